@@ -204,6 +204,7 @@ class SejmHighlightsApp(QMainWindow):
         self.logger = logging.getLogger("app")
         self.processing_thread = None
         self.current_results = None
+        self.selection_index = None
         self.download_thread = None
         self.downloaded_file_path = None
         self.copyright_protector = CopyrightProtector(
@@ -787,6 +788,13 @@ class SejmHighlightsApp(QMainWindow):
         threshold_layout.addWidget(self.score_threshold_label)
         layout.addLayout(threshold_layout)
 
+        # Podgląd selekcji na danych ostatniego przebiegu (SelectionIndex, bez Stage 6)
+        self.selection_preview_label = QLabel("")
+        layout.addWidget(self.selection_preview_label)
+        self.score_threshold_slider.valueChanged.connect(self._update_selection_preview)
+        self.target_duration.valueChanged.connect(self._update_selection_preview)
+        self.num_clips.valueChanged.connect(self._update_selection_preview)
+
         # Transitions & Hardsub
         self.add_transitions = QCheckBox("✨ Dodaj przejścia między klipami")
         self.add_transitions.setChecked(False)  # Domyślnie wyłączone - fontconfig issue
@@ -1672,9 +1680,27 @@ class SejmHighlightsApp(QMainWindow):
         time_taken = stats.get('time', 'N/A')
         self.stats_list.addItem(f"✅ {stage} - {time_taken}")
     
+    def _update_selection_preview(self, *_):
+        """Live podgląd: ile klipów / minut dałby Stage 6 z bieżącymi ustawieniami"""
+        if self.selection_index is None:
+            return
+        preview = self.selection_index.preview(
+            min_score_threshold=self.score_threshold_slider.value() / 100.0,
+            target_total_duration=self.target_duration.value() * 60,
+            max_clips=self.num_clips.value(),
+        )
+        self.selection_preview_label.setText(
+            f"👁️ Podgląd (ostatnie nagranie): {preview.num_clips} klipów, "
+            f"{preview.total_duration / 60:.1f} min (kandydaci: {preview.num_candidates}, próg {preview.threshold:.2f}, "
+            f"silnik {preview.engine})"
+        )
+
     def on_processing_completed(self, results: dict):
         """Przetwarzanie zakończone pomyślnie"""
         self.current_results = results
+        processor = self.processing_thread.processor if self.processing_thread else None
+        self.selection_index = getattr(processor, 'selection_index', None)
+        self._update_selection_preview()
 
         export_results = results.get('export_results') or []
         primary_output = results.get('output_file')
@@ -0,0 +1,93 @@
+"""
+Benchmark: skalowanie transkrypcji CPU z ASRWorkerPool (1/2/4/8 workerów).
+
+Generuje syntetyczne audio (16 kHz, "mowa" = harmoniczne z modulacją
+amplitudy + szum) i segmenty VAD o losowej długości 3-30s, a potem mierzy
+czas transkrypcji dla kolejnych liczb workerów. Każdy worker ładuje własny
+model (czas ładowania liczony osobno - pierwsza, rozgrzewkowa transkrypcja),
+cpu_threads = rdzenie / workers.
+
+Uruchomienie (wymaga pobranego modelu faster-whisper):
+    python benchmarks/bench_asr_pool.py [--model tiny] [--minutes 10] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.asr_pool import ASRWorkerPool
+from pipeline.audio_store import AudioStore
+from pipeline.config import Config
+
+SR = 16000
+
+
+def make_fixture(minutes: float, directory: Path):
+    """Audio .f32 + segmenty VAD pokrywające całe nagranie"""
+    rng = np.random.default_rng(0)
+    total = int(minutes * 60 * SR)
+    t = np.arange(total) / SR
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SR
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2  # ~sylaby
+    audio = (0.2 * voice * envelope + 0.01 * rng.standard_normal(total)).astype('<f4')
+
+    pcm = directory / "audio.f32"
+    audio.tofile(pcm)
+
+    segments, start = [], 0.0
+    while start < total / SR - 1:
+        duration = min(float(rng.uniform(3.0, 30.0)), total / SR - start)
+        segments.append({'id': f"seg_{len(segments):04d}", 't0': start, 't1': start + duration,
+                         'duration': duration})
+        start += duration
+    return AudioStore(pcm, SR), segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="tiny", help="Model faster-whisper")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Długość syntetycznego audio")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    config = Config()
+    config.use_gpu = False
+    config.asr.model = args.model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store, segments = make_fixture(args.minutes, Path(tmp))
+        audio_seconds = store.duration
+        print(f"🎧 Audio: {audio_seconds / 60:.0f} min, {len(segments)} segmentów, "
+              f"{os.cpu_count()} rdzeni, model {args.model}")
+
+        print(f"\n{'workery':>8}{'wątki/worker':>14}{'ładowanie [s]':>15}{'transkrypcja [s]':>18}{'x realtime':>12}{'skalowanie':>12}")
+        baseline = None
+        for workers in args.workers:
+            pool = ASRWorkerPool(config, workers=workers)
+            try:
+                start = time.perf_counter()
+                pool.transcribe(store, segments[:workers])  # rozgrzewka: model w każdym procesie
+                load_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                pool.transcribe(store, segments)
+                elapsed = time.perf_counter() - start
+            finally:
+                pool.shutdown()
+
+            baseline = baseline or elapsed
+            print(f"{workers:>8}{pool.worker_config.asr.cpu_threads:>14}{load_time:>15.1f}{elapsed:>18.1f}"
+                  f"{audio_seconds / elapsed:>12.1f}{baseline / elapsed:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
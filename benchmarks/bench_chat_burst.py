@@ -0,0 +1,75 @@
+"""
+Benchmark: chat burst - calculate_chat_burst_score per segment vs ChatTimeline.
+
+Generuje czat 12h streamu z dużym ruchem (tło kilkadziesiąt wiadomości/s,
+bursty do kilku tysięcy/s) i segmenty VAD co kilka sekund, a potem mierzy:
+- poprzedni przebieg Stage 5: calculate_chat_burst_score dla każdego segmentu
+  (baseline 180s i okno peak z lookupami w dict)
+- calculate_chat_burst_scores: gęsta tablica + suma prefiksowa + sparse table
+  (budowa tablicy wliczona)
+Sprawdza też, że wynik jest identyczny.
+
+Uruchomienie:
+    python benchmarks/bench_chat_burst.py [--hours 12]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.chat_burst import calculate_chat_burst_score, calculate_chat_burst_scores
+
+
+def make_chat(seconds: int) -> dict:
+    rng = np.random.default_rng(0)
+    counts = rng.poisson(40, seconds)
+    bursts = rng.random(seconds) < 0.01
+    counts[bursts] += rng.integers(200, 3000, int(bursts.sum()))
+    return {int(s): int(c) for s, c in enumerate(counts) if c}
+
+
+def make_segments(seconds: int):
+    rng = np.random.default_rng(1)
+    t0s, t1s, t = [], [], 0.0
+    while t < seconds:
+        duration = float(rng.uniform(2, 20))
+        t0s.append(t)
+        t1s.append(min(t + duration, float(seconds)))
+        t += duration + float(rng.uniform(0.2, 2.0))
+    return t0s, t1s
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=12.0, help="Długość streamu")
+    args = parser.parse_args()
+
+    seconds = int(args.hours * 3600)
+    chat = make_chat(seconds)
+    t0s, t1s = make_segments(seconds)
+    print(f"💬 Czat: {args.hours:.0f}h, {sum(chat.values()) / 1e6:.1f} mln wiadomości, {len(t0s)} segmentów")
+
+    expected, t_loop = timed(lambda: [calculate_chat_burst_score(a, b, chat) for a, b in zip(t0s, t1s)])
+    result, t_vec = timed(lambda: calculate_chat_burst_scores(t0s, t1s, chat))
+
+    print(f"\n{'wariant':<32}{'czas [s]':>10}")
+    print(f"{'per segment (poprzednio)':<32}{t_loop:>10.3f}")
+    print(f"{'ChatTimeline (wektorowo)':<32}{t_vec:>10.3f}")
+    print(f"\n⚡ Przyspieszenie: {t_loop / t_vec:.1f}x")
+    identical = result.tolist() == expected
+    print(f"{'✅' if identical else '❌'} Wynik identyczny: {identical}")
+
+
+if __name__ == "__main__":
+    main()
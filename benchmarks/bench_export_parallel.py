@@ -0,0 +1,93 @@
+"""
+Benchmark: wycinanie klipów w Stage 7 - sekwencyjnie vs EncoderPool.
+
+Generuje syntetyczne źródło (ffmpeg lavfi testsrc2 + sine, domyślnie 10 min
+1280x720) i wycina z niego N klipów (domyślnie 40 × 20 s) przez
+ExportStage._extract_clips:
+- encode_workers=1, encoder_threads=0 (dawne zachowanie: jeden ffmpeg naraz,
+  wątki domyślne)
+- encode_workers=0 (rdzenie / encoder_threads) dla podanych wartości
+  encoder_threads
+Wymaga ffmpeg w PATH. Czas = jedno uruchomienie (kodowanie jest długie).
+
+Uruchomienie:
+    python benchmarks/bench_export_parallel.py [--clips 40] [--threads 2 4]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.encoder_pool import encoder_workers
+from pipeline.stage_07_export import ExportStage
+
+
+def make_source(path: Path, minutes: float) -> None:
+    subprocess.run([
+        'ffmpeg', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={minutes * 60}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={minutes * 60}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', '-y', str(path)
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=40, help="Liczba klipów")
+    parser.add_argument("--clip-seconds", type=float, default=20.0, help="Długość klipu [s]")
+    parser.add_argument("--source-minutes", type=float, default=10.0, help="Długość źródła [min]")
+    parser.add_argument("--threads", type=int, nargs="+", default=[2, 4], help="Wątki na enkoder (encoder_threads)")
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        print("❌ Brak ffmpeg w PATH")
+        sys.exit(1)
+
+    work_dir = Path(tempfile.mkdtemp())
+    source = work_dir / "source.mp4"
+    print(f"📼 Generowanie źródła ({args.source_minutes:.0f} min)...")
+    make_source(source, args.source_minutes)
+
+    span = args.source_minutes * 60 - args.clip_seconds - 5
+    clips = [
+        {'t0': 2 + i * span / args.clips, 't1': 2 + i * span / args.clips + args.clip_seconds,
+         'duration': args.clip_seconds}
+        for i in range(args.clips)
+    ]
+
+    variants = [("sekwencyjnie (dawniej)", 1, 0)] + [
+        (f"pula, {threads} wątki/enkoder", 0, threads) for threads in args.threads
+    ]
+    print(f"🖥️ Rdzenie: {os.cpu_count()}")
+    print(f"{'wariant':<28}{'enkodery':>9}{'czas [s]':>10}{'x':>7}")
+    baseline = None
+    for name, workers, threads in variants:
+        config = Config()
+        config.export.encode_workers = workers
+        config.export.encoder_threads = threads
+        stage = ExportStage(config)
+        out_dir = work_dir / f"clips_{workers}_{threads}"
+        out_dir.mkdir()
+
+        _, elapsed = timed(lambda: stage._extract_clips(source, [dict(c) for c in clips], out_dir))
+        baseline = baseline or elapsed
+        print(f"{name:<28}{encoder_workers(workers, threads):>9}{elapsed:>10.1f}{baseline / elapsed:>7.2f}")
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
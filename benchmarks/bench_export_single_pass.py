@@ -0,0 +1,106 @@
+"""
+Benchmark: eksport Stage 7 - tryb klasyczny vs jeden przebieg filter_complex.
+
+Generuje syntetyczne źródło (ffmpeg lavfi testsrc2 + sine) i eksportuje
+N klipów przez ExportStage.process:
+- tryb klasyczny: cięcie (N kodowań) → fade (N kodowań) → concat
+  (+ osobne kodowanie hardsub)
+- export.single_pass: jeden graf trim/fade/concat, jedno kodowanie
+  (hardsub w tym samym przebiegu)
+i porównuje czas oraz długość plików wynikowych. Title cards wyłączone
+(drawtext wymaga ffmpeg z freetype/fontconfig). Wymaga ffmpeg w PATH.
+
+Uruchomienie:
+    python benchmarks/bench_export_single_pass.py [--clips 8] [--hardsub]
+"""
+
+import argparse
+import contextlib
+import io
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_07_export import ExportStage
+
+
+def make_source(path: Path, seconds: float) -> None:
+    subprocess.run([
+        'ffmpeg', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', '-y', str(path)
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+
+def media_duration(path: str) -> str:
+    stderr = subprocess.run(['ffmpeg', '-i', path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stderr
+    match = re.search(r'Duration: (\S+),', stderr)
+    return match.group(1) if match else "?"
+
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # printy Stage 7
+        result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=8, help="Liczba klipów")
+    parser.add_argument("--clip-seconds", type=float, default=15.0, help="Długość klipu [s]")
+    parser.add_argument("--preset", default="veryfast", help="export.video_preset")
+    parser.add_argument("--hardsub", action="store_true", help="Z wersją hardsub (generate_hardsub)")
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        print("❌ Brak ffmpeg w PATH")
+        sys.exit(1)
+
+    work_dir = Path(tempfile.mkdtemp())
+    spacing = args.clip_seconds + 10
+    source = work_dir / "source.mp4"
+    print("📼 Generowanie źródła...")
+    make_source(source, args.clips * spacing + 20)
+
+    clips = [
+        {'id': f"seg_{i:03d}", 't0': 10 + i * spacing, 't1': 10 + i * spacing + args.clip_seconds,
+         'duration': args.clip_seconds, 'transcript': "przykładowa wypowiedź posła " * 4}
+        for i in range(args.clips)
+    ]
+    segments = [{'id': c['id'], 'transcript': c['transcript']} for c in clips]
+
+    print(f"{'tryb':<14}{'czas [s]':>10}{'x':>7}  {'film':<13}{'hardsub':<13}")
+    baseline = None
+    for name, single_pass in (("klasyczny", False), ("single-pass", True)):
+        config = Config()
+        config.export.add_transitions = False
+        config.export.generate_hardsub = args.hardsub
+        config.export.single_pass = single_pass
+        config.export.video_preset = args.preset
+        stage = ExportStage(config)
+        session_dir = work_dir / name
+        output_dir = work_dir / f"{name}_out"
+        session_dir.mkdir()
+        output_dir.mkdir()
+
+        result, elapsed = timed(lambda: stage.process(
+            str(source), [dict(c) for c in clips], segments, output_dir, session_dir
+        ))
+        baseline = baseline or elapsed
+        hardsub = result.get('output_file_hardsub')
+        print(f"{name:<14}{elapsed:>10.1f}{baseline / elapsed:>7.2f}  {media_duration(result['output_file']):<13}"
+              f"{media_duration(hardsub) if hardsub else '-':<13}")
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: cechy akustyczne Stage 4 - STFT per segment vs jedno STFT nagrania.
+
+Generuje syntetyczne nagranie (16 kHz: ton o zmiennej wysokości z modulacją
+głośności + szum) i segmenty VAD 5-30s, a potem mierzy:
+- per segment: librosa spectral_centroid + stft + zero_crossing_rate
+  dla każdego wycinka (FeaturesStage._extract_acoustic_features)
+- całe nagranie: FrameFeatures (STFT blokami) + sumy prefiksowe
+Raportuje też maksymalną różnicę względną cech.
+
+Uruchomienie:
+    python benchmarks/bench_features_acoustic.py [--hours 2]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_04_features import FeaturesStage
+
+SR = 16000
+BLOCK_SECONDS = 600  # generowanie fixture blokami (mniej pamięci tymczasowej)
+
+
+def make_fixture(hours: float):
+    rng = np.random.default_rng(0)
+    total = int(hours * 3600 * SR)
+    audio = np.empty(total, dtype=np.float32)
+    for start in range(0, total, BLOCK_SECONDS * SR):
+        t = np.arange(start, min(total, start + BLOCK_SECONDS * SR)) / SR
+        tone = np.sin(2 * np.pi * (200 + 100 * np.sin(t / 7)) * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 0.5 * t))
+        audio[start:start + len(t)] = 0.2 * tone + 0.02 * rng.standard_normal(len(t))
+
+    segments, t0 = [], 0.0
+    while t0 < total / SR - 5:
+        duration = float(rng.uniform(5, 30))
+        segments.append({'t0': t0, 't1': min(t0 + duration, total / SR)})
+        t0 += duration + float(rng.uniform(0.3, 2.0))
+    return audio, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=2.0, help="Długość syntetycznego nagrania")
+    args = parser.parse_args()
+
+    audio, segments = make_fixture(args.hours)
+    print(f"🎧 Nagranie: {args.hours:.1f}h @ {SR} Hz, {len(segments)} segmentów")
+
+    stage = FeaturesStage.__new__(FeaturesStage)
+    stage.config = Config()
+
+    start = time.perf_counter()
+    legacy = [stage._extract_acoustic_features(seg, audio, SR) for seg in segments]
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = stage._compute_acoustic_features(segments, audio, SR)
+    t_vectorized = time.perf_counter() - start
+
+    print(f"\n{'wariant':<26}{'czas [s]':>10}")
+    print(f"{'STFT per segment':<26}{t_legacy:>10.2f}")
+    print(f"{'STFT całego nagrania':<26}{t_vectorized:>10.2f}")
+    print(f"\n⚡ Przyspieszenie: {t_legacy / t_vectorized:.1f}x")
+
+    for name in legacy[0]:
+        expected = np.array([f[name] for f in legacy])
+        actual = np.array([f[name] for f in vectorized])
+        rel = np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-12))
+        print(f"   max różnica względna {name:<18} {rel:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: przepustowość PipelineJobQueue vs tryb szeregowy (single-flight).
+
+Symuluje nagrania przechodzące przez graf etapów o kształcie pipeline'u
+(ingest/ffmpeg → VAD → ASR → features → scoring/GPT → export/ffmpeg) z czasami
+skalowanymi z realnego uruchomienia. Etapy śpią zamiast liczyć, więc wynik
+pokazuje zysk z nakładania etapów różnych nagrań przy danym budżecie zasobów,
+a nie wydajność samych etapów.
+
+Uruchomienie:
+    python benchmarks/bench_job_queue.py [--jobs 6] [--scale 0.05]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.job_queue import PipelineJobQueue
+from pipeline.stage_graph import ResourceBudget, StageGraph, StageScheduler
+
+# (etap, inputs, outputs, zasoby, względny czas) - proporcje z ~4h nagrania
+STAGES = [
+    ('ingest', ('input_file',), ('audio',), {'ffmpeg': 1, 'ram_mb': 1024}, 4.0),
+    ('vad', ('audio',), ('vad',), {'ram_mb': 2048}, 2.0),
+    ('transcribe', ('vad',), ('transcript',), {'asr': 1, 'ram_mb': 6144}, 10.0),
+    ('features', ('transcript',), ('features',), {'ram_mb': 4096}, 3.0),
+    ('scoring', ('features',), ('scores',), {}, 6.0),
+    ('export', ('scores',), ('export',), {'ffmpeg': 1, 'ram_mb': 2048}, 8.0),
+]
+
+
+class SimulatedProcessor:
+    def __init__(self, config, resource_budget, scale):
+        self.resource_budget = resource_budget
+        self.scale = scale
+        self.run_id = None
+
+    def cancel(self):
+        pass
+
+    def process(self, input_file):
+        graph = StageGraph()
+        for name, inputs, outputs, resources, cost in STAGES:
+            def run(ctx, outputs=outputs, cost=cost):
+                time.sleep(cost * self.scale)
+                return {key: True for key in outputs}
+            graph.add_stage(name, run, inputs=inputs, outputs=outputs, resources=resources)
+
+        StageScheduler(graph, resource_budget=self.resource_budget).run({'input_file': input_file})
+        return {'export_results': []}
+
+
+def run_queue(inputs, max_concurrent_jobs, capacities, scale):
+    budget = ResourceBudget(capacities)
+    queue = PipelineJobQueue(
+        Config(),
+        max_concurrent_jobs=max_concurrent_jobs,
+        resource_budget=budget,
+        processor_factory=lambda cfg, b: SimulatedProcessor(cfg, b, scale),
+    )
+    start = time.perf_counter()
+    for input_file in inputs:
+        queue.submit(input_file)
+    queue.wait()
+    elapsed = time.perf_counter() - start
+    queue.shutdown()
+    return elapsed, budget.peak_usage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=6, help="Liczba nagrań")
+    parser.add_argument("--scale", type=float, default=0.05, help="Sekundy na jednostkę kosztu etapu")
+    parser.add_argument("--ffmpeg-slots", type=int, default=2)
+    parser.add_argument("--asr-instances", type=int, default=1)
+    parser.add_argument("--ram-mb", type=int, default=16000)
+    args = parser.parse_args()
+
+    inputs = [f"/tmp/bench_sejm_{i}.mp4" for i in range(args.jobs)]
+    capacities = {'ffmpeg': args.ffmpeg_slots, 'asr': args.asr_instances, 'ram_mb': args.ram_mb}
+
+    serial, _ = run_queue(inputs, 1, capacities, args.scale)
+    print(f"Serialized (1 job):       {serial:6.2f}s  {args.jobs / serial * 60:6.1f} jobs/min")
+
+    for concurrency in (2, 4):
+        elapsed, peak = run_queue(inputs, concurrency, capacities, args.scale)
+        print(f"Queue ({concurrency} jobs):           {elapsed:6.2f}s  {args.jobs / elapsed * 60:6.1f} jobs/min"
+              f"  speedup x{serial / elapsed:.2f}  peak={peak}")
+
+    asr_cost = next(cost for name, *_, cost in STAGES if name == 'transcribe')
+    print(f"(dolne ograniczenie: ASR {asr_cost * args.scale * args.jobs / args.asr_instances:.2f}s przy "
+          f"{args.asr_instances} instancji)")
+
+
+if __name__ == "__main__":
+    main()
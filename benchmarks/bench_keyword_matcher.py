@@ -0,0 +1,81 @@
+"""
+Benchmark: dopasowanie keywords - pętla `token in transcript` vs KeywordMatcher.
+
+Leksykon models/keywords.csv jest powiększany syntetycznymi słowami (do
+kilku tysięcy wpisów); mierzony jest czas dopasowania dla zestawu
+segmentów zbudowanych z prawdziwych keywords i wypełniacza:
+- poprzednia implementacja: podciąg dla każdego wpisu leksykonu
+- KeywordMatcher.positions (trie słów, jedno przejście po transkrypcie)
+
+Uruchomienie:
+    python benchmarks/bench_keyword_matcher.py [--segments 3000]
+"""
+
+import argparse
+import csv
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.keyword_matcher import KeywordMatcher
+
+KEYWORDS_CSV = Path(__file__).resolve().parents[1] / "models" / "keywords.csv"
+FILLER = "pan poseł powiedział że w tej sprawie nie ma zgody bo wszyscy wiedzą jak było".split()
+
+
+def load_keywords():
+    with open(KEYWORDS_CSV, 'r', encoding='utf-8') as f:
+        return [row['token'] for row in csv.DictReader(f) if not row['token'].startswith('#')]
+
+
+def synthetic_keywords(n, rng):
+    letters = "abcdefghijklmnoprstuwyzłśćżźąęó"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(5, 11))) for _ in range(n)]
+
+
+def make_segments(keywords, count, rng):
+    segments = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(15, 60))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        segments.append(" ".join(words))
+    return segments
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=3000, help="Liczba segmentów")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    base = load_keywords()
+    segments = make_segments(base, args.segments, rng)
+    lowered_segments = [s.lower() for s in segments]
+    print(f"📚 {len(base)} keywords z {KEYWORDS_CSV.name}, {args.segments} segmentów")
+
+    print(f"\n{'leksykon':>10}{'pętla [s]':>12}{'matcher [s]':>13}{'budowa [s]':>12}")
+    for size in (len(base), 1000, 5000):
+        lexicon = base + synthetic_keywords(max(0, size - len(base)), rng)
+        lowered = [k.lower() for k in lexicon]
+
+        _, t_loop = timed(lambda: [[k for k in lowered if k in s] for s in lowered_segments])
+
+        matcher = KeywordMatcher()
+        _, t_build = timed(lambda: [matcher.add(k) for k in lexicon])
+        _, t_matcher = timed(lambda: [matcher.positions(s) for s in segments])
+
+        print(f"{len(lexicon):>10}{t_loop:>12.3f}{t_matcher:>13.3f}{t_build:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark: zapis/odczyt segmentów - JSON (indent=2) vs format kolumnowy (.segs).
+
+Generuje syntetyczną transkrypcję o kształcie wyniku stage 4 (segmenty ze
+słowami word/start/end/probability + zagnieżdżone features) i mierzy:
+- zapis (json.dump indent=2 vs save_segments_columnar)
+- pełny odczyt (json.load vs LazySegments.to_list)
+- odczyt jednej kolumny (final_score) - to, czego potrzebuje selekcja
+- rozmiar na dysku
+
+Uruchomienie:
+    python benchmarks/bench_segment_store.py [--hours 10] [--words-per-segment 200]
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.segment_store import LazySegments, save_segments_columnar
+
+WORDS = ["posiedzenie", "Sejmu", "marszałek", "ustawa", "głosowanie", "poseł", "rząd",
+         "projekt", "komisja", "budżet", "pytanie", "odpowiedź", "wniosek", "proszę"]
+
+
+def make_segments(hours: float, words_per_segment: int):
+    rng = random.Random(0)
+    segments = []
+    t = 0.0
+    # ~24s na segment (średnia z VAD dla posiedzeń)
+    for i in range(int(hours * 3600 / 24)):
+        duration = rng.uniform(8.0, 40.0)
+        words = []
+        wt = t
+        for _ in range(words_per_segment):
+            w_dur = duration / words_per_segment
+            words.append({
+                'word': rng.choice(WORDS),
+                'start': round(wt, 3),
+                'end': round(wt + w_dur, 3),
+                'probability': round(rng.random(), 4),
+            })
+            wt += w_dur
+        segments.append({
+            'id': f"seg_{i:05d}",
+            't0': t,
+            't1': t + duration,
+            'duration': duration,
+            'transcript': " ".join(w['word'] for w in words),
+            'words': words,
+            'language': 'pl',
+            'confidence': rng.random(),
+            'features': {
+                'rms': rng.random(),
+                'spectral_centroid': rng.random() * 4000,
+                'keyword_score': rng.random(),
+                'matched_keywords': rng.sample(WORDS, 2),
+                'speaker_change_prob': rng.random(),
+            },
+            'final_score': rng.random(),
+        })
+        t += duration + rng.uniform(0.5, 3.0)
+    return segments
+
+
+def dir_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.iterdir())
+    return path.stat().st_size
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=10.0, help="Długość nagrania (h)")
+    parser.add_argument("--words-per-segment", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    segments = make_segments(args.hours, args.words_per_segment)
+    total_words = sum(len(s['words']) for s in segments)
+    print(f"Segmenty: {len(segments)}, słowa: {total_words}")
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_segs_"))
+    try:
+        json_path = tmp / "scored_segments.json"
+        segs_path = tmp / "scored_segments.segs"
+
+        def save_json():
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(segments, f, indent=2, ensure_ascii=False)
+
+        def load_json():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        t_save_json, _ = timed(save_json, args.repeat)
+        t_save_cols, _ = timed(lambda: save_segments_columnar(segments, segs_path), args.repeat)
+        t_load_json, loaded_json = timed(load_json, args.repeat)
+        t_load_cols, loaded_cols = timed(lambda: LazySegments(segs_path).to_list(), args.repeat)
+        t_col_json, _ = timed(lambda: [s['final_score'] for s in load_json()], args.repeat)
+        t_col_cols, _ = timed(lambda: LazySegments(segs_path).column('final_score').sum(), args.repeat)
+
+        assert loaded_cols == loaded_json
+
+        size_json = dir_size(json_path)
+        size_cols = dir_size(segs_path)
+
+        print(f"{'':24s}{'JSON':>10s}{'kolumnowo':>12s}{'zysk':>8s}")
+        for label, a, b in (
+            ("zapis", t_save_json, t_save_cols),
+            ("odczyt (pełny)", t_load_json, t_load_cols),
+            ("odczyt final_score", t_col_json, t_col_cols),
+        ):
+            print(f"{label:24s}{a:9.3f}s{b:11.3f}s{a / b:7.1f}x")
+        print(f"{'rozmiar':24s}{size_json / 1024 ** 2:8.1f}MB{size_cols / 1024 ** 2:10.1f}MB"
+              f"{size_json / size_cols:7.1f}x")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
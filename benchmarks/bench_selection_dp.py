@@ -0,0 +1,97 @@
+"""
+Benchmark: silnik selekcji Stage 6 - greedy vs DP z budżetem czasu.
+
+Generuje kandydatów z 12h materiału (domyślnie 10k) i dla kilku
+konfiguracji (15 min / 40 klipów, 40 min, 4h kompilacji) mierzy:
+- SelectionStage._select_greedy (NMS → merge → coverage → trim → top-up)
+- select_budgeted (pipeline/interval_dp.py) z tymi samymi limitami
+i raportuje Σ final_score obu silników, zysk DP, górne ograniczenie
+optimum oraz to, czy wynik greedy mieści się w limitach (top-up potrafi
+je przekroczyć). Czas = najlepszy z 3 powtórzeń.
+
+Uruchomienie:
+    python benchmarks/bench_selection_dp.py [--sizes 10000 50000]
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_06_selection import SelectionStage
+
+
+def make_candidates(n: int, hours: float = 12.0):
+    rng = np.random.default_rng(0)
+    t0s = rng.uniform(0, hours * 3600, n)
+    durations = rng.uniform(8, 120, n)
+    scores = rng.beta(2, 5, n)
+    return [
+        {
+            'id': f"seg_{i:05d}", 't0': float(t0), 't1': float(t0 + d), 'duration': float(d),
+            'final_score': float(s), 'transcript': '', 'features': {}, 'subscores': {}
+        }
+        for i, (t0, d, s) in enumerate(zip(t0s, durations, scores))
+    ]
+
+
+def timed(fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # printy Stage 6
+            result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000], help="Liczby kandydatów")
+    parser.add_argument("--hours", type=float, default=12.0, help="Długość materiału [h]")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("15 min / 40 klipów", 900.0, 40, 4),
+        ("40 min / 40 klipów", 2400.0, 40, 5),
+        ("4h / 400 klipów", 4 * 3600.0, 400, 100),
+    ]
+    total_duration = args.hours * 3600
+
+    print(f"{'kandydaci':>10}  {'scenariusz':<20}{'greedy [s]':>11}{'DP [s]':>9}"
+          f"{'Σ greedy':>10}{'Σ DP':>9}{'zysk':>8}{'≤ opt':>9}{'krok':>7}  greedy w limitach")
+    for size in args.sizes:
+        candidates = make_candidates(size, args.hours)
+        for name, target, max_clips, per_bin in scenarios:
+            stage = SelectionStage.__new__(SelectionStage)
+            stage.config = Config()
+            stage.config.selection.engine = "dp"
+            stage.config.selection.target_total_duration = target
+            stage.config.selection.max_clips = max_clips
+            stage.config.selection.max_clips_per_bin = per_bin
+
+            _, t_greedy = timed(lambda: stage._select_greedy(
+                copy.deepcopy(candidates), copy.deepcopy(candidates), copy.deepcopy(candidates),
+                total_duration, 8
+            ))
+            # _select_dp liczy też greedy (raport) - odejmujemy jego czas
+            (_, report), t_both = timed(lambda: stage._select_dp(
+                candidates, candidates, candidates, total_duration, 8
+            ))
+            t_dp = max(t_both - t_greedy, 0.0)
+            print(f"{size:>10}  {name:<20}{t_greedy:>11.3f}{t_dp:>9.3f}"
+                  f"{report['greedy_score']:>10.2f}{report['dp_score']:>9.2f}{report['gain']:>+8.2f}"
+                  f"{report['upper_bound']:>9.2f}{report['budget_step']:>7.1f}"
+                  f"  {'✅' if report['greedy_within_limits'] else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: podgląd selekcji - SelectionStage.process vs SelectionIndex.preview.
+
+Generuje segmenty po scoringu z 12h materiału (10k / 50k) i dla kilku
+ustawień suwaków (próg score, docelowy czas, max klipów) mierzy:
+- pełne SelectionStage.process (pre-merge, filtry, sortowanie, zapis JSON)
+- SelectionIndex.preview na indeksie zbudowanym raz (czas budowy osobno)
+Czas = najlepszy z 3 powtórzeń. Sprawdza też, że klipy są identyczne.
+
+Uruchomienie:
+    python benchmarks/bench_selection_index.py [--sizes 10000 50000]
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.selection_index import SelectionIndex
+from pipeline.stage_06_selection import SelectionStage
+
+
+def make_segments(n: int, hours: float = 12.0):
+    rng = np.random.default_rng(0)
+    t0s = np.sort(rng.uniform(0, hours * 3600 - 150, n))
+    durations = rng.uniform(3, 140, n)
+    scores = rng.beta(2, 5, n)
+    return [
+        {
+            'id': f"seg_{i:05d}", 't0': float(t0), 't1': float(t0 + d), 'duration': float(d),
+            'final_score': float(s), 'transcript': '', 'features': {}, 'subscores': {}
+        }
+        for i, (t0, d, s) in enumerate(zip(t0s, durations, scores))
+    ]
+
+
+def timed(fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # printy Stage 6
+            result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000], help="Liczby segmentów")
+    args = parser.parse_args()
+
+    sliders = [(0.35, 900.0, 40), (0.5, 2400.0, 40), (0.25, 3600.0, 40), (0.7, 600.0, 10)]
+    total_duration = 12 * 3600.0
+    config = Config()
+    config.shorts.enabled = False
+    output_dir = Path(tempfile.mkdtemp())
+
+    print(f"{'segmenty':>9}  {'próg/target/klipy':<20}{'process [ms]':>14}{'preview [ms]':>14}{'x':>8}{'klipy':>7}  identyczne")
+    for size in args.sizes:
+        segments = make_segments(size)
+        index, t_build = timed(lambda: SelectionIndex(segments, total_duration, config), repeat=1)
+        print(f"{size:>9}  budowa indeksu: {t_build * 1000:.0f} ms")
+
+        for threshold, target, max_clips in sliders:
+            stage_config = copy.deepcopy(config)
+            stage_config.selection.min_score_threshold = threshold
+            stage_config.selection.target_total_duration = target
+            stage_config.selection.max_clips = max_clips
+            stage = SelectionStage(stage_config)
+
+            # process() przycina t1 segmentów wejściowych - kopia poza pomiarem
+            copies = [copy.deepcopy(segments) for _ in range(3)]
+            expected, t_process = timed(lambda: stage.process(copies.pop(), total_duration, output_dir))
+            preview, t_preview = timed(lambda: index.preview(
+                min_score_threshold=threshold, target_total_duration=target, max_clips=max_clips
+            ))
+            identical = [(c['id'], c['t1']) for c in preview.clips] == [(c['id'], c['t1']) for c in expected['clips']]
+            print(f"{'':>9}  {f'{threshold:.2f} / {target / 60:.0f} min / {max_clips}':<20}"
+                  f"{t_process * 1000:>14.1f}{t_preview * 1000:>14.2f}{t_process / t_preview:>8.0f}"
+                  f"{preview.num_clips:>7}  {'✅' if identical else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
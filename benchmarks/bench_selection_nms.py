@@ -0,0 +1,107 @@
+"""
+Benchmark: greedy NMS w Stage 6 - pełny przegląd wybranych vs IntervalSet.
+
+Generuje kandydatów z 12h materiału (10k / 50k) i mierzy:
+- poprzednią pętlę (`_has_overlap` po wszystkich wybranych + suma długości
+  od zera dla każdego kandydata)
+- SelectionStage._greedy_selection_with_nms (bisect po wybranych, suma na bieżąco)
+dla domyślnej konfiguracji (15 min, max 40 klipów), długiej kompilacji
+(4h, max 1000 klipów) i pokrycia całego materiału (12h, bez limitu klipów -
+każdy kandydat przechodzi test kolizji). Czas = najlepszy z 3 powtórzeń.
+Sprawdza też, że wybór jest identyczny.
+
+Uruchomienie:
+    python benchmarks/bench_selection_nms.py [--sizes 10000 50000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_06_selection import SelectionStage
+
+
+def make_candidates(n: int, hours: float = 12.0):
+    rng = np.random.default_rng(0)
+    t0s = rng.uniform(0, hours * 3600, n)
+    durations = rng.uniform(8, 120, n)
+    scores = rng.beta(2, 5, n)
+    return [
+        {'id': f"seg_{i:05d}", 't0': float(t0), 't1': float(t0 + d), 'duration': float(d), 'final_score': float(s)}
+        for i, (t0, d, s) in enumerate(zip(t0s, durations, scores))
+    ]
+
+
+def loop_nms(candidates, target_duration, max_clips, min_gap):
+    """Poprzednia implementacja"""
+
+    def has_overlap(candidate, selected):
+        for sel in selected:
+            if not (candidate['t1'] < sel['t0'] or candidate['t0'] > sel['t1']):
+                return True
+            if sel['t0'] - candidate['t1'] < min_gap and sel['t0'] > candidate['t1']:
+                return True
+            if candidate['t0'] - sel['t1'] < min_gap and candidate['t0'] > sel['t1']:
+                return True
+        return False
+
+    selected = []
+    for candidate in sorted(candidates, key=lambda x: x['final_score'], reverse=True):
+        if len(selected) >= max_clips:
+            break
+        current_total = sum(s['duration'] for s in selected)
+        if current_total >= target_duration:
+            break
+        if has_overlap(candidate, selected):
+            continue
+        if current_total + candidate['duration'] > target_duration * 1.2:
+            continue
+        selected.append(candidate)
+    return selected
+
+
+def timed(fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000], help="Liczby kandydatów")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("15 min / 40 klipów", 900.0, 40),
+        ("4h / 1000 klipów", 4 * 3600.0, 1000),
+        ("12h / bez limitu", 12 * 3600.0, 100000),
+    ]
+
+    print(f"{'kandydaci':>10}  {'scenariusz':<20}{'pętla [s]':>11}{'bisect [s]':>12}{'x':>7}{'klipy':>7}  identyczne")
+    for size in args.sizes:
+        candidates = make_candidates(size)
+        for name, target, max_clips in scenarios:
+            stage = SelectionStage.__new__(SelectionStage)
+            stage.config = Config()
+            stage.config.selection.target_total_duration = target
+            stage.config.selection.max_clips = max_clips
+            min_gap = stage.config.selection.min_time_gap
+
+            expected, t_loop = timed(lambda: loop_nms(candidates, target, max_clips, min_gap))
+            result, t_new = timed(lambda: stage._greedy_selection_with_nms(candidates))
+            identical = [c['id'] for c in result] == [c['id'] for c in expected]
+            print(f"{size:>10}  {name:<20}{t_loop:>11.3f}{t_new:>12.3f}{t_loop / t_new:>7.1f}"
+                  f"{len(result):>7}  {'✅' if identical else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
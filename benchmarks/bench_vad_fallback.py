@@ -0,0 +1,110 @@
+"""
+Benchmark: energetyczny fallback VAD - pętla po ramkach vs wersja wektorowa.
+
+Generuje syntetyczne audio (bloki mowa/tło, 16 kHz) i mierzy:
+- poprzednią implementację (pętla Pythona po ramkach 20ms/10ms + pętla po masce)
+- VADStage._detect_speech_fallback (sumy skumulowane + np.diff)
+- wariant z progiem kroczącym (vad.energy_adaptive)
+Sprawdza też, że wynik jest identyczny.
+
+Uruchomienie:
+    python benchmarks/bench_vad_fallback.py [--minutes 30]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_02_vad import VADStage
+
+SR = 16000
+
+
+def make_audio(minutes: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    total = int(minutes * 60 * SR)
+    parts = []
+    size = 0
+    while size < total:
+        n = int(rng.uniform(0.5, 8.0) * SR)
+        parts.append((rng.standard_normal(n) * rng.choice([0.3, 0.01])).astype(np.float32))
+        size += n
+    return np.concatenate(parts)[:total]
+
+
+def loop_fallback(audio_np: np.ndarray, sample_rate: int, min_speech_duration: float):
+    """Poprzednia implementacja (pętla po ramkach)"""
+    frame_length = int(0.02 * sample_rate)
+    hop_length = int(0.01 * sample_rate)
+
+    energy = []
+    for i in range(0, len(audio_np) - frame_length, hop_length):
+        frame = audio_np[i:i + frame_length]
+        energy.append(np.sum(frame ** 2) / len(frame))
+    energy = np.array(energy)
+
+    is_speech = energy > np.percentile(energy, 30)
+
+    segments = []
+    in_speech = False
+    start_idx = 0
+    for i, speech in enumerate(is_speech):
+        if speech and not in_speech:
+            start_idx = i
+            in_speech = True
+        elif not speech and in_speech:
+            t0 = start_idx * hop_length / sample_rate
+            t1 = i * hop_length / sample_rate
+            if t1 - t0 >= min_speech_duration:
+                segments.append({'id': f"seg_{len(segments):04d}", 't0': t0, 't1': t1, 'duration': t1 - t0})
+            in_speech = False
+    if in_speech:
+        t0 = start_idx * hop_length / sample_rate
+        t1 = len(is_speech) * hop_length / sample_rate
+        if t1 - t0 >= min_speech_duration:
+            segments.append({'id': f"seg_{len(segments):04d}", 't0': t0, 't1': t1, 'duration': t1 - t0})
+    return segments
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30.0, help="Długość syntetycznego audio")
+    args = parser.parse_args()
+
+    audio = make_audio(args.minutes)
+    waveform = torch.from_numpy(audio)[None]
+    print(f"🎧 Audio: {args.minutes:.0f} min @ {SR} Hz ({len(audio) * 4 / 1e6:.0f} MB float32)")
+
+    config = Config()
+    stage = VADStage.__new__(VADStage)
+    stage.config = config
+    min_dur = config.vad.min_speech_duration
+
+    expected, t_loop = timed(lambda: loop_fallback(audio, SR, min_dur))
+    result, t_vec = timed(lambda: stage._detect_speech_fallback(waveform, SR))
+    config.vad.energy_adaptive = True
+    adaptive, t_adaptive = timed(lambda: stage._detect_speech_fallback(waveform, SR))
+
+    print(f"\n{'wariant':<28}{'czas [s]':>10}{'segmenty':>10}")
+    print(f"{'pętla (poprzednio)':<28}{t_loop:>10.3f}{len(expected):>10}")
+    print(f"{'wektorowo':<28}{t_vec:>10.3f}{len(result):>10}")
+    print(f"{'wektorowo + próg kroczący':<28}{t_adaptive:>10.3f}{len(adaptive):>10}")
+    print(f"\n⚡ Przyspieszenie: {t_loop / t_vec:.1f}x")
+    print(f"{'✅' if result == expected else '❌'} Wynik identyczny z pętlą: {result == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from pathlib import Path
 from pipeline.stage_06_selection import SelectionStage
 from pipeline.stage_07_export import ExportStage
 from pipeline.config import Config
+from pipeline.segment_store import load_segments, resolve_segments_path
 import json
 
 # === KONFIGURACJA ===
@@ -15,7 +16,7 @@ OUTPUT_DIR = Path("output")
 # === AUTO DETECT najnowszy folder ===
 temp_folders = []
 for folder in Path("temp").iterdir():
-    if folder.is_dir() and (folder / "scored_segments.json").exists():
+    if folder.is_dir() and resolve_segments_path(folder / "scored_segments.json"):
         temp_folders.append(folder)
 
 if not temp_folders:
@@ -27,8 +28,9 @@ print(f"📂 Znaleziono najnowszy folder: {TEMP_DIR.name}")
 
 # === Wczytaj dane ===
 print("📂 Wczytywanie danych...")
-with open(TEMP_DIR / "scored_segments.json", "r", encoding="utf-8") as f:
-    segments = json.load(f)
+# .json lub .segs; lista (nie lazy=True) - selekcja i eksport (napisy) czytają
+# wszystkie segmenty kilka razy, to_list dekoduje je raz, kolumnami
+segments = load_segments(TEMP_DIR / "scored_segments.json")
 
 print(f"✓ Załadowano {len(segments)} segmentów")
 
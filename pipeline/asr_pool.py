@@ -0,0 +1,166 @@
+"""
+ASR Worker Pool
+Wieloprocesowa transkrypcja na CPU: N procesów, każdy z własnym WhisperModel.
+
+Jeden WhisperModel int8 na CPU nie wykorzystuje całej maszyny renderującej
+(dekodowanie beam search jest w dużej części sekwencyjne). Pool uruchamia
+`asr.workers` procesów (spawn), każdy ładuje model raz, z
+`cpu_threads = rdzenie / workers` (albo asr.cpu_threads).
+
+Segmenty VAD dzielone są między workery metodą LPT (longest processing time
+first): od najdłuższego, zawsze do workera z najmniejszą sumą czasu - czas
+transkrypcji jest w przybliżeniu proporcjonalny do długości audio. Audio
+czytane jest przez workery z tego samego pliku .f32 (AudioStore, mmap - strony
+współdzielone w page cache), a wyniki wracają w kolejności segmentów.
+
+    pool = ASRWorkerPool(config)
+    segments = pool.transcribe(audio_store, vad_segments)
+"""
+
+from __future__ import annotations
+
+import copy
+import heapq
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import Config
+
+# Stan procesu workera (ustawiany w initializerze)
+_WORKER_STAGE = None
+_WORKER_STORES: Dict[str, Any] = {}
+
+
+def lpt_shards(segments: List[Dict], workers: int) -> List[List[int]]:
+    """
+    Podział indeksów segmentów na `workers` shardów (LPT po 'duration').
+
+    Returns:
+        Lista shardów; każdy to rosnąca lista indeksów segmentów
+    """
+    workers = max(1, workers)
+    order = sorted(range(len(segments)), key=lambda i: (-float(segments[i].get('duration', 0.0)), i))
+
+    heap = [(0.0, w) for w in range(workers)]  # (suma czasu, worker)
+    shards: List[List[int]] = [[] for _ in range(workers)]
+    for idx in order:
+        load, worker = heapq.heappop(heap)
+        shards[worker].append(idx)
+        heapq.heappush(heap, (load + float(segments[idx].get('duration', 0.0)), worker))
+
+    return [sorted(shard) for shard in shards if shard]
+
+
+def worker_cpu_threads(config: Config, workers: int) -> int:
+    """Wątki CTranslate2 na workera: asr.cpu_threads lub równy podział rdzeni"""
+    if config.asr.cpu_threads > 0:
+        return config.asr.cpu_threads
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _init_worker(config: Config, stage_factory: Callable[[Config], Any]) -> None:
+    global _WORKER_STAGE
+    _WORKER_STAGE = stage_factory(config)
+
+
+def _transcribe_shard(pcm_path: str, sample_rate: int, segments: List[Dict], checkpoint=None) -> List[Dict]:
+    from .audio_store import AudioStore
+
+    store = _WORKER_STORES.get(pcm_path)
+    if store is None:
+        store = _WORKER_STORES[pcm_path] = AudioStore(pcm_path, sample_rate)
+    return _WORKER_STAGE.transcribe_segments(pcm_path, segments, store, checkpoint=checkpoint)
+
+
+class ASRWorkerPool:
+    """Pula procesów z modelem Whisper na proces"""
+
+    def __init__(
+        self,
+        config: Config,
+        workers: Optional[int] = None,
+        stage_factory: Optional[Callable[[Config], Any]] = None
+    ):
+        self.workers = max(1, workers or config.asr.workers)
+
+        # Workery zawsze na CPU, jeden proces = jeden model (bez zagnieżdżonej puli)
+        self.worker_config = copy.deepcopy(config)
+        self.worker_config.use_gpu = False
+        self.worker_config.asr.workers = 1
+        self.worker_config.asr.cpu_threads = worker_cpu_threads(config, self.workers)
+
+        if stage_factory is None:
+            from .stage_03_transcribe import TranscribeStage
+            stage_factory = TranscribeStage
+        self.stage_factory = stage_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),  # bezpieczne z wątkami torch/ctranslate2
+                initializer=_init_worker,
+                initargs=(self.worker_config, self.stage_factory)
+            )
+        return self._executor
+
+    def transcribe(
+        self,
+        audio_store,
+        segments: List[Dict],
+        progress_callback: Optional[Callable] = None,
+        checkpoint=None
+    ) -> List[Dict]:
+        """
+        Transkrybuj segmenty w workerach; wynik w kolejności `segments`.
+
+        Args:
+            audio_store: AudioStore (workery mapują ten sam plik .f32)
+            segments: Segmenty VAD
+            progress_callback: callback(progress 0-1, message) po każdym shardzie
+            checkpoint: TranscriptCheckpoint - workery dopisują do niego po każdym batchu
+        """
+        if not segments:
+            return []
+
+        shards = lpt_shards(segments, self.workers)
+        executor = self._ensure_executor()
+        pcm_path = str(Path(audio_store.path).resolve())
+
+        futures = {
+            executor.submit(
+                _transcribe_shard, pcm_path, audio_store.sample_rate, [segments[i] for i in shard], checkpoint
+            ): shard
+            for shard in shards
+        }
+
+        results: List[Optional[Dict]] = [None] * len(segments)
+        done_segments = 0
+        try:
+            for future in as_completed(futures):
+                shard = futures[future]
+                for idx, transcribed in zip(shard, future.result()):
+                    results[idx] = transcribed
+                done_segments += len(shard)
+                print(f"   ✓ Worker ASR: {len(shard)} segmentów ({done_segments}/{len(segments)})")
+                if progress_callback:
+                    progress_callback(done_segments / len(segments), f"Transkrypcja {done_segments}/{len(segments)}")
+        except BaseException:
+            self.shutdown(cancel=True)
+            raise
+
+        return results
+
+    def shutdown(self, cancel: bool = False) -> None:
+        """Zamknij procesy (cancel=True: bez czekania, trwające shardy są przerywane)"""
+        if self._executor is not None:
+            if cancel:
+                # Trwające shardy trwają minutami - zakończ procesy zamiast czekać
+                for process in list((self._executor._processes or {}).values()):
+                    process.terminate()
+            self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
+            self._executor = None
@@ -0,0 +1,145 @@
+"""
+Audio Store
+Wspólny bufor audio (float32 PCM, mmap) przekazywany między etapami.
+
+Dotąd każdy etap dekodował audio osobno: VAD (torchaudio.load), features
+(librosa.load całego pliku) i transkrypcja (ffmpeg per segment). AudioStore
+mapuje do pamięci surowe float32 PCM zapisane przez ingest
+(`audio_normalized.f32`, config.audio.write_pcm_f32) i daje widoki
+bez kopiowania po czasie:
+
+    store = AudioStore.from_ingest(ingest_result, sample_rate=16000)
+    seg = store.slice(t0, t1)        # np.ndarray (widok na mmap)
+    for start, chunk in store.iter_chunks(600.0, overlap=1.0): ...
+
+Strony pliku ładuje system operacyjny na żądanie, więc zużycie RAM nie
+rośnie z długością nagrania. Gdy ingest nie zapisał PCM (np. starsza sesja),
+WAV jest jednorazowo konwertowany blokami do .f32 obok pliku.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+PCM_DTYPE = np.dtype('<f4')
+CONVERT_BLOCK_FRAMES = 1 << 20  # ~65s przy 16kHz
+
+
+class AudioStore:
+    """Mono float32 PCM zmapowane do pamięci, z cięciem po czasie (t0/t1 w sekundach)"""
+
+    def __init__(self, pcm_path: Union[str, Path], sample_rate: int):
+        self.path = Path(pcm_path)
+        self.sample_rate = int(sample_rate)
+        if self.path.stat().st_size == 0:
+            self.samples = np.zeros(0, dtype=PCM_DTYPE)
+        else:
+            self.samples = np.memmap(self.path, dtype=PCM_DTYPE, mode='r')
+
+    # === Konstruktory ===
+
+    @classmethod
+    def from_ingest(cls, ingest_result: Dict[str, Any], sample_rate: int) -> Optional['AudioStore']:
+        """
+        Store z wyniku IngestStage: audio_pcm_f32 albo konwersja audio_normalized.
+
+        Returns:
+            AudioStore lub None, gdy brak pliku audio
+        """
+        pcm = ingest_result.get('audio_pcm_f32')
+        if pcm and Path(pcm).exists():
+            return cls(pcm, sample_rate)
+
+        wav = ingest_result.get('audio_normalized') or ingest_result.get('audio_raw')
+        if wav and Path(wav).exists():
+            return cls.from_wav(wav, sample_rate)
+        return None
+
+    @classmethod
+    def from_wav(cls, wav_path: Union[str, Path], sample_rate: int,
+                 pcm_path: Optional[Union[str, Path]] = None) -> 'AudioStore':
+        """
+        Skonwertuj WAV do .f32 (blokami, stała pamięć) i zmapuj.
+        Istniejący, nowszy plik .f32 jest używany ponownie.
+        """
+        import soundfile as sf
+
+        wav_path = Path(wav_path)
+        pcm_path = Path(pcm_path) if pcm_path else wav_path.with_suffix('.f32')
+
+        if pcm_path.exists() and pcm_path.stat().st_mtime >= wav_path.stat().st_mtime:
+            return cls(pcm_path, sample_rate)
+
+        info = sf.info(str(wav_path))
+        if info.samplerate != sample_rate:
+            # Rzadka ścieżka (ingest zawsze zapisuje sample_rate z config)
+            import librosa
+            audio, _ = librosa.load(str(wav_path), sr=sample_rate, mono=True)
+            _write_pcm(pcm_path, [audio])
+        else:
+            blocks = (
+                block.mean(axis=1) if block.ndim > 1 else block
+                for block in sf.blocks(str(wav_path), blocksize=CONVERT_BLOCK_FRAMES,
+                                       dtype='float32', always_2d=False)
+            )
+            _write_pcm(pcm_path, blocks)
+
+        return cls(pcm_path, sample_rate)
+
+    # === Dostęp ===
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def index(self, t: float) -> int:
+        """Czas (s) → indeks próbki (obcięty do zakresu)"""
+        return min(max(int(t * self.sample_rate), 0), len(self.samples))
+
+    def slice(self, t0: float, t1: float) -> np.ndarray:
+        """Widok (bez kopii) na próbki [t0, t1)"""
+        return self.samples[self.index(t0):self.index(t1)]
+
+    def iter_chunks(self, chunk_seconds: float, overlap: float = 0.0) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Kolejne okna (offset_próbki, widok) długości chunk_seconds; sąsiednie okna
+        zachodzą na siebie o `overlap` sekund.
+        """
+        chunk = max(1, int(chunk_seconds * self.sample_rate))
+        step = max(1, chunk - int(overlap * self.sample_rate))
+        total = len(self.samples)
+        start = 0
+        while start < total:
+            yield start, self.samples[start:start + chunk]
+            if start + chunk >= total:
+                break
+            start += step
+
+    def as_tensor(self, t0: float = 0.0, t1: Optional[float] = None):
+        """torch.Tensor współdzielący pamięć z mmap (tylko do odczytu!)"""
+        import warnings
+        import torch
+
+        view = self.slice(t0, self.duration if t1 is None else t1)
+        with warnings.catch_warnings():
+            # mmap jest read-only; tensor nie jest modyfikowany przez VAD
+            warnings.simplefilter("ignore", UserWarning)
+            return torch.from_numpy(np.asarray(view))
+
+    def __repr__(self) -> str:
+        return f"AudioStore({self.path.name}, {self.duration:.1f}s @ {self.sample_rate}Hz)"
+
+
+def _write_pcm(pcm_path: Path, blocks) -> None:
+    tmp = pcm_path.with_name(pcm_path.name + f".{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        for block in blocks:
+            f.write(np.ascontiguousarray(block, dtype=PCM_DTYPE).tobytes())
+    os.replace(tmp, pcm_path)
@@ -2,16 +2,200 @@
 Cache Manager
 Zarządza cache dla kosztownych etapów pipeline'u (VAD, Transcribe, Scoring)
 
-Cache key = hash(input_video) + hash(config_for_stage)
-- Jeśli input i config się nie zmieniły → cache hit → pomiń stage
-- Jeśli coś się zmieniło → cache miss → wykonaj stage i zapisz do cache
+Cache jest content-addressed i niezależny per etap:
+    key(stage) = hash(config_for_stage) + hash(upstream_artifact)
+- VAD: upstream = input video (input_hash)
+- Transcribe: upstream = segmenty VAD
+- Features: upstream = segmenty z transkrypcją
+- Scoring: upstream = segmenty z features
+- export_clip / export_faded: pliki MP4 per klip, upstream = (t0, t1)
+Zmiana wagi scoringu unieważnia tylko scoring - VAD i transkrypcja są
+ponownie używane. Kolejne typy wpisów (JSON lub pliki) dodaje się przez
+CacheManager.register_stage(). Wpisy JSON z listą 'segments' są zapisywane
+kolumnowo (katalog *.segs, patrz segment_store) razem z hashem treści:
+load_from_cache(..., lazy=True) zwraca LazySegments, a artifact_hash bierze
+zapisany hash - przy trafieniach w cache kolejnych etapów segmenty wejściowe
+nie są dekodowane. Rozmiar cache jest ograniczony (CacheConfig.max_size_gb);
+po przekroczeniu usuwane są najdawniej używane wpisy (LRU).
 """
 
 import hashlib
 import json
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional
-from dataclasses import asdict
+from typing import Callable, Dict, Any, Optional
+from dataclasses import asdict, dataclass
+
+from .fingerprint import (
+    DEFAULT_SAMPLES,
+    FINGERPRINT_DIR,
+    MODES as FINGERPRINT_MODES,
+    fingerprint,
+    prefetch_fingerprint,
+)
+from .segment_store import LazySegments, columnar_path, save_segments_columnar
+from .transcript_checkpoint import TranscriptCheckpoint
+
+
+# Wspólny lock dla index.json (kilka jobów w jednym procesie dzieli katalog cache)
+_INDEX_LOCK = threading.RLock()
+
+# Inputy (cache_key) w użyciu przez działające joby tego procesu → licznik.
+# LRU żadnego CacheManagera ich nie usuwa (segmenty, dzienniki, klipy eksportu).
+_PINNED_KEYS: Dict[str, int] = {}
+
+# Nazwy plików ze starego układu cache ({input_hash}_{combined_config_hash}/)
+LEGACY_FILENAMES = {
+    'vad_segments.json': 'vad',
+    'segments_with_transcript.json': 'transcribe',
+    'scored_segments.json': 'scoring',
+}
+
+
+@dataclass
+class CacheEntryType:
+    """
+    Typ wpisu cache (pluggable).
+
+    Args:
+        name: Nazwa etapu/artefaktu (prefix pliku w cache)
+        config_params: Funkcja config -> dict parametrów wpływających na wynik
+        kind: 'json' (dict z load/save_to_cache) lub 'file' (plik, np. MP4)
+        extension: Rozszerzenie pliku w cache
+    """
+    name: str
+    config_params: Callable[[Any], Dict[str, Any]]
+    kind: str = 'json'
+    extension: str = '.json'
+
+
+def _audio_params(config: Any) -> Dict[str, Any]:
+    return {
+        'sample_rate': config.audio.sample_rate,
+        # Normalizacja zmienia audio wejściowe VAD i ASR
+        'normalization': config.audio.normalization,
+        'target_loudness': config.audio.target_loudness,
+        'loudnorm_two_pass': getattr(config.audio, 'loudnorm_two_pass', True),
+    }
+
+
+def _vad_params(config: Any) -> Dict[str, Any]:
+    return {
+        'model': config.vad.model,
+        'threshold': config.vad.threshold,
+        'min_speech_duration': config.vad.min_speech_duration,
+        'min_silence_duration': config.vad.min_silence_duration,
+        'max_segment_duration': config.vad.max_segment_duration,
+        **_audio_params(config),
+    }
+
+
+def _transcribe_params(config: Any) -> Dict[str, Any]:
+    return {
+        'model': config.asr.model,
+        'language': config.asr.language,
+        'initial_prompt': config.asr.initial_prompt,
+        'temperature': config.asr.temperature,
+        'beam_size': config.asr.beam_size,
+        'compute_type': config.asr.compute_type,
+        'condition_on_previous_text': config.asr.condition_on_previous_text,
+        'batched': config.asr.batched,  # Batched pipeline: bez kontekstu poprzedniego tekstu
+        'global_language': config.language,  # Include global language for cache invalidation
+        # Audio podawane do Whisper - klucz także dziennika transkrypcji (WordStore)
+        **_audio_params(config),
+    }
+
+
+# Pola features wpływające tylko na przepustowość (nie na wynik) - poza kluczem cache
+FEATURES_THROUGHPUT_FIELDS = ('spacy_batch_size', 'spacy_n_process')
+
+
+def _features_params(config: Any) -> Dict[str, Any]:
+    params = asdict(config.features)
+    for field_name in FEATURES_THROUGHPUT_FIELDS:
+        params.pop(field_name, None)
+    params['global_language'] = config.language
+    params['sample_rate'] = config.audio.sample_rate
+
+    # Treść pliku słów kluczowych wpływa na keyword_score
+    keywords_file = Path(config.features.keywords_file) if config.features.keywords_file else None
+    if keywords_file and keywords_file.exists():
+        params['keywords_sha'] = hashlib.sha256(keywords_file.read_bytes()).hexdigest()[:16]
+
+    return params
+
+
+def _scoring_params(config: Any) -> Dict[str, Any]:
+    return {
+        'semantic_backend': config.scoring.semantic_backend,
+        'nli_model': config.scoring.nli_model,
+        'nli_quantize': config.scoring.nli_quantize,
+        'gpt_model': config.scoring.gpt_model,
+        'gpt_batch_size': config.scoring.gpt_batch_size,
+        'interest_labels': config.scoring.interest_labels,
+        'weight_acoustic': config.scoring.weight_acoustic,
+        'weight_keyword': config.scoring.weight_keyword,
+        'weight_semantic': config.scoring.weight_semantic,
+        'weight_speaker_change': config.scoring.weight_speaker_change,
+        'position_diversity_bonus': config.scoring.position_diversity_bonus,
+        'global_language': config.language,  # Include global language for cache invalidation (affects prompts)
+    }
+
+
+def _export_clip_params(config: Any) -> Dict[str, Any]:
+    export = config.export
+    return {
+        'video_codec': export.video_codec,
+        'video_preset': export.video_preset,
+        'crf': export.crf,
+        'audio_codec': export.audio_codec,
+        'audio_bitrate': export.audio_bitrate,
+        'movflags': export.movflags,
+    }
+
+
+def _export_faded_params(config: Any) -> Dict[str, Any]:
+    params = _export_clip_params(config)
+    params['fade_in_duration'] = config.export.fade_in_duration
+    params['fade_out_duration'] = config.export.fade_out_duration
+    return params
+
+
+DEFAULT_ENTRY_TYPES = (
+    CacheEntryType('vad', _vad_params),
+    CacheEntryType('transcribe', _transcribe_params),
+    CacheEntryType('features', _features_params),
+    CacheEntryType('scoring', _scoring_params),
+    CacheEntryType('export_clip', _export_clip_params, kind='file', extension='.mp4'),
+    CacheEntryType('export_faded', _export_faded_params, kind='file', extension='.mp4'),
+)
+
+
+def _json_default(obj: Any):
+    """Serializacja typów numpy/Path w sposób zgodny z JSON roundtrip"""
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return str(obj)
+
+
+def artifact_hash(data: Any) -> str:
+    """
+    Hash treści artefaktu (kanoniczny JSON).
+
+    Wynik świeżo policzony i ten sam wynik wczytany z cache dają ten sam hash
+    (LazySegments: hash zapisany przy save_to_cache, bez dekodowania).
+    """
+    if isinstance(data, LazySegments):
+        if data.content_hash is not None:
+            return data.content_hash
+        data = data.to_list()
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
 
 
 class CacheManager:
@@ -20,72 +204,125 @@ class CacheManager:
 
     Cache structure:
         cache/
-            {input_hash}_{config_hash}/
-                vad_segments.json           # Stage 2
-                segments_with_transcript.json  # Stage 3
-                scored_segments.json        # Stage 5
+            index.json                      # LRU: rozmiar, last_access, hit/miss per stage
+            {input_hash}/
+                vad_{stage_key}.json        # Stage 2
+                transcribe_{stage_key}.json # Stage 3
+                transcribe_log_{asr_key}.jsonl  # Stage 3: dziennik per segment (wznowienie, reuse po zmianie VAD)
+                features_{stage_key}.json   # Stage 4
+                scoring_{stage_key}.json    # Stage 5
+                export_clip_{key}.mp4       # Stage 7: wycięty klip
+                export_faded_{key}.mp4      # Stage 7: klip z fade in/out (gotowy do concat)
     """
 
-    def __init__(self, cache_dir: Path, enabled: bool = True, force_recompute: bool = False):
+    INDEX_FILE = "index.json"
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        enabled: bool = True,
+        force_recompute: bool = False,
+        max_size_gb: float = 0.0,
+        segment_format: str = "columnar",
+        hash_mode: str = "sampled",
+        hash_samples: int = DEFAULT_SAMPLES,
+        hash_workers: int = 4
+    ):
         """
         Args:
             cache_dir: Katalog cache (np. cache/)
             enabled: Czy cache jest włączony
             force_recompute: Wymuszenie pełnego przeliczenia (--force flag)
+            max_size_gb: Limit rozmiaru cache (LRU eviction), 0 = bez limitu
+            segment_format: 'columnar' (segmenty jako *.segs) lub 'json'
+            hash_mode: Odcisk inputu: 'sampled', 'full' lub 'edges' (pipeline/fingerprint.py)
+            hash_samples: Liczba próbkowanych bloków (tryb sampled)
+            hash_workers: Wątki hasha drzewiastego (tryb full)
         """
         self.cache_dir = Path(cache_dir)
         self.enabled = enabled and not force_recompute
         self.force_recompute = force_recompute
+        self.max_bytes = int(max_size_gb * 1024 ** 3) if max_size_gb else 0
+        self.segment_format = segment_format
+        if hash_mode not in FINGERPRINT_MODES:
+            raise ValueError(f"Unknown hash_mode: {hash_mode}")
+        self.hash_mode = hash_mode
+        self.hash_samples = hash_samples
+        self.hash_workers = hash_workers
 
         if self.enabled:
             self.cache_dir.mkdir(parents=True, exist_ok=True)
 
-        # Current cache key dla tej sesji
+        # Current cache key dla tej sesji (= input_hash)
         self.current_cache_key: Optional[str] = None
         self.current_cache_path: Optional[Path] = None
+        self._pinned_key: Optional[str] = None
+        self._config: Any = None
+
+        # Klucze etapów wyliczone w tej sesji + statystyki hit/miss
+        self._stage_keys: Dict[str, str] = {}
+        self.session_stats: Dict[str, Dict[str, int]] = {}
+
+        # Zarejestrowane typy wpisów (register_stage dodaje kolejne)
+        self.entry_types: Dict[str, CacheEntryType] = {t.name: t for t in DEFAULT_ENTRY_TYPES}
+
+    def register_stage(
+        self,
+        name: str,
+        config_params: Callable[[Any], Dict[str, Any]],
+        kind: str = 'json',
+        extension: Optional[str] = None
+    ) -> CacheEntryType:
+        """
+        Zarejestruj nowy typ wpisu cache.
+
+        Args:
+            name: Nazwa etapu (bez '_' na końcu; prefix pliku w cache)
+            config_params: Funkcja config -> dict parametrów wpływających na wynik
+            kind: 'json' lub 'file'
+            extension: Rozszerzenie pliku (domyślnie .json dla kind='json')
+        """
+        if kind not in ('json', 'file'):
+            raise ValueError(f"Unknown cache entry kind: {kind}")
+        if kind == 'file' and not extension:
+            raise ValueError("File cache entries need an extension (e.g. '.mp4')")
+
+        entry_type = CacheEntryType(name, config_params, kind=kind, extension=extension or '.json')
+        self.entry_types[name] = entry_type
+        return entry_type
 
-    def calculate_input_hash(self, file_path: str, chunk_size: int = 8192) -> str:
+    def calculate_input_hash(self, file_path: str) -> str:
         """
-        Oblicz hash pliku wideo (używa pierwszych i ostatnich 10MB + size dla szybkości)
+        Odcisk pliku wideo (tryb z CacheConfig.hash_mode, patrz pipeline/fingerprint.py).
+
+        Wynik jest zapisywany w sidecarze obok pliku (albo w cache/fingerprints/),
+        więc ten sam VOD nie jest hashowany ponownie.
 
         Args:
             file_path: Ścieżka do pliku wideo
-            chunk_size: Rozmiar chunka do czytania
 
         Returns:
-            SHA256 hash jako hex string
+            Hash jako hex string (16 znaków)
         """
-        path = Path(file_path)
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-
-        hasher = hashlib.sha256()
-        file_size = path.stat().st_size
-
-        # Hash zawiera: file_size + first 10MB + last 10MB (dla szybkości)
-        hasher.update(str(file_size).encode())
-
-        with open(path, 'rb') as f:
-            # First 10MB
-            chunk_limit = 10 * 1024 * 1024  # 10MB
-            read_bytes = 0
-            while read_bytes < chunk_limit:
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                hasher.update(chunk)
-                read_bytes += len(chunk)
-
-            # Last 10MB (jeśli plik > 20MB)
-            if file_size > 20 * 1024 * 1024:
-                f.seek(-chunk_limit, 2)  # Seek from end
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    hasher.update(chunk)
-
-        return hasher.hexdigest()[:16]  # First 16 chars (64 bits)
+        return fingerprint(
+            file_path,
+            mode=self.hash_mode,
+            samples=self.hash_samples,
+            workers=self.hash_workers,
+            fallback_dir=self.cache_dir
+        )
+
+    def prefetch_input_hash(self, file_path: str):
+        """Zacznij liczyć odcisk inputu w tle (np. gdy nagranie czeka w kolejce)"""
+        if self.enabled and Path(file_path).exists():
+            return prefetch_fingerprint(
+                file_path,
+                mode=self.hash_mode,
+                samples=self.hash_samples,
+                workers=self.hash_workers,
+                fallback_dir=self.cache_dir
+            )
+        return None
 
     def calculate_config_hash(self, config: Any, stage: str) -> str:
         """
@@ -93,7 +330,7 @@ class CacheManager:
 
         Args:
             config: Config object
-            stage: Nazwa stage ('vad', 'transcribe', 'scoring')
+            stage: Nazwa zarejestrowanego stage ('vad', 'transcribe', 'scoring', ...)
 
         Returns:
             SHA256 hash jako hex string
@@ -101,49 +338,23 @@ class CacheManager:
         hasher = hashlib.sha256()
 
         # Config parameters wpływające na dany stage
-        if stage == 'vad':
-            params = {
-                'model': config.vad.model,
-                'threshold': config.vad.threshold,
-                'min_speech_duration': config.vad.min_speech_duration,
-                'min_silence_duration': config.vad.min_silence_duration,
-                'max_segment_duration': config.vad.max_segment_duration,
-                'sample_rate': config.audio.sample_rate,
-            }
-        elif stage == 'transcribe':
-            params = {
-                'model': config.asr.model,
-                'language': config.asr.language,
-                'initial_prompt': config.asr.initial_prompt,
-                'temperature': config.asr.temperature,
-                'beam_size': config.asr.beam_size,
-                'compute_type': config.asr.compute_type,
-                'condition_on_previous_text': config.asr.condition_on_previous_text,
-                'global_language': config.language,  # Include global language for cache invalidation
-            }
-        elif stage == 'scoring':
-            params = {
-                'nli_model': config.scoring.nli_model,
-                'interest_labels': config.scoring.interest_labels,
-                'weight_acoustic': config.scoring.weight_acoustic,
-                'weight_keyword': config.scoring.weight_keyword,
-                'weight_semantic': config.scoring.weight_semantic,
-                'weight_speaker_change': config.scoring.weight_speaker_change,
-                'position_diversity_bonus': config.scoring.position_diversity_bonus,
-                'global_language': config.language,  # Include global language for cache invalidation (affects prompts)
-            }
-        else:
+        entry_type = self.entry_types.get(stage)
+        if entry_type is None:
             raise ValueError(f"Unknown stage for cache: {stage}")
+        params = entry_type.config_params(config)
 
         # Sortuj dict dla konsystentności
-        params_json = json.dumps(params, sort_keys=True)
+        params_json = json.dumps(params, sort_keys=True, default=_json_default)
         hasher.update(params_json.encode())
 
         return hasher.hexdigest()[:16]  # First 16 chars (64 bits)
 
     def initialize_cache_key(self, input_file: str, config: Any):
         """
-        Inicjalizuj cache key dla tej sesji przetwarzania.
+        Inicjalizuj cache dla tej sesji przetwarzania (hash inputu).
+
+        Klucze poszczególnych etapów są wyliczane leniwie w stage_key(),
+        gdy znany jest artefakt upstream.
 
         Args:
             input_file: Ścieżka do pliku wideo
@@ -152,34 +363,73 @@ class CacheManager:
         if not self.enabled:
             return
 
+        self._config = config
+        self._stage_keys = {}
+
         # Oblicz hash inputu
         input_hash = self.calculate_input_hash(input_file)
 
-        # Oblicz combined config hash (wszystkie stages)
-        vad_hash = self.calculate_config_hash(config, 'vad')
-        transcribe_hash = self.calculate_config_hash(config, 'transcribe')
-        scoring_hash = self.calculate_config_hash(config, 'scoring')
-
-        combined_config_hash = hashlib.sha256(
-            f"{vad_hash}{transcribe_hash}{scoring_hash}".encode()
-        ).hexdigest()[:16]
-
-        # Cache key
-        self.current_cache_key = f"{input_hash}_{combined_config_hash}"
-        self.current_cache_path = self.cache_dir / self.current_cache_key
+        self.current_cache_key = input_hash
+        self.current_cache_path = self.cache_dir / input_hash
+        self._pin(input_hash)
 
-        # Utwórz katalog cache dla tej sesji
+        # Utwórz katalog cache dla tego inputu
         self.current_cache_path.mkdir(parents=True, exist_ok=True)
 
         print(f"💾 Cache initialized: {self.current_cache_key}")
         print(f"   Cache dir: {self.current_cache_path}")
 
-    def get_cache_file_path(self, stage: str) -> Path:
+    def _pin(self, cache_key: str):
+        """Chroń wpisy inputu przed LRU (także innych jobów) do release()"""
+        with _INDEX_LOCK:
+            self.release()
+            _PINNED_KEYS[cache_key] = _PINNED_KEYS.get(cache_key, 0) + 1
+            self._pinned_key = cache_key
+
+    def release(self):
+        """Koniec joba: wpisy bieżącego inputu mogą być znowu usuwane przez LRU"""
+        with _INDEX_LOCK:
+            key, self._pinned_key = self._pinned_key, None
+            if key is None:
+                return
+            _PINNED_KEYS[key] -= 1
+            if not _PINNED_KEYS[key]:
+                del _PINNED_KEYS[key]
+
+    def stage_key(self, stage: str, upstream: Any = None) -> str:
+        """
+        Wylicz (i zapamiętaj na sesję) klucz cache dla etapu.
+
+        Args:
+            stage: Nazwa stage ('vad', 'transcribe', 'scoring')
+            upstream: Artefakt wejściowy etapu (np. wynik VAD dla transcribe).
+                      None = etap zależy bezpośrednio od inputu (input_hash).
+
+        Returns:
+            Klucz etapu (hex)
+        """
+        if not self.current_cache_key:
+            raise RuntimeError("Cache key not initialized. Call initialize_cache_key() first.")
+
+        if upstream is None:
+            if stage in self._stage_keys:
+                return self._stage_keys[stage]
+            upstream_hash = self.current_cache_key
+        else:
+            upstream_hash = artifact_hash(upstream)
+
+        config_hash = self.calculate_config_hash(self._config, stage)
+        key = hashlib.sha256(f"{stage}:{config_hash}:{upstream_hash}".encode()).hexdigest()[:16]
+        self._stage_keys[stage] = key
+        return key
+
+    def get_cache_file_path(self, stage: str, upstream: Any = None) -> Path:
         """
         Pobierz ścieżkę do pliku cache dla danego stage.
 
         Args:
             stage: Nazwa stage ('vad', 'transcribe', 'scoring')
+            upstream: Artefakt wejściowy etapu (patrz stage_key)
 
         Returns:
             Path do pliku cache
@@ -187,23 +437,20 @@ class CacheManager:
         if not self.current_cache_path:
             raise RuntimeError("Cache key not initialized. Call initialize_cache_key() first.")
 
-        filename_map = {
-            'vad': 'vad_segments.json',
-            'transcribe': 'segments_with_transcript.json',
-            'scoring': 'scored_segments.json'
-        }
-
-        if stage not in filename_map:
+        entry_type = self.entry_types.get(stage)
+        if entry_type is None:
             raise ValueError(f"Unknown stage for cache: {stage}")
 
-        return self.current_cache_path / filename_map[stage]
+        return self.current_cache_path / f"{stage}_{self.stage_key(stage, upstream)}{entry_type.extension}"
 
-    def is_cache_valid(self, stage: str) -> bool:
+    def is_cache_valid(self, stage: str, upstream: Any = None) -> bool:
         """
         Sprawdź czy cache istnieje i jest aktualny dla danego stage.
+        Zlicza hit/miss (sesja + index.json).
 
         Args:
             stage: Nazwa stage ('vad', 'transcribe', 'scoring')
+            upstream: Artefakt wejściowy etapu (patrz stage_key)
 
         Returns:
             True jeśli cache jest valid, False w przeciwnym razie
@@ -211,15 +458,18 @@ class CacheManager:
         if not self.enabled:
             return False
 
-        cache_file = self.get_cache_file_path(stage)
-        return cache_file.exists() and cache_file.stat().st_size > 0
+        is_valid = self._existing_entry(self.get_cache_file_path(stage, upstream)) is not None
+        self._record_lookup(stage, is_valid)
+        return is_valid
 
-    def load_from_cache(self, stage: str) -> Dict[str, Any]:
+    def load_from_cache(self, stage: str, upstream: Any = None, lazy: bool = False) -> Dict[str, Any]:
         """
         Załaduj dane z cache dla danego stage.
 
         Args:
             stage: Nazwa stage ('vad', 'transcribe', 'scoring')
+            upstream: Artefakt wejściowy etapu (patrz stage_key)
+            lazy: True → data['segments'] jako LazySegments (wpisy kolumnowe)
 
         Returns:
             Dict z danymi z cache
@@ -227,35 +477,248 @@ class CacheManager:
         Raises:
             FileNotFoundError: Jeśli cache nie istnieje
         """
-        cache_file = self.get_cache_file_path(stage)
+        cache_file = self._existing_entry(self.get_cache_file_path(stage, upstream))
+
+        if cache_file is None:
+            raise FileNotFoundError(f"Cache file not found: {self.get_cache_file_path(stage, upstream)}")
 
-        if not cache_file.exists():
-            raise FileNotFoundError(f"Cache file not found: {cache_file}")
+        if cache_file.is_dir():
+            segments = LazySegments(cache_file)
+            data = dict(segments.extra)
+            data['segments'] = segments if lazy else segments.to_list()
+        else:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
 
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        self._touch(cache_file, stage)
+        return data
 
-    def save_to_cache(self, data: Dict[str, Any], stage: str):
+    def save_to_cache(self, data: Dict[str, Any], stage: str, upstream: Any = None):
         """
-        Zapisz dane do cache dla danego stage.
+        Zapisz dane do cache dla danego stage (atomowo) i wymuś limit rozmiaru.
 
         Args:
             data: Dict z danymi do zapisania
             stage: Nazwa stage ('vad', 'transcribe', 'scoring')
+            upstream: Artefakt wejściowy etapu (domyślnie klucz z is_cache_valid)
         """
         if not self.enabled:
             return
 
-        cache_file = self.get_cache_file_path(stage)
+        cache_file = self.get_cache_file_path(stage, upstream)
+
+        if self.segment_format == 'columnar' and isinstance(data.get('segments'), list):
+            extra = {k: v for k, v in data.items() if k != 'segments'}
+            cache_file = save_segments_columnar(
+                data['segments'], columnar_path(cache_file), extra=extra,
+                content_hash=artifact_hash(data['segments'])
+            )
+        else:
+            tmp_file = cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=_json_default)
+            os.replace(tmp_file, cache_file)
 
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        self._touch(cache_file, stage)
+        self.enforce_size_limit()
 
-        print(f"💾 Saved to cache: {cache_file.name}")
+        print(f"💾 Saved to cache: {cache_file.relative_to(self.cache_dir)}")
+
+    def transcript_checkpoint(self) -> Optional[TranscriptCheckpoint]:
+        """
+        Dziennik transkrypcji dla bieżącego inputu i konfiguracji ASR.
+
+        Klucz nie zależy od VAD: po zmianie parametrów VAD segmenty o tych
+        samych granicach są przywracane z dziennika zamiast transkrybowane
+        ponownie; przerwana transkrypcja wznawia się od brakujących segmentów.
+        """
+        if not self.enabled or not self.current_cache_path:
+            return None
+
+        asr_key = self.calculate_config_hash(self._config, 'transcribe')
+        log_file = self.current_cache_path / f"transcribe_log_{asr_key}.jsonl"
+        if log_file.exists():
+            self._touch(log_file, 'transcribe_log')  # LRU: dziennik liczy się do rozmiaru cache
+        return TranscriptCheckpoint(log_file, vad_key=self.calculate_config_hash(self._config, 'vad'))
+
+    # === Wpisy plikowe (np. klipy MP4) ===
+
+    def get_cached_file(self, stage: str, upstream: Any = None) -> Optional[Path]:
+        """
+        Zwróć plik artefaktu z cache (i oznacz go jako użyty) albo None.
+
+        Args:
+            stage: Nazwa zarejestrowanego wpisu plikowego (np. 'export_clip')
+            upstream: Dane identyfikujące artefakt (np. {'t0': ..., 't1': ...})
+        """
+        if not self.enabled or not self.current_cache_path:
+            return None
+
+        cache_file = self.get_cache_file_path(stage, upstream)
+        is_valid = cache_file.exists() and cache_file.stat().st_size > 0
+        self._record_lookup(stage, is_valid)
+        if not is_valid:
+            return None
+
+        self._touch(cache_file, stage)
+        return cache_file
+
+    def save_file_to_cache(self, src_file: Path, stage: str, upstream: Any = None) -> Path:
+        """
+        Przenieś gotowy plik artefaktu do cache.
+
+        Returns:
+            Ścieżka pliku w cache (albo src_file, gdy cache jest wyłączony)
+        """
+        src_file = Path(src_file)
+        if not self.enabled or not self.current_cache_path:
+            return src_file
+
+        cache_file = self.get_cache_file_path(stage, upstream)
+        tmp_file = cache_file.with_name(cache_file.name + '.tmp')
+        shutil.move(str(src_file), str(tmp_file))
+        os.replace(tmp_file, cache_file)
+
+        self._touch(cache_file, stage)
+        self.enforce_size_limit()
+        return cache_file
+
+    @staticmethod
+    def _existing_entry(cache_file: Path) -> Optional[Path]:
+        """Istniejący wpis JSON: katalog kolumnowy (*.segs) albo niepusty plik"""
+        segs_dir = columnar_path(cache_file)
+        if (segs_dir / 'meta.json').exists():
+            return segs_dir
+        if cache_file.exists() and cache_file.stat().st_size > 0:
+            return cache_file
+        return None
+
+    @staticmethod
+    def _entry_size(path: Path) -> int:
+        if path.is_dir():
+            return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+        return path.stat().st_size
+
+    # === Index (LRU + statystyki) ===
+
+    def _index_path(self) -> Path:
+        return self.cache_dir / self.INDEX_FILE
+
+    def _load_index(self) -> Dict[str, Any]:
+        index_path = self._index_path()
+        if index_path.exists():
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                index.setdefault('entries', {})
+                index.setdefault('stats', {})
+                index.setdefault('evicted', {'entries': 0, 'bytes': 0})
+                return index
+            except (json.JSONDecodeError, OSError):
+                pass
+
+        # Brak/uszkodzony index → zindeksuj istniejące pliki (też stary układ
+        # {input_hash}_{config_hash}/), żeby LRU mogło je kiedyś usunąć
+        index = {'entries': {}, 'stats': {}, 'evicted': {'entries': 0, 'bytes': 0}}
+        for path in self.cache_dir.glob("*/*"):
+            if path.parent.name == FINGERPRINT_DIR:
+                continue  # Sidecary odcisków inputu - nie są wpisami cache
+            if path.is_file() or path.suffix == '.segs':
+                index['entries'][path.relative_to(self.cache_dir).as_posix()] = {
+                    'stage': LEGACY_FILENAMES.get(path.name, path.stem.rsplit('_', 1)[0]),
+                    'bytes': self._entry_size(path),
+                    'last_access': path.stat().st_mtime,
+                }
+        return index
+
+    def _save_index(self, index: Dict[str, Any]):
+        index_path = self._index_path()
+        tmp_path = index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def _touch(self, cache_file: Path, stage: str):
+        """Zaktualizuj wpis LRU (rozmiar + czas ostatniego użycia)"""
+        with _INDEX_LOCK:
+            index = self._load_index()
+            index['entries'][cache_file.relative_to(self.cache_dir).as_posix()] = {
+                'stage': stage,
+                'bytes': self._entry_size(cache_file),
+                'last_access': time.time(),
+            }
+            self._save_index(index)
+
+    def _record_lookup(self, stage: str, hit: bool):
+        field_name = 'hits' if hit else 'misses'
+        session = self.session_stats.setdefault(stage, {'hits': 0, 'misses': 0})
+        session[field_name] += 1
+
+        with _INDEX_LOCK:
+            index = self._load_index()
+            lifetime = index['stats'].setdefault(stage, {'hits': 0, 'misses': 0})
+            lifetime[field_name] += 1
+            self._save_index(index)
+
+    def enforce_size_limit(self) -> int:
+        """
+        Usuń najdawniej używane wpisy aż cache zmieści się w max_size_gb.
+        Wpisy inputów przetwarzanych przez działające joby (bieżący i inne
+        CacheManagery w tym procesie) nie są usuwane - mogą być w użyciu.
+
+        Returns:
+            Liczba zwolnionych bajtów
+        """
+        if not self.enabled or not self.max_bytes:
+            return 0
+
+        freed = 0
+        with _INDEX_LOCK:
+            index = self._load_index()
+            entries = index['entries']
+            total = sum(entry['bytes'] for entry in entries.values())
+            if total <= self.max_bytes:
+                return 0
+
+            in_use = set(_PINNED_KEYS)
+            if self.current_cache_key:
+                in_use.add(self.current_cache_key)
+
+            for relpath, entry in sorted(entries.items(), key=lambda item: item[1]['last_access']):
+                if total <= self.max_bytes:
+                    break
+                if relpath.split('/', 1)[0] in in_use:
+                    continue
+                path = self.cache_dir / relpath
+                try:
+                    if path.is_dir():
+                        shutil.rmtree(path)
+                    else:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
+                try:
+                    path.parent.rmdir()  # Usuń pusty katalog inputu
+                except OSError:
+                    pass
+
+                del entries[relpath]
+                total -= entry['bytes']
+                freed += entry['bytes']
+                index['evicted']['entries'] += 1
+                index['evicted']['bytes'] += entry['bytes']
+
+            self._save_index(index)
+
+        if freed:
+            print(f"🧹 Cache LRU: usunięto {freed / 1024 ** 2:.1f} MB (limit {self.max_bytes / 1024 ** 3:.1f} GB)")
+
+        return freed
 
     def get_cache_stats(self) -> Dict[str, Any]:
         """
-        Pobierz statystyki cache (ile stages ma cache hit).
+        Pobierz statystyki cache: stan etapów bieżącej sesji, zajętość (bajty)
+        oraz hit rate (sesja i łącznie).
 
         Returns:
             Dict ze statystykami
@@ -266,18 +729,42 @@ class CacheManager:
                 'reason': 'force_recompute' if self.force_recompute else 'disabled'
             }
 
+        with _INDEX_LOCK:
+            index = self._load_index()
+
+        def with_rate(counts: Dict[str, int]) -> Dict[str, Any]:
+            lookups = counts['hits'] + counts['misses']
+            return {**counts, 'hit_rate': counts['hits'] / lookups if lookups else 0.0}
+
+        bytes_by_stage: Dict[str, int] = {}
+        for entry in index['entries'].values():
+            bytes_by_stage[entry['stage']] = bytes_by_stage.get(entry['stage'], 0) + entry['bytes']
+
         stats = {
             'enabled': True,
             'cache_key': self.current_cache_key,
             'cache_path': str(self.current_cache_path),
-            'stages': {}
+            'stages': {},
+            'total_bytes': sum(bytes_by_stage.values()),
+            'max_bytes': self.max_bytes,
+            'num_entries': len(index['entries']),
+            'bytes_by_stage': bytes_by_stage,
+            'session': {stage: with_rate(c) for stage, c in self.session_stats.items()},
+            'lifetime': {stage: with_rate(c) for stage, c in index['stats'].items()},
+            'evicted': index['evicted'],
         }
 
-        for stage in ['vad', 'transcribe', 'scoring']:
-            is_valid = self.is_cache_valid(stage)
+        for stage, entry_type in self.entry_types.items():
+            if entry_type.kind != 'json':
+                continue
+            key = self._stage_keys.get(stage)
+            cache_file = self.current_cache_path / f"{stage}_{key}{entry_type.extension}" if key and self.current_cache_path else None
+            cache_file = self._existing_entry(cache_file) if cache_file else None
+            is_valid = cache_file is not None
             stats['stages'][stage] = {
+                'key': key,
                 'cached': is_valid,
-                'file': self.get_cache_file_path(stage).name if is_valid else None
+                'file': cache_file.name if is_valid else None
             }
 
         return stats
@@ -299,6 +786,8 @@ if __name__ == "__main__":
 
         class Audio:
             sample_rate = 16000
+            normalization = "ebu_r128"
+            target_loudness = -16.0
 
         class ASR:
             model = "large-v3"
@@ -308,6 +797,7 @@ if __name__ == "__main__":
             beam_size = 3
             compute_type = "float16"
             condition_on_previous_text = True
+            batched = True
 
         class Scoring:
             nli_model = "clarin-pl/roberta-large-nli"
@@ -3,18 +3,36 @@ Analiza czatu: wykrywanie burstów i finalny scoring.
 
 Zawiera narzędzia do parsowania plików chat.json (Twitch/YouTube)
 oraz obliczania burstów aktywności czatu w oknach sekundowych.
+
+Dla wielu segmentów naraz: ChatTimeline zamienia mapę {sekunda: liczba}
+na gęstą tablicę NumPy raz na nagranie - baseline z sumy prefiksowej,
+peak z sparse table (max w przedziale w O(1)); wynik identyczny
+z calculate_chat_burst_score.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Dict
+from typing import Dict, Sequence
+
+import numpy as np
 
 from utils.chat_parser import load_chat_robust
 from .config import CompositeWeights
 
 logger = logging.getLogger(__name__)
 
+# (minimalny burst_multiplier, score) - malejąco; poniżej ostatniego progu 0.10
+BURST_THRESHOLDS = (
+    (15, 1.00),
+    (10, 0.95),
+    (7, 0.85),
+    (5, 0.70),
+    (3, 0.50),
+    (2, 0.30),
+)
+BURST_SCORE_FLOOR = 0.10
+
 
 def parse_chat_json(path: str) -> Dict[int, int]:
     """Wrapper kompatybilności – korzysta z utils.load_chat_robust."""
@@ -59,22 +77,108 @@ def calculate_chat_burst_score(
 
     burst_multiplier = peak_msgs_per_sec / max(baseline_rate, 1)
 
-    if burst_multiplier >= 15:
-        score = 1.00
-    elif burst_multiplier >= 10:
-        score = 0.95
-    elif burst_multiplier >= 7:
-        score = 0.85
-    elif burst_multiplier >= 5:
-        score = 0.70
-    elif burst_multiplier >= 3:
-        score = 0.50
-    elif burst_multiplier >= 2:
-        score = 0.30
-    else:
-        score = 0.10
+    for threshold, score in BURST_THRESHOLDS:
+        if burst_multiplier >= threshold:
+            return float(score)
+    return float(BURST_SCORE_FLOOR)
+
+
+class ChatTimeline:
+    """Gęsta tablica wiadomości/s: sumy prefiksowe (baseline) + sparse table (peak)"""
+
+    def __init__(self, chat_data: Dict[int, int]):
+        # Ujemne sekundy nigdy nie są odpytywane (okna zaczynają się od 0)
+        seconds = np.fromiter(map(int, chat_data.keys()), dtype=np.int64, count=len(chat_data))
+        values = np.fromiter(map(int, chat_data.values()), dtype=np.int64, count=len(chat_data))
+        seconds, values = seconds[seconds >= 0], values[seconds >= 0]
+        self.empty = not chat_data
+        self.length = int(seconds.max()) + 1 if len(seconds) else 0
+
+        self.counts = np.zeros(self.length, dtype=np.int64)
+        self.counts[seconds] = values
+        self.prefix = np.zeros(self.length + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=self.prefix[1:])
+
+        # sparse[k][i] = max(counts[i : i + 2^k])
+        self.sparse = [self.counts]
+        width = 1
+        while 2 * width <= self.length:
+            prev = self.sparse[-1]
+            self.sparse.append(np.maximum(prev[:-width], prev[width:]))
+            width *= 2
+
+    def window_sum(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Suma counts[start:end) (poza tablicą = 0)"""
+        starts = np.clip(starts, 0, self.length)
+        ends = np.clip(ends, 0, self.length)
+        return self.prefix[np.maximum(ends, starts)] - self.prefix[starts]
+
+    def window_max(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Max counts[start..end] (włącznie; sekundy bez wiadomości = 0)"""
+        result = np.zeros(len(starts), dtype=np.int64)
+        if self.length == 0:
+            return result
+        lo = np.clip(starts, 0, None)
+        hi = np.minimum(ends, self.length - 1)
+        valid = lo <= hi
+        lo, hi = lo[valid], hi[valid]
+
+        level = np.floor(np.log2(hi - lo + 1)).astype(np.int64)
+        peaks = np.zeros(len(lo), dtype=np.int64)
+        for k in np.unique(level):
+            mask = level == k
+            table = self.sparse[k]
+            peaks[mask] = np.maximum(table[lo[mask]], table[hi[mask] - (1 << k) + 1])
+
+        # Część okna poza tablicą to sekundy z 0 wiadomości
+        beyond = ends[valid] > self.length - 1
+        peaks[beyond] = np.maximum(peaks[beyond], 0)
+        result[valid] = peaks
+        return result
+
+    def burst_scores(
+        self,
+        segment_starts: Sequence[float],
+        segment_ends: Sequence[float],
+        baseline_window: int = 180,
+        peak_extension: int = 10,
+    ) -> np.ndarray:
+        """calculate_chat_burst_score dla wszystkich segmentów jednym wywołaniem"""
+        t0s = np.asarray(segment_starts, dtype=np.float64)
+        t1s = np.asarray(segment_ends, dtype=np.float64)
+        if self.empty:
+            return np.zeros(len(t0s), dtype=np.float64)
+
+        # int() w Pythonie obcina w stronę zera
+        seg_start = np.maximum(0, np.trunc(t0s).astype(np.int64))
+        seg_end = np.maximum(seg_start, np.trunc(t1s).astype(np.int64))
+
+        baseline_start = np.maximum(0, seg_start - baseline_window)
+        baseline_total = self.window_sum(baseline_start, seg_start)
+        baseline_duration = np.maximum(seg_start - baseline_start, 1)
+        baseline_rate = baseline_total / baseline_duration
+
+        peak = self.window_max(seg_start, seg_end + peak_extension)
+        burst_multiplier = peak / np.maximum(baseline_rate, 1.0)
+
+        scores = np.full(len(t0s), BURST_SCORE_FLOOR, dtype=np.float64)
+        for threshold, score in reversed(BURST_THRESHOLDS):
+            scores[burst_multiplier >= threshold] = score
+        return scores
+
+
+def calculate_chat_burst_scores(
+    segment_starts: Sequence[float],
+    segment_ends: Sequence[float],
+    chat_data: Dict[int, int],
+    baseline_window: int = 180,
+    peak_extension: int = 10,
+) -> np.ndarray:
+    """Wektorowa wersja calculate_chat_burst_score (jedna tablica na nagranie)."""
 
-    return float(score)
+    return ChatTimeline(chat_data).burst_scores(
+        segment_starts, segment_ends, baseline_window, peak_extension
+    )
 
 
 def calculate_final_score(
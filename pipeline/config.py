@@ -16,8 +16,10 @@ class AudioConfig:
     """Konfiguracja przetwarzania audio"""
     sample_rate: int = 16000
     channels: int = 1
-    normalization: str = "ebu_r128"
+    normalization: str = "ebu_r128"  # "ebu_r128" lub "none"
     target_loudness: float = -16.0  # LUFS
+    loudnorm_two_pass: bool = True  # Pomiar w przebiegu ekstrakcji → liniowy loudnorm
+    write_pcm_f32: bool = True  # audio_normalized.f32 (float32 PCM) → AudioStore (mmap) dla VAD/ASR/features
 
 
 @dataclass
@@ -28,6 +30,12 @@ class VADConfig:
     min_speech_duration: float = 3.0
     min_silence_duration: float = 1.5
     max_segment_duration: float = 180.0  # 3 min hard limit
+    streaming: bool = True  # Silero po oknach z AudioStore (stała pamięć, wynik jak get_speech_timestamps)
+    chunk_seconds: float = 600.0  # Rozmiar okna czytanego z mmap w trybie streaming
+    # Fallback energetyczny (gdy Silero nie działa)
+    energy_percentile: float = 30.0  # Ramki poniżej tego percentyla energii = cisza
+    energy_adaptive: bool = False  # Próg kroczący (np. zmienny poziom tła na sali)
+    energy_window_seconds: float = 30.0  # Okno progu kroczącego
 
 
 @dataclass
@@ -45,6 +53,11 @@ class ASRConfig:
     initial_prompt: Optional[str] = None
 
     batch_size: int = 10  # Liczba segmentów przetwarzanych jednocześnie
+    batched: bool = True  # BatchedInferencePipeline (klipy ≤30s w batchach) zamiast segment po segmencie
+    workers: int = 1  # >1 = pula procesów CPU, każdy z własnym modelem (segmenty dzielone LPT)
+    cpu_threads: int = 0  # Wątki CTranslate2 na model (0 = auto: rdzenie / workers)
+    reuse_words: bool = True  # Po zmianie VAD: słowa z wcześniejszych transkrypcji, Whisper tylko na lukach
+    reuse_min_gap: float = 0.5  # Luki krótsze niż tyle sekund nie są transkrybowane
 
     def __post_init__(self):
         if self.temperature is None:
@@ -75,6 +88,7 @@ class FeatureConfig:
     compute_spectral_centroid: bool = True
     compute_spectral_flux: bool = True
     compute_zcr: bool = True
+    whole_recording_acoustic: bool = True  # Jedno STFT nagrania + sumy prefiksowe (False = STFT per segment)
 
     # Prosodic features
     compute_speech_rate: bool = True
@@ -85,10 +99,13 @@ class FeatureConfig:
     # Will be set to keywords_pl.csv or keywords_en.csv based on language
     keywords_file: Optional[str] = None
     compute_entity_density: bool = True
+    keyword_inflection: bool = True  # Keywords dopasowywane z polską fleksją (Tusk → Tuska)
 
     # NLP model dla entity recognition
     # Will be set to pl_core_news_lg or en_core_web_lg based on language
     spacy_model: Optional[str] = None
+    spacy_batch_size: int = 64  # Transkryptów na batch nlp.pipe
+    spacy_n_process: int = 1  # Procesy nlp.pipe (>1 = równoległy NER)
 
 
 @dataclass
@@ -98,10 +115,27 @@ class ScoringConfig:
     prefilter_top_n: int = 40
     prefilter_keyword_threshold: float = 5.0
     
-    # AI Model
-    nli_model: str = "clarin-pl/roberta-large-nli"
+    # Backend semantic_score: auto (GPT → lokalny NLI → keywords) / gpt / nli / keywords
+    semantic_backend: str = "auto"
+
+    # AI Model (lokalny NLI - zero-shot na interest_labels)
+    nli_model: str = "MoritzLaurer/mDeBERTa-v3-base-mnli-xnli"
     batch_size: int = 8
     device: int = 0  # GPU device ID, -1 dla CPU
+    nli_onnx: bool = True  # ONNX Runtime, jeśli model ma plik .onnx
+    nli_quantize: bool = True  # int8 (model_quantized.onnx / dynamiczna kwantyzacja torch)
+    nli_workers: int = 2  # Batche liczone równolegle (wątki dzielą rdzenie)
+    nli_max_length: int = 256  # Tokenów na parę transkrypt + hipoteza
+
+    # GPT semantic scoring
+    gpt_model: str = "gpt-4o-mini"
+    gpt_base_url: Optional[str] = None  # Endpoint zgodny z OpenAI (None = api.openai.com / OPENAI_BASE_URL)
+    gpt_batch_size: int = 10  # Transkryptów na zapytanie
+    gpt_max_in_flight: int = 8  # Zapytań równolegle
+    gpt_requests_per_minute: int = 500  # Limit RPM konta
+    gpt_tokens_per_minute: int = 200000  # Limit TPM konta
+    gpt_max_retries: int = 5  # Ponowienia 429/5xx (backoff wykładniczy)
+    gpt_cache: bool = True  # Cache odpowiedzi w cache/gpt_scores/
     
     # Interest labels z wagami
     interest_labels: Dict[str, float] = None
@@ -192,6 +226,12 @@ class SelectionConfig:
     trim_percentage: float = 0.2
     duration_tolerance: float = 1.1  # 10% tolerance
 
+    # Silnik selekcji: "greedy" (heurystyki) albo "dp" (dokładne DP z budżetem czasu)
+    engine: str = "greedy"
+    dp_budget_step: float = 1.0  # Dyskretyzacja budżetu [s] (rośnie automatycznie przy wielu kandydatach)
+    dp_max_cells: int = 12_000_000  # Limit tablicy DP (kandydaci × kroki budżetu)
+    dp_iterations: int = 20  # Iteracje mnożników Lagrange'a (limity per faza / max_clips)
+
 
 @dataclass
 class CompositeWeights:
@@ -252,6 +292,14 @@ class ExportConfig:
     # Misc
     movflags: str = "+faststart"
 
+    # Równoległe kodowanie klipów (cięcie + fade)
+    encode_workers: int = 0  # Sloty enkodera (0 = rdzenie / encoder_threads), najwyżej queue.ffmpeg_slots
+    encoder_threads: int = 4  # Wątki na jeden proces ffmpeg (-threads; 0 = domyślne ffmpeg)
+
+    # Eksport jednym przebiegiem: jeden graf filter_complex (trim + fade + title cards + concat)
+    single_pass: bool = False
+    fuse_hardsub: bool = True  # Hardsub w tym samym przebiegu (single_pass)
+
 @dataclass
 class HighlightPackerConfig:
     """
@@ -322,13 +370,35 @@ class CacheConfig:
     """
     Konfiguracja cache dla kosztownych etapów (VAD, Transcribe, Scoring).
 
-    Cache key = hash(input_video) + hash(config_for_stage)
-    - Jeśli input i config się nie zmieniły → cache hit → pomiń stage
+    Cache key (per stage) = hash(config_for_stage) + hash(upstream_artifact)
+    - Jeśli upstream i config etapu się nie zmieniły → cache hit → pomiń stage
     - Jeśli coś się zmieniło → cache miss → wykonaj stage i zapisz
     """
     enabled: bool = True
     cache_dir: Path = Path("cache")
     force_recompute: bool = False  # --force flag aby wymusić pełne przeliczenie
+    max_size_gb: float = 50.0  # Limit rozmiaru (LRU eviction), 0 = bez limitu
+    # Odcisk inputu (pipeline/fingerprint.py): "sampled" (bloki z całego pliku, mmap),
+    # "full" (równoległy hash drzewiasty całego pliku), "edges" (stary: pierwsze/ostatnie 10MB)
+    hash_mode: str = "sampled"
+    hash_samples: int = 256
+    hash_workers: int = 4
+
+
+@dataclass
+class QueueConfig:
+    """
+    Kolejka wielu nagrań (PipelineJobQueue).
+
+    Kilka nagrań przechodzi równolegle przez różne etapy; współbieżność
+    ograniczają budżety zasobów (sloty ffmpeg, instancje modelu ASR, RAM).
+    Identyczne inputy są deduplikowane (następca single-flight).
+    """
+    max_concurrent_jobs: int = 2   # Ile nagrań jednocześnie w pipeline
+    ffmpeg_slots: int = 2          # Równoległe procesy ffmpeg (export rezerwuje cały swój EncoderPool)
+    asr_instances: int = 1         # Instancje modelu Whisper naraz (pula CPU asr.workers zajmuje tyle instancji)
+    ram_budget_mb: int = 16000     # Łączny budżet RAM dla etapów (szacunki per etap)
+    spool_dir: str = "temp/job_queue"  # Katalog kolejki dla CLI (submit/list/cancel)
 
 
 @dataclass
@@ -349,6 +419,7 @@ class Config:
     youtube: YouTubeConfig = None
     shorts: ShortsConfig = None
     cache: CacheConfig = None  # Cache configuration
+    queue: QueueConfig = None  # Multi-job queue
     uploader: UploaderConfig = None
     copyright: CopyrightConfig = None
 
@@ -358,6 +429,10 @@ class Config:
     keep_intermediate: bool = False
     language: str = "pl"  # Pipeline language: "pl" or "en"
 
+    # Artefakty segmentów (stage 3-5 + cache)
+    segment_format: str = "columnar"  # "columnar" (.segs, mmap) lub "json"
+    debug_json: bool = False  # Dodatkowo zapisz JSON (indent=2) przy formacie kolumnowym
+
     # Hardware
     use_gpu: bool = True
     gpu_device: int = 0
@@ -412,6 +487,8 @@ class Config:
                 self.shorts.default_template = "auto"
         if self.cache is None:
             self.cache = CacheConfig()
+        if self.queue is None:
+            self.queue = QueueConfig()
         if self.uploader is None:
             self.uploader = UploaderConfig()
         if self.copyright is None:
@@ -467,6 +544,7 @@ class Config:
         packer = HighlightPackerConfig(**data.get('packer', data.get('splitter', {})))
         shorts = ShortsConfig(**data.get('shorts', {}))
         cache = CacheConfig(**data.get('cache', {}))
+        queue = QueueConfig(**data.get('queue', {}))
         uploader_cfg = UploaderConfig(**data.get('uploader', {}))
         copyright_cfg = CopyrightConfig(**data.get('copyright', {}))
 
@@ -487,6 +565,7 @@ class Config:
             splitter=packer,
             shorts=shorts,
             cache=cache,  # Cache configuration
+            queue=queue,
             uploader=uploader_cfg,
             copyright=copyright_cfg,
             **general
@@ -518,12 +597,15 @@ class Config:
             'packer': asdict(self.packer),
             'splitter': asdict(self.splitter),
             'shorts': asdict(self.shorts),
+            'queue': asdict(self.queue),
             'uploader': asdict(self.uploader),
             'copyright': asdict(self.copyright),
             'general': {
                 'output_dir': str(self.output_dir),
                 'temp_dir': str(self.temp_dir),
                 'keep_intermediate': self.keep_intermediate,
+                'segment_format': self.segment_format,
+                'debug_json': self.debug_json,
                 'language': self.language,  # Language parameter
                 'use_gpu': self.use_gpu,
                 'gpu_device': self.gpu_device,
@@ -556,11 +638,14 @@ class Config:
             'packer': asdict(self.packer),
             'splitter': asdict(self.splitter),
             'shorts': asdict(self.shorts),
+            'queue': asdict(self.queue),
             'uploader': asdict(self.uploader),
             'copyright': asdict(self.copyright),
             'output_dir': str(self.output_dir),
             'temp_dir': str(self.temp_dir),
             'keep_intermediate': self.keep_intermediate,
+            'segment_format': self.segment_format,
+            'debug_json': self.debug_json,
             'use_gpu': self.use_gpu,
             'gpu_device': self.gpu_device,
             'mode': self.mode,
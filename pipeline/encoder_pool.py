@@ -0,0 +1,140 @@
+"""
+Encoder Pool
+Ograniczona pula równoległych procesów ffmpeg dla Stage 7.
+
+Dotąd ExportStage kodował klipy jeden po drugim (blokujące subprocess.run):
+pełny re-encode libx264 przy cięciu i drugi przy fade. Pojedynczy enkoder
+nie skaluje się liniowo z rdzeniami (lookahead, wątki per klatka), więc
+kilka enkoderów z mniejszą liczbą wątków wykorzystuje maszynę lepiej.
+
+EncoderPool uruchamia naraz do `workers` procesów ffmpeg (sloty enkodera;
+domyślnie rdzenie / wątki na enkoder - patrz `encoder_workers`):
+- callback postępu po każdym zakończonym klipie (done, total, job),
+- fail-fast: pierwszy błąd zabija działające procesy, zadania w kolejce
+  nie startują, run() rzuca EncodeError (CalledProcessError z zadaniem `job`,
+  jak subprocess.run check=True),
+- cancel() (z ExportStage.cancel) zabija działające procesy - run() rzuca
+  InterruptedError,
+- fail_fast=False: błędy zwracane per zadanie (fade z fallbackiem na oryginał).
+
+    pool = EncoderPool(workers=4)
+    errors = pool.run([EncodeJob(cmd, "klip 1"), ...], progress_callback=cb)
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple, Optional
+
+
+class EncodeJob(NamedTuple):
+    cmd: List[str]
+    label: str = ""
+
+
+class EncodeError(subprocess.CalledProcessError):
+    """CalledProcessError z zadaniem, które zawiodło (etykieta do komunikatu)"""
+
+    def __init__(self, job: EncodeJob, returncode: int, output=None, stderr=None):
+        super().__init__(returncode, job.cmd, output, stderr)
+        self.job = job
+
+
+def encoder_workers(workers: int, threads_per_encode: int) -> int:
+    """Liczba slotów: `workers` lub (gdy 0) rdzenie / wątki na enkoder"""
+    if workers > 0:
+        return workers
+    return max(1, (os.cpu_count() or 1) // max(1, threads_per_encode))
+
+
+class EncoderPool:
+    """Do `workers` procesów ffmpeg naraz, z fail-fast i anulowaniem"""
+
+    def __init__(self, workers: int, popen: Optional[Callable] = None):
+        self.workers = max(1, workers)
+        self._popen = popen  # None = subprocess.Popen (w chwili wywołania)
+        self._running = set()
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._failed = threading.Event()
+
+    def cancel(self) -> None:
+        """Zatrzymaj pulę: zabij działające procesy, pomiń zakolejkowane"""
+        self._cancelled.set()
+        self._kill_running()
+
+    def _kill_running(self) -> None:
+        with self._lock:
+            processes = list(self._running)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass  # proces już się zakończył
+
+    def _stopped(self) -> bool:
+        return self._cancelled.is_set() or self._failed.is_set()
+
+    def _encode(self, job: EncodeJob) -> None:
+        if self._stopped():
+            return
+
+        with self._lock:
+            # Sprawdzenie pod lockiem: cancel() nie przegapi procesu startującego w tej chwili
+            if self._stopped():
+                return
+            popen = self._popen or subprocess.Popen
+            process = popen(job.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._running.add(process)
+        try:
+            stdout, stderr = process.communicate()
+        finally:
+            with self._lock:
+                self._running.discard(process)
+
+        if process.returncode != 0 and not self._stopped():
+            raise EncodeError(job, process.returncode, stdout, stderr)
+
+    def run(
+        self,
+        jobs: List[EncodeJob],
+        progress_callback: Optional[Callable[[int, int, EncodeJob], None]] = None,
+        fail_fast: bool = True
+    ) -> List[Optional[EncodeError]]:
+        """
+        Wykonaj zadania (kolejność startu = kolejność listy).
+
+        Returns:
+            Błąd per zadanie (None = sukces); przy fail_fast pierwszy błąd jest rzucany
+        """
+        errors: List[Optional[EncodeError]] = [None] * len(jobs)
+        if not jobs:
+            return errors
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            futures = {executor.submit(self._encode, job): idx for idx, job in enumerate(jobs)}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    idx = futures[future]
+                    try:
+                        future.result()
+                    except EncodeError as error:
+                        if fail_fast:
+                            raise
+                        errors[idx] = error
+
+                    if self._cancelled.is_set():
+                        raise InterruptedError("Eksport anulowany")
+                    if progress_callback:
+                        progress_callback(done, len(jobs), jobs[idx])
+            except BaseException:
+                self._failed.set()
+                for future in futures:
+                    future.cancel()
+                self._kill_running()
+                raise
+
+        return errors
@@ -0,0 +1,295 @@
+"""
+Input Fingerprint
+Odcisk pliku wideo dla klucza cache (CacheManager.calculate_input_hash).
+
+Tryby:
+- sampled (domyślny): rozmiar + początek/koniec + N bloków rozłożonych równo
+  po całym pliku (mmap). Dwa nagrania Sejmu z tą samą planszą na początku
+  i końcu różnią się w środku, więc nie kolidują; czyta ~25 MB niezależnie
+  od długości VOD.
+- full: pełny hash drzewiasty - plik dzielony na chunki hashowane równolegle
+  (blake2b zwalnia GIL), wynik = hash(rozmiar + hashe chunków).
+- edges: stary tryb (pierwsze i ostatnie 10 MB + rozmiar) - zgodność ze
+  starym cache.
+
+Wynik zapisywany jest w sidecarze obok pliku (`<plik>.fingerprint.json`,
+ważny dopóki nie zmieni się rozmiar/mtime), a jeśli katalog jest tylko do
+odczytu - w `<fallback_dir>/fingerprints/`. Ten sam VOD nie jest hashowany
+ponownie. prefetch_fingerprint() liczy odcisk w tle (np. dla nagrań czekających
+w kolejce), a fingerprint() dołącza do trwającego obliczenia zamiast je dublować.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_SUFFIX = ".fingerprint.json"
+FINGERPRINT_DIR = "fingerprints"        # podkatalog fallback_dir na sidecary
+MODES = ("sampled", "full", "edges")
+
+SAMPLE_EDGE_BYTES = 4 * 1024 * 1024     # początek i koniec pliku
+SAMPLE_BLOCK_BYTES = 64 * 1024          # pojedynczy próbkowany blok
+DEFAULT_SAMPLES = 256
+TREE_CHUNK_BYTES = 64 * 1024 * 1024     # chunk hasha drzewiastego
+LEGACY_EDGE_BYTES = 10 * 1024 * 1024
+
+# Obliczenia w tle (prefetch) + deduplikacja trwających obliczeń
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fingerprint")
+_IN_FLIGHT: Dict[Tuple[str, str], Future] = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def _digest(hasher) -> str:
+    return hasher.hexdigest()[:16]  # 64 bity - jak dotychczasowy klucz cache
+
+
+def sampled_hash(path: Union[str, Path], samples: int = DEFAULT_SAMPLES) -> str:
+    """Rozmiar + początek/koniec + `samples` bloków rozłożonych równo (mmap)"""
+    path = Path(path)
+    size = path.stat().st_size
+    hasher = hashlib.blake2b(digest_size=32)
+    hasher.update(f"sampled:{samples}:{size}".encode())
+    if size == 0:
+        return _digest(hasher)
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if size <= 2 * SAMPLE_EDGE_BYTES + samples * SAMPLE_BLOCK_BYTES:
+            hasher.update(mm)  # Mały plik - całość
+            return _digest(hasher)
+
+        hasher.update(mm[:SAMPLE_EDGE_BYTES])
+        span = size - 2 * SAMPLE_EDGE_BYTES - SAMPLE_BLOCK_BYTES
+        for i in range(samples):
+            offset = SAMPLE_EDGE_BYTES + span * i // max(1, samples - 1)
+            hasher.update(offset.to_bytes(8, 'little'))
+            hasher.update(mm[offset:offset + SAMPLE_BLOCK_BYTES])
+        hasher.update(mm[size - SAMPLE_EDGE_BYTES:])
+
+    return _digest(hasher)
+
+
+def tree_hash(
+    path: Union[str, Path],
+    workers: int = 4,
+    chunk_bytes: int = TREE_CHUNK_BYTES
+) -> str:
+    """Pełny hash drzewiasty: chunki hashowane równolegle, potem hash hashów"""
+    path = Path(path)
+    size = path.stat().st_size
+    root = hashlib.blake2b(digest_size=32)
+    root.update(f"tree:{chunk_bytes}:{size}".encode())
+    if size == 0:
+        return _digest(root)
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            def hash_chunk(start: int) -> bytes:
+                return hashlib.blake2b(view[start:start + chunk_bytes], digest_size=32).digest()
+
+            offsets = range(0, size, chunk_bytes)
+            if workers > 1 and len(offsets) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    chunk_digests = list(pool.map(hash_chunk, offsets))
+            else:
+                chunk_digests = [hash_chunk(offset) for offset in offsets]
+        finally:
+            view.release()
+
+    for digest in chunk_digests:
+        root.update(digest)
+    return _digest(root)
+
+
+def edges_hash(path: Union[str, Path], chunk_size: int = 8192) -> str:
+    """Stary odcisk: rozmiar + pierwsze 10MB + ostatnie 10MB (SHA256)"""
+    path = Path(path)
+    hasher = hashlib.sha256()
+    file_size = path.stat().st_size
+    hasher.update(str(file_size).encode())
+
+    with open(path, 'rb') as f:
+        read_bytes = 0
+        while read_bytes < LEGACY_EDGE_BYTES:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            read_bytes += len(chunk)
+
+        if file_size > 2 * LEGACY_EDGE_BYTES:
+            f.seek(-LEGACY_EDGE_BYTES, 2)
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+
+    return hasher.hexdigest()[:16]
+
+
+def _mode_id(mode: str, samples: int) -> str:
+    return f"sampled:{samples}" if mode == "sampled" else mode
+
+
+def compute_fingerprint(path: Union[str, Path], mode: str = "sampled",
+                        samples: int = DEFAULT_SAMPLES, workers: int = 4) -> str:
+    """Policz odcisk bez sidecara"""
+    if mode == "sampled":
+        return sampled_hash(path, samples)
+    if mode == "full":
+        return tree_hash(path, workers)
+    if mode == "edges":
+        return edges_hash(path)
+    raise ValueError(f"Unknown fingerprint mode: {mode} (expected one of {MODES})")
+
+
+# === Sidecar ===
+
+def sidecar_paths(path: Union[str, Path], fallback_dir: Optional[Path] = None) -> Tuple[Path, Optional[Path]]:
+    """(sidecar obok pliku, sidecar w fallback_dir/fingerprints/)"""
+    path = Path(path).resolve()
+    primary = path.with_name(path.name + SIDECAR_SUFFIX)
+    fallback = None
+    if fallback_dir is not None:
+        name = hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:16]
+        fallback = Path(fallback_dir) / FINGERPRINT_DIR / f"{name}.json"
+    return primary, fallback
+
+
+def _file_state(path: Path) -> Dict[str, int]:
+    stat = path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_sidecar(sidecar: Path, state: Dict[str, int]) -> Dict[str, str]:
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if data.get('size') != state['size'] or data.get('mtime_ns') != state['mtime_ns']:
+        return {}  # Plik zmieniony → stare odciski nieważne
+    return data.get('hashes', {})
+
+
+def _write_sidecar(candidates, state: Dict[str, int], hashes: Dict[str, str]) -> Optional[Path]:
+    payload = {**state, 'hashes': hashes}
+    for sidecar in candidates:
+        if sidecar is None:
+            continue
+        try:
+            sidecar.parent.mkdir(parents=True, exist_ok=True)
+            tmp = sidecar.with_name(sidecar.name + f".{os.getpid()}.tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=2)
+            os.replace(tmp, sidecar)
+            return sidecar
+        except OSError as e:
+            logger.debug("Cannot write fingerprint sidecar %s: %s", sidecar, e)
+    return None
+
+
+def cached_fingerprint(path: Union[str, Path], mode: str = "sampled", samples: int = DEFAULT_SAMPLES,
+                       fallback_dir: Optional[Path] = None) -> Optional[str]:
+    """Odcisk z sidecara (bez liczenia) albo None"""
+    path = Path(path)
+    state = _file_state(path)
+    for sidecar in sidecar_paths(path, fallback_dir):
+        if sidecar is not None:
+            value = _read_sidecar(sidecar, state).get(_mode_id(mode, samples))
+            if value:
+                return value
+    return None
+
+
+def _fingerprint_and_store(path: Path, mode: str, samples: int, workers: int,
+                           fallback_dir: Optional[Path]) -> str:
+    cached = cached_fingerprint(path, mode, samples, fallback_dir)
+    if cached:
+        return cached
+
+    state = _file_state(path)
+    value = compute_fingerprint(path, mode, samples, workers)
+
+    primary, fallback = sidecar_paths(path, fallback_dir)
+    hashes = {**_read_sidecar(primary, state), _mode_id(mode, samples): value}
+    _write_sidecar((primary, fallback), state, hashes)
+    return value
+
+
+def fingerprint(path: Union[str, Path], mode: str = "sampled", samples: int = DEFAULT_SAMPLES,
+                workers: int = 4, fallback_dir: Optional[Path] = None) -> str:
+    """
+    Odcisk pliku: z sidecara, z trwającego obliczenia w tle, albo policzony teraz.
+
+    Args:
+        path: Plik wideo
+        mode: 'sampled', 'full' lub 'edges'
+        samples: Liczba próbkowanych bloków (tryb sampled)
+        workers: Wątki dla hasha drzewiastego (tryb full)
+        fallback_dir: Katalog na sidecar, gdy katalog pliku jest tylko do odczytu
+
+    Returns:
+        16-znakowy hex
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+
+    key = (str(path.resolve()), _mode_id(mode, samples))
+    with _IN_FLIGHT_LOCK:
+        pending = _IN_FLIGHT.get(key)
+    if pending is not None:
+        return pending.result()
+
+    return _fingerprint_and_store(path, mode, samples, workers, fallback_dir)
+
+
+def prefetch_fingerprint(path: Union[str, Path], mode: str = "sampled", samples: int = DEFAULT_SAMPLES,
+                         workers: int = 4, fallback_dir: Optional[Path] = None) -> Future:
+    """
+    Zacznij liczyć odcisk w tle (no-op jeśli już trwa). fingerprint() dla tego
+    pliku poczeka na wynik zamiast liczyć drugi raz.
+    """
+    path = Path(path)
+    key = (str(path.resolve()), _mode_id(mode, samples))
+
+    with _IN_FLIGHT_LOCK:
+        pending = _IN_FLIGHT.get(key)
+        if pending is not None:
+            return pending
+        future = _EXECUTOR.submit(_fingerprint_and_store, path, mode, samples, workers, fallback_dir)
+        _IN_FLIGHT[key] = future
+
+    def _done(f: Future):
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT.pop(key, None)
+        if f.exception() is not None:
+            logger.warning("Background fingerprint failed for %s: %s", path, f.exception())
+
+    future.add_done_callback(_done)
+    return future
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Użycie: python -m pipeline.fingerprint <plik> [sampled|full|edges]")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    value = compute_fingerprint(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "sampled")
+    print(f"{value}  ({time.perf_counter() - start:.2f}s)")
@@ -0,0 +1,181 @@
+"""
+Frame Features
+Cechy akustyczne liczone raz dla całego nagrania (blokami), statystyki
+segmentów z sum prefiksowych.
+
+Dotąd Stage 4 liczył dla każdego segmentu osobno spectral_centroid, STFT
+(spectral flux) i zero_crossing_rate - trzy przejścia z osobnym
+przygotowaniem STFT na każdy wycinek. FrameFeatures liczy jedno STFT
+(n_fft=2048, hop=512, jak domyślne librosa) strumieniowo po blokach ramek
+całego nagrania i trzyma per ramka:
+- energię (suma kwadratów próbek w bloku hopu) → RMS
+- liczbę przejść przez zero w bloku hopu → ZCR
+- spectral centroid ramki
+- spectral flux ramki (norma różnicy z poprzednią ramką)
+jako sumy prefiksowe. Statystyka segmentu [t0, t1) to różnica dwóch
+elementów - koszt Stage 4 jest O(nagranie) + O(1) na segment.
+
+Granice segmentów są zaokrąglane do hopu (32 ms przy 16 kHz), a ramki na
+brzegach segmentu widzą sąsiednie audio zamiast zer - wartości różnią się
+od liczonych per wycinek o ułamki procenta (cechy i tak są potem
+normalizowane z-score w obrębie nagrania).
+
+    frames = FrameFeatures.compute(audio, sr)
+    stats = frames.segment_stats(t0s, t1s)   # dict kolumn numpy
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+N_FFT = 2048
+HOP_LENGTH = 512
+BLOCK_FRAMES = 4096  # ramek STFT na blok (~2 min przy 16 kHz, ~35 MB widma)
+ZCR_THRESHOLD = 1e-10  # jak librosa.zero_crossings: |y| ≤ próg traktowane jako 0
+
+
+class FrameFeatures:
+    """Sumy prefiksowe cech per ramka / blok hopu dla całego nagrania"""
+
+    def __init__(
+        self,
+        sample_rate: int,
+        num_samples: int,
+        energy: np.ndarray,
+        crossings: np.ndarray,
+        centroid: np.ndarray,
+        flux: np.ndarray,
+        hop_length: int = HOP_LENGTH
+    ):
+        self.sample_rate = sample_rate
+        self.num_samples = num_samples
+        self.hop_length = hop_length
+        self.num_frames = len(centroid)
+
+        def prefix(values: np.ndarray) -> np.ndarray:
+            out = np.zeros(len(values) + 1, dtype=np.float64)
+            np.cumsum(values, out=out[1:])
+            return out
+
+        self._energy = prefix(energy)
+        self._crossings = prefix(crossings)
+        self._centroid = prefix(centroid)
+        self._flux = prefix(flux)
+
+    @classmethod
+    def compute(
+        cls,
+        audio: np.ndarray,
+        sr: int,
+        n_fft: int = N_FFT,
+        hop_length: int = HOP_LENGTH,
+        block_frames: int = BLOCK_FRAMES,
+        progress_callback: Optional[Callable[[float], None]] = None
+    ) -> 'FrameFeatures':
+        """
+        Jedno przejście po nagraniu (audio może być mmap - czytane blokami).
+
+        Ramki jak librosa.stft(center=True, pad_mode='constant'): ramka k ma
+        środek w próbce k * hop_length, poza nagraniem zera.
+        """
+        import librosa
+        from scipy import fft as sp_fft  # rfft float32 bez promocji do float64
+
+        num_samples = len(audio)
+        num_frames = 1 + num_samples // hop_length
+        half = n_fft // 2
+        freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft).astype(np.float32)
+        window = librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+
+        energy = np.zeros(num_frames, dtype=np.float64)
+        crossings = np.zeros(num_frames, dtype=np.float64)
+        centroid = np.zeros(num_frames, dtype=np.float64)
+        flux = np.zeros(num_frames, dtype=np.float64)
+
+        prev_row = None
+        prev_sign = None
+        for k0 in range(0, num_frames, block_frames):
+            k1 = min(num_frames, k0 + block_frames)
+
+            # --- STFT bloku ramek (z zerami poza nagraniem) ---
+            start = k0 * hop_length - half
+            end = (k1 - 1) * hop_length + half + (n_fft - 2 * half)
+            block = np.zeros(end - start, dtype=np.float32)
+            src0, src1 = max(start, 0), min(end, num_samples)
+            if src1 > src0:
+                block[src0 - start:src1 - start] = audio[src0:src1]
+            frames = np.lib.stride_tricks.sliding_window_view(block, n_fft)[::hop_length]
+            spec = np.abs(sp_fft.rfft(frames * window, axis=1))  # (ramki, freq)
+
+            # Centroid: jak librosa (widmo ramki znormalizowane L1, cisza → 0)
+            frame_sums = spec.sum(axis=1, dtype=np.float64)
+            nonzero = frame_sums > np.finfo(np.float32).tiny
+            weighted = (spec @ freqs).astype(np.float64)
+            centroid[k0:k1][nonzero] = weighted[nonzero] / frame_sums[nonzero]
+
+            # Flux: różnica z poprzednią ramką (także z poprzedniego bloku)
+            if prev_row is not None:
+                diff = np.diff(np.concatenate([prev_row, spec], axis=0), axis=0)
+                flux[k0:k1] = np.sqrt(np.einsum('ij,ij->i', diff, diff, dtype=np.float64))
+            else:
+                diff = np.diff(spec, axis=0)
+                flux[k0 + 1:k1] = np.sqrt(np.einsum('ij,ij->i', diff, diff, dtype=np.float64))
+            prev_row = spec[-1:]
+
+            # --- Energia i przejścia przez zero per blok hopu [j*hop, (j+1)*hop) ---
+            s0 = min(k0 * hop_length, num_samples)
+            s1 = min(k1 * hop_length, num_samples)
+            if s1 > s0:
+                samples = np.asarray(audio[s0:s1], dtype=np.float32)
+                block_ids = np.arange(s0, s1, hop_length)
+                offsets = block_ids - s0
+                energy[k0:k0 + len(offsets)] = np.add.reduceat(
+                    samples.astype(np.float64) ** 2, offsets
+                )
+
+                sign = np.signbit(np.where(np.abs(samples) <= ZCR_THRESHOLD, 0.0, samples))
+                changes = np.empty(len(sign), dtype=np.float64)
+                changes[0] = float(prev_sign is not None and sign[0] != prev_sign)
+                changes[1:] = sign[1:] != sign[:-1]
+                crossings[k0:k0 + len(offsets)] = np.add.reduceat(changes, offsets)
+                prev_sign = sign[-1]
+
+            if progress_callback:
+                progress_callback(k1 / num_frames)
+
+        return cls(sr, num_samples, energy, crossings, centroid, flux, hop_length)
+
+    def segment_stats(self, t0s: Sequence[float], t1s: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Statystyki segmentów [t0, t1) (wektorowo, O(1) na segment).
+
+        Returns:
+            Dict kolumn: rms, spectral_centroid, spectral_flux, zcr
+            (segmenty puste → 0.0, jak w ekstrakcji per segment)
+        """
+        t0s = np.asarray(t0s, dtype=np.float64)
+        t1s = np.asarray(t1s, dtype=np.float64)
+        scale = self.sample_rate / self.hop_length
+
+        last_block = max(0, (self.num_samples - 1) // self.hop_length)  # ostatni blok hopu z próbkami
+        a = np.clip(np.round(t0s * scale).astype(np.int64), 0, last_block)
+        b = np.clip(np.round(t1s * scale).astype(np.int64), 0, self.num_frames)
+        b = np.maximum(b, a + 1)
+        empty = (t1s <= t0s) | (np.minimum(t1s * self.sample_rate, self.num_samples) <= t0s * self.sample_rate)
+
+        samples = np.minimum(b * self.hop_length, self.num_samples) - a * self.hop_length
+        samples = np.maximum(samples, 1)
+        frames = (b - a).astype(np.float64)
+        flux_frames = np.maximum(frames - 1, 1)
+
+        stats = {
+            'rms': np.sqrt(np.maximum(self._energy[b] - self._energy[a], 0.0) / samples),
+            'spectral_centroid': (self._centroid[b] - self._centroid[a]) / frames,
+            'spectral_flux': np.where(frames > 1, (self._flux[b] - self._flux[a + 1]) / flux_frames, 0.0),
+            'zcr': (self._crossings[b] - self._crossings[a]) / samples,
+        }
+        for values in stats.values():
+            values[empty] = 0.0
+        return stats
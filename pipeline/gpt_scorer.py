@@ -0,0 +1,292 @@
+"""
+GPT Scorer
+Współbieżny klient scoringu GPT: limit zapytań w locie, token bucket,
+retry z backoffem i trwały cache odpowiedzi.
+
+Dotąd Stage 5 wysyłał batche po 10 transkryptów jeden po drugim
+(blokujące chat.completions.create), a batch z błędem dostawał po cichu 0.5.
+GPTScorer:
+- wysyła do `max_in_flight` batchy naraz (ThreadPoolExecutor - klient
+  OpenAI jest thread-safe),
+- przed każdym zapytaniem bierze żeton z dwóch kubełków: zapytań/min
+  i (szacowanych) tokenów/min,
+- ponawia 429 / 5xx / błędy połączenia z wykładniczym backoffem + jitter
+  (respektuje nagłówek Retry-After),
+- czeka (backoff, brak żetonów) na zdarzeniu anulowania - cancel() budzi
+  wątki od razu, a te rzucają InterruptedError,
+- zapisuje wynik każdego segmentu w cache JSONL kluczowanym
+  (model, wersja promptu, hash transkryptu) - ponowne uruchomienie nie
+  wysyła żadnego zapytania, także przy innym podziale na batche,
+- segmenty z batchy, które nie powiodły się po wszystkich próbach, oraz
+  pozycje brakujące w odpowiedzi modelu zwraca jako None (nie trafiają do
+  cache - zostaną ponowione w kolejnym przebiegu).
+
+    scorer = GPTScorer(client, model, build_messages, prompt_version, cache=GPTScoreCache(path))
+    scores = scorer.score(transcripts)   # lista float / None
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+CHARS_PER_TOKEN = 4  # zgrubne oszacowanie tokenów promptu
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def transcript_key(prompt_version: str, transcript: str) -> str:
+    return f"{prompt_version}:{hashlib.sha1(transcript.encode('utf-8')).hexdigest()[:16]}"
+
+
+class TokenBucket:
+    """
+    Kubełek żetonów (thread-safe): `rate_per_minute` uzupełniania, pojemność = minuta.
+    Z `cancelled` oczekiwanie to cancelled.wait() - ustawienie zdarzenia przerywa
+    acquire() wyjątkiem InterruptedError.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: Optional[float] = None,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        cancelled: Optional[threading.Event] = None
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._cancelled = cancelled
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Pobierz `amount` żetonów (czeka, jeśli brak). Zwraca czas oczekiwania [s]"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            self._wait(delay)
+            waited += delay
+
+    def _wait(self, delay: float) -> None:
+        if self._cancelled is None:
+            self._sleep(delay)
+        elif self._cancelled.wait(delay):
+            raise InterruptedError("Oczekiwanie na żeton przerwane")
+
+
+class GPTScoreCache:
+    """Wyniki per segment w JSONL (dopisywanie; odczyt raz przy starcie)"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._scores: Optional[Dict[str, float]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, float]:
+        if self._scores is None:
+            self._scores = {}
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # przerwany zapis
+                        self._scores[record['key']] = float(record['score'])
+        return self._scores
+
+    def get(self, key: str) -> Optional[float]:
+        return self._load().get(key)
+
+    def put_many(self, scores: Dict[str, float]) -> None:
+        if not scores:
+            return
+        with self._lock:
+            self._load().update(scores)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps({'key': k, 'score': v}) + "\n" for k, v in scores.items()))
+
+
+class GPTScorer:
+    """Współbieżny scoring batchy transkryptów przez chat.completions"""
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        build_messages: Callable[[List[str]], List[Dict]],
+        prompt_version: str,
+        cache: Optional[GPTScoreCache] = None,
+        batch_size: int = 10,
+        max_in_flight: int = 8,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200000,
+        max_retries: int = 5,
+        max_tokens: int = 200,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0
+    ):
+        self.client = client
+        self.model = model
+        self.build_messages = build_messages
+        self.prompt_version = prompt_version
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.max_tokens = max_tokens
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._cancelled = threading.Event()
+        self._requests = TokenBucket(requests_per_minute, cancelled=self._cancelled)
+        self._tokens = TokenBucket(tokens_per_minute, cancelled=self._cancelled)
+        self._stats_lock = threading.Lock()
+
+        self.stats = {'requests': 0, 'retries': 0, 'cached': 0, 'failed_batches': 0}
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    # === Pojedyncze zapytanie ===
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)  # jitter
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        import openai
+
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRY_STATUS or error.status_code >= 500
+        return False
+
+    def _request(self, transcripts: List[str]) -> List[Optional[float]]:
+        messages = self.build_messages(transcripts)
+        prompt_chars = sum(len(m['content']) for m in messages)
+
+        for attempt in range(self.max_retries + 1):
+            if self._cancelled.is_set():
+                raise InterruptedError("GPT scoring anulowany")
+
+            self._requests.acquire(1)
+            self._tokens.acquire(prompt_chars / CHARS_PER_TOKEN + self.max_tokens)
+            try:
+                self._count('requests')
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    max_tokens=self.max_tokens,
+                    temperature=0.3
+                )
+            except Exception as error:
+                if attempt >= self.max_retries or not self._is_retryable(error):
+                    raise
+                self._count('retries')
+                if self._cancelled.wait(self._retry_delay(attempt, error)):
+                    raise InterruptedError("GPT scoring anulowany")
+                continue
+
+            scores = json.loads(response.choices[0].message.content).get('scores', [])
+            # Brakujące pozycje w odpowiedzi → None (0.5 w Stage 5, bez zapisu w cache)
+            return [
+                float(min(max(float(scores[i]), 0.0), 1.0)) if i < len(scores) else None
+                for i in range(len(transcripts))
+            ]
+
+    # === Cały zbiór ===
+
+    def score(
+        self,
+        transcripts: Sequence[str],
+        progress_callback: Optional[Callable[[float, str], None]] = None
+    ) -> List[Optional[float]]:
+        """
+        Score każdego transkryptu (kolejność wejścia).
+        Cache jest sprawdzany per transkrypt; do API trafiają tylko braki
+        (zdeduplikowane). None = batch nieudany po wszystkich próbach
+        albo brak pozycji w odpowiedzi modelu.
+        """
+        keys = [transcript_key(self.prompt_version, t) for t in transcripts]
+        results: Dict[str, Optional[float]] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, transcripts):
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                results[key] = cached
+                self.stats['cached'] += 1
+            elif key not in results:
+                missing.setdefault(key, text)
+
+        pending = list(missing.items())
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        if batches:
+            print(f"   🤖 GPT: {len(pending)} transkryptów w {len(batches)} batchach "
+                  f"(do {self.max_in_flight} naraz, {self.stats['cached']} z cache)")
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            futures = {
+                executor.submit(self._request, [text for _, text in batch]): batch
+                for batch in batches
+            }
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    batch = futures[future]
+                    try:
+                        scores = future.result()
+                    except InterruptedError:
+                        raise
+                    except Exception as e:
+                        self.stats['failed_batches'] += 1
+                        print(f"   ⚠️ GPT batch ({len(batch)} segmentów) nieudany: {e}")
+                        scores = [None] * len(batch)
+
+                    fresh = {}
+                    for (key, _), value in zip(batch, scores):
+                        results[key] = value
+                        if value is not None:
+                            fresh[key] = value
+                    if self.cache is not None:
+                        self.cache.put_many(fresh)
+
+                    if progress_callback:
+                        progress_callback(done / len(batches), f"GPT eval batch {done}/{len(batches)}")
+            except BaseException:
+                self.cancel()
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return [results.get(key) for key in keys]
@@ -0,0 +1,252 @@
+"""
+Interval DP
+Selekcja klipów jako ważone planowanie przedziałów z budżetem czasu.
+
+Stage 6 (silnik greedy) buduje listę klipów kilkoma heurystykami po kolei
+(NMS, merge, coverage, trim, top-up). Silnik DP rozwiązuje zadanie wprost:
+
+    max Σ final_score  przy:  Σ duration ≤ budżet,
+                              klipy nie nachodzą na siebie i mają odstęp ≥ min_gap,
+                              ≤ max_per_bin klipów w każdej fazie materiału,
+                              ≤ max_clips klipów łącznie
+
+DP po kandydatach posortowanych po końcu (t1), z wymiarem budżetu
+zdyskretyzowanym do `step` sekund (długość klipu zaokrąglana w górę -
+wynik zawsze mieści się w budżecie):
+
+    best[i][b] = max(best[i-1][b], best[p(i)][b - d_i] + w_i)
+
+gdzie p(i) to ostatni kandydat (po t1) zgodny z i (warunek kolizji jak
+w `_has_overlap`). Jeden wiersz = jedna operacja wektorowa NumPy; rozmiar
+tablicy jest ograniczony (`max_cells` - przy wielu kandydatach krok budżetu
+rośnie), więc czas jest przewidywalny także dla 10k kandydatów.
+
+Limity liczby klipów (per faza i łącznie) są obsługiwane mnożnikami
+Lagrange'a: każdy klip płaci karę λ swojej fazy + λ globalną, a mnożniki
+są poprawiane subgradientem (krok Polyaka) przez kilka iteracji. Rozwiązanie naruszające
+limity jest naprawiane (usunięcie najsłabszych klipów w przepełnionych
+fazach i zachłanne dopełnienie budżetu). Wartość dualna dotyczy zadania
+z długościami zaokrąglonymi w górę, więc nie ogranicza optimum z dokładnymi
+długościami. `upper_bound` liczy się raz na końcu, z najlepszymi mnożnikami,
+w relaksacji z długościami zaokrąglonymi w dół: Σ⌊d/step⌋ ≤ ⌊budżet/step⌋
+dla każdego wyboru mieszczącego się w budżecie. `optimal` = wynik osiąga to
+ograniczenie. Bez aktywnych limitów i z długościami będącymi wielokrotnością
+kroku wynik pierwszej iteracji jest dokładnym optimum.
+"""
+
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+import numpy as np
+
+from .interval_set import IntervalSet, conflicts_with
+
+MAX_CELLS = 12_000_000  # kandydaci × kroki budżetu (~60 MB: float32 + maska wyboru)
+
+
+@dataclass
+class DPSelection:
+    """Wynik selekcji DP (indeksy wejściowe, rosnąco po czasie)"""
+    indices: List[int]
+    score: float
+    upper_bound: float
+    step: float
+    iterations: int
+    optimal: bool = False
+    bin_counts: List[int] = field(default_factory=list)
+
+
+def compatible_predecessors(t0s: Sequence[float], t1s: Sequence[float], min_gap: float) -> np.ndarray:
+    """
+    Dla kandydatów posortowanych po t1: p[i] = ostatni j < i zgodny z i (-1 = brak).
+    Zgodność jest monotoniczna w t1 - wszystkie j ≤ p[i] też są zgodne.
+    """
+    n = len(t0s)
+    ends = list(t1s)
+    p = np.full(n, -1, dtype=np.int64)
+    for i in range(n):
+        j = min(bisect_right(ends, t0s[i] - max(min_gap, 0.0)), i) - 1
+        while j + 1 < i and not conflicts_with(t0s[i], t1s[i], t0s[j + 1], t1s[j + 1], min_gap):
+            j += 1
+        while j >= 0 and conflicts_with(t0s[i], t1s[i], t0s[j], t1s[j], min_gap):
+            j -= 1
+        p[i] = j
+    return p
+
+
+def _solve(weights: np.ndarray, units: np.ndarray, pred: np.ndarray, budget: int):
+    """Plecak na przedziałach: (wartość, wybrane indeksy w kolejności t1)"""
+    n = len(weights)
+    values = np.zeros((n + 1, budget + 1), dtype=np.float32)
+    take = np.zeros((n, budget + 1), dtype=bool)
+
+    for i in range(n):
+        row = values[i + 1]
+        row[:] = values[i]
+        w, d = weights[i], units[i]
+        if w <= 0 or d > budget:
+            continue
+        candidate = values[pred[i] + 1, :budget + 1 - d] + w
+        better = candidate > row[d:]
+        take[i, d:] = better
+        np.maximum(row[d:], candidate, out=row[d:])
+
+    chosen = []
+    i, b = n - 1, budget
+    while i >= 0:
+        if take[i, b]:
+            chosen.append(i)
+            b -= units[i]
+            i = pred[i]
+        else:
+            i -= 1
+    chosen.reverse()
+    return float(values[n, budget]), chosen
+
+
+def select_budgeted(
+    t0s: Sequence[float],
+    t1s: Sequence[float],
+    scores: Sequence[float],
+    bins: Sequence[int],
+    budget_seconds: float,
+    min_gap: float,
+    max_per_bin: int,
+    max_clips: int,
+    step: float = 1.0,
+    max_cells: int = MAX_CELLS,
+    iterations: int = 20
+) -> DPSelection:
+    """
+    Selekcja kandydatów (t0s/t1s/scores/bins - równoległe listy).
+
+    Returns:
+        DPSelection z indeksami wejściowymi, łącznym score i górnym ograniczeniem
+    """
+    n = len(t0s)
+    if n == 0 or budget_seconds <= 0:
+        return DPSelection([], 0.0, 0.0, step, 0, optimal=True)
+
+    # Krok budżetu: co najmniej `step`, tak by tablica zmieściła się w max_cells
+    step = max(step, n * budget_seconds / max_cells)
+    budget = int(budget_seconds // step)
+
+    order = sorted(range(n), key=lambda k: (t1s[k], t0s[k]))
+    s_t0 = [float(t0s[k]) for k in order]
+    s_t1 = [float(t1s[k]) for k in order]
+    s_scores = np.array([float(scores[k]) for k in order], dtype=np.float64)
+    s_bins = np.array([int(bins[k]) for k in order], dtype=np.int64)
+    units = np.array([max(1, math.ceil((b - a) / step - 1e-9)) for a, b in zip(s_t0, s_t1)], dtype=np.int64)
+    floor_units = np.array([math.floor((b - a) / step + 1e-9) for a, b in zip(s_t0, s_t1)], dtype=np.int64)
+    pred = compatible_predecessors(s_t0, s_t1, min_gap)
+
+    num_bins = int(s_bins.max()) + 1
+    lam_bins = np.zeros(num_bins)
+    lam_clips = 0.0
+    theta, stalled = 2.0, 0
+
+    # Punkt startowy: zachłanny wybór po score z wszystkimi limitami
+    best_chosen = _repair([], s_t0, s_t1, s_scores, s_bins, budget_seconds, min_gap, max_per_bin, max_clips)
+    best_score = float(s_scores[best_chosen].sum()) if best_chosen else 0.0
+    # Ograniczenie zadania zdyskretyzowanego (w górę) - kryterium stopu i krok subgradientu
+    discrete_bound = math.inf
+    best_lams = (lam_bins.copy(), lam_clips)
+    iteration = 0
+    for iteration in range(1, max(1, iterations) + 1):
+        weights = s_scores - lam_bins[s_bins] - lam_clips
+        value, chosen = _solve(weights, units, pred, budget)
+        dual = value + lam_clips * max_clips + float(lam_bins.sum()) * max_per_bin
+        if dual < discrete_bound - 1e-9:
+            discrete_bound, stalled = dual, 0
+            best_lams = (lam_bins.copy(), lam_clips)
+        else:
+            stalled += 1
+
+        counts = np.bincount(s_bins[chosen], minlength=num_bins) if chosen else np.zeros(num_bins, dtype=np.int64)
+        feasible = bool(np.all(counts <= max_per_bin)) and len(chosen) <= max_clips
+        repaired = chosen if feasible else _repair(
+            chosen, s_t0, s_t1, s_scores, s_bins, budget_seconds, min_gap, max_per_bin, max_clips
+        )
+        score = float(s_scores[repaired].sum()) if repaired else 0.0
+        if score > best_score:
+            best_score, best_chosen = score, repaired
+
+        if discrete_bound - best_score <= 1e-4 * max(1.0, best_score):  # wartości DP w float32
+            break
+
+        # Subgradient (krok Polyaka): kara rośnie dla przepełnionych limitów,
+        # maleje dla luźnych; theta maleje, gdy ograniczenie przestaje się poprawiać
+        if stalled >= 2:
+            theta, stalled = theta / 2, 0
+        grad_bins = (counts - max_per_bin).astype(np.float64)
+        grad_clips = float(len(chosen) - max_clips)
+        norm = float(np.sum(np.where((lam_bins > 0) | (grad_bins > 0), grad_bins, 0.0) ** 2))
+        norm += grad_clips ** 2 if (lam_clips > 0 or grad_clips > 0) else 0.0
+        if norm == 0:
+            break
+        rate = theta * (dual - best_score) / norm
+        lam_bins = np.maximum(0.0, lam_bins + rate * grad_bins)
+        lam_clips = max(0.0, lam_clips + rate * grad_clips)
+
+    # Górne ograniczenie: dual relaksacji z długościami w dół (ważny dla każdych λ ≥ 0)
+    if np.array_equal(floor_units, units):
+        upper_bound = discrete_bound
+    else:
+        lam_b, lam_c = best_lams
+        relaxed, _ = _solve(s_scores - lam_b[s_bins] - lam_c, floor_units, pred, budget)
+        upper_bound = relaxed + lam_c * max_clips + float(lam_b.sum()) * max_per_bin
+    upper_bound = max(upper_bound, best_score)  # zaokrąglenia float32 w DP
+    optimal = upper_bound - best_score <= 1e-4 * max(1.0, best_score)
+    indices = sorted((order[k] for k in best_chosen), key=lambda k: t0s[k])
+    bin_counts = np.bincount(s_bins[best_chosen], minlength=num_bins).tolist() if best_chosen else [0] * num_bins
+    return DPSelection(indices, best_score, float(upper_bound), step, iteration, optimal, bin_counts)
+
+
+def _repair(
+    chosen: List[int],
+    t0s: List[float],
+    t1s: List[float],
+    scores: np.ndarray,
+    bins: np.ndarray,
+    budget_seconds: float,
+    min_gap: float,
+    max_per_bin: int,
+    max_clips: int
+) -> List[int]:
+    """
+    Usuń najsłabsze klipy z przepełnionych faz (potem ponad max_clips),
+    a zwolnione miejsce dopełnij zachłannie najlepszymi zgodnymi kandydatami.
+    """
+    by_bin = {}
+    for k in chosen:
+        by_bin.setdefault(int(bins[k]), []).append(k)
+    kept = []
+    for members in by_bin.values():
+        members.sort(key=lambda k: scores[k], reverse=True)
+        kept.extend(members[:max_per_bin])
+    kept.sort(key=lambda k: scores[k], reverse=True)
+    kept = kept[:max_clips]
+
+    selected = IntervalSet(min_gap)
+    counts = defaultdict(int)
+    for k in kept:
+        selected.add(t0s[k], t1s[k], k)
+        counts[int(bins[k])] += 1
+    for k in np.argsort(-scores, kind='stable'):
+        if len(selected) >= max_clips:
+            break
+        b = int(bins[k])
+        if scores[k] <= 0 or counts[b] >= max_per_bin:
+            continue
+        if selected.total_duration + (t1s[k] - t0s[k]) > budget_seconds:
+            continue
+        if selected.conflicts(t0s[k], t1s[k]):  # wybrane klipy też kolidują same ze sobą
+            continue
+        selected.add(t0s[k], t1s[k], int(k))
+        counts[b] += 1
+    return sorted(selected)
@@ -0,0 +1,79 @@
+"""
+Interval Set
+Posortowany zbiór rozłącznych przedziałów czasu (bisect) dla NMS w Stage 6.
+
+Greedy NMS sprawdzał każdego kandydata ze wszystkimi wybranymi klipami
+(`_has_overlap` - pętla po liście) i za każdym razem sumował ich długości
+od zera. IntervalSet trzyma wybrane przedziały posortowane po t0 i liczy
+sumę długości na bieżąco.
+
+Przedziały w zbiorze nie kolidują ze sobą (add() dostaje tylko kandydatów,
+którzy przeszli conflicts()), więc są też posortowane po t1. Jeśli kandydat
+koliduje z jakimkolwiek przedziałem, to koliduje z jednym z dwóch sąsiadów
+(ostatni o t0 < t0 kandydata i pierwszy o t0 ≥ t0 kandydata) - wystarczą
+dwa porównania tym samym warunkiem co w `_has_overlap`, więc wynik selekcji
+jest identyczny.
+
+    chosen = IntervalSet(min_gap=10.0)
+    if not chosen.conflicts(t0, t1):
+        chosen.add(t0, t1, clip)
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+def conflicts_with(c0: float, c1: float, s0: float, s1: float, min_gap: float) -> bool:
+    """Warunek z SelectionStage._has_overlap: overlap albo odstęp < min_gap"""
+    if not (c1 < s0 or c0 > s1):
+        return True
+    if s0 - c1 < min_gap and s0 > c1:
+        return True
+    if c0 - s1 < min_gap and c0 > s1:
+        return True
+    return False
+
+
+class IntervalSet:
+    """Rozłączne przedziały posortowane po t0 + bieżąca suma długości"""
+
+    def __init__(self, min_gap: float = 0.0):
+        self.min_gap = min_gap
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        self._items: List[Any] = []
+        self.total_duration = 0.0
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[Any]:
+        """Elementy w kolejności czasu"""
+        return iter(self._items)
+
+    def neighbors(self, t0: float) -> Tuple[Optional[int], Optional[int]]:
+        """Indeksy: ostatni przedział o starcie < t0 i pierwszy o starcie ≥ t0"""
+        idx = bisect_left(self._starts, t0)
+        left = idx - 1 if idx > 0 else None
+        right = idx if idx < len(self._starts) else None
+        return left, right
+
+    def conflicts(self, t0: float, t1: float) -> bool:
+        """Czy [t0, t1] nachodzi na któryś przedział lub jest bliżej niż min_gap"""
+        for idx in self.neighbors(t0):
+            if idx is not None and conflicts_with(t0, t1, self._starts[idx], self._ends[idx], self.min_gap):
+                return True
+        return False
+
+    def add(self, t0: float, t1: float, item: Any = None, duration: Optional[float] = None) -> None:
+        """
+        Wstaw przedział (bisect). Wywołujący gwarantuje brak kolizji (conflicts() == False).
+        duration: doliczana do total_duration (domyślnie t1 - t0)
+        """
+        idx = bisect_left(self._starts, t0)
+        self._starts.insert(idx, t0)
+        self._ends.insert(idx, t1)
+        self._items.insert(idx, item)
+        self.total_duration += (t1 - t0) if duration is None else duration
@@ -0,0 +1,417 @@
+"""
+Pipeline Job Queue
+Kolejka wielu nagrań z kontrolą dopuszczania (admission control).
+
+Zamiast globalnego single-flight (jedno uruchomienie na proces) kilka nagrań
+przechodzi równolegle przez różne etapy pipeline'u. Współbieżność ograniczają:
+- max_concurrent_jobs: ile nagrań jest jednocześnie w pipeline,
+- ResourceBudget: sloty ffmpeg, instancje modelu ASR, budżet RAM - współdzielone
+  przez wszystkie joby i rezerwowane przez StageScheduler per etap.
+
+Identyczne inputy są deduplikowane: ponowny submit nagrania, które jest już
+w kolejce lub w trakcie, zwraca istniejący job.
+
+API:
+    queue = PipelineJobQueue(config)
+    job = queue.submit("sejm_2025_01_12.mp4")
+    queue.list_jobs(); queue.cancel(job.job_id); queue.wait()
+
+CLI (kolejka w katalogu config.queue.spool_dir):
+    python -m pipeline.job_queue serve [--config config.yml]
+    python -m pipeline.job_queue submit nagranie1.mp4 nagranie2.mp4
+    python -m pipeline.job_queue list
+    python -m pipeline.job_queue cancel <job_id>
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import Config
+from .fingerprint import prefetch_fingerprint
+from .stage_graph import ResourceBudget
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_FAILED = "FAILED"
+JOB_CANCELLED = "CANCELLED"
+
+ACTIVE_STATES = {JOB_QUEUED, JOB_RUNNING}
+
+
+@dataclass
+class PipelineJob:
+    """Pojedyncze nagranie w kolejce"""
+    input_file: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    input_key: str = ""
+    status: str = JOB_QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    run_id: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Stan joba do JSON (bez pełnego wyniku pipeline'u)"""
+        outputs = []
+        if self.result:
+            outputs = [r.get('output_file') for r in self.result.get('export_results', []) if r]
+        return {
+            'job_id': self.job_id,
+            'input_file': self.input_file,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'run_id': self.run_id,
+            'error': self.error,
+            'outputs': outputs,
+        }
+
+
+ProcessorFactory = Callable[[Config, ResourceBudget], Any]
+
+
+def _default_processor_factory(config: Config, resource_budget: ResourceBudget):
+    from .processor import PipelineProcessor
+    return PipelineProcessor(config, resource_budget=resource_budget)
+
+
+class PipelineJobQueue:
+    """
+    Kolejka jobów pipeline'u z pulą workerów i wspólnym budżetem zasobów.
+
+    Każdy job dostaje własną kopię Config (HighlightPacker modyfikuje
+    config.selection w trakcie uruchomienia) i własny PipelineProcessor.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        max_concurrent_jobs: Optional[int] = None,
+        resource_budget: Optional[ResourceBudget] = None,
+        processor_factory: Optional[ProcessorFactory] = None,
+        state_file: Optional[Path] = None,
+    ):
+        self.config = config
+        self.max_concurrent_jobs = max(1, int(max_concurrent_jobs or config.queue.max_concurrent_jobs))
+        self.resource_budget = resource_budget or ResourceBudget.from_config(config.queue)
+        self.processor_factory = processor_factory or _default_processor_factory
+        self.state_file = Path(state_file) if state_file else None
+        self.callbacks: List[Callable[[str, PipelineJob], None]] = []
+
+        self._jobs: Dict[str, PipelineJob] = {}
+        self._processors: Dict[str, Any] = {}
+        self._cancel_requested: set = set()
+        self._pending: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+
+    # === API ===
+
+    def add_callback(self, cb: Callable[[str, PipelineJob], None]):
+        self.callbacks.append(cb)
+
+    def submit(self, input_file: str, job_id: Optional[str] = None) -> PipelineJob:
+        """
+        Dodaj nagranie do kolejki.
+
+        Returns:
+            Nowy job, albo istniejący aktywny job z tym samym inputem (deduplikacja)
+        """
+        from .processor import PipelineProcessor
+
+        input_key = PipelineProcessor.input_key(input_file)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.is_active and job.input_key == input_key:
+                    logger.info("Duplicate submit for %s -> job %s", input_file, job.job_id)
+                    return job
+
+            job = PipelineJob(input_file=str(input_file), input_key=input_key)
+            if job_id:
+                job.job_id = job_id
+            self._jobs[job.job_id] = job
+
+        logger.info("Enqueue pipeline job %s: %s", job.job_id, input_file)
+        self._prefetch_input_hash(job.input_file)
+        self._pending.put(job.job_id)
+        self._ensure_workers()
+        self._notify("job_queued", job)
+        return job
+
+    def _prefetch_input_hash(self, input_file: str):
+        """Odcisk inputu (klucz cache) liczony w tle, zanim job dostanie slot"""
+        cache_cfg = self.config.cache
+        if not cache_cfg.enabled or not Path(input_file).exists():
+            return
+        prefetch_fingerprint(
+            input_file,
+            mode=cache_cfg.hash_mode,
+            samples=cache_cfg.hash_samples,
+            workers=cache_cfg.hash_workers,
+            fallback_dir=Path(cache_cfg.cache_dir)
+        )
+
+    def list_jobs(self) -> List[PipelineJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id: str) -> Optional[PipelineJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Anuluj job: zakolejkowany - nie wystartuje; działający - PipelineProcessor.cancel()
+        (przerwanie na najbliższej granicy etapu lub w trakcie ffmpeg/ASR, jeśli etap to wspiera).
+
+        Returns:
+            True jeśli job był aktywny
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.is_active:
+                return False
+
+            if job.status == JOB_QUEUED:
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+                self._changed.notify_all()
+            else:
+                self._cancel_requested.add(job_id)
+            processor = self._processors.get(job_id)
+
+        if processor is not None:
+            processor.cancel()
+        self._notify("job_cancel_requested", job)
+        return True
+
+    def wait(self, job_ids: Optional[List[str]] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Czekaj aż wskazane (domyślnie wszystkie) joby się zakończą.
+
+        Returns:
+            False jeśli minął timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._changed:
+            while True:
+                jobs = [self._jobs[j] for j in job_ids] if job_ids else list(self._jobs.values())
+                if not any(job.is_active for job in jobs):
+                    return True
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(timeout=remaining)
+
+    def shutdown(self, cancel_running: bool = False):
+        """Zatrzymaj workery (opcjonalnie anulując aktywne joby)"""
+        if cancel_running:
+            for job in self.list_jobs():
+                if job.is_active:
+                    self.cancel(job.job_id)
+        for _ in self._workers:
+            self._pending.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    # === Workers ===
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            while len(self._workers) < self.max_concurrent_jobs:
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"pipeline-job-{len(self._workers)}",
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._pending.get()
+            if job_id is None:
+                return
+            self._run_job(job_id)
+
+    def _run_job(self, job_id: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job.status != JOB_QUEUED:
+                return  # Anulowany przed startem
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+
+        # Własna kopia configu - packer zmienia config.selection w trakcie uruchomienia
+        processor = self.processor_factory(copy.deepcopy(self.config), self.resource_budget)
+        with self._lock:
+            self._processors[job_id] = processor
+            cancel_requested = job_id in self._cancel_requested
+        if cancel_requested:
+            processor.cancel()
+        self._notify("job_started", job)
+
+        try:
+            result = processor.process(job.input_file)
+            status, error = JOB_DONE, None
+        except InterruptedError:
+            result, status, error = None, JOB_CANCELLED, None
+        except Exception as e:
+            logger.exception("Pipeline job %s failed", job_id)
+            result, status, error = None, JOB_FAILED, str(e)
+
+        with self._lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.run_id = getattr(processor, 'run_id', None)
+            job.finished_at = time.time()
+            self._processors.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+            self._changed.notify_all()
+        self._notify("job_finished", job)
+
+    def _notify(self, event: str, job: PipelineJob):
+        self._save_state()
+        for cb in self.callbacks:
+            try:
+                cb(event, job)
+            except Exception:
+                logger.exception("Job queue callback failed")
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        with self._lock:
+            data = [job.to_dict() for job in self._jobs.values()]
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.state_file)
+
+
+# === CLI (kolejka w katalogu spool: incoming/, cancel/, jobs.json) ===
+
+def _spool_paths(spool_dir: Path) -> Dict[str, Path]:
+    return {
+        'incoming': spool_dir / "incoming",
+        'cancel': spool_dir / "cancel",
+        'state': spool_dir / "jobs.json",
+    }
+
+
+def serve(config: Config, spool_dir: Path, poll_seconds: float = 1.0):
+    """Uruchom kolejkę i obsługuj zlecenia z katalogu spool aż do Ctrl+C"""
+    paths = _spool_paths(spool_dir)
+    for key in ('incoming', 'cancel'):
+        paths[key].mkdir(parents=True, exist_ok=True)
+
+    job_queue = PipelineJobQueue(config, state_file=paths['state'])
+    job_queue.add_callback(lambda event, job: print(f"📋 [{job.job_id}] {event}: {job.status} {job.input_file}"))
+    job_queue._save_state()
+
+    print(f"🚀 Job queue: {job_queue.max_concurrent_jobs} równoległych jobów, "
+          f"budżet {job_queue.resource_budget.capacities} (spool: {spool_dir})")
+
+    try:
+        while True:
+            for request_file in sorted(paths['incoming'].glob("*.json")):
+                try:
+                    request = json.loads(request_file.read_text(encoding='utf-8'))
+                    job_queue.submit(request['input_file'], job_id=request.get('job_id'))
+                except Exception as e:
+                    print(f"⚠️ Błędne zlecenie {request_file.name}: {e}")
+                request_file.unlink(missing_ok=True)
+
+            for cancel_file in paths['cancel'].iterdir():
+                job_queue.cancel(cancel_file.name)
+                cancel_file.unlink(missing_ok=True)
+
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("\n🛑 Zatrzymywanie kolejki - anulowanie aktywnych jobów...")
+        job_queue.shutdown(cancel_running=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Kolejka wielu nagrań dla pipeline'u highlightów")
+    parser.add_argument("--config", default="config.yml", help="Ścieżka do config.yml")
+    parser.add_argument("--spool-dir", default=None, help="Katalog kolejki (domyślnie config.queue.spool_dir)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("serve", help="Uruchom workery kolejki")
+    submit_parser = sub.add_parser("submit", help="Dodaj nagrania do kolejki")
+    submit_parser.add_argument("inputs", nargs="+")
+    sub.add_parser("list", help="Pokaż joby")
+    cancel_parser = sub.add_parser("cancel", help="Anuluj job")
+    cancel_parser.add_argument("job_ids", nargs="+")
+
+    args = parser.parse_args(argv)
+
+    config = Config.load_from_yaml(args.config) if Path(args.config).exists() else Config()
+    spool_dir = Path(args.spool_dir or config.queue.spool_dir)
+    paths = _spool_paths(spool_dir)
+
+    if args.command == "serve":
+        serve(config, spool_dir)
+        return 0
+
+    if args.command == "submit":
+        paths['incoming'].mkdir(parents=True, exist_ok=True)
+        for input_file in args.inputs:
+            if not Path(input_file).exists():
+                print(f"❌ Plik nie istnieje: {input_file}")
+                return 1
+            job_id = uuid.uuid4().hex[:12]
+            request = {'job_id': job_id, 'input_file': str(Path(input_file).resolve())}
+            (paths['incoming'] / f"{job_id}.json").write_text(json.dumps(request), encoding='utf-8')
+            print(f"✅ {job_id}  {input_file}")
+        return 0
+
+    if args.command == "list":
+        if not paths['state'].exists():
+            print("Brak jobów (czy `serve` działa?)")
+            return 0
+        for job in json.loads(paths['state'].read_text(encoding='utf-8')):
+            error = f"  ({job['error']})" if job.get('error') else ""
+            print(f"{job['job_id']}  {job['status']:<9}  {job['input_file']}{error}")
+        return 0
+
+    if args.command == "cancel":
+        paths['cancel'].mkdir(parents=True, exist_ok=True)
+        for job_id in args.job_ids:
+            (paths['cancel'] / job_id).touch()
+            print(f"🛑 Anulowanie zlecone: {job_id}")
+        return 0
+
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
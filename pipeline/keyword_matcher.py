@@ -0,0 +1,177 @@
+"""
+Keyword Matcher
+Dopasowanie całego leksykonu keywords.csv jednym przejściem po transkrypcie.
+
+Dotąd Stage 4 sprawdzał każde słowo kluczowe osobno (`token in transcript`):
+koszt rósł liniowo z rozmiarem leksykonu, a dopasowania trafiały wewnątrz
+innych słów ("rząd" w "porządek", "dług" w "długopis") i w przyimkach
+(skrót "PO" po zamianie na małe litery pasował do każdego "po").
+
+KeywordMatcher buduje raz trie po słowach (frazy wielowyrazowe to ścieżki)
+i idzie po słowach transkryptu: z każdej pozycji startowej schodzi w trie
+tak długo, jak kolejne słowa pasują (jak Aho–Corasick na poziomie słów -
+wszystkie, także nachodzące na siebie dopasowania). Przejście ze słowa to
+kilka lookupów w dict, więc koszt na segment nie zależy od liczby keywords.
+
+Dopasowanie słowa:
+- akronimy (≥2 wielkie litery, np. PiS, NFZ, PO) - z rozróżnieniem wielkości
+  liter, także z końcówką po myślniku (PiS-u, NFZ-etu),
+- słowa z liter (≥4 znaki) - po temacie: keyword bez polskiej końcówki
+  fleksyjnej + do MAX_SUFFIX liter (Kaczyński → Kaczyńskiego, afera → aferze,
+  korupcja → korupcji),
+- pozostałe (krótkie, liczby, "500+") - dokładnie.
+
+    matcher = KeywordMatcher.from_csv("models/keywords.csv")
+    matches = matcher.find(transcript)   # KeywordMatch(token, start, end)
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+# Słowo transkryptu: litery/cyfry, człony po myślniku, opcjonalny '+' (500+)
+WORD_PATTERN = re.compile(r"\w+(?:-\w+)*\+?")
+
+MIN_STEM = 4  # minimalna długość tematu (krótsze keywords - dopasowanie dokładne)
+MAX_SUFFIX = 4  # maksymalna długość końcówki za tematem
+
+# Końcówki fleksyjne zdejmowane z keyword przy budowie tematu (najdłuższe najpierw)
+POLISH_ENDINGS = (
+    'ami', 'ach', 'ego', 'emu', 'ich', 'ych', 'imi', 'ymi', 'owi',
+    'ie', 'ia', 'ii', 'ią', 'ej', 'ów', 'om', 'em',
+    'a', 'e', 'i', 'o', 'u', 'y', 'ą', 'ę',
+)
+
+
+def polish_stem(word: str) -> str:
+    """Temat słowa: bez najdłuższej końcówki, po której zostaje ≥ MIN_STEM znaków"""
+    for ending in POLISH_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def is_acronym(word: str) -> bool:
+    return sum(ch.isupper() for ch in word) >= 2 and word.isalpha()
+
+
+class KeywordMatch(NamedTuple):
+    token: str  # keyword (jak w keywords_db - małe litery)
+    start: int  # pozycja znaku w transkrypcie
+    end: int
+
+
+@dataclass
+class _Node:
+    exact: Dict[str, '_Node']
+    stems: Dict[str, '_Node']
+    acronyms: Dict[str, '_Node']
+    tokens: List[str]
+
+    @classmethod
+    def empty(cls) -> '_Node':
+        return cls({}, {}, {}, [])
+
+
+class KeywordMatcher:
+    """Trie słów kluczowych (po słowach) z dopasowaniem fleksji i akronimów"""
+
+    def __init__(self, inflection: bool = True):
+        self.inflection = inflection
+        self._root = _Node.empty()
+        self._size = 0
+
+    @classmethod
+    def from_csv(cls, path: Union[str, Path], inflection: bool = True) -> 'KeywordMatcher':
+        """Z pliku keywords.csv (token,weight,category; linie '#' pomijane)"""
+        matcher = cls(inflection=inflection)
+        with open(path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row['token'].startswith('#'):
+                    continue
+                matcher.add(row['token'])
+        return matcher
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, keyword: str, token: Optional[str] = None) -> None:
+        """
+        Dodaj keyword (pisownia oryginalna - wielkość liter rozpoznaje akronimy).
+        token: nazwa zwracana w dopasowaniach (domyślnie keyword małymi literami)
+        """
+        token = token or keyword.lower().strip()
+        words = WORD_PATTERN.findall(keyword.strip())
+        if not words:
+            return
+
+        node = self._root
+        for word in words:
+            if is_acronym(word):
+                edges, key = node.acronyms, word
+            elif self.inflection and word.isalpha() and len(word) >= MIN_STEM:
+                edges, key = node.stems, polish_stem(word.lower())
+            else:
+                edges, key = node.exact, word.lower()
+            node = edges.setdefault(key, _Node.empty())
+
+        if token not in node.tokens:
+            node.tokens.append(token)
+            self._size += 1
+
+    def _step(self, node: _Node, word: str, lower: str) -> List[_Node]:
+        """Węzły osiągalne z `node` po słowie transkryptu"""
+        nodes = []
+        child = node.exact.get(lower)
+        if child is not None:
+            nodes.append(child)
+
+        if node.acronyms:
+            child = node.acronyms.get(word) or node.acronyms.get(word.split('-', 1)[0])
+            if child is not None:
+                nodes.append(child)
+
+        if node.stems and lower.isalpha():
+            for k in range(max(MIN_STEM, len(lower) - MAX_SUFFIX), len(lower) + 1):
+                child = node.stems.get(lower[:k])
+                if child is not None:
+                    nodes.append(child)
+        return nodes
+
+    def find(self, text: str) -> List[KeywordMatch]:
+        """Wszystkie dopasowania (także nachodzące na siebie), posortowane po pozycji"""
+        words = [(m.group(), m.start(), m.end()) for m in WORD_PATTERN.finditer(text)]
+        lowered = [w.lower() for w, _, _ in words]
+        matches: List[KeywordMatch] = []
+
+        # Pierwsze słowo frazy: krok z korzenia zapamiętany per słowo (słowa się powtarzają)
+        root_steps: Dict[str, List[_Node]] = {}
+
+        for i, (word, start, _) in enumerate(words):
+            frontier = root_steps.get(word)
+            if frontier is None:
+                frontier = root_steps[word] = self._step(self._root, word, lowered[i])
+            j = i
+            while frontier:
+                end = words[j][2]
+                for node in frontier:
+                    for token in node.tokens:
+                        matches.append(KeywordMatch(token, start, end))
+                j += 1
+                if j == len(words):
+                    break
+                frontier = [child for node in frontier for child in self._step(node, words[j][0], lowered[j])]
+        return matches
+
+    def positions(self, text: str) -> Dict[str, List[Tuple[int, int]]]:
+        """token → lista (start, end) dopasowań (kolejność pierwszego wystąpienia)"""
+        result: Dict[str, List[Tuple[int, int]]] = {}
+        for match in self.find(text):
+            spans = result.setdefault(match.token, [])
+            if (match.start, match.end) not in spans:
+                spans.append((match.start, match.end))
+        return result
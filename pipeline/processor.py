@@ -14,6 +14,8 @@ from datetime import datetime, timedelta
 
 from .config import Config
 from .cache_manager import CacheManager
+from .audio_store import AudioStore
+from .stage_graph import ResourceBudget, StageGraph, StageScheduler, StageTiming
 from .highlight_packer import HighlightPacker
 from .stage_01_ingest import IngestStage
 from .stage_02_vad import VADStage
@@ -21,6 +23,7 @@ from .stage_03_transcribe import TranscribeStage
 from .stage_04_features import FeaturesStage
 from .stage_05_scoring_gpt import ScoringStage
 from .stage_06_selection import SelectionStage
+from .selection_index import SelectionIndex
 from .stage_07_export import ExportStage
 from .stage_08_thumbnail import ThumbnailStage
 
@@ -31,18 +34,34 @@ class PipelineProcessor:
     """
     Główny processor zarządzający całym pipeline'em
 
-    Implementuje mechanizm "single flight" - tylko jedna instancja może działać jednocześnie.
+    Implementuje mechanizm "single flight" per input - to samo nagranie nie może być
+    przetwarzane dwa razy jednocześnie. Różne nagrania mogą działać równolegle
+    (patrz pipeline/job_queue.py), dzieląc ResourceBudget.
     """
 
     # Class-level lock dla single-flight mechanism (współdzielony między wszystkie instancje)
     _global_lock = threading.Lock()
-    _is_running = False
+    _active_inputs: Dict[str, str] = {}  # input_key -> RUN_ID aktywnego uruchomienia
+    _is_running = False  # True gdy działa jakiekolwiek uruchomienie
     _current_run_id: Optional[str] = None
 
-    def __init__(self, config: Config):
+    # Zapotrzebowanie etapów na zasoby (dla ResourceBudget przy wielu jobach)
+    STAGE_RESOURCES: Dict[str, Dict[str, int]] = {
+        'ingest': {'ffmpeg': 1, 'ram_mb': 1024},
+        'vad': {'ram_mb': 2048},
+        'transcribe': {'asr': 1, 'ram_mb': 6144},
+        'features': {'ram_mb': 4096},
+        'export': {'ffmpeg': 1, 'ram_mb': 2048},
+        'shorts': {'ffmpeg': 1, 'ram_mb': 2048},
+    }
+
+    def __init__(self, config: Config, resource_budget: Optional[ResourceBudget] = None):
         self.config = config
         self.config.validate()
 
+        # Budżet zasobów współdzielony z innymi jobami (None = bez limitów)
+        self.resource_budget = resource_budget
+
         # Progress callback
         self.progress_callback: Optional[Callable] = None
 
@@ -51,19 +70,34 @@ class PipelineProcessor:
 
         # Timing stats
         self.timing_stats = {}
+        self._cached_stages = set()  # Etapy załadowane z cache (timing "0s (cache)")
 
         # RUN_ID dla tej sesji (będzie wygenerowany w process())
         self.run_id: Optional[str] = None
 
+        # Cache Manager (cache dla kosztownych stages: VAD, Transcribe, Features, Scoring + klipy Export)
+        self.cache_manager = CacheManager(
+            cache_dir=config.cache.cache_dir,
+            enabled=config.cache.enabled,
+            force_recompute=config.cache.force_recompute,
+            max_size_gb=config.cache.max_size_gb,
+            segment_format=config.segment_format,
+            hash_mode=config.cache.hash_mode,
+            hash_samples=config.cache.hash_samples,
+            hash_workers=config.cache.hash_workers
+        )
+
         # Initialize stages
         self.stages = {
             'ingest': IngestStage(config),
             'vad': VADStage(config),
-            'transcribe': TranscribeStage(config),
+            'transcribe': TranscribeStage(config, max_workers=self._budget_capacity('asr')),
             'features': FeaturesStage(config),
             'scoring': ScoringStage(config),
             'selection': SelectionStage(config),
-            'export': ExportStage(config)
+            'export': ExportStage(
+                config, cache_manager=self.cache_manager, max_encode_workers=self._budget_capacity('ffmpeg')
+            )
         }
 
         # Initialize thumbnail stage
@@ -78,15 +112,21 @@ class PipelineProcessor:
                 language=config.language
             )
 
-        # Cache Manager (cache dla kosztownych stages: VAD, Transcribe, Scoring)
-        self.cache_manager = CacheManager(
-            cache_dir=config.cache.cache_dir,
-            enabled=config.cache.enabled,
-            force_recompute=config.cache.force_recompute
-        )
-
         self.session_dir: Optional[Path] = None
 
+        # Indeks selekcji ostatniego przebiegu (podgląd w GUI bez ponownego Stage 6)
+        self.selection_index: Optional[SelectionIndex] = None
+
+    @staticmethod
+    def input_key(input_file: str) -> str:
+        """
+        Klucz deduplikacji inputu: znormalizowana ścieżka pliku.
+
+        Używany przez single-flight i PipelineJobQueue - to samo nagranie
+        nie jest przetwarzane dwa razy jednocześnie.
+        """
+        return str(Path(input_file).expanduser().resolve())
+
     @staticmethod
     def _generate_run_id() -> str:
         """
@@ -224,28 +264,35 @@ class PipelineProcessor:
             """
             Główna metoda przetwarzania z mechanizmem single-flight
 
+            Etapy są wykonywane przez StageScheduler wg grafu z _build_stage_graph():
+            etapy niezależne (np. hash cache vs ingest, Shorts vs Export) działają równolegle.
+
             Returns:
                 Dict z wynikami i metadanymi
 
             Raises:
-                RuntimeError: Jeśli pipeline już działa (single-flight violation)
+                RuntimeError: Jeśli ten input już jest przetwarzany (single-flight violation)
             """
-            # === SINGLE-FLIGHT CHECK ===
+            input_key = self.input_key(input_file)
+
+            # === SINGLE-FLIGHT CHECK (per input) ===
             with PipelineProcessor._global_lock:
-                if PipelineProcessor._is_running:
+                active_run_id = PipelineProcessor._active_inputs.get(input_key)
+                if active_run_id is not None:
                     error_msg = (
-                        f"⚠️ PIPELINE ALREADY RUNNING!\n"
-                        f"Current RUN_ID: {PipelineProcessor._current_run_id}\n"
+                        f"⚠️ PIPELINE ALREADY RUNNING FOR THIS INPUT!\n"
+                        f"Current RUN_ID: {active_run_id}\n"
                         f"Ignoring duplicate start request to prevent conflicts."
                     )
                     print(error_msg)
-                    raise RuntimeError("Pipeline already running - duplicate start prevented")
-
-                # Mark jako running
-                PipelineProcessor._is_running = True
+                    raise RuntimeError("Pipeline already running for this input - duplicate start prevented")
 
                 # Generuj unikalny RUN_ID dla tej sesji
                 self.run_id = self._generate_run_id()
+
+                # Mark jako running
+                PipelineProcessor._active_inputs[input_key] = self.run_id
+                PipelineProcessor._is_running = True
                 PipelineProcessor._current_run_id = self.run_id
 
                 print(f"\n{'='*80}")
@@ -264,406 +311,588 @@ class PipelineProcessor:
                 self.session_dir = self._create_session_directory_with_run_id(input_file)
 
                 self._report_progress("Initialize", 0, f"Inicjalizacja... [RUN_ID: {self.run_id}]")
-                
-                # === ETAP 1: Ingest & Preprocessing ===
-                self._check_cancelled()
-                stage_start = time.time()
-                print(f"\n📌 STAGE 1/7 - Ingest [RUN_ID: {self.run_id}]")
-                self._report_progress("Stage 1/7", 5, f"Audio extraction i normalizacja... [RUN_ID: {self.run_id}]")
 
-                ingest_result = self.stages['ingest'].process(
-                    input_file=input_file,
-                    output_dir=self.session_dir
+                # === Wykonanie grafu etapów ===
+                context: Dict[str, Any] = {'input_file': input_file}
+                graph = self._build_stage_graph()
+                scheduler = StageScheduler(
+                    graph,
+                    max_workers=getattr(self.config, 'num_workers', 4),
+                    check_cancelled=self._check_cancelled,
+                    resource_budget=self.resource_budget
                 )
+                self._cached_stages = set()
 
-                source_duration = ingest_result['metadata']['duration']
-                self.timing_stats['ingest'] = self._format_duration(time.time() - stage_start)
-                self._report_progress("Stage 1/7", 14, f"✅ Audio extraction zakończony [RUN_ID: {self.run_id}]")
+                try:
+                    scheduler.run(context)
+                finally:
+                    self._record_stage_timings(graph, scheduler.timings)
 
-                # === CACHE: Inicjalizacja cache key ===
-                self.cache_manager.initialize_cache_key(input_file, self.config)
+                # === Finalize result ===
+                result = {
+                    'success': True,
+                    'run_id': self.run_id,
+                    'input_file': input_file,
+                    'export_results': context['export_results'],
+                    'youtube_results': context['youtube_results'],
+                    'shorts_results': context['shorts_results'],
+                    'packing_plan': context['packing_plan'],  # Renamed from 'split_plan'
+                    'parts_metadata': context['parts_metadata'],
+                    'timing': self.timing_stats
+                }
 
-                # === HIGHLIGHT PACKER: Wstępna analiza strategii pakowania ===
-                # (Faktyczne pakowanie nastąpi PO Stage 6 - Selection)
-                packing_plan = None
-                if self.highlight_packer and source_duration >= self.config.packer.min_duration_for_split:
-                    print("\n📦 Materiał kwalifikuje się do pakowania w części - analiza strategii...")
+                print(f"\n{'='*80}")
+                print(f"✅ PIPELINE COMPLETE - RUN_ID: {self.run_id}")
+                print(f"Total time: {self._format_duration(time.time() - start_time)}")
+                if 'critical_path' in self.timing_stats:
+                    print(f"Critical path: {self.timing_stats['critical_path']}")
+                cache_stats = self.cache_manager.get_cache_stats()
+                if cache_stats.get('enabled'):
+                    hits = sum(s['hits'] for s in cache_stats['session'].values())
+                    lookups = hits + sum(s['misses'] for s in cache_stats['session'].values())
+                    print(f"Cache: {hits}/{lookups} hit, {cache_stats['total_bytes'] / 1024 ** 2:.1f} MB "
+                          f"w {cache_stats['num_entries']} wpisach")
+                print(f"{'='*80}\n")
 
-                    # Pobierz opcjonalne overrides z config (jeśli są)
-                    override_parts = getattr(self.config.packer, 'force_num_parts', None)
-                    override_target_mins = getattr(self.config.packer, 'target_part_minutes', None)
+                return result
 
-                    # Wylicz plan pakowania RAZ (single source of truth!)
-                    packing_plan = self.highlight_packer.calculate_packing_strategy(
-                        source_duration,
-                        override_parts=override_parts,
-                        override_target_minutes=override_target_mins
-                    )
+            except InterruptedError:
+                self._report_progress("Cancelled", 0, f"Anulowano przez użytkownika [RUN_ID: {self.run_id}]")
+                raise
+            except Exception as e:
+                self._report_progress("Error", 0, f"Błąd: {str(e)} [RUN_ID: {self.run_id}]")
+                raise
+            finally:
+                # Wpisy cache tego inputu mogą już być usuwane przez LRU innych jobów
+                self.cache_manager.release()
 
-                    # Dostosuj config selection do planu (z wyjaśnieniem DLACZEGO)
-                    original_target = self.config.selection.target_total_duration
-                    if packing_plan.total_target_duration != original_target:
-                        change_reason = (
-                            f"HighlightPacker dostosował target duration: {original_target}s → {packing_plan.total_target_duration}s\n"
-                            f"   Powód: Materiał {source_duration/3600:.1f}h wymaga {packing_plan.num_parts} części "
-                            f"po ~{packing_plan.target_duration_per_part/60:.0f}min każda dla optymalnej retencji"
-                        )
-                        print(f"\n⚙️  {change_reason}")
-                        packing_plan._config_change_reason = change_reason  # Zapisz do późniejszego wyświetlenia
-                        self.config.selection.target_total_duration = packing_plan.total_target_duration
-                
-                # === ETAP 2: VAD (Voice Activity Detection) ===
-                self._check_cancelled()
-                stage_start = time.time()
-                print(f"\n📌 STAGE 2/7 - VAD [RUN_ID: {self.run_id}]")
-
-                # Check cache
-                if self.cache_manager.is_cache_valid('vad'):
-                    print("✅ Cache hit: VAD - ładowanie z cache...")
-                    vad_result = self.cache_manager.load_from_cache('vad')
-                    self.timing_stats['vad'] = "0s (cache)"
-                    self._report_progress("Stage 2/7", 28, f"✅ VAD załadowany z cache [RUN_ID: {self.run_id}]")
-                else:
-                    print("⚠️ Cache miss: VAD - wykonywanie stage...")
-                    self._report_progress("Stage 2/7", 20, f"Voice Activity Detection... [RUN_ID: {self.run_id}]")
+                # === ZWOLNIJ LOCK - KONIEC SINGLE-FLIGHT ===
+                with PipelineProcessor._global_lock:
+                    PipelineProcessor._active_inputs.pop(input_key, None)
+                    PipelineProcessor._is_running = bool(PipelineProcessor._active_inputs)
+                    if PipelineProcessor._current_run_id == self.run_id:
+                        PipelineProcessor._current_run_id = None
+                    print(f"🔓 Pipeline lock released [RUN_ID: {self.run_id}]")
 
-                    vad_result = self.stages['vad'].process(
-                        audio_file=self._get_audio_file_from_ingest(ingest_result),
-                        output_dir=self.session_dir
-                    )
+    def _build_stage_graph(self) -> StageGraph:
+        """
+        Zbuduj graf etapów (inputs/outputs = klucze kontekstu).
 
-                    # Save to cache
-                    self.cache_manager.save_to_cache(vad_result, 'vad')
+        Zależności:
+            ingest ─┬─ packing_plan ──────────────┐
+                    └─ vad → transcribe → features → scoring → selection → packing → export → thumbnail → youtube
+            cache_key (hash inputu) ─ równolegle z ingest      └─ shorts (równolegle z export)
+        """
+        graph = StageGraph()
+        graph.add_stage('ingest', self._stage_ingest,
+                        inputs=('input_file',),
+                        outputs=('ingest_result', 'source_duration', 'audio_store'))
+        graph.add_stage('cache_key', self._stage_cache_key,
+                        inputs=('input_file',),
+                        outputs=('cache_key',))
+        graph.add_stage('packing_plan', self._stage_packing_plan,
+                        inputs=('source_duration',),
+                        outputs=('packing_plan',))
+        graph.add_stage('vad', self._stage_vad,
+                        inputs=('ingest_result', 'audio_store', 'cache_key'),
+                        outputs=('vad_result',))
+        graph.add_stage('transcribe', self._stage_transcribe,
+                        inputs=('ingest_result', 'audio_store', 'vad_result', 'cache_key'),
+                        outputs=('transcribe_result',))
+        graph.add_stage('features', self._stage_features,
+                        inputs=('ingest_result', 'audio_store', 'transcribe_result', 'cache_key'),
+                        outputs=('features_result',))
+        graph.add_stage('scoring', self._stage_scoring,
+                        inputs=('features_result', 'cache_key'),
+                        outputs=('scoring_result',))
+        graph.add_stage('selection', self._stage_selection,
+                        inputs=('scoring_result', 'source_duration', 'packing_plan'),
+                        outputs=('selection_result',))
+        graph.add_stage('packing', self._stage_packing,
+                        inputs=('selection_result', 'packing_plan'),
+                        outputs=('parts_metadata',))
+        graph.add_stage('export', self._stage_export,
+                        inputs=('input_file', 'selection_result', 'scoring_result', 'parts_metadata'),
+                        outputs=('export_results',))
+        graph.add_stage('thumbnail', self._stage_thumbnail,
+                        inputs=('export_results', 'selection_result', 'parts_metadata'),
+                        outputs=('thumbnail_results',))
+        graph.add_stage('shorts', self._stage_shorts,
+                        inputs=('input_file', 'selection_result', 'scoring_result'),
+                        outputs=('shorts_results',))
+        graph.add_stage('youtube', self._stage_youtube,
+                        inputs=('export_results', 'thumbnail_results', 'selection_result',
+                                'scoring_result', 'parts_metadata'),
+                        outputs=('youtube_results',))
+
+        # Zasoby per etap (egzekwowane tylko gdy processor ma ResourceBudget)
+        for name, demand in self.STAGE_RESOURCES.items():
+            if name in graph.nodes:
+                graph.nodes[name].resources = dict(demand)
+        # Eksport trzyma tyle slotów ffmpeg, ile procesów uruchamia jego EncoderPool
+        graph.nodes['export'].resources['ffmpeg'] = self.stages['export'].encode_slots()
+        # Transkrypcja trzyma tyle instancji ASR (i RAM), ile modeli ładuje jej ASRWorkerPool
+        asr_slots = self.stages['transcribe'].asr_slots()
+        graph.nodes['transcribe'].resources['asr'] = asr_slots
+        graph.nodes['transcribe'].resources['ram_mb'] = self.STAGE_RESOURCES['transcribe']['ram_mb'] * asr_slots
+
+        return graph
+
+    def _budget_capacity(self, resource: str) -> Optional[int]:
+        """Pojemność zasobu w ResourceBudget (None = bez budżetu)"""
+        if self.resource_budget is None:
+            return None
+        return self.resource_budget.capacities.get(resource)
+
+    def _record_stage_timings(self, graph: StageGraph, timings: Dict[str, StageTiming]):
+        """Przepisz wall time etapów (w kolejności grafu) + ścieżkę krytyczną do timing_stats"""
+        for name in graph.topological_order():
+            if name not in timings:
+                continue
+            if name in self._cached_stages:
+                self.timing_stats[name] = "0s (cache)"
+            else:
+                self.timing_stats[name] = self._format_duration(timings[name].duration)
 
-                    self.timing_stats['vad'] = self._format_duration(time.time() - stage_start)
-                    self._report_progress("Stage 2/7", 28, f"✅ VAD zakończony [RUN_ID: {self.run_id}]")
-                
-                # === ETAP 3: ASR/Transcribe (Whisper) ===
-                self._check_cancelled()
-                stage_start = time.time()
-                print(f"\n📌 STAGE 3/7 - Transcribe [RUN_ID: {self.run_id}]")
-
-                # Check cache
-                if self.cache_manager.is_cache_valid('transcribe'):
-                    print("✅ Cache hit: Transcribe - ładowanie z cache...")
-                    transcribe_result = self.cache_manager.load_from_cache('transcribe')
-                    self.timing_stats['transcribe'] = "0s (cache)"
-                    self._report_progress("Stage 3/7", 50, f"✅ Transkrypcja załadowana z cache [RUN_ID: {self.run_id}]")
-                else:
-                    print("⚠️ Cache miss: Transcribe - wykonywanie stage...")
-                    self._report_progress("Stage 3/7", 30, f"Transkrypcja audio (Whisper)... [RUN_ID: {self.run_id}]")
+        path, length = graph.critical_path(timings)
+        if path:
+            self.timing_stats['critical_path'] = f"{' → '.join(path)} ({self._format_duration(length)})"
 
-                    transcribe_result = self.stages['transcribe'].process(
-                        audio_file=self._get_audio_file_from_ingest(ingest_result),
-                        vad_segments=vad_result['segments'],
-                        output_dir=self.session_dir
-                    )
+    # === Etapy grafu ===
 
-                    # Save to cache
-                    self.cache_manager.save_to_cache(transcribe_result, 'transcribe')
+    def _stage_ingest(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 1: Ingest & Preprocessing"""
+        print(f"\n📌 STAGE 1/7 - Ingest [RUN_ID: {self.run_id}]")
+        self._report_progress("Stage 1/7", 5, f"Audio extraction i normalizacja... [RUN_ID: {self.run_id}]")
 
-                    self.timing_stats['transcribe'] = self._format_duration(time.time() - stage_start)
-                    self._report_progress("Stage 3/7", 50, f"✅ Transkrypcja zakończona [RUN_ID: {self.run_id}]")
-                
-                # === ETAP 4: Feature Extraction ===
-                self._check_cancelled()
-                stage_start = time.time()
-                print(f"\n📌 STAGE 4/7 - Features [RUN_ID: {self.run_id}]")
-                self._report_progress("Stage 4/7", 52, f"Ekstrakcja features... [RUN_ID: {self.run_id}]")
-
-                features_result = self.stages['features'].process(
-                    audio_file=self._get_audio_file_from_ingest(ingest_result),
-                    segments=transcribe_result['segments'],
-                    output_dir=self.session_dir
+        ingest_result = self.stages['ingest'].process(
+            input_file=ctx['input_file'],
+            output_dir=self.session_dir
+        )
+
+        # Wspólny bufor PCM (mmap) dla VAD / transcribe / features - audio dekodowane raz
+        audio_store = AudioStore.from_ingest(ingest_result, self.config.audio.sample_rate)
+
+        self._report_progress("Stage 1/7", 14, f"✅ Audio extraction zakończony [RUN_ID: {self.run_id}]")
+        return {
+            'ingest_result': ingest_result,
+            'source_duration': ingest_result['metadata']['duration'],
+            'audio_store': audio_store
+        }
+
+    def _stage_cache_key(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """CACHE: Inicjalizacja cache key (hash inputu liczony równolegle z ingest)"""
+        self.cache_manager.initialize_cache_key(ctx['input_file'], self.config)
+        return {'cache_key': self.cache_manager.current_cache_key}
+
+    def _stage_packing_plan(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """HIGHLIGHT PACKER: Wstępna analiza strategii pakowania (faktyczne pakowanie PO Stage 6)"""
+        source_duration = ctx['source_duration']
+        packing_plan = None
+        if self.highlight_packer and source_duration >= self.config.packer.min_duration_for_split:
+            print("\n📦 Materiał kwalifikuje się do pakowania w części - analiza strategii...")
+
+            # Pobierz opcjonalne overrides z config (jeśli są)
+            override_parts = getattr(self.config.packer, 'force_num_parts', None)
+            override_target_mins = getattr(self.config.packer, 'target_part_minutes', None)
+
+            # Wylicz plan pakowania RAZ (single source of truth!)
+            packing_plan = self.highlight_packer.calculate_packing_strategy(
+                source_duration,
+                override_parts=override_parts,
+                override_target_minutes=override_target_mins
+            )
+
+            # Dostosuj config selection do planu (z wyjaśnieniem DLACZEGO)
+            original_target = self.config.selection.target_total_duration
+            if packing_plan.total_target_duration != original_target:
+                change_reason = (
+                    f"HighlightPacker dostosował target duration: {original_target}s → {packing_plan.total_target_duration}s\n"
+                    f"   Powód: Materiał {source_duration/3600:.1f}h wymaga {packing_plan.num_parts} części "
+                    f"po ~{packing_plan.target_duration_per_part/60:.0f}min każda dla optymalnej retencji"
                 )
+                print(f"\n⚙️  {change_reason}")
+                packing_plan._config_change_reason = change_reason  # Zapisz do późniejszego wyświetlenia
+                self.config.selection.target_total_duration = packing_plan.total_target_duration
+
+        return {'packing_plan': packing_plan}
+
+    def _stage_vad(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 2: VAD (Voice Activity Detection)"""
+        print(f"\n📌 STAGE 2/7 - VAD [RUN_ID: {self.run_id}]")
+
+        # Check cache
+        if self.cache_manager.is_cache_valid('vad'):
+            print("✅ Cache hit: VAD - ładowanie z cache...")
+            vad_result = self.cache_manager.load_from_cache('vad')
+            self._cached_stages.add('vad')
+            self._report_progress("Stage 2/7", 28, f"✅ VAD załadowany z cache [RUN_ID: {self.run_id}]")
+        else:
+            print("⚠️ Cache miss: VAD - wykonywanie stage...")
+            self._report_progress("Stage 2/7", 20, f"Voice Activity Detection... [RUN_ID: {self.run_id}]")
 
-                self.timing_stats['features'] = self._format_duration(time.time() - stage_start)
-                self._report_progress("Stage 4/7", 60, f"✅ Features ekstrahowane [RUN_ID: {self.run_id}]")
-                
-                # === ETAP 5: Scoring (GPT) ===
-                self._check_cancelled()
-                stage_start = time.time()
-                print(f"\n📌 STAGE 5/7 - Scoring [RUN_ID: {self.run_id}]")
-
-                # Check cache
-                if self.cache_manager.is_cache_valid('scoring'):
-                    print("✅ Cache hit: Scoring - ładowanie z cache...")
-                    scoring_result = self.cache_manager.load_from_cache('scoring')
-                    self.timing_stats['scoring'] = "0s (cache)"
-                    self._report_progress("Stage 5/7", 75, f"✅ Scoring załadowany z cache [RUN_ID: {self.run_id}]")
-                else:
-                    print("⚠️ Cache miss: Scoring - wykonywanie stage...")
-                    self._report_progress("Stage 5/7", 62, f"Scoring segmentów (GPT-4)... [RUN_ID: {self.run_id}]")
+            vad_result = self.stages['vad'].process(
+                audio_file=self._get_audio_file_from_ingest(ctx['ingest_result']),
+                output_dir=self.session_dir,
+                audio_store=ctx['audio_store']
+            )
 
-                    scoring_result = self.stages['scoring'].process(
-                        segments=features_result['segments'],
-                        output_dir=self.session_dir
-                    )
+            # Save to cache
+            self.cache_manager.save_to_cache(vad_result, 'vad')
 
-                    # Save to cache
-                    self.cache_manager.save_to_cache(scoring_result, 'scoring')
+            self._report_progress("Stage 2/7", 28, f"✅ VAD zakończony [RUN_ID: {self.run_id}]")
 
-                    self.timing_stats['scoring'] = self._format_duration(time.time() - stage_start)
-                    self._report_progress("Stage 5/7", 75, f"✅ Scoring zakończony [RUN_ID: {self.run_id}]")
-                
-                # === ETAP 6: Selection (wybór top klipów) ===
-                self._check_cancelled()
-                stage_start = time.time()
-                print(f"\n📌 STAGE 6/7 - Selection [RUN_ID: {self.run_id}]")
-                self._report_progress("Stage 6/7", 77, f"Selekcja najlepszych klipów... [RUN_ID: {self.run_id}]")
+        return {'vad_result': vad_result}
+
+    def _stage_transcribe(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 3: ASR/Transcribe (Whisper)"""
+        print(f"\n📌 STAGE 3/7 - Transcribe [RUN_ID: {self.run_id}]")
+
+        # Check cache
+        if self.cache_manager.is_cache_valid('transcribe', upstream=ctx['vad_result']['segments']):
+            print("✅ Cache hit: Transcribe - ładowanie z cache...")
+            # LazySegments: przy trafieniu w cache Features segmenty są tylko hashowane
+            transcribe_result = self.cache_manager.load_from_cache('transcribe', lazy=True)
+            self._cached_stages.add('transcribe')
+            self._report_progress("Stage 3/7", 50, f"✅ Transkrypcja załadowana z cache [RUN_ID: {self.run_id}]")
+        else:
+            print("⚠️ Cache miss: Transcribe - wykonywanie stage...")
+            self._report_progress("Stage 3/7", 30, f"Transkrypcja audio (Whisper)... [RUN_ID: {self.run_id}]")
+
+            transcribe_result = self.stages['transcribe'].process(
+                audio_file=self._get_audio_file_from_ingest(ctx['ingest_result']),
+                vad_segments=ctx['vad_result']['segments'],
+                output_dir=self.session_dir,
+                audio_store=ctx['audio_store'],
+                checkpoint=self.cache_manager.transcript_checkpoint()
+            )
+
+            # Save to cache
+            self.cache_manager.save_to_cache(transcribe_result, 'transcribe')
 
-                # Użyj threshold z planu pakowania (jeśli istnieje)
-                min_score = packing_plan.min_score_threshold if packing_plan else 0.0  # Bez filtrowania gdy brak planu
+            self._report_progress("Stage 3/7", 50, f"✅ Transkrypcja zakończona [RUN_ID: {self.run_id}]")
+
+        return {'transcribe_result': transcribe_result}
+
+    def _stage_features(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 4: Feature Extraction"""
+        print(f"\n📌 STAGE 4/7 - Features [RUN_ID: {self.run_id}]")
+
+        # Check cache
+        if self.cache_manager.is_cache_valid('features', upstream=ctx['transcribe_result']['segments']):
+            print("✅ Cache hit: Features - ładowanie z cache...")
+            features_result = self.cache_manager.load_from_cache('features', lazy=True)
+            self._cached_stages.add('features')
+            self._report_progress("Stage 4/7", 60, f"✅ Features załadowane z cache [RUN_ID: {self.run_id}]")
+        else:
+            print("⚠️ Cache miss: Features - wykonywanie stage...")
+            self._report_progress("Stage 4/7", 52, f"Ekstrakcja features... [RUN_ID: {self.run_id}]")
+
+            features_result = self.stages['features'].process(
+                audio_file=self._get_audio_file_from_ingest(ctx['ingest_result']),
+                segments=ctx['transcribe_result']['segments'],
+                output_dir=self.session_dir,
+                audio_store=ctx['audio_store']
+            )
 
-                selection_result = self.stages['selection'].process(
+            # Save to cache
+            self.cache_manager.save_to_cache(features_result, 'features')
+
+            self._report_progress("Stage 4/7", 60, f"✅ Features ekstrahowane [RUN_ID: {self.run_id}]")
+
+        return {'features_result': features_result}
+
+    def _stage_scoring(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 5: Scoring (GPT)"""
+        print(f"\n📌 STAGE 5/7 - Scoring [RUN_ID: {self.run_id}]")
+
+        # Check cache
+        if self.cache_manager.is_cache_valid('scoring', upstream=ctx['features_result']['segments']):
+            print("✅ Cache hit: Scoring - ładowanie z cache...")
+            scoring_result = self.cache_manager.load_from_cache('scoring')
+            self._cached_stages.add('scoring')
+            self._report_progress("Stage 5/7", 75, f"✅ Scoring załadowany z cache [RUN_ID: {self.run_id}]")
+        else:
+            print("⚠️ Cache miss: Scoring - wykonywanie stage...")
+            self._report_progress("Stage 5/7", 62, f"Scoring segmentów (GPT-4)... [RUN_ID: {self.run_id}]")
+
+            scoring_result = self.stages['scoring'].process(
+                segments=ctx['features_result']['segments'],
+                output_dir=self.session_dir
+            )
+
+            # Save to cache
+            self.cache_manager.save_to_cache(scoring_result, 'scoring')
+
+            self._report_progress("Stage 5/7", 75, f"✅ Scoring zakończony [RUN_ID: {self.run_id}]")
+
+        return {'scoring_result': scoring_result}
+
+    def _stage_selection(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 6: Selection (wybór top klipów)"""
+        print(f"\n📌 STAGE 6/7 - Selection [RUN_ID: {self.run_id}]")
+        self._report_progress("Stage 6/7", 77, f"Selekcja najlepszych klipów... [RUN_ID: {self.run_id}]")
+
+        # Użyj threshold z planu pakowania (jeśli istnieje)
+        packing_plan = ctx['packing_plan']
+        min_score = packing_plan.min_score_threshold if packing_plan else 0.0  # Bez filtrowania gdy brak planu
+
+        self.selection_index = SelectionIndex(
+            ctx['scoring_result']['segments'], ctx['source_duration'], self.config, min_score=min_score
+        )
+        selection_result = self.stages['selection'].process(
+            segments=ctx['scoring_result']['segments'],
+            total_duration=ctx['source_duration'],
+            output_dir=self.session_dir,
+            min_score=min_score
+        )
+
+        self._report_progress("Stage 6/7", 85, f"✅ Wybrano {len(selection_result['clips'])} klipów [RUN_ID: {self.run_id}]")
+        return {'selection_result': selection_result}
+
+    def _stage_packing(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        HIGHLIGHT PACKER: Pakowanie selected_clips do części
+        (FLOW: Stage 6 selected_clips → HighlightPacker → Stage 7 Export per part)
+        """
+        selection_result = ctx['selection_result']
+        packing_plan = ctx['packing_plan']
+        parts_metadata = None
+
+        if packing_plan:
+            print(f"\n📦 Pakowanie {len(selection_result['clips'])} klipów do {packing_plan.num_parts} części...")
+            parts = self.highlight_packer.split_clips_into_parts(
+                selection_result['clips'],
+                packing_plan.num_parts,
+                packing_plan.target_duration_per_part
+            )
+
+            # Generuj metadata premier dla każdej części (generic, language-aware base title)
+            base_date = datetime.now() + timedelta(days=self.config.packer.first_premiere_days_offset)
+
+            # Generic base title (language-aware, no hardcoded parliamentary content)
+            if self.config.language == "pl":
+                base_title = "Najlepsze Momenty"
+            else:
+                base_title = "Best Moments"
+
+            parts_metadata = self.highlight_packer.generate_part_metadata(
+                parts,
+                base_title,
+                base_date=base_date
+            )
+
+            # Wypełnij plan pakowania metadata (single source of truth!)
+            packing_plan.parts_metadata = parts_metadata
+
+            # Pokaż FINALNY plan pakowania (RAZ, z harmonogramem premier!)
+            self.highlight_packer.print_packing_summary(packing_plan)
+
+        return {'parts_metadata': parts_metadata}
+
+    def _stage_export(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 7: Export (dla każdej części lub pojedynczy)"""
+        print(f"\n📌 STAGE 7/7 - Export [RUN_ID: {self.run_id}]")
+        self._check_cancelled()
+        export_results = []
+        parts_metadata = ctx['parts_metadata']
+        scoring_result = ctx['scoring_result']
+
+        if parts_metadata:
+            # Multi-part export
+            for part_meta in parts_metadata:
+                self._check_cancelled()
+                print(f"\n🎬 Eksport części {part_meta['part_number']}/{part_meta['total_parts']}... [RUN_ID: {self.run_id}]")
+
+                part_export = self.stages['export'].process(
+                    input_file=ctx['input_file'],
+                    clips=part_meta['clips'],
                     segments=scoring_result['segments'],
-                    total_duration=source_duration,
-                    output_dir=self.session_dir,
-                    min_score=min_score
+                    output_dir=self.config.output_dir,
+                    session_dir=self.session_dir,
+                    part_number=part_meta['part_number']  # ✅ Przekazanie numeru części
                 )
+                export_results.append(part_export)
+        else:
+            # Single export (standardowy)
+            print(f"🎬 Eksport pojedynczego filmu... [RUN_ID: {self.run_id}]")
+            export_result = self.stages['export'].process(
+                input_file=ctx['input_file'],
+                clips=ctx['selection_result']['clips'],
+                segments=scoring_result['segments'],
+                output_dir=self.config.output_dir,
+                session_dir=self.session_dir
+            )
+            export_results.append(export_result)
 
-                self.timing_stats['selection'] = self._format_duration(time.time() - stage_start)
-                self._report_progress("Stage 6/7", 85, f"✅ Wybrano {len(selection_result['clips'])} klipów [RUN_ID: {self.run_id}]")
-
-                # === HIGHLIGHT PACKER: Pakowanie selected_clips do części ===
-                # (FLOW: Stage 6 selected_clips → HighlightPacker → Stage 7 Export per part)
-                parts_metadata = None
-                if packing_plan:
-                    print(f"\n📦 Pakowanie {len(selection_result['clips'])} klipów do {packing_plan.num_parts} części...")
-                    parts = self.highlight_packer.split_clips_into_parts(
-                        selection_result['clips'],
-                        packing_plan.num_parts,
-                        packing_plan.target_duration_per_part
-                    )
+        return {'export_results': export_results}
 
-                    # Generuj metadata premier dla każdej części (generic, language-aware base title)
-                    base_date = datetime.now() + timedelta(days=self.config.packer.first_premiere_days_offset)
+    def _stage_thumbnail(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 8: Thumbnail (z numerem części lub standardowa)"""
+        thumbnail_results = []
+        if not hasattr(self, 'thumbnail_stage'):
+            return {'thumbnail_results': thumbnail_results}
 
-                    # Generic base title (language-aware, no hardcoded parliamentary content)
-                    if self.config.language == "pl":
-                        base_title = "Najlepsze Momenty"
-                    else:
-                        base_title = "Best Moments"
+        export_results = ctx['export_results']
+        parts_metadata = ctx['parts_metadata']
 
-                    parts_metadata = self.highlight_packer.generate_part_metadata(
-                        parts,
-                        base_title,
-                        base_date=base_date
-                    )
+        if parts_metadata:
+            for part_meta, part_export in zip(parts_metadata, export_results):
+                part_thumbnail = self._generate_thumbnail_with_part_number(
+                    part_export['output_file'],
+                    part_meta['part_number'],
+                    part_meta['total_parts']
+                )
+                thumbnail_results.append(part_thumbnail)
+        else:
+            thumbnail_result = self._generate_standard_thumbnail(
+                export_results[0]['output_file'],
+                ctx['selection_result']['clips']
+            )
+            thumbnail_results.append(thumbnail_result)
+
+        return {'thumbnail_results': thumbnail_results}
+
+    def _stage_youtube(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 9: YouTube Upload (dla każdej części z premiere scheduling)"""
+        youtube_results = []
+        if not self.config.youtube.enabled:
+            return {'youtube_results': youtube_results}
+
+        from .stage_09_youtube import YouTubeStage
+        youtube_stage = YouTubeStage(self.config)
+        youtube_stage.authorize()
+
+        export_results = ctx['export_results']
+        thumbnail_results = ctx['thumbnail_results']
+        parts_metadata = ctx['parts_metadata']
+        scoring_result = ctx['scoring_result']
+        selection_result = ctx['selection_result']
+
+        if parts_metadata:
+            # Multi-part upload z premiere scheduling
+            for i, part_meta in enumerate(parts_metadata):
+                print(f"\n📤 Upload części {part_meta['part_number']}/{part_meta['total_parts']}...")
+
+                # Generuj enhanced title
+                video_title = self.highlight_packer.generate_enhanced_title(
+                    part_meta,
+                    part_meta['clips'],
+                    use_politicians=self.config.packer.use_politicians_in_titles
+                )
 
-                    # Wypełnij plan pakowania metadata (single source of truth!)
-                    packing_plan.parts_metadata = parts_metadata
+                # Determine privacy/premiere status
+                premiere_datetime = datetime.fromisoformat(part_meta['premiere_datetime'])
 
-                    # Pokaż FINALNY plan pakowania (RAZ, z harmonogramem premier!)
-                    self.highlight_packer.print_packing_summary(packing_plan)
-                
-                # === ETAP 7: Export (dla każdej części lub pojedynczy) ===
-                print(f"\n📌 STAGE 7/7 - Export [RUN_ID: {self.run_id}]")
-                export_results = []
-                thumbnail_results = []
-
-                if parts_metadata:
-                    # Multi-part export
-                    for part_meta in parts_metadata:
-                        print(f"\n🎬 Eksport części {part_meta['part_number']}/{part_meta['total_parts']}... [RUN_ID: {self.run_id}]")
-                        
-                        # Export video
-                        part_export = self.stages['export'].process(
-                            input_file=input_file,
-                            clips=part_meta['clips'],
-                            segments=scoring_result['segments'],
-                            output_dir=self.config.output_dir,
-                            session_dir=self.session_dir,
-                            part_number=part_meta['part_number']  # ✅ Przekazanie numeru części
-                        )
-                        export_results.append(part_export)
-                        
-                        # Generate thumbnail z numerem części
-                        if hasattr(self, 'thumbnail_stage'):
-                            part_thumbnail = self._generate_thumbnail_with_part_number(
-                                part_export['output_file'],
-                                part_meta['part_number'],
-                                part_meta['total_parts']
-                            )
-                            thumbnail_results.append(part_thumbnail)
+                if self.config.youtube.schedule_as_premiere:
+                    # Schedule as premiere
+                    youtube_result = youtube_stage.schedule_premiere(
+                        video_file=export_results[i]['output_file'],
+                        thumbnail_file=thumbnail_results[i].get('thumbnail_path') if thumbnail_results else None,
+                        title=video_title,
+                        clips=part_meta['clips'],
+                        segments=scoring_result['segments'],
+                        output_dir=self.config.output_dir,
+                        premiere_datetime=premiere_datetime
+                    )
                 else:
-                    # Single export (standardowy)
-                    print(f"🎬 Eksport pojedynczego filmu... [RUN_ID: {self.run_id}]")
-                    export_result = self.stages['export'].process(
-                        input_file=input_file,
-                        clips=selection_result['clips'],
+                    # Upload unlisted/private
+                    youtube_result = youtube_stage.process(
+                        video_file=export_results[i]['output_file'],
+                        thumbnail_file=thumbnail_results[i].get('thumbnail_path') if thumbnail_results else None,
+                        title=video_title,
+                        clips=part_meta['clips'],
                         segments=scoring_result['segments'],
                         output_dir=self.config.output_dir,
-                        session_dir=self.session_dir
+                        privacy_status='unlisted'
                     )
-                    export_results.append(export_result)
-                    
-                    # Standard thumbnail
-                    if hasattr(self, 'thumbnail_stage'):
-                        thumbnail_result = self._generate_standard_thumbnail(export_result['output_file'], selection_result['clips'])
-                        thumbnail_results.append(thumbnail_result)
-                
-                # === ETAP 9: YouTube Upload (dla każdej części z premiere scheduling) ===
-                youtube_results = []
-                if self.config.youtube.enabled:
+
+                youtube_results.append(youtube_result)
+        else:
+            # Single upload (standardowy)
+            video_title = self._generate_youtube_title(selection_result)
+            youtube_result = youtube_stage.process(
+                video_file=export_results[0]['output_file'],
+                thumbnail_file=thumbnail_results[0].get('thumbnail_path') if thumbnail_results else None,
+                title=video_title,
+                clips=selection_result['clips'],
+                segments=scoring_result['segments'],
+                output_dir=self.config.output_dir,
+                privacy_status=self.config.youtube.privacy_status
+            )
+            youtube_results.append(youtube_result)
+
+        return {'youtube_results': youtube_results}
+
+    def _stage_shorts(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """ETAP 10: YouTube Shorts Generation (optional, równolegle z Export)"""
+        shorts_results = []
+        shorts_clips_list = ctx['selection_result'].get('shorts_clips', [])
+
+        # Validation: prevent double invocation and empty list processing
+        if self.config.shorts.enabled and shorts_clips_list:
+            # Check if shorts already generated (prevent double run)
+            if hasattr(self, '_shorts_generated') and self._shorts_generated:
+                print("\n⚠️ Shorts already generated, skipping duplicate generation")
+            else:
+                self._check_cancelled()
+                self._report_progress("Stage 8/8", 95, "Generowanie YouTube Shorts...")
+
+                print(f"\n🎬 Starting Shorts generation with {len(shorts_clips_list)} candidates...")
+
+                from .stage_10_shorts import ShortsStage
+                shorts_stage = ShortsStage(self.config)
+
+                shorts_result = shorts_stage.process(
+                    input_file=ctx['input_file'],
+                    shorts_clips=shorts_clips_list,
+                    segments=ctx['scoring_result']['segments'],
+                    output_dir=self.config.output_dir,
+                    session_dir=self.session_dir,
+                    template=self.config.shorts.default_template  # Przekaż wybrany szablon
+                )
+
+                shorts_results = shorts_result.get('shorts', [])
+                self._report_progress("Stage 8/8", 98, f"✅ Wygenerowano {len(shorts_results)} Shorts")
+
+                # Mark as generated to prevent double run
+                self._shorts_generated = True
+
+                # Optional: Upload Shorts to YouTube
+                if self.config.shorts.upload_to_youtube and self.config.youtube.enabled and shorts_results:
+                    print("\n📤 Upload Shorts na YouTube...")
                     from .stage_09_youtube import YouTubeStage
                     youtube_stage = YouTubeStage(self.config)
                     youtube_stage.authorize()
-                    
-                    if parts_metadata:
-                        # Multi-part upload z premiere scheduling
-                        for i, part_meta in enumerate(parts_metadata):
-                            print(f"\n📤 Upload części {part_meta['part_number']}/{part_meta['total_parts']}...")
-                            
-                            # Generuj enhanced title
-                            video_title = self.highlight_packer.generate_enhanced_title(
-                                part_meta,
-                                part_meta['clips'],
-                                use_politicians=self.config.packer.use_politicians_in_titles
+
+                    for short_meta in shorts_results:
+                        try:
+                            # Upload as Short (dodaj #Shorts w tytule)
+                            short_title = short_meta['title']
+                            if self.config.shorts.add_hashtags and '#Shorts' not in short_title:
+                                short_title += " #Shorts"
+
+                            upload_result = youtube_stage.upload_video(
+                                video_file=short_meta['file'],
+                                title=short_title,
+                                description=short_meta['description'],
+                                tags=short_meta['tags'],
+                                category_id=self.config.shorts.shorts_category_id,
+                                privacy_status='unlisted'  # lub 'public'
                             )
-                            
-                            # Determine privacy/premiere status
-                            premiere_datetime = datetime.fromisoformat(part_meta['premiere_datetime'])
-                            
-                            if self.config.youtube.schedule_as_premiere:
-                                # Schedule as premiere
-                                youtube_result = youtube_stage.schedule_premiere(
-                                    video_file=export_results[i]['output_file'],
-                                    thumbnail_file=thumbnail_results[i].get('thumbnail_path') if thumbnail_results else None,
-                                    title=video_title,
-                                    clips=part_meta['clips'],
-                                    segments=scoring_result['segments'],
-                                    output_dir=self.config.output_dir,
-                                    premiere_datetime=premiere_datetime
-                                )
-                            else:
-                                # Upload unlisted/private
-                                youtube_result = youtube_stage.process(
-                                    video_file=export_results[i]['output_file'],
-                                    thumbnail_file=thumbnail_results[i].get('thumbnail_path') if thumbnail_results else None,
-                                    title=video_title,
-                                    clips=part_meta['clips'],
-                                    segments=scoring_result['segments'],
-                                    output_dir=self.config.output_dir,
-                                    privacy_status='unlisted'
-                                )
-                            
-                            youtube_results.append(youtube_result)
-                    else:
-                        # Single upload (standardowy)
-                        video_title = self._generate_youtube_title(selection_result)
-                        youtube_result = youtube_stage.process(
-                            video_file=export_results[0]['output_file'],
-                            thumbnail_file=thumbnail_results[0].get('thumbnail_path') if thumbnail_results else None,
-                            title=video_title,
-                            clips=selection_result['clips'],
-                            segments=scoring_result['segments'],
-                            output_dir=self.config.output_dir,
-                            privacy_status=self.config.youtube.privacy_status
-                        )
-                        youtube_results.append(youtube_result)
-                
-                # === ETAP 10: YouTube Shorts Generation (optional) ===
-                shorts_results = []
-                shorts_clips_list = selection_result.get('shorts_clips', [])
-
-                # Validation: prevent double invocation and empty list processing
-                if self.config.shorts.enabled and shorts_clips_list:
-                    # Check if shorts already generated (prevent double run)
-                    if hasattr(self, '_shorts_generated') and self._shorts_generated:
-                        print("\n⚠️ Shorts already generated, skipping duplicate generation")
-                    else:
-                        self._check_cancelled()
-                        stage_start = time.time()
-                        self._report_progress("Stage 8/8", 95, "Generowanie YouTube Shorts...")
-
-                        print(f"\n🎬 Starting Shorts generation with {len(shorts_clips_list)} candidates...")
-
-                        from .stage_10_shorts import ShortsStage
-                        shorts_stage = ShortsStage(self.config)
-
-                        shorts_result = shorts_stage.process(
-                            input_file=input_file,
-                            shorts_clips=shorts_clips_list,
-                            segments=scoring_result['segments'],
-                            output_dir=self.config.output_dir,
-                            session_dir=self.session_dir,
-                            template=self.config.shorts.default_template  # Przekaż wybrany szablon
-                        )
-
-                        shorts_results = shorts_result.get('shorts', [])
-                        self.timing_stats['shorts'] = self._format_duration(time.time() - stage_start)
-                        self._report_progress("Stage 8/8", 98, f"✅ Wygenerowano {len(shorts_results)} Shorts")
-
-                        # Mark as generated to prevent double run
-                        self._shorts_generated = True
-
-                        # Optional: Upload Shorts to YouTube
-                        if self.config.shorts.upload_to_youtube and self.config.youtube.enabled and shorts_results:
-                            print("\n📤 Upload Shorts na YouTube...")
-                            from .stage_09_youtube import YouTubeStage
-                            youtube_stage = YouTubeStage(self.config)
-                            youtube_stage.authorize()
-
-                            for short_meta in shorts_results:
-                                try:
-                                    # Upload as Short (dodaj #Shorts w tytule)
-                                    short_title = short_meta['title']
-                                    if self.config.shorts.add_hashtags and '#Shorts' not in short_title:
-                                        short_title += " #Shorts"
-
-                                    upload_result = youtube_stage.upload_video(
-                                        video_file=short_meta['file'],
-                                        title=short_title,
-                                        description=short_meta['description'],
-                                        tags=short_meta['tags'],
-                                        category_id=self.config.shorts.shorts_category_id,
-                                        privacy_status='unlisted'  # lub 'public'
-                                    )
-
-                                    if upload_result.get('success'):
-                                        short_meta['youtube_url'] = upload_result['video_url']
-                                        print(f"   ✅ Short uploaded: {upload_result['video_url']}")
-
-                                except Exception as e:
-                                    print(f"   ⚠️ Błąd uploadu Short: {e}")
-
-                elif self.config.shorts.enabled and not shorts_clips_list:
-                    print("\n⚠️ Shorts enabled but no clips available (selection returned empty list)")
-                    print("   → Check if scored segments have sufficient scores for shorts")
-                
-                # === Finalize result ===
-                result = {
-                    'success': True,
-                    'run_id': self.run_id,
-                    'input_file': input_file,
-                    'export_results': export_results,
-                    'youtube_results': youtube_results,
-                    'shorts_results': shorts_results,
-                    'packing_plan': packing_plan,  # Renamed from 'split_plan'
-                    'parts_metadata': parts_metadata,
-                    'timing': self.timing_stats
-                }
 
-                print(f"\n{'='*80}")
-                print(f"✅ PIPELINE COMPLETE - RUN_ID: {self.run_id}")
-                print(f"Total time: {self._format_duration(time.time() - start_time)}")
-                print(f"{'='*80}\n")
+                            if upload_result.get('success'):
+                                short_meta['youtube_url'] = upload_result['video_url']
+                                print(f"   ✅ Short uploaded: {upload_result['video_url']}")
 
-                return result
+                        except Exception as e:
+                            print(f"   ⚠️ Błąd uploadu Short: {e}")
 
-            except InterruptedError:
-                self._report_progress("Cancelled", 0, f"Anulowano przez użytkownika [RUN_ID: {self.run_id}]")
-                raise
-            except Exception as e:
-                self._report_progress("Error", 0, f"Błąd: {str(e)} [RUN_ID: {self.run_id}]")
-                raise
-            finally:
-                # === ZWOLNIJ LOCK - KONIEC SINGLE-FLIGHT ===
-                with PipelineProcessor._global_lock:
-                    PipelineProcessor._is_running = False
-                    PipelineProcessor._current_run_id = None
-                    print(f"🔓 Pipeline lock released [RUN_ID: {self.run_id}]")
+        elif self.config.shorts.enabled and not shorts_clips_list:
+            print("\n⚠️ Shorts enabled but no clips available (selection returned empty list)")
+            print("   → Check if scored segments have sufficient scores for shorts")
+
+        return {'shorts_results': shorts_results}
     
     def _cleanup_temp_files(self):
         """Usuń pliki tymczasowe"""
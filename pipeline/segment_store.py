@@ -0,0 +1,537 @@
+"""
+Segment Store
+Kolumnowy (struct-of-arrays) zapis segmentów zamiast JSON z indent=2.
+
+Transkrypcja 10h posiedzenia (słowa z start/end/probability) w JSON to setki MB
+parsowane wielokrotnie przez kolejne etapy. Tutaj segmenty trafiają do katalogu
+`*.segs/` z osobnym plikiem .npy per kolumna:
+
+    scored_segments.segs/
+        meta.json       # schemat kolumn + pola spoza listy segmentów
+        c000.npy        # np. t0 (float64)
+        c001.npy        # np. transcript (bajty UTF-8) + c001_off.npy (offsety)
+        c004_off.npy    # words: offsety słów per segment
+        c005.npy        # words/start (float64) ...
+
+Typy kolumn:
+- num  - bool/int/float (numpy), opcjonalna maska stanu (brak klucza / None)
+- str  - bajty UTF-8 + offsety
+- json - wartości niepasujące do schematu (JSON per wiersz, jak str)
+- table - lista dictów per segment (np. words): offsety + kolumny podtabeli
+
+Zagnieżdżone dicty (features, subscores) są spłaszczane do ścieżek 'features/rms'.
+Odczyt jest leniwy: kolumny to np.load(mmap_mode='r') otwierane przy pierwszym
+użyciu (LazySegments.column('final_score') nie dotyka transkrypcji).
+Opcjonalny content_hash w meta.json (hash treści liczony przy zapisie) pozwala
+porównać segmenty z cache bez ich dekodowania.
+JSON pozostaje dostępny do debugowania (write_segments(..., debug_json=True)).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+FORMAT_VERSION = 1
+COLUMNAR_SUFFIX = ".segs"
+META_FILE = "meta.json"
+
+# Stan wartości w kolumnie z maską
+_MISSING, _PRESENT, _NULL = 0, 1, 2
+
+_PATH_SEP = "/"
+
+
+def _json_default(obj: Any):
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return str(obj)
+
+
+def _scalar(value: Any) -> Any:
+    """numpy scalar -> python scalar"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# === Zapis ===
+
+class _Writer:
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        self.counter = 0
+
+    def _next_file(self) -> str:
+        name = f"c{self.counter:03d}"
+        self.counter += 1
+        return name
+
+    def _save(self, name: str, array: np.ndarray):
+        np.save(self.out_dir / f"{name}.npy", array, allow_pickle=False)
+
+    def _save_strings(self, name: str, values: List[str]):
+        encoded = [v.encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        self._save(name, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        self._save(f"{name}_off", offsets)
+
+    def encode_rows(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Zakoduj listę dictów do kolumn; zwraca schemat (do meta.json)"""
+        flat_rows, paths = _flatten_rows(rows)
+        columns = []
+
+        for path in paths:
+            values = [row.get(path, _MissingType) for row in flat_rows]
+            columns.append(self._encode_column(path, values))
+
+        return {'num_rows': len(rows), 'columns': columns}
+
+    def _encode_column(self, path: str, values: List[Any]) -> Dict[str, Any]:
+        name = self._next_file()
+        spec: Dict[str, Any] = {'path': path, 'file': name}
+
+        state = np.array(
+            [_MISSING if v is _MissingType else (_NULL if v is None else _PRESENT) for v in values],
+            dtype=np.int8
+        )
+        present = [_scalar(v) for v in values if v is not _MissingType and v is not None]
+        if not (state == _PRESENT).all():
+            self._save(f"{name}_state", state)
+            spec['state'] = True
+
+        kind = _column_kind(present)
+        spec['kind'] = kind
+
+        if kind == 'num':
+            dtype = _numeric_dtype(present)
+            filled = np.zeros(len(values), dtype=dtype)
+            if present:
+                filled[state == _PRESENT] = np.asarray(present, dtype=dtype)
+            self._save(name, filled)
+            spec['dtype'] = np.dtype(dtype).name
+        elif kind == 'str':
+            self._save_strings(name, [_scalar(v) if s == _PRESENT else "" for v, s in zip(values, state)])
+        elif kind == 'table':
+            sub_rows: List[Dict[str, Any]] = []
+            offsets = np.zeros(len(values) + 1, dtype=np.int64)
+            for i, (v, s) in enumerate(zip(values, state)):
+                items = v if s == _PRESENT else []
+                sub_rows.extend(items)
+                offsets[i + 1] = offsets[i] + len(items)
+            self._save(f"{name}_off", offsets)
+            spec['table'] = self.encode_rows(sub_rows)
+        else:
+            self._save_strings(name, [
+                json.dumps(v, ensure_ascii=False, default=_json_default) if s == _PRESENT else ""
+                for v, s in zip(values, state)
+            ])
+
+        return spec
+
+
+class _MissingType:
+    """Znacznik braku klucza w wierszu"""
+
+
+def _flatten_rows(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Spłaszcz zagnieżdżone dicty do ścieżek. Klucz top-level, który w różnych
+    wierszach jest raz dictem a raz skalarem, jest zostawiany jako liść (kolumna json).
+    """
+    leaf_keys = set()
+    for row in rows:
+        for key, value in row.items():
+            if not isinstance(value, dict) or not value:
+                leaf_keys.add(key)
+
+    def flatten(value: Dict[str, Any], prefix: str, out: Dict[str, Any], top_level: bool):
+        for key, item in value.items():
+            key = str(key)
+            path = f"{prefix}{key}"
+            nested = isinstance(item, dict) and item and not (top_level and key in leaf_keys)
+            if nested and all(_PATH_SEP not in str(k) for k in item):
+                flatten(item, path + _PATH_SEP, out, False)
+            else:
+                out[path] = item
+
+    flat_rows = []
+    paths: Dict[str, None] = {}
+    for row in rows:
+        flat: Dict[str, Any] = {}
+        flatten(row, "", flat, True)
+        flat_rows.append(flat)
+        for path in flat:
+            paths.setdefault(path, None)
+
+    # Ścieżka będąca jednocześnie liściem i prefiksem innej → cały klucz top-level jako json
+    path_list = list(paths)
+    conflicts = {
+        p.split(_PATH_SEP, 1)[0] for p in path_list
+        if any(q.startswith(p + _PATH_SEP) for q in path_list)
+    }
+    if conflicts:
+        leaf_keys |= conflicts
+        return _flatten_rows_with_leaves(rows, leaf_keys)
+
+    return flat_rows, path_list
+
+
+def _flatten_rows_with_leaves(rows, leaf_keys):
+    flat_rows = []
+    paths: Dict[str, None] = {}
+    for row in rows:
+        flat: Dict[str, Any] = {}
+        for key, value in row.items():
+            key = str(key)
+            if key in leaf_keys or not isinstance(value, dict) or not value:
+                flat[key] = value
+            else:
+                stack = [(value, key + _PATH_SEP)]
+                while stack:
+                    current, prefix = stack.pop()
+                    for k, v in current.items():
+                        if isinstance(v, dict) and v:
+                            stack.append((v, f"{prefix}{k}{_PATH_SEP}"))
+                        else:
+                            flat[f"{prefix}{k}"] = v
+        flat_rows.append(flat)
+        for path in flat:
+            paths.setdefault(path, None)
+    return flat_rows, list(paths)
+
+
+def _column_kind(values: List[Any]) -> str:
+    # Tylko jednorodne kolumny liczbowe - 13 vs 13.0 zmienia artifact_hash w cache
+    if not values:
+        return 'num'
+    for scalar_type in (bool, int, float):
+        if all(type(v) is scalar_type for v in values):
+            if scalar_type is int and not all(-(2 ** 63) <= v < 2 ** 63 for v in values):
+                break
+            return 'num'
+    if all(isinstance(v, str) for v in values):
+        return 'str'
+    if all(isinstance(v, list) and all(isinstance(i, dict) for i in v) for v in values) \
+            and any(v for v in values):
+        return 'table'
+    return 'json'
+
+
+def _numeric_dtype(values: List[Any]):
+    if values and type(values[0]) is bool:
+        return np.bool_
+    if values and type(values[0]) is int:
+        return np.int64
+    return np.float64
+
+
+def save_segments_columnar(
+    segments: List[Dict[str, Any]],
+    path: Union[str, Path],
+    extra: Optional[Dict[str, Any]] = None,
+    content_hash: Optional[str] = None
+) -> Path:
+    """
+    Zapisz segmenty w formacie kolumnowym (atomowo: katalog tymczasowy + rename).
+
+    Args:
+        segments: Lista segmentów (dicty)
+        path: Katalog docelowy (zwykle *.segs)
+        extra: Dodatkowe pola (np. total_words) zapisywane w meta.json
+        content_hash: Hash treści segmentów (np. artifact_hash) → LazySegments.content_hash
+
+    Returns:
+        Ścieżka katalogu
+    """
+    path = Path(path)
+    tmp_dir = path.with_name(path.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    writer = _Writer(tmp_dir)
+    schema = writer.encode_rows(list(segments))
+    meta = {
+        'format': 'segment_store',
+        'version': FORMAT_VERSION,
+        'schema': schema,
+        'extra': extra or {},
+    }
+    if content_hash is not None:
+        meta['content_hash'] = content_hash
+    with open(tmp_dir / META_FILE, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, default=_json_default)
+
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp_dir, path)
+    return path
+
+
+# === Odczyt ===
+
+class _Columns:
+    """Leniwy dostęp do plików kolumn (mmap)"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def array(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.root / f"{name}.npy", mmap_mode='r', allow_pickle=False)
+        return self._arrays[name]
+
+    def strings(self, name: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        offsets = np.asarray(self.array(f"{name}_off"))
+        stop = len(offsets) - 1 if stop is None else stop
+        if stop <= start:
+            return []
+        lo, hi = int(offsets[start]), int(offsets[stop])
+        blob = self.array(name)[lo:hi].tobytes()
+        rel = (offsets[start:stop + 1] - lo).tolist()
+        return [blob[rel[i]:rel[i + 1]].decode('utf-8') for i in range(stop - start)]
+
+
+def _decode_column(columns: _Columns, spec: Dict[str, Any], start: int, stop: int) -> List[Any]:
+    """Zdekoduj wiersze [start, stop) kolumny do listy wartości (_MissingType = brak klucza)"""
+    name = spec['file']
+    kind = spec['kind']
+
+    if kind == 'num':
+        values = np.asarray(columns.array(name)[start:stop]).tolist()
+    elif kind == 'str':
+        values = columns.strings(name, start, stop)
+    elif kind == 'table':
+        offsets = np.asarray(columns.array(f"{name}_off")[start:stop + 1])
+        sub_rows = _decode_rows(columns, spec['table'], int(offsets[0]), int(offsets[-1]))
+        rel = (offsets - offsets[0]).tolist()
+        values = [sub_rows[rel[i]:rel[i + 1]] for i in range(stop - start)]
+    else:
+        values = [json.loads(v) if v else None for v in columns.strings(name, start, stop)]
+
+    if spec.get('state'):
+        state = np.asarray(columns.array(f"{name}_state")[start:stop]).tolist()
+        values = [
+            v if s == _PRESENT else (None if s == _NULL else _MissingType)
+            for v, s in zip(values, state)
+        ]
+
+    return values
+
+
+def _decode_rows(columns: _Columns, schema: Dict[str, Any], start: int, stop: int) -> List[Dict[str, Any]]:
+    specs = schema['columns']
+    if stop <= start:
+        return []
+
+    decoded = [_decode_column(columns, spec, start, stop) for spec in specs]
+    paths = [spec['path'] for spec in specs]
+
+    if all(_PATH_SEP not in p for p in paths) and not any(spec.get('state') for spec in specs):
+        # Szybka ścieżka: płaskie wiersze bez braków (np. words)
+        return [dict(zip(paths, row)) for row in zip(*decoded)]
+
+    split_paths = [p.split(_PATH_SEP) for p in paths]
+    rows = []
+    for i in range(stop - start):
+        row: Dict[str, Any] = {}
+        for parts, values in zip(split_paths, decoded):
+            value = values[i]
+            if value is _MissingType:
+                continue
+            target = row
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+        rows.append(row)
+    return rows
+
+
+class LazySegments(Sequence):
+    """
+    Segmenty z katalogu *.segs ładowane leniwie (mmap).
+
+    - len(), indeksowanie i iteracja materializują tylko potrzebne wiersze
+    - column('final_score') zwraca tablicę numpy bez dotykania pozostałych kolumn
+    - to_list() materializuje wszystko (kolumnami, szybciej niż wiersz po wierszu)
+
+    Każdy odczyt dekoduje nowe dicty - zmiany w nich nie trafiają do
+    LazySegments. Etapy, które modyfikują segmenty albo czytają je w całości
+    kilka razy, biorą materialize(segments).
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path / META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != 'segment_store':
+            raise ValueError(f"Not a segment store: {self.path}")
+
+        self.meta = meta
+        self.extra: Dict[str, Any] = meta.get('extra', {})
+        self.content_hash: Optional[str] = meta.get('content_hash')
+        self._schema = meta['schema']
+        self._columns = _Columns(self.path)
+        self._by_path = {spec['path']: spec for spec in self._schema['columns']}
+
+    def __len__(self) -> int:
+        return self._schema['num_rows']
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return _decode_rows(self._columns, self._schema, start, stop)
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return _decode_rows(self._columns, self._schema, index, index + 1)[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        chunk = 256
+        for start in range(0, len(self), chunk):
+            yield from _decode_rows(self._columns, self._schema, start, min(len(self), start + chunk))
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._by_path)
+
+    def column(self, path: str) -> Union[np.ndarray, List[Any]]:
+        """
+        Kolumna po ścieżce (np. 't0', 'features/rms').
+
+        Kolumny liczbowe bez braków → np.ndarray (mmap), pozostałe → lista.
+        """
+        spec = self._by_path[path]
+        if spec['kind'] == 'num' and not spec.get('state'):
+            return self._columns.array(spec['file'])
+        return _decode_column(self._columns, spec, 0, len(self))
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return _decode_rows(self._columns, self._schema, 0, len(self))
+
+
+# === API dla etapów ===
+
+def materialize(segments: Union[List[Dict[str, Any]], LazySegments]) -> List[Dict[str, Any]]:
+    """LazySegments → lista dictów (jeden odczyt kolumnami); lista bez zmian"""
+    return segments.to_list() if isinstance(segments, LazySegments) else segments
+
+
+def columnar_path(json_path: Union[str, Path]) -> Path:
+    """scored_segments.json -> scored_segments.segs"""
+    return Path(json_path).with_suffix(COLUMNAR_SUFFIX)
+
+
+def resolve_segments_path(path: Union[str, Path]) -> Optional[Path]:
+    """
+    Znajdź zapisane segmenty: podana ścieżka (.json lub .segs) albo jej
+    odpowiednik w drugim formacie. None jeśli nic nie istnieje.
+    """
+    path = Path(path)
+    candidates = [path]
+    if path.suffix == '.json':
+        candidates.append(columnar_path(path))
+    elif path.suffix == COLUMNAR_SUFFIX:
+        candidates.append(path.with_suffix('.json'))
+
+    for candidate in candidates:
+        if candidate.is_dir() and (candidate / META_FILE).exists():
+            return candidate
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def load_segments(path: Union[str, Path], lazy: bool = False) -> Union[List[Dict[str, Any]], LazySegments]:
+    """
+    Wczytaj segmenty z .json lub katalogu .segs (wykrywane automatycznie).
+
+    Args:
+        path: Ścieżka (np. temp/.../scored_segments.json - działa też gdy istnieje tylko .segs)
+        lazy: True → LazySegments (mmap) dla formatu kolumnowego
+
+    Returns:
+        Lista segmentów (lub LazySegments)
+    """
+    resolved = resolve_segments_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"Segments not found: {path}")
+
+    if resolved.is_dir():
+        segments = LazySegments(resolved)
+        return segments if lazy else segments.to_list()
+
+    with open(resolved, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data['segments'] if isinstance(data, dict) and 'segments' in data else data
+
+
+def write_segments(
+    segments: List[Dict[str, Any]],
+    json_path: Union[str, Path],
+    segment_format: str = "columnar",
+    debug_json: bool = False
+) -> Path:
+    """
+    Zapisz segmenty etapu w wybranym formacie.
+
+    Args:
+        json_path: Nazwa pliku JSON (np. output_dir / "scored_segments.json");
+                   format kolumnowy trafia obok jako *.segs
+        segment_format: 'columnar' lub 'json'
+        debug_json: Przy formacie kolumnowym zapisz dodatkowo JSON (indent=2) do debugowania
+
+    Returns:
+        Ścieżka głównego zapisu
+    """
+    json_path = Path(json_path)
+
+    if segment_format == 'columnar':
+        output = save_segments_columnar(segments, columnar_path(json_path))
+        if not debug_json:
+            return output
+    elif segment_format != 'json':
+        raise ValueError(f"Unknown segment format: {segment_format}")
+    else:
+        output = json_path
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(segments, f, indent=2, ensure_ascii=False, default=_json_default)
+    return output
+
+
+def export_json(path: Union[str, Path], json_path: Optional[Union[str, Path]] = None) -> Path:
+    """Skonwertuj katalog .segs do JSON (indent=2) - do debugowania"""
+    path = Path(path)
+    json_path = Path(json_path) if json_path else path.with_suffix('.json')
+    segments = load_segments(path)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(segments, f, indent=2, ensure_ascii=False)
+    return json_path
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Użycie: python -m pipeline.segment_store <plik.segs> [plik.json]")
+        sys.exit(1)
+
+    out = export_json(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"✅ JSON zapisany: {out}")
@@ -0,0 +1,251 @@
+"""
+Selection Index
+Indeks segmentów po scoringu do szybkich zapytań "co wybrałby Stage 6".
+
+Zmiana progu score / docelowego czasu / max klipów w GUI wymagała
+ponownego SelectionStage.process: sortowanie i kopiowanie wszystkich
+segmentów przy każdym ruchu suwaka. SelectionIndex buduje raz:
+- segmenty po `_merge_short_bursts` posortowane malejąco po score
+  (stabilnie - remisy w tej samej kolejności co sorted() w Stage 6),
+- sumy prefiksowe długości i liczby kandydatów w przedziale długości
+  (filtr progu = prefiks listy → statystyki kandydatów w O(log n)),
+- próg fallback (percentyl) liczony raz.
+
+Zapytanie `preview()` odtwarza selekcję greedy Stage 6 (NMS → merge →
+coverage → trim → top-up) na gotowych strukturach: NMS przechodzi prefiks
+listy do pierwszego warunku stopu, merge/coverage/trim działają na
+≤ max_clips klipach (metody Stage 6), top-up idzie po tym samym porządku
+zamiast sortować pulę. Przy selection.engine: dp kandydaci z prefiksu idą
+do select_budgeted jak w Stage 6. Domyślne min_score i silnik to te
+z przebiegu, dla którego zbudowano indeks. Wynik (klipy i łączny czas)
+jest taki sam jak z process() z tymi parametrami.
+
+    index = SelectionIndex(scored_segments, total_duration, config, min_score=0.4)
+    index.candidate_totals(0.45)                 # (liczba, sekundy) - O(log n)
+    index.preview(min_score_threshold=0.45, target_total_duration=1800, max_clips=30)
+"""
+
+from __future__ import annotations
+
+import copy
+from bisect import bisect_left
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import Config, SelectionConfig
+from .interval_set import IntervalSet
+from .stage_06_selection import SelectionStage
+
+
+@dataclass
+class SelectionPreview:
+    """Wynik zapytania do indeksu (klipy chronologicznie, bez clip_id/title)"""
+    clips: List[Dict]
+    total_duration: float
+    threshold: float
+    num_candidates: int
+    candidates_duration: float
+    bin_counts: List[int] = field(default_factory=list)
+    engine: str = "greedy"
+
+    @property
+    def num_clips(self) -> int:
+        return len(self.clips)
+
+
+class SelectionIndex:
+    """Segmenty posortowane po score + sumy prefiksowe (budowane raz)"""
+
+    def __init__(self, segments: List[Dict], total_duration: float, config: Config, min_score: float = 0.0):
+        self.config = config
+        self.total_duration = total_duration
+        # Jak w przebiegu Stage 6: min_score z planu pakowania, silnik z configu
+        self.min_score = min_score
+        self.engine = getattr(config.selection, 'engine', 'greedy')
+        self._stage = SelectionStage(config)
+
+        # Jak w process(): pre-merge krótkich burstów, kolejność czasowa
+        # (płytkie kopie - process() przycina t1 segmentów wejściowych)
+        self.segments = self._stage._merge_short_bursts([dict(seg) for seg in segments])
+        scores = np.array([seg.get('final_score', 0) for seg in self.segments], dtype=np.float64)
+        durations = np.array([seg['duration'] for seg in self.segments], dtype=np.float64)
+
+        order = np.argsort(-scores, kind='stable')
+        self.order = order.tolist()
+        self._scores_desc = scores[order]
+        self._scores_asc = self._scores_desc[::-1].tolist()
+        self._durations_desc = durations[order]
+
+        percentile = getattr(config.scoring, 'dynamic_threshold_percentile', 80)
+        self._fallback_threshold = float(np.percentile(scores, percentile)) if len(scores) else 0.0
+        self._duration_prefix: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    # === Statystyki kandydatów (O(log n)) ===
+
+    def _count_at_least(self, threshold: float) -> int:
+        """Liczba segmentów z score ≥ threshold (= długość prefiksu `order`)"""
+        return len(self._scores_asc) - bisect_left(self._scores_asc, threshold)
+
+    def _prefix_len(self, threshold: float) -> int:
+        """Prefiks po filtrze score z fallbackiem (jak _filter_by_score_with_fallback)"""
+        if threshold <= 0:
+            return len(self.order)
+        k = self._count_at_least(threshold)
+        if k == 0 and self.order:
+            k = max(1, self._count_at_least(self._fallback_threshold))
+        return k
+
+    def _duration_sums(self, min_dur: int, max_dur: int):
+        """Sumy prefiksowe (maska, liczba, sekundy) kandydatów w [min_dur, max_dur]"""
+        key = (min_dur, max_dur)
+        if key not in self._duration_prefix:
+            mask = (self._durations_desc >= min_dur) & (self._durations_desc <= max_dur)
+            counts = np.concatenate(([0], np.cumsum(mask)))
+            seconds = np.concatenate(([0.0], np.cumsum(np.where(mask, self._durations_desc, 0.0))))
+            self._duration_prefix[key] = (mask, counts, seconds)
+        return self._duration_prefix[key]
+
+    def _duration_bounds(self, selection) -> Tuple[int, int]:
+        if getattr(self.config, "mode", "stream") == "stream":
+            min_dur = 8
+        else:
+            min_dur = max(8, int(selection.min_clip_duration))
+        return min_dur, int(selection.max_clip_duration)
+
+    def candidate_totals(self, threshold: float, **overrides) -> Tuple[int, float]:
+        """(liczba kandydatów, ich łączny czas [s]) dla progu - bez selekcji"""
+        selection = replace(self.config.selection, **overrides)
+        _, counts, seconds = self._duration_sums(*self._duration_bounds(selection))
+        k = self._prefix_len(threshold)
+        return int(counts[k]), float(seconds[k])
+
+    # === Pełna selekcja ===
+
+    def preview(
+        self,
+        min_score_threshold: Optional[float] = None,
+        target_total_duration: Optional[float] = None,
+        max_clips: Optional[int] = None,
+        min_score: Optional[float] = None,
+        engine: Optional[str] = None,
+        **overrides
+    ) -> SelectionPreview:
+        """
+        Wynik selekcji Stage 6 dla podanych parametrów (None = wartość
+        z config.selection, min_score / engine - z przebiegu indeksu;
+        overrides - inne pola SelectionConfig).
+        """
+        if min_score is None:
+            min_score = self.min_score
+        for name, value in (('min_score_threshold', min_score_threshold),
+                            ('target_total_duration', target_total_duration),
+                            ('max_clips', max_clips),
+                            ('engine', engine or self.engine)):
+            if value is not None:
+                overrides[name] = value
+        selection = replace(self.config.selection, **overrides)
+        config = copy.copy(self.config)
+        config.selection = selection
+        stage = SelectionStage.__new__(SelectionStage)
+        stage.config = config
+        stage.verbose = False
+
+        min_dur, max_dur = self._duration_bounds(selection)
+        mask, counts, seconds = self._duration_sums(min_dur, max_dur)
+
+        # STEP 0-1: próg score (prefiks) + filtr długości (maska) + obniżenie progu
+        threshold = max(min_score, selection.min_score_threshold or 0.35)
+        k = self._prefix_len(threshold)
+        if counts[k] < 30 or seconds[k] < selection.target_total_duration * 0.5:
+            relaxed = max(0.25, threshold - 0.10)
+            relaxed_k = self._prefix_len(relaxed)
+            if counts[relaxed_k] > counts[k]:
+                threshold, k = relaxed, relaxed_k
+
+        if selection.engine == 'dp':
+            final_clips = self._select_dp(stage, k, mask)
+        else:
+            final_clips = self._select_greedy(stage, selection, k, mask, min_dur)
+
+        num_bins, _, bin_size = stage._coverage_limits(self.total_duration)
+        bin_counts = [0] * num_bins
+        for clip in final_clips:
+            bin_counts[stage._bin_index(clip['t0'], bin_size, num_bins)] += 1
+
+        return SelectionPreview(
+            clips=final_clips,
+            total_duration=float(sum(c['duration'] for c in final_clips)),
+            threshold=threshold,
+            num_candidates=int(counts[k]),
+            candidates_duration=float(seconds[k]),
+            bin_counts=bin_counts,
+            engine=selection.engine
+        )
+
+    def _select_greedy(
+        self, stage: SelectionStage, selection: SelectionConfig, k: int, mask: np.ndarray, min_dur: int
+    ) -> List[Dict]:
+        """NMS → merge → coverage → trim → top-up na prefiksie k (chronologicznie)"""
+        # STEP 2: greedy NMS po prefiksie (stop jak w _greedy_selection_with_nms)
+        selected = []
+        chosen = IntervalSet(selection.min_time_gap)
+        target = selection.target_total_duration
+        for pos in range(k):
+            if len(selected) >= selection.max_clips or chosen.total_duration >= target:
+                break
+            if not mask[pos]:
+                continue
+            seg = self.segments[self.order[pos]]
+            if chosen.conflicts(seg['t0'], seg['t1']):
+                continue
+            if chosen.total_duration + seg['duration'] > target * 1.2:
+                continue
+            selected.append(dict(seg))  # kopia - _adjust_duration modyfikuje t1
+            chosen.add(seg['t0'], seg['t1'], duration=seg['duration'])
+
+        # STEP 3-5: merge / coverage / trim na małej liście
+        merged = stage._smart_merge(selected, [])
+        balanced = stage._optimize_temporal_coverage(merged, self.total_duration)
+        final_clips = stage._adjust_duration(balanced)
+        final_clips = self._top_up(stage, final_clips, k, min_dur)
+        final_clips.sort(key=lambda c: c['t0'])
+        return final_clips
+
+    def _select_dp(self, stage: SelectionStage, k: int, mask: np.ndarray) -> List[Dict]:
+        """select_budgeted na kandydatach z prefiksu k (kolejność czasowa jak w process())"""
+        positions = sorted(self.order[pos] for pos in range(k) if mask[pos])
+        final_clips, _ = stage._dp_clips([self.segments[i] for i in positions], self.total_duration)
+        final_clips.sort(key=lambda c: c['t0'])
+        return final_clips
+
+    def _top_up(self, stage: SelectionStage, clips: List[Dict], k: int, min_dur: int) -> List[Dict]:
+        """_top_up_if_needed po gotowym porządku (bez sortowania puli)"""
+        target = stage.config.selection.target_total_duration
+        total = sum(c.get('duration', 0) for c in clips)
+        if (total >= target or len(clips) >= 40) and total >= target * 0.5:
+            return clips
+
+        # Pula: segmenty po progu (prefiks k) albo wszystkie, gdy coverage < 50%
+        limit = k if total >= target * 0.5 else len(self.order)
+        relaxed_min = max(4, int(min_dur * 0.6))
+        used_ids = {c.get('id') for c in clips}
+        min_gap = stage.config.selection.min_time_gap
+
+        for pos in range(limit):
+            if len(clips) >= 40 or total >= target:
+                break
+            seg = self.segments[self.order[pos]]
+            if seg.get('id') in used_ids or seg.get('duration', 0) < relaxed_min:
+                continue
+            if stage._has_overlap(seg, clips, min_gap):
+                continue
+            if total + seg.get('duration', 0) > target * 1.15:
+                continue
+            clips.append(dict(seg))
+            total += seg.get('duration', 0)
+        return clips
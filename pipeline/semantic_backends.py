@@ -0,0 +1,382 @@
+"""
+Semantic Backends
+Wymienne backendy semantic_score dla Stage 5.
+
+Dotąd bez OPENAI_API_KEY Stage 5 liczył semantic_score jako keyword_score / 15,
+a `scoring.nli_model` / `interest_labels` z configu nie były używane.
+Backend dostaje listę kandydatów i zwraca score 0-1 per segment
+(None = brak wyniku → 0.5):
+
+- GPTBackend      - GPTScorer (API zgodne z OpenAI, współbieżnie, cache)
+- NLIBackend      - lokalny zero-shot NLI na CPU, bez sieci i kosztu per token
+- KeywordBackend  - dotychczasowy fallback (keyword_score / 15)
+
+NLIBackend ocenia każdą parę (transkrypt, hipoteza z interest_labels):
+p(entailment) vs p(contradiction), a score to
+    0.5 + 0.5 * Σ waga · p / Σ |waga|
+(etykiety z ujemną wagą - procedury, podziękowania - obniżają score).
+Model działa przez ONNX Runtime, jeśli katalog / repo modelu zawiera plik
+.onnx (preferowany skwantyzowany int8, np. onnx/model_quantized.onnx),
+a w przeciwnym razie (także gdy brak pakietu onnxruntime lub sesja ONNX się
+nie tworzy) przez PyTorch z dynamiczną kwantyzacją int8 warstw Linear.
+Runner (plik .onnx / PyTorch int8 / PyTorch fp32 na GPU) jest częścią klucza
+cache - różne runnery dają różne score'y. Pary są sortowane po długości
+(mniej paddingu), dzielone na batche i liczone w `nli_workers` wątkach
+(ONNX Runtime / torch zwalniają GIL),
+każdy z cpu_count / nli_workers wątkami obliczeń. Wyniki trafiają do cache
+jak odpowiedzi GPT.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .gpt_scorer import GPTScoreCache, GPTScorer, transcript_key
+
+MAX_TRANSCRIPT_CHARS = 400  # jak w promptach GPT
+HYPOTHESIS_TEMPLATES = {
+    'pl': "Ten fragment to {}.",
+    'en': "This segment is {}.",
+}
+# Pliki ONNX szukane w katalogu / repo modelu (kolejność = preferencja)
+ONNX_QUANTIZED_FILES = ("onnx/model_quantized.onnx", "model_quantized.onnx", "onnx/model_int8.onnx")
+ONNX_FILES = ("onnx/model.onnx", "model.onnx")
+
+
+class SemanticBackend:
+    """Interfejs backendu semantic_score"""
+
+    name = "base"
+
+    def __init__(self):
+        self.stats: Dict[str, float] = {}
+
+    def load(self) -> None:
+        """Przygotowanie (ładowanie modelu) - wyjątek = backend niedostępny"""
+
+    def score(
+        self,
+        segments: Sequence[Dict],
+        progress_callback: Optional[Callable[[float, str], None]] = None
+    ) -> List[Optional[float]]:
+        raise NotImplementedError
+
+    def summary(self) -> str:
+        return self.name
+
+    def cancel(self) -> None:
+        pass
+
+
+class KeywordBackend(SemanticBackend):
+    """Heurystyka bez modelu: keyword_score / 15"""
+
+    name = "keywords"
+
+    def score(self, segments, progress_callback=None):
+        return [min(seg.get('features', {}).get('keyword_score', 0) / 15.0, 1.0) for seg in segments]
+
+
+class GPTBackend(SemanticBackend):
+    """GPTScorer na transkryptach (max MAX_TRANSCRIPT_CHARS znaków)"""
+
+    name = "gpt"
+
+    def __init__(self, scorer: GPTScorer):
+        super().__init__()
+        self.scorer = scorer
+        self.stats = scorer.stats
+
+    def score(self, segments, progress_callback=None):
+        transcripts = [seg.get('transcript', '')[:MAX_TRANSCRIPT_CHARS] for seg in segments]
+        return self.scorer.score(transcripts, progress_callback=progress_callback)
+
+    def summary(self) -> str:
+        return (f"{self.scorer.model}: {self.stats['requests']} zapytań ({self.stats['retries']} ponowień), "
+                f"{self.stats['cached']} z cache")
+
+    def cancel(self) -> None:
+        self.scorer.cancel()
+
+
+# === Lokalny NLI ===
+
+class _ONNXRunner:
+    """Sesja ONNX Runtime na CPU"""
+
+    def __init__(self, onnx_path: Path, threads: int):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.description = self.describe(onnx_path)
+
+    @staticmethod
+    def describe(onnx_path: Path) -> str:
+        return f"ONNX ({Path(onnx_path).name})"
+
+    def __call__(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        feed = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        return self.session.run(None, feed)[0]
+
+
+class _TorchRunner:
+    """Model PyTorch (CPU: dynamiczna kwantyzacja int8 warstw Linear)"""
+
+    def __init__(self, model_name: str, quantize: bool, threads: int, device: str = "cpu"):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        self.torch = torch
+        self.device = device
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        if device == "cpu":
+            torch.set_num_threads(threads)
+            if quantize:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(device)
+        self.description = self.describe(quantize, device)
+
+    @staticmethod
+    def describe(quantize: bool, device: str) -> str:
+        return f"PyTorch {device}" + (" int8" if quantize and device == "cpu" else "")
+
+    def __call__(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        torch = self.torch
+        inputs = {k: torch.from_numpy(v).to(self.device) for k, v in encoded.items()}
+        with torch.inference_mode():
+            return self.model(**inputs).logits.float().cpu().numpy()
+
+
+def _onnxruntime_available() -> bool:
+    """onnxruntime jest opcjonalny (requirements.txt) - bez niego NLI działa przez PyTorch"""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def find_onnx_file(model_name: str, quantize: bool = True) -> Optional[Path]:
+    """Plik .onnx w katalogu modelu albo w repo HF (z lokalnego cache, bez wymuszania sieci)"""
+    names = (ONNX_QUANTIZED_FILES + ONNX_FILES) if quantize else (ONNX_FILES + ONNX_QUANTIZED_FILES)
+    local_dir = Path(model_name)
+    if local_dir.is_dir():
+        for name in names:
+            if (local_dir / name).exists():
+                return local_dir / name
+        return None
+
+    try:
+        from huggingface_hub import hf_hub_download
+    except ImportError:
+        return None
+    for name in names:
+        try:
+            return Path(hf_hub_download(model_name, name))
+        except Exception:
+            continue
+    return None
+
+
+class NLIBackend(SemanticBackend):
+    """Zero-shot NLI (interest_labels jako hipotezy) na lokalnym modelu"""
+
+    name = "nli"
+
+    def __init__(
+        self,
+        model_name: str,
+        labels: Dict[str, float],
+        language: str = "pl",
+        batch_size: int = 8,
+        max_length: int = 256,
+        workers: int = 2,
+        use_onnx: bool = True,
+        quantize: bool = True,
+        device: str = "cpu",
+        cache: Optional[GPTScoreCache] = None
+    ):
+        super().__init__()
+        self.model_name = model_name
+        self.labels = dict(labels)
+        self.template = HYPOTHESIS_TEMPLATES.get(language, HYPOTHESIS_TEMPLATES['en'])
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+        self.workers = max(1, workers)
+        self.use_onnx = use_onnx
+        self.quantize = quantize
+        self.device = device
+        self.cache = cache
+        self.tokenizer = None
+        self.runner = None
+        self._onnx_file: Optional[Path] = None
+        self._onnx_resolved = False
+        self._entail_idx = None
+        self._contra_idx = None
+        self._cancelled = threading.Event()
+        self.stats = {'pairs': 0, 'cached': 0, 'seconds': 0.0}
+
+    def _resolve_onnx_file(self) -> Optional[Path]:
+        """Plik .onnx dla runnera (None = PyTorch) - ustalany raz, bez ładowania modelu"""
+        if not self._onnx_resolved:
+            usable = self.use_onnx and self.device == "cpu" and _onnxruntime_available()
+            self._onnx_file = find_onnx_file(self.model_name, self.quantize) if usable else None
+            self._onnx_resolved = True
+        return self._onnx_file
+
+    @property
+    def runner_description(self) -> str:
+        """Runner załadowany albo ten, który załaduje load()"""
+        if self.runner is not None:
+            return self.runner.description
+        onnx_file = self._resolve_onnx_file()
+        if onnx_file is not None:
+            return _ONNXRunner.describe(onnx_file)
+        return _TorchRunner.describe(self.quantize, self.device)
+
+    @property
+    def version(self) -> str:
+        """Klucz cache: model, hipotezy z wagami, kwantyzacja, runner (ONNX / PyTorch int8 / fp32)"""
+        payload = repr((self.model_name, sorted(self.labels.items()), self.template, self.quantize,
+                        self.runner_description))
+        return "nli-" + hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+    def load(self) -> None:
+        if self.runner is not None:
+            return
+        from transformers import AutoConfig, AutoTokenizer
+
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model_config = AutoConfig.from_pretrained(self.model_name)
+
+        onnx_file = self._resolve_onnx_file()
+        if onnx_file is not None:
+            try:
+                self.runner = _ONNXRunner(onnx_file, threads)
+            except Exception as e:  # uszkodzony plik / niezgodna wersja onnxruntime
+                print(f"   ⚠️ ONNX Runtime: {e} - NLI przez PyTorch")
+                self._onnx_file = None
+        if self.runner is None:
+            self.runner = _TorchRunner(self.model_name, self.quantize, threads, self.device)
+
+        label_ids = {str(name).lower(): int(idx) for idx, name in model_config.id2label.items()}
+        self._entail_idx = next((i for name, i in label_ids.items() if name.startswith('entail')), None)
+        self._contra_idx = next((i for name, i in label_ids.items() if name.startswith('contra')), None)
+        if self._entail_idx is None:
+            raise ValueError(f"Model {self.model_name} nie ma etykiety 'entailment' (id2label: {model_config.id2label})")
+        print(f"   ✓ NLI: {self.model_name} [{self.runner.description}, {self.workers}×{threads} wątków]")
+
+    def _entailment(self, logits: np.ndarray) -> np.ndarray:
+        """p(entailment) - względem contradiction (jak zero-shot multi-label) albo wszystkich klas"""
+        if self._contra_idx is not None:
+            logits = logits[:, [self._contra_idx, self._entail_idx]]
+            idx = 1
+        else:
+            idx = self._entail_idx
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs[:, idx] / probs.sum(axis=1)
+
+    def _run_batch(self, premises: List[str], hypotheses: List[str]) -> np.ndarray:
+        if self._cancelled.is_set():
+            raise InterruptedError("NLI scoring anulowany")
+        encoded = self.tokenizer(
+            premises, hypotheses,
+            padding=True, truncation='only_first', max_length=self.max_length, return_tensors='np'
+        )
+        return self._entailment(self.runner(dict(encoded)))
+
+    def _lookup(self, transcripts: List[str]) -> tuple:
+        """Klucze cache (bieżąca wersja), wyniki z cache i braki do policzenia"""
+        keys = [transcript_key(self.version, t) for t in transcripts]
+        results: Dict[str, float] = {}
+        missing: Dict[str, str] = {}
+        cached_count = 0
+        for key, text in zip(keys, transcripts):
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                results[key] = cached
+                cached_count += 1
+            elif not text.strip():
+                results[key] = 0.5
+            else:
+                missing.setdefault(key, text)
+        return keys, results, missing, cached_count
+
+    def score(self, segments, progress_callback=None):
+        transcripts = [seg.get('transcript', '')[:MAX_TRANSCRIPT_CHARS] for seg in segments]
+        keys, results, missing, cached_count = self._lookup(transcripts)
+
+        if missing:
+            version = self.version
+            self.load()
+            if self.version != version:  # load() przeszedł z ONNX na PyTorch → inne klucze cache
+                keys, results, missing, cached_count = self._lookup(transcripts)
+            if missing:
+                results.update(self._score_texts(missing, progress_callback))
+        self.stats['cached'] += cached_count
+        return [results.get(key) for key in keys]
+
+    def _score_texts(self, texts: Dict[str, str], progress_callback=None) -> Dict[str, float]:
+        start = time.perf_counter()
+        labels = list(self.labels)
+        weights = np.array([self.labels[label] for label in labels], dtype=np.float64)
+        hypotheses = [self.template.format(label) for label in labels]
+
+        # Pary (transkrypt, hipoteza) posortowane po długości transkryptu - mniej paddingu
+        order = sorted(texts, key=lambda k: len(texts[k]))
+        pairs = [(key, j) for key in order for j in range(len(labels))]
+        batches = [pairs[i:i + self.batch_size] for i in range(0, len(pairs), self.batch_size)]
+        self.stats['pairs'] += len(pairs)
+
+        probs: Dict[str, np.ndarray] = {key: np.zeros(len(labels)) for key in order}
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self._run_batch, [texts[k] for k, _ in batch], [hypotheses[j] for _, j in batch])
+                for batch in batches
+            ]
+            try:
+                for batch, future in zip(batches, futures):
+                    for (key, j), p in zip(batch, future.result()):
+                        probs[key][j] = p
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done / len(batches), f"NLI batch {done}/{len(batches)}")
+            except BaseException:
+                self.cancel()
+                for future in futures:
+                    future.cancel()
+                raise
+
+        norm = float(np.abs(weights).sum()) or 1.0
+        scores = {key: float(np.clip(0.5 + 0.5 * (weights @ p) / norm, 0.0, 1.0)) for key, p in probs.items()}
+        if self.cache is not None:
+            self.cache.put_many(scores)
+        self.stats['seconds'] += time.perf_counter() - start
+        return scores
+
+    def summary(self) -> str:
+        description = self.runner.description if self.runner is not None else "nie załadowany"
+        return (f"NLI {self.model_name} [{description}]: {self.stats['pairs']} par w "
+                f"{self.stats['seconds']:.1f}s, {self.stats['cached']} z cache")
+
+    def cancel(self) -> None:
+        self._cancelled.set()
@@ -1,17 +1,51 @@
 """
 Stage 1: Ingest & Preprocessing
-- Ekstrakcja audio z video
-- Normalizacja głośności (EBU R128)
+- Ekstrakcja audio z video (jedno dekodowanie VOD, razem z pomiarem głośności)
+- Normalizacja głośności (EBU R128, dwuprzebiegowy loudnorm)
+- Opcjonalnie surowe float32 PCM do mmap
 - Walidacja plików
 """
 
 import subprocess
 import json
+import re
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from .config import Config
 
+# Parametry loudnorm (poza target I z config.audio.target_loudness)
+LOUDNORM_LRA = 11
+LOUDNORM_TP = -1.5
+
+# Surowe float32 PCM (little-endian, bez nagłówka) - np.memmap(path, dtype='<f4')
+PCM_F32_FILENAME = "audio_normalized.f32"
+
+_LOUDNORM_KEYS = ('input_i', 'input_lra', 'input_tp', 'input_thresh', 'target_offset')
+
+
+def parse_loudnorm_stats(stderr: str) -> Optional[Dict[str, float]]:
+    """
+    Wyciągnij pomiary z loudnorm print_format=json (ostatni blok JSON w stderr ffmpeg).
+    
+    Returns:
+        Dict input_i/input_lra/input_tp/input_thresh/target_offset lub None
+    """
+    for block in reversed(re.findall(r"\{[^{}]*\}", stderr)):
+        try:
+            data = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        if all(key in data for key in _LOUDNORM_KEYS):
+            try:
+                stats = {key: float(data[key]) for key in _LOUDNORM_KEYS}
+            except (TypeError, ValueError):
+                return None  # np. "-inf" dla ciszy
+            if all(abs(v) != float('inf') for v in stats.values()):
+                return stats
+            return None
+    return None
+
 
 class IngestStage:
     """Stage 1: Audio extraction i preprocessing"""
@@ -40,33 +74,42 @@ class IngestStage:
         """
         Główna metoda przetwarzania
         
+        Wideo jest dekodowane tylko raz: jeden przebieg ffmpeg zapisuje surowe
+        audio (16kHz mono) i jednocześnie mierzy głośność (loudnorm pass 1).
+        Pass 2 (liniowy loudnorm z pomiarami) czyta już mały plik WAV.
+        
         Returns:
             Dict zawierający:
                 - audio_raw: Path do surowego audio
                 - audio_normalized: Path do znormalizowanego audio
+                - audio_pcm_f32: Path do surowego float32 PCM (mmap) lub None
+                - loudness: Pomiary loudnorm (pass 1) lub None
                 - metadata: Dict z metadanymi video
         """
         input_path = Path(input_file)
         
-        # 1. Walidacja pliku wejściowego
+        # 1. Walidacja pliku wejściowego (ffprobe czyta tylko nagłówki)
         print("📋 Walidacja pliku wejściowego...")
         metadata = self._validate_and_get_metadata(input_path)
         
-        # 2. Ekstrakcja audio
-        print("🎵 Ekstrakcja audio...")
+        # 2. Ekstrakcja audio + pomiar głośności (jedyny przebieg po wideo)
+        print("🎵 Ekstrakcja audio + pomiar głośności...")
         audio_raw = output_dir / "audio_raw.wav"
-        self._extract_audio(input_path, audio_raw)
+        loudness = self._extract_audio(input_path, audio_raw)
         
-        # 3. Normalizacja głośności
+        # 3. Normalizacja głośności (pass 2 na WAV 16kHz)
         print("🔊 Normalizacja głośności (EBU R128)...")
         audio_normalized = output_dir / "audio_normalized.wav"
-        self._normalize_audio(audio_raw, audio_normalized)
+        audio_pcm = output_dir / PCM_F32_FILENAME if self.config.audio.write_pcm_f32 else None
+        self._normalize_audio(audio_raw, audio_normalized, loudness, audio_pcm)
         
         print("✅ Stage 1 zakończony")
         
         return {
             'audio_raw': str(audio_raw),
             'audio_normalized': str(audio_normalized),
+            'audio_pcm_f32': str(audio_pcm) if audio_pcm else None,
+            'loudness': loudness,
             'metadata': metadata
         }
     
@@ -150,55 +193,123 @@ class IngestStage:
         
         return metadata
     
-    def _extract_audio(self, input_file: Path, output_file: Path):
+    def _audio_format_filter(self) -> str:
+        layout = 'mono' if self.config.audio.channels == 1 else 'stereo'
+        return f"aformat=sample_rates={self.config.audio.sample_rate}:channel_layouts={layout}"
+    
+    def _loudnorm_target(self) -> str:
+        return f"I={self.config.audio.target_loudness}:LRA={LOUDNORM_LRA}:TP={LOUDNORM_TP}"
+    
+    def _extract_audio(self, input_file: Path, output_file: Path) -> Optional[Dict[str, float]]:
         """
-        Ekstrakcja audio z video
+        Ekstrakcja audio z video + pomiar loudnorm w tym samym przebiegu
         Output: 16kHz mono WAV (wymóg Whisper)
+        
+        Dekodowany jest tylko pierwszy strumień audio (-map), wideo jest pomijane.
+        asplit rozdziela sygnał na zapis WAV i gałąź mierzącą głośność (-f null).
+        
+        Returns:
+            Pomiary loudnorm (input_i, input_lra, input_tp, input_thresh, target_offset)
+            lub None (pomiar wyłączony / nieudany)
         """
-        cmd = [
-            'ffmpeg',
-            '-i', str(input_file),
-            '-vn',  # No video
-            '-ac', str(self.config.audio.channels),  # Mono
-            '-ar', str(self.config.audio.sample_rate),  # 16kHz
-            '-y',  # Overwrite
-            str(output_file)
-        ]
+        measure = self._uses_loudnorm() and self.config.audio.loudnorm_two_pass
+        
+        if measure:
+            graph = (
+                f"[0:a:0]{self._audio_format_filter()},asplit=2[raw][meas];"
+                f"[meas]loudnorm={self._loudnorm_target()}:print_format=json[measured]"
+            )
+            cmd = [
+                'ffmpeg', '-hide_banner', '-nostats',
+                '-i', str(input_file),
+                '-filter_complex', graph,
+                '-map', '[raw]', '-c:a', 'pcm_s16le', '-y', str(output_file),
+                '-map', '[measured]', '-f', 'null', '-'
+            ]
+        else:
+            cmd = [
+                'ffmpeg', '-hide_banner', '-nostats',
+                '-i', str(input_file),
+                '-map', '0:a:0',
+                '-af', self._audio_format_filter(),
+                '-c:a', 'pcm_s16le', '-y', str(output_file)
+            ]
         
         try:
-            subprocess.run(
+            result = subprocess.run(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 check=True
             )
-            
-            print(f"   ✓ Audio zapisane: {output_file.name}")
-            
         except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"ffmpeg extraction error: {e.stderr.decode()}")
+            raise RuntimeError(f"ffmpeg extraction error: {e.stderr.decode(errors='replace')}")
+        
+        print(f"   ✓ Audio zapisane: {output_file.name}")
+        
+        if not measure:
+            return None
+        
+        loudness = parse_loudnorm_stats(result.stderr.decode(errors='replace'))
+        if loudness is None:
+            print("   ⚠️ Brak pomiarów loudnorm - normalizacja jednoprzebiegowa")
+        else:
+            print(f"   Zmierzona głośność: {loudness['input_i']:.1f} LUFS")
+        return loudness
     
-    def _normalize_audio(self, input_file: Path, output_file: Path):
+    def _uses_loudnorm(self) -> bool:
+        return self.config.audio.normalization == "ebu_r128"
+    
+    def _normalize_audio(
+        self,
+        input_file: Path,
+        output_file: Path,
+        loudness: Optional[Dict[str, float]] = None,
+        pcm_file: Optional[Path] = None
+    ):
         """
         Normalizacja głośności używając EBU R128
         
         Sejm ma bardzo nierówną głośność (mikrofony różne, oklaski itp)
         EBU R128 to broadcast standard dla normalizacji
+        
+        Z pomiarami z pass 1 loudnorm działa liniowo (stałe wzmocnienie, bez
+        "pompowania" głośności); bez nich - tryb dynamiczny (jeden przebieg).
+        Opcjonalnie ten sam sygnał (zawsze mono) trafia do surowego float32 PCM (pcm_file),
+        który kolejne etapy mogą mapować do pamięci bez dekodowania WAV.
         """
         target_loudness = self.config.audio.target_loudness
         
-        # Dwu-przebiegowa normalizacja:
-        # Pass 1: Analiza
-        # Pass 2: Aplikacja
+        chain = []
+        if self._uses_loudnorm():
+            loudnorm = f"loudnorm={self._loudnorm_target()}"
+            if loudness:
+                loudnorm += (
+                    f":measured_I={loudness['input_i']}"
+                    f":measured_LRA={loudness['input_lra']}"
+                    f":measured_TP={loudness['input_tp']}"
+                    f":measured_thresh={loudness['input_thresh']}"
+                    f":offset={loudness['target_offset']}"
+                    ":linear=true"
+                )
+            chain.append(loudnorm)
+        # loudnorm pracuje wewnętrznie na 192kHz → z powrotem do 16kHz mono
+        chain.append(self._audio_format_filter())
+        
+        outputs = ['-map', '[norm]', '-c:a', 'pcm_s16le', '-y', str(output_file)]
+        graph = f"[0:a]{','.join(chain)}"
+        if pcm_file:
+            # AudioStore mapuje PCM jako mono - przy audio.channels: 2 gałąź PCM jest downmiksowana
+            graph += ",asplit=2[norm][pcmsrc];[pcmsrc]aformat=channel_layouts=mono[pcm]"
+            outputs += ['-map', '[pcm]', '-f', 'f32le', '-c:a', 'pcm_f32le', '-y', str(pcm_file)]
+        else:
+            graph += "[norm]"
         
         cmd = [
-            'ffmpeg',
+            'ffmpeg', '-hide_banner', '-nostats',
             '-i', str(input_file),
-            '-af', f'loudnorm=I={target_loudness}:LRA=11:TP=-1.5',
-            '-ar', str(self.config.audio.sample_rate),
-            '-ac', str(self.config.audio.channels),
-            '-y',
-            str(output_file)
+            '-filter_complex', graph,
+            *outputs
         ]
         
         try:
@@ -210,10 +321,13 @@ class IngestStage:
             )
             
             print(f"   ✓ Audio znormalizowane: {output_file.name}")
-            print(f"   Target loudness: {target_loudness} LUFS")
+            print(f"   Target loudness: {target_loudness} LUFS"
+                  f" ({'liniowo, 2 przebiegi' if loudness else 'dynamicznie'})")
+            if pcm_file:
+                print(f"   ✓ PCM float32: {pcm_file.name}")
             
         except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"ffmpeg normalization error: {e.stderr.decode()}")
+            raise RuntimeError(f"ffmpeg normalization error: {e.stderr.decode(errors='replace')}")
     
     def cancel(self):
         """Anuluj operację (placeholder dla future)"""
@@ -3,18 +3,189 @@ Stage 2: Voice Activity Detection (VAD)
 - Używa Silero VAD do wykrycia gdzie jest mowa
 - Segmentuje audio na fragmenty z mową
 - Post-processing: merge gaps, split długich segmentów
+- Tryb streaming: audio czytane oknami z AudioStore, stan Silero przenoszony
+  między oknami, segmenty emitowane na bieżąco (stała pamięć)
 """
 
 import torch
 import torchaudio
 import json
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 import numpy as np
 
+from .audio_store import AudioStore
 from .config import Config
 
 
+# Parametry Silero utils_vad.get_speech_timestamps (wartości domyślne używane przez _detect_speech)
+SILERO_WINDOW_SAMPLES = 512  # 16kHz
+SILERO_SPEECH_PAD_MS = 30
+
+
+ENERGY_BLOCK_FRAMES = 1 << 16  # ramek na blok przy liczeniu energii (~11 min przy 10ms hop)
+
+
+def frame_energy(
+    audio: np.ndarray,
+    frame_length: int,
+    hop_length: int,
+    block_frames: int = ENERGY_BLOCK_FRAMES
+) -> np.ndarray:
+    """
+    Średnia energia ramek audio[i:i+frame_length] dla i in range(0, len - frame_length, hop).
+    
+    Sumy kwadratów z różnic sum skumulowanych (float64). Gdy ramka to
+    wielokrotność hopu (20ms/10ms), sumowane są rozłączne bloki hopu (einsum,
+    bez kopii audio); w przeciwnym razie blokami ramek - pamięć nie zależy
+    od długości nagrania.
+    """
+    num_frames = len(range(0, len(audio) - frame_length, hop_length))
+    
+    if num_frames and frame_length % hop_length == 0:
+        per_frame = frame_length // hop_length
+        num_hops = num_frames - 1 + per_frame
+        hops = np.asarray(audio[:num_hops * hop_length]).reshape(num_hops, hop_length)
+        hop_sums = np.einsum('ij,ij->i', hops, hops, dtype=np.float64)
+        cumsum = np.concatenate(([0.0], np.cumsum(hop_sums)))
+        return (cumsum[per_frame:per_frame + num_frames] - cumsum[:num_frames]) / frame_length
+    
+    energy = np.empty(num_frames, dtype=np.float64)
+    offsets = np.arange(min(block_frames, max(num_frames, 1))) * hop_length
+    
+    for first in range(0, num_frames, block_frames):
+        count = min(block_frames, num_frames - first)
+        start = first * hop_length
+        block = np.asarray(audio[start:start + (count - 1) * hop_length + frame_length], dtype=np.float64)
+        cumsum = np.concatenate(([0.0], np.cumsum(block * block)))
+        idx = offsets[:count]
+        energy[first:first + count] = (cumsum[idx + frame_length] - cumsum[idx]) / frame_length
+    
+    return energy
+
+
+def rolling_percentile_threshold(
+    energy: np.ndarray,
+    percentile: float,
+    window_frames: int,
+    block_frames: int = 100
+) -> np.ndarray:
+    """
+    Próg adaptacyjny: kroczący percentyl energii (okno window_frames, wyśrodkowane).
+    
+    Percentyl liczony jest najpierw per blok (block_frames ramek), a potem kroczący
+    percentyl tych wartości - O(N) pamięci zamiast okna pełnej rozdzielczości.
+    """
+    num_blocks = -(-len(energy) // block_frames)
+    padded = np.full(num_blocks * block_frames, np.nan)
+    padded[:len(energy)] = energy
+    block_values = np.nanpercentile(padded.reshape(num_blocks, block_frames), percentile, axis=1)
+    
+    half = max(1, window_frames // block_frames) // 2
+    edge_padded = np.pad(block_values, half, mode='edge')
+    windows = np.lib.stride_tricks.sliding_window_view(edge_padded, 2 * half + 1)
+    block_threshold = np.percentile(windows, percentile, axis=1)
+    
+    return np.repeat(block_threshold, block_frames)[:len(energy)]
+
+
+class StreamingSpeechTracker:
+    """
+    Inkrementalna wersja Silero get_speech_timestamps.
+    
+    Przyjmuje kolejne prawdopodobieństwa mowy (po jednym na okno 512 próbek)
+    i zwraca gotowe fragmenty mowy (w próbkach) gdy tylko są pewne - fragment
+    jest oddawany po rozpoczęciu następnego, bo padding jego końca zależy od
+    przerwy do kolejnej mowy. Logika progów/paddingu jak w utils_vad
+    (bez max_speech_duration, którego _detect_speech nie ustawia).
+    """
+    
+    def __init__(
+        self,
+        threshold: float,
+        sampling_rate: int,
+        min_speech_duration_ms: int,
+        min_silence_duration_ms: int,
+        speech_pad_ms: int = SILERO_SPEECH_PAD_MS,
+        window_size_samples: int = SILERO_WINDOW_SAMPLES
+    ):
+        self.threshold = threshold
+        self.neg_threshold = threshold - 0.15
+        self.window = window_size_samples
+        self.min_speech_samples = sampling_rate * min_speech_duration_ms / 1000
+        self.min_silence_samples = sampling_rate * min_silence_duration_ms / 1000
+        self.speech_pad_samples = sampling_rate * speech_pad_ms / 1000
+        
+        self._index = 0
+        self._triggered = False
+        self._start = 0
+        self._temp_end = 0
+        self._pending: Optional[Dict[str, int]] = None
+        self._emitted = 0
+    
+    def push(self, probs: Iterable[float]) -> List[Dict[str, int]]:
+        """Dodaj prawdopodobieństwa kolejnych okien; zwraca zakończone fragmenty"""
+        done = []
+        for prob in probs:
+            position = self.window * self._index
+            self._index += 1
+            
+            if prob >= self.threshold and self._temp_end:
+                self._temp_end = 0
+            
+            if prob >= self.threshold and not self._triggered:
+                self._triggered = True
+                self._start = position
+                continue
+            
+            if prob < self.neg_threshold and self._triggered:
+                if not self._temp_end:
+                    self._temp_end = position
+                if position - self._temp_end < self.min_silence_samples:
+                    continue
+                if self._temp_end - self._start > self.min_speech_samples:
+                    done.extend(self._add_speech({'start': self._start, 'end': self._temp_end}))
+                self._temp_end = 0
+                self._triggered = False
+        return done
+    
+    def finish(self, total_samples: int) -> List[Dict[str, int]]:
+        """Zamknij strumień (długość audio w próbkach); zwraca pozostałe fragmenty"""
+        done = []
+        if self._triggered and total_samples - self._start > self.min_speech_samples:
+            done.extend(self._add_speech({'start': self._start, 'end': total_samples}))
+            self._triggered = False
+        
+        if self._pending is not None:
+            last = self._pending
+            last['end'] = int(min(total_samples, last['end'] + self.speech_pad_samples))
+            done.append(last)
+            self._pending = None
+        return done
+    
+    def _add_speech(self, speech: Dict[str, int]) -> List[Dict[str, int]]:
+        if self._emitted == 0 and self._pending is None:
+            speech['start'] = int(max(0, speech['start'] - self.speech_pad_samples))
+        
+        if self._pending is None:
+            self._pending = speech
+            return []
+        
+        previous = self._pending
+        silence_duration = speech['start'] - previous['end']
+        if silence_duration < 2 * self.speech_pad_samples:
+            previous['end'] += int(silence_duration // 2)
+            speech['start'] = int(max(0, speech['start'] - silence_duration // 2))
+        else:
+            # następna mowa zaczyna się ≥ 2*pad dalej, więc bez min(audio_length, ...)
+            previous['end'] = int(previous['end'] + self.speech_pad_samples)
+            speech['start'] = int(max(0, speech['start'] - self.speech_pad_samples))
+        
+        self._pending = speech
+        self._emitted += 1
+        return [previous]
+
+
 class VADStage:
     """Stage 2: Voice Activity Detection"""
     
@@ -22,6 +193,7 @@ class VADStage:
         self.config = config
         self.model = None
         self.utils = None
+        self._cancelled = False
         self._load_model()
     
     def _load_model(self):
@@ -74,10 +246,17 @@ class VADStage:
             except Exception as e2:
                 raise RuntimeError(f"Nie udało się załadować Silero VAD: {e2}")
     
-    def process(self, audio_file: str, output_dir: Path) -> Dict[str, Any]:
+    def process(
+        self,
+        audio_file: str,
+        output_dir: Path,
+        audio_store: Optional[AudioStore] = None
+    ) -> Dict[str, Any]:
         """
         Główna metoda przetwarzania
         
+        audio_store: wspólny bufor PCM (mmap) - tensor współdzieli pamięć z plikiem
+        
         Returns:
             Dict zawierający:
                 - segments: Lista segmentów z mową
@@ -85,23 +264,44 @@ class VADStage:
         """
         audio_path = Path(audio_file)
         
-        # 1. Wczytaj audio
-        print(f"🎵 Wczytywanie audio: {audio_path.name}")
-        waveform, sample_rate = self._load_audio(audio_path)
+        processed_segments = None
         
-        # 2. Uruchom VAD
-        print("🔍 Wykrywanie aktywności głosowej...")
-        try:
-            raw_segments = self._detect_speech(waveform, sample_rate)
-        except Exception as e:
-            print(f"   ⚠️ Błąd VAD, używam fallback metody: {e}")
-            raw_segments = self._detect_speech_fallback(waveform, sample_rate)
-        
-        print(f"   Znaleziono {len(raw_segments)} surowych segmentów")
+        # 1-3. Tryb streaming: okna z mmap, segmenty przetwarzane na bieżąco
+        if audio_store is not None and self.config.vad.streaming and audio_store.sample_rate == 16000:
+            print(f"🔍 Wykrywanie aktywności głosowej (streaming, {audio_store})...")
+            try:
+                processed_segments = list(self._iter_post_processed(self._iter_speech_streaming(audio_store)))
+            except InterruptedError:
+                raise
+            except Exception as e:
+                print(f"   ⚠️ Błąd VAD (streaming), używam fallback metody: {e}")
+                waveform, sample_rate = self._load_audio_store(audio_store)
+                processed_segments = self._post_process_segments(
+                    self._detect_speech_fallback(waveform, sample_rate)
+                )
         
-        # 3. Post-processing
-        print("⚙️ Post-processing segmentów...")
-        processed_segments = self._post_process_segments(raw_segments)
+        if processed_segments is None:
+            # 1. Wczytaj audio
+            if audio_store is not None:
+                print(f"🎵 Audio: {audio_store}")
+                waveform, sample_rate = self._load_audio_store(audio_store)
+            else:
+                print(f"🎵 Wczytywanie audio: {audio_path.name}")
+                waveform, sample_rate = self._load_audio(audio_path)
+            
+            # 2. Uruchom VAD
+            print("🔍 Wykrywanie aktywności głosowej...")
+            try:
+                raw_segments = self._detect_speech(waveform, sample_rate)
+            except Exception as e:
+                print(f"   ⚠️ Błąd VAD, używam fallback metody: {e}")
+                raw_segments = self._detect_speech_fallback(waveform, sample_rate)
+            
+            print(f"   Znaleziono {len(raw_segments)} surowych segmentów")
+            
+            # 3. Post-processing
+            print("⚙️ Post-processing segmentów...")
+            processed_segments = self._post_process_segments(raw_segments)
         
         print(f"   Po przetworzeniu: {len(processed_segments)} segmentów")
         
@@ -142,6 +342,18 @@ class VADStage:
         except Exception as e:
             raise RuntimeError(f"Błąd wczytywania audio: {e}")
     
+    def _load_audio_store(self, audio_store: AudioStore) -> tuple:
+        """Tensor (1, N) na mmap z AudioStore (bez kopii przy 16kHz)"""
+        waveform = audio_store.as_tensor().unsqueeze(0)
+        sample_rate = audio_store.sample_rate
+        
+        if sample_rate != 16000:
+            resampler = torchaudio.transforms.Resample(sample_rate, 16000)
+            waveform = resampler(waveform)
+            sample_rate = 16000
+        
+        return waveform, sample_rate
+    
     def _detect_speech(self, waveform: torch.Tensor, sample_rate: int) -> List[Dict]:
         """
         Wykryj segmenty mowy używając Silero VAD
@@ -189,9 +401,106 @@ class VADStage:
         
         return segments
     
+    def _iter_speech_streaming(self, audio_store: AudioStore) -> Iterator[Dict]:
+        """
+        Silero VAD po oknach AudioStore; zwraca surowe segmenty (jak _detect_speech) na bieżąco.
+        
+        Okna mają długość będącą wielokrotnością 512 próbek, a stan modelu nie jest
+        resetowany między nimi - prawdopodobieństwa są identyczne jak przy
+        przetwarzaniu całego tensora, więc nakładanie się okien nie jest potrzebne.
+        W pamięci jest tylko bieżące okno.
+        """
+        sample_rate = audio_store.sample_rate
+        window = SILERO_WINDOW_SAMPLES
+        chunk_windows = max(1, int(self.config.vad.chunk_seconds * sample_rate) // window)
+        device = 'cuda' if self.config.use_gpu and torch.cuda.is_available() else 'cpu'
+        
+        tracker = StreamingSpeechTracker(
+            threshold=self.config.vad.threshold,
+            sampling_rate=sample_rate,
+            min_speech_duration_ms=int(self.config.vad.min_speech_duration * 1000),
+            min_silence_duration_ms=int(self.config.vad.min_silence_duration * 1000)
+        )
+        
+        if hasattr(self.model, 'reset_states'):
+            self.model.reset_states()
+        
+        total = len(audio_store)
+        index = 0
+        
+        def to_segments(speeches):
+            nonlocal index
+            for ts in speeches:
+                start_sec = ts['start'] / sample_rate
+                end_sec = ts['end'] / sample_rate
+                yield {
+                    'id': f"seg_{index:04d}",
+                    't0': start_sec,
+                    't1': end_sec,
+                    'duration': end_sec - start_sec
+                }
+                index += 1
+        
+        with torch.no_grad():
+            for chunk_start, chunk in audio_store.iter_chunks(chunk_windows * window / sample_rate):
+                tensor = torch.from_numpy(np.array(chunk, dtype=np.float32)).to(device)
+                if len(tensor) % window:
+                    # Ostatnie okno nagrania dopełnione zerami (jak w get_speech_timestamps)
+                    tensor = torch.nn.functional.pad(tensor, (0, window - len(tensor) % window))
+                
+                probs = [
+                    self.model(tensor[i:i + window], sample_rate).item()
+                    for i in range(0, len(tensor), window)
+                ]
+                yield from to_segments(tracker.push(probs))
+                
+                self._check_cancelled()
+                print(f"   {min(total, chunk_start + len(chunk)) / sample_rate / 3600:.2f}h / "
+                      f"{total / sample_rate / 3600:.2f}h, segmentów: {index}")
+        
+        yield from to_segments(tracker.finish(total))
+    
+    def _iter_post_processed(self, raw_segments: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Strumieniowy odpowiednik _post_process_segments: merge przerw < min_silence,
+        split > max_segment_duration, numeracja seg_XXXX. Wymaga segmentów
+        w kolejności czasu (jak z VAD).
+        """
+        min_gap = self.config.vad.min_silence_duration
+        max_dur = self.config.vad.max_segment_duration
+        index = 0
+        current = None
+        
+        def finalize(segment):
+            nonlocal index
+            parts = self._split_long_segment(segment) if segment['duration'] > max_dur else [segment]
+            for part in parts:
+                part['id'] = f"seg_{index:04d}"
+                index += 1
+                yield part
+        
+        for seg in raw_segments:
+            if current is None:
+                current = seg.copy()
+                continue
+            
+            if seg['t0'] - current['t1'] < min_gap:
+                current['t1'] = seg['t1']
+                current['duration'] = current['t1'] - current['t0']
+            else:
+                yield from finalize(current)
+                current = seg.copy()
+        
+        if current is not None:
+            yield from finalize(current)
+    
     def _detect_speech_fallback(self, waveform: torch.Tensor, sample_rate: int) -> List[Dict]:
         """
         Fallback VAD using simple energy-based detection
+        
+        W pełni wektorowo: energia ramek z sum skumulowanych (blokami - stała
+        pamięć), próg = percentyl energii (globalny lub kroczący), krawędzie
+        segmentów z np.diff na masce mowy.
         """
         print("   Używam prostej detekcji opartej na energii...")
         
@@ -201,63 +510,42 @@ class VADStage:
         frame_length = int(0.02 * sample_rate)  # 20ms frames
         hop_length = int(0.01 * sample_rate)  # 10ms hop
         
-        # Oblicz energię w każdym oknie
-        energy = []
-        for i in range(0, len(audio_np) - frame_length, hop_length):
-            frame = audio_np[i:i+frame_length]
-            frame_energy = np.sum(frame ** 2) / len(frame)
-            energy.append(frame_energy)
-        
-        energy = np.array(energy)
+        energy = frame_energy(audio_np, frame_length, hop_length)
+        if len(energy) == 0:
+            return []
         
         # Threshold (percentyl 30 - poniżej tego to cisza)
-        threshold = np.percentile(energy, 30)
+        percentile = self.config.vad.energy_percentile
+        if self.config.vad.energy_adaptive:
+            window_frames = max(1, int(self.config.vad.energy_window_seconds * sample_rate / hop_length))
+            threshold = rolling_percentile_threshold(energy, percentile, window_frames)
+        else:
+            threshold = np.percentile(energy, percentile)
         
         # Znajdź segmenty z mową
         is_speech = energy > threshold
         
-        # Znajdź początki i końce segmentów
-        segments = []
-        in_speech = False
-        start_idx = 0
-        
-        for i, speech in enumerate(is_speech):
-            if speech and not in_speech:
-                # Początek segmentu
-                start_idx = i
-                in_speech = True
-            elif not speech and in_speech:
-                # Koniec segmentu
-                start_time = start_idx * hop_length / sample_rate
-                end_time = i * hop_length / sample_rate
-                duration = end_time - start_time
-                
-                # Tylko segmenty dłuższe niż min_duration
-                if duration >= self.config.vad.min_speech_duration:
-                    segments.append({
-                        'id': f"seg_{len(segments):04d}",
-                        't0': start_time,
-                        't1': end_time,
-                        'duration': duration
-                    })
-                
-                in_speech = False
+        # Początki i końce segmentów: zbocza maski (z ramkami ciszy na brzegach)
+        edges = np.diff(np.concatenate(([False], is_speech, [False])).astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
         
-        # Ostatni segment jeśli jest otwarty
-        if in_speech:
-            start_time = start_idx * hop_length / sample_rate
-            end_time = len(is_speech) * hop_length / sample_rate
-            duration = end_time - start_time
-            
-            if duration >= self.config.vad.min_speech_duration:
-                segments.append({
-                    'id': f"seg_{len(segments):04d}",
-                    't0': start_time,
-                    't1': end_time,
-                    'duration': duration
-                })
+        start_times = starts * hop_length / sample_rate
+        end_times = ends * hop_length / sample_rate
+        durations = end_times - start_times
         
-        return segments
+        # Tylko segmenty dłuższe niż min_duration
+        keep = durations >= self.config.vad.min_speech_duration
+        
+        return [
+            {
+                'id': f"seg_{i:04d}",
+                't0': float(t0),
+                't1': float(t1),
+                'duration': float(duration)
+            }
+            for i, (t0, t1, duration) in enumerate(zip(start_times[keep], end_times[keep], durations[keep]))
+        ]
     
     def _post_process_segments(self, segments: List[Dict]) -> List[Dict]:
         """
@@ -349,8 +637,12 @@ class VADStage:
         print(f"   💾 Segmenty zapisane: {output_file.name}")
     
     def cancel(self):
-        """Anuluj operację"""
-        pass
+        """Anuluj operację (przerywa tryb streaming na granicy okna)"""
+        self._cancelled = True
+    
+    def _check_cancelled(self):
+        if self._cancelled:
+            raise InterruptedError("Processing cancelled by user")
 
 
 if __name__ == "__main__":
@@ -1,12 +1,23 @@
 """
 Stage 3: Transkrypcja Audio → Tekst
 - Używa Faster-Whisper (optimized dla GPU)
-- TYLKO szybka metoda (wycinanie segmentów)
+- TYLKO szybka metoda (wycinanie segmentów: widok z AudioStore lub ffmpeg)
+- Tryb batched (asr.batched): BatchedInferencePipeline na tablicach numpy,
+  prawdziwe batche po asr.batch_size klipów, bez ffmpeg per segment
+- Tryb wieloprocesowy na CPU (asr.workers > 1): ASRWorkerPool, model per proces
+- Checkpoint po każdym batchu (TranscriptCheckpoint) - wznowienie transkrybuje
+  tylko brakujące segmenty
+- Reuse słów po zmianie VAD (WordStore): segmenty pokryte wcześniejszą
+  transkrypcją są składane ze słów, Whisper dostaje tylko luki
 """
 
 import json
+from bisect import bisect_right
+from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Union
+
+import numpy as np
 
 try:
     from faster_whisper import WhisperModel
@@ -16,22 +27,66 @@ except ImportError:
     subprocess.check_call(["pip", "install", "faster-whisper"])
     from faster_whisper import WhisperModel
 
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:  # faster-whisper < 1.1
+    BatchedInferencePipeline = None
+
+from .audio_store import AudioStore
+from .cache_manager import artifact_hash
 from .config import Config
+from .segment_store import write_segments
+from .transcript_checkpoint import TranscriptCheckpoint
+from .word_store import WordStore
+
+
+WHISPER_SAMPLE_RATE = 16000
+MAX_CLIP_SECONDS = 30.0  # okno Whispera - batched pipeline obcina dłuższe klipy
+
+
+def split_clips(segments: List[Dict], max_seconds: float = MAX_CLIP_SECONDS) -> tuple:
+    """
+    Podziel segmenty VAD na klipy ≤ max_seconds (równe części).
+    
+    Returns:
+        (clip_timestamps [{'start', 'end'}] w sekundach, indeks segmentu dla każdego klipu)
+    """
+    clips = []
+    owners = []
+    for idx, seg in enumerate(segments):
+        t0 = float(seg['t0'])
+        t1 = float(seg['t1'])
+        if t1 <= t0:
+            continue
+        parts = int(np.ceil((t1 - t0) / max_seconds))
+        step = (t1 - t0) / parts
+        for k in range(parts):
+            clips.append({'start': t0 + k * step, 'end': t1 if k == parts - 1 else t0 + (k + 1) * step})
+            owners.append(idx)
+    return clips, owners
 
 
 class TranscribeStage:
     """Stage 3: Automatic Speech Recognition z Whisper"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, max_workers: Optional[int] = None):
         self.config = config
+        # Limit procesów ASR z zewnątrz (pojemność 'asr' w ResourceBudget przy wielu jobach)
+        self.max_workers = max_workers
         self.model = None
+        self.batched_model = None
+        self._pool = None
         self._load_model()
     
     def _load_model(self):
         """Załaduj Faster-Whisper model"""
-        print(f"📥 Ładowanie Whisper model: {self.config.asr.model}")
-        
         device = "cuda" if self.config.use_gpu else "cpu"
+        if device == "cpu" and self.config.asr.workers > 1:
+            # Modele ładują procesy ASRWorkerPool (leniwie, przy pierwszej transkrypcji)
+            print(f"📥 Whisper {self.config.asr.model}: {self.config.asr.workers} workerów CPU")
+            return
+        
+        print(f"📥 Ładowanie Whisper model: {self.config.asr.model}")
         compute_type = self.config.asr.compute_type if device == "cuda" else "int8"
         
         try:
@@ -39,30 +94,187 @@ class TranscribeStage:
                 self.config.asr.model,
                 device=device,
                 compute_type=compute_type,
+                cpu_threads=self.config.asr.cpu_threads,
                 download_root=None
             )
             
             print(f"   ✓ Model załadowany na {device.upper()}")
             
+            if self.config.asr.batched and BatchedInferencePipeline is not None:
+                self.batched_model = BatchedInferencePipeline(model=self.model)
+                print(f"   ✓ Batched inference (batch_size={self.config.asr.batch_size})")
+            
         except Exception as e:
             raise RuntimeError(f"Nie udało się załadować Whisper: {e}")
     
+    def asr_slots(self) -> int:
+        """Instancje modelu Whisper: procesy ASRWorkerPool (CPU, asr.workers > 1) lub 1"""
+        if self.config.use_gpu or self.config.asr.workers <= 1:
+            return 1
+        workers = self.config.asr.workers
+        if self.max_workers:
+            workers = min(workers, self.max_workers)
+        return workers
+    
     def process(
         self, 
         audio_file: str, 
         vad_segments: List[Dict],
         output_dir: Path,
-        progress_callback: Optional[Callable] = None
+        progress_callback: Optional[Callable] = None,
+        audio_store: Optional[AudioStore] = None,
+        checkpoint: Optional[TranscriptCheckpoint] = None
     ) -> Dict[str, Any]:
-        """Główna metoda przetwarzania"""
+        """
+        Główna metoda przetwarzania
+        
+        audio_store: wspólny bufor PCM (mmap) - segmenty są wycinane jako widoki
+        numpy zamiast osobnego ffmpeg per segment
+        checkpoint: dziennik transkrypcji - segmenty już w nim zapisane nie są
+        transkrybowane ponownie, nowe są dopisywane po każdym batchu
+        (domyślnie w output_dir, per konfiguracja ASR)
+        """
         audio_path = Path(audio_file)
         
         print(f"🎤 Transkrypcja {len(vad_segments)} segmentów...")
         
+        if checkpoint is None:
+            asr_key = artifact_hash(asdict(self.config.asr))
+            checkpoint = TranscriptCheckpoint(Path(output_dir) / f"transcript_checkpoint_{asr_key}.jsonl")
+        records = checkpoint.load()
+        restored = checkpoint.restore(vad_segments, records)
+        pending = [seg for seg, done in zip(vad_segments, restored) if done is None]
+        if len(pending) < len(vad_segments):
+            print(f"   ♻️ Checkpoint: {len(vad_segments) - len(pending)} segmentów przywróconych, "
+                  f"{len(pending)} do transkrypcji")
+        
+        # Segmenty o przesuniętych granicach: słowa z wcześniejszych przebiegów + luki
+        word_store = None
+        gap_plan: Dict[str, List[Dict]] = {}
+        to_transcribe = pending
+        if pending and records and self.config.asr.reuse_words:
+            word_store = WordStore.from_records(records)
+            to_transcribe, gap_plan = self._plan_word_reuse(word_store, pending)
+        
+        if not to_transcribe:
+            new_segments = []
+        elif self.model is None:
+            new_segments = self._transcribe_with_pool(audio_path, to_transcribe, progress_callback, audio_store, checkpoint)
+        else:
+            new_segments = self.transcribe_segments(audio_path, to_transcribe, audio_store, progress_callback, checkpoint)
+        
+        by_id = {seg['id']: seg for seg in new_segments}
+        if gap_plan:
+            assembled = [
+                self._assemble_from_words(word_store, seg, [by_id[gap['id']] for gap in gap_plan[seg['id']]])
+                for seg in pending if seg['id'] in gap_plan
+            ]
+            checkpoint.append(assembled)
+            by_id.update((seg['id'], seg) for seg in assembled)
+        
+        transcribed_segments = [
+            done if done is not None else by_id[seg['id']]
+            for seg, done in zip(vad_segments, restored)
+        ]
+        
+        total_words = sum(len(seg.get('words', [])) for seg in transcribed_segments)
+        
+        print(f"   ✓ Transkrybowano {total_words} słów")
+        
+        output_file = self._save_segments(transcribed_segments, output_dir / "segments_with_transcript.json")
+        
+        print("✅ Stage 3 zakończony")
+        
+        return {
+            'segments': transcribed_segments,
+            'total_words': total_words,
+            'num_segments': len(transcribed_segments),
+            'output_file': str(output_file)
+        }
+    
+    def _plan_word_reuse(self, word_store: WordStore, segments: List[Dict]) -> tuple:
+        """
+        Podziel segmenty: niepokryte → do transkrypcji w całości; pokryte
+        (całkowicie lub częściowo) → składane ze słów, transkrybowane tylko luki.
+        
+        Returns:
+            (segmenty/luki do transkrypcji, {id segmentu: lista luk})
+        """
+        min_gap = self.config.asr.reuse_min_gap
+        to_transcribe = []
+        gap_plan: Dict[str, List[Dict]] = {}
+        
+        for seg in segments:
+            t0, t1 = float(seg['t0']), float(seg['t1'])
+            if word_store.covered(t0, t1) <= 0:
+                to_transcribe.append(seg)
+                continue
+            gaps = [
+                {'id': f"{seg['id']}_gap{k}", 't0': a, 't1': b, 'duration': b - a}
+                for k, (a, b) in enumerate(word_store.gaps(t0, t1, min_gap=min_gap))
+            ]
+            gap_plan[seg['id']] = gaps
+            to_transcribe.extend(gaps)
+        
+        if gap_plan:
+            num_gaps = sum(len(gaps) for gaps in gap_plan.values())
+            print(f"   ♻️ Word store: {len(gap_plan)} segmentów ze słów poprzednich przebiegów "
+                  f"({num_gaps} luk do transkrypcji)")
+        return to_transcribe, gap_plan
+    
+    def _assemble_from_words(self, word_store: WordStore, segment: Dict, gap_results: List[Dict]) -> Dict:
+        """
+        Segment ze słów WordStore + transkrypcji luk (po czasie).
+        Błąd transkrypcji luki przechodzi na segment - checkpoint zapisze go
+        jako nieudany i kolejny przebieg powtórzy lukę.
+        """
+        t0, t1 = float(segment['t0']), float(segment['t1'])
+        words = list(word_store.words(t0, t1))
+        for gap in gap_results:
+            words.extend(gap.get('words', []))
+        words.sort(key=lambda w: w['start'])
+        
+        # Pewność: średnia ważona długością (pokryta część vs luki)
+        gap_seconds = sum(gap['duration'] for gap in gap_results)
+        covered_seconds = max(0.0, (t1 - t0) - gap_seconds)
+        weighted = covered_seconds * word_store.confidence(t0, t1)
+        weighted += sum(gap['duration'] * gap.get('confidence', 0.0) for gap in gap_results)
+        
+        assembled = {
+            **segment,
+            'transcript': " ".join(w['word'] for w in words if w['word']),
+            'words': words,
+            'confidence': float(weighted / (t1 - t0)) if t1 > t0 else 0.0,
+            'language': self.config.asr.language,
+            'num_words': len(words)
+        }
+        errors = [gap['error'] for gap in gap_results if gap.get('error')]
+        if errors:
+            assembled['error'] = "; ".join(errors)
+        return assembled
+    
+    def transcribe_segments(
+        self,
+        audio_path: Union[str, Path],
+        vad_segments: List[Dict],
+        audio_store: Optional[AudioStore] = None,
+        progress_callback: Optional[Callable] = None,
+        checkpoint: Optional[TranscriptCheckpoint] = None
+    ) -> List[Dict]:
+        """Transkrypcja segmentów w tym procesie (batchami po asr.batch_size, checkpoint po batchu)"""
+        audio_path = Path(audio_path)
         transcribed_segments = []
         total_segments = len(vad_segments)
         batch_size = self.config.asr.batch_size
         
+        if self.batched_model is not None and audio_store is None:
+            audio_store = self._open_audio_store(audio_path)
+        batched = (
+            self.batched_model is not None
+            and audio_store is not None
+            and audio_store.sample_rate == WHISPER_SAMPLE_RATE
+        )
+        
         for batch_idx in range(0, total_segments, batch_size):
             batch = vad_segments[batch_idx:batch_idx + batch_size]
             
@@ -75,31 +287,122 @@ class TranscribeStage:
             
             print(f"   Batch {batch_idx//batch_size + 1}: segmenty {batch_idx}-{batch_idx+len(batch)}")
             
-            for seg in batch:
-                transcribed = self._transcribe_segment(audio_path, seg)
-                transcribed_segments.append(transcribed)
+            if batched:
+                batch_results = self._transcribe_batch(audio_store, batch)
+            else:
+                batch_results = [self._transcribe_segment(audio_path, seg, audio_store) for seg in batch]
+            transcribed_segments.extend(batch_results)
+            
+            if checkpoint is not None:
+                checkpoint.append(batch_results)
         
-        total_words = sum(len(seg.get('words', [])) for seg in transcribed_segments)
+        return transcribed_segments
+    
+    def _transcribe_with_pool(
+        self,
+        audio_path: Path,
+        vad_segments: List[Dict],
+        progress_callback: Optional[Callable],
+        audio_store: Optional[AudioStore],
+        checkpoint: Optional[TranscriptCheckpoint] = None
+    ) -> List[Dict]:
+        """Segmenty rozdzielone (LPT) między procesy ASRWorkerPool"""
+        from .asr_pool import ASRWorkerPool
         
-        print(f"   ✓ Transkrybowano {total_words} słów")
+        if audio_store is None:
+            audio_store = self._open_audio_store(audio_path)
+        if audio_store is None:
+            raise RuntimeError("Tryb asr.workers > 1 wymaga audio PCM (AudioStore)")
         
-        output_file = output_dir / "segments_with_transcript.json"
-        self._save_segments(transcribed_segments, output_file)
+        if self._pool is None:
+            self._pool = ASRWorkerPool(self.config, workers=self.asr_slots())
+        print(f"   ⚙️ Pool ASR: {self._pool.workers} procesów × {self._pool.worker_config.asr.cpu_threads} wątków")
+        return self._pool.transcribe(audio_store, vad_segments, progress_callback, checkpoint)
+    
+    def _open_audio_store(self, audio_path: Path) -> Optional[AudioStore]:
+        """AudioStore z WAV (jednorazowa konwersja) gdy etap dostał tylko ścieżkę"""
+        try:
+            return AudioStore.from_wav(audio_path, WHISPER_SAMPLE_RATE)
+        except Exception as e:
+            print(f"   ⚠️ Nie udało się zmapować audio ({e}) - transkrypcja per segment")
+            return None
+    
+    def _transcribe_batch(self, audio_store: AudioStore, batch: List[Dict]) -> List[Dict]:
+        """
+        Jeden batch segmentów VAD przez BatchedInferencePipeline.
         
-        print("✅ Stage 3 zakończony")
+        Segmenty dzielone są na klipy ≤30s, klipy idą do modelu po asr.batch_size
+        naraz (widoki numpy na mmap, bez plików tymczasowych), a wyniki wracają
+        do segmentów po czasie startu. Przy błędzie batch jest powtarzany
+        segment po segmencie, żeby jeden zły segment nie psuł pozostałych.
+        """
+        clips, owners = split_clips(batch)
+        results = [
+            {'text': [], 'words': [], 'logprobs': []}
+            for _ in batch
+        ]
         
-        return {
-            'segments': transcribed_segments,
-            'total_words': total_words,
-            'num_segments': len(transcribed_segments),
-            'output_file': str(output_file)
-        }
+        try:
+            if clips:
+                segments_iter, _ = self.batched_model.transcribe(
+                    audio_store.samples,
+                    language=self.config.asr.language,
+                    beam_size=self.config.asr.beam_size,
+                    temperature=self.config.asr.temperature,
+                    initial_prompt=self.config.asr.initial_prompt.strip(),
+                    word_timestamps=True,
+                    vad_filter=False,
+                    clip_timestamps=clips,
+                    batch_size=self.config.asr.batch_size
+                )
+                
+                # Klip, z którego pochodzi wynik: ostatni klip o starcie ≤ start wyniku
+                clip_starts = [clip['start'] for clip in clips]
+                for whisper_seg in segments_iter:
+                    clip_idx = max(0, bisect_right(clip_starts, whisper_seg.start + 1e-3) - 1)
+                    result = results[owners[clip_idx]]
+                    result['text'].append(whisper_seg.text.strip())
+                    result['logprobs'].append(whisper_seg.avg_logprob)
+                    for word_info in whisper_seg.words or []:
+                        # Czasy są już bezwzględne (offset klipu w nagraniu)
+                        result['words'].append({
+                            'word': word_info.word.strip(),
+                            'start': float(word_info.start),
+                            'end': float(word_info.end),
+                            'probability': float(word_info.probability)
+                        })
+        except Exception as e:
+            print(f"      ⚠️ Błąd batcha ({e}) - ponawiam segment po segmencie")
+            return [self._transcribe_segment(None, seg, audio_store) for seg in batch]
+        
+        transcribed = []
+        for seg, result in zip(batch, results):
+            logprobs = result['logprobs']
+            transcribed.append({
+                **seg,
+                'transcript': " ".join(t for t in result['text'] if t),
+                'words': result['words'],
+                'confidence': float(sum(logprobs) / len(logprobs)) if logprobs else 0.0,
+                'language': self.config.asr.language,
+                'num_words': len(result['words'])
+            })
+        return transcribed
     
-    def _transcribe_segment(self, audio_path: Path, segment: Dict) -> Dict:
+    def _transcribe_segment(
+        self,
+        audio_path: Path,
+        segment: Dict,
+        audio_store: Optional[AudioStore] = None
+    ) -> Dict:
         """Transkrybuj segment - TYLKO szybka metoda"""
         print(f"      → Segment {segment['id']} ({segment['duration']:.1f}s)...")
         
         try:
+            if audio_store is not None:
+                audio = np.ascontiguousarray(
+                    audio_store.slice(float(segment['t0']), float(segment['t1'])), dtype=np.float32
+                )
+                return self._transcribe_audio(audio, segment)
             return self._transcribe_segment_alternative(audio_path, segment)
         except Exception as e:
             print(f"      ❌ Błąd: {e}")
@@ -136,48 +439,7 @@ class TranscribeStage:
             subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
                          check=True, timeout=60)
             
-            # Transcribe
-            segments_iter, info = self.model.transcribe(
-                temp_audio,
-                language=self.config.asr.language,
-                beam_size=self.config.asr.beam_size,
-                temperature=self.config.asr.temperature,
-                condition_on_previous_text=self.config.asr.condition_on_previous_text,
-                initial_prompt=self.config.asr.initial_prompt.strip(),
-                word_timestamps=True,
-                vad_filter=False
-            )
-            
-            full_text = []
-            all_words = []
-            confidence_scores = []
-            
-            for whisper_seg in segments_iter:
-                full_text.append(whisper_seg.text.strip())
-                
-                if whisper_seg.words:
-                    for word_info in whisper_seg.words:
-                        all_words.append({
-                            'word': word_info.word.strip(),
-                            'start': float(word_info.start) + t0,
-                            'end': float(word_info.end) + t0,
-                            'probability': float(word_info.probability)
-                        })
-                
-                if hasattr(whisper_seg, 'avg_logprob'):
-                    confidence_scores.append(whisper_seg.avg_logprob)
-            
-            transcript = " ".join(full_text)
-            avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.0
-            
-            return {
-                **segment,
-                'transcript': transcript,
-                'words': all_words,
-                'confidence': float(avg_confidence),
-                'language': self.config.asr.language,  # Always use configured language (forced, not detected)
-                'num_words': len(all_words)
-            }
+            return self._transcribe_audio(temp_audio, segment)
             
         finally:
             try:
@@ -186,8 +448,54 @@ class TranscribeStage:
             except:
                 pass
     
-    def _save_segments(self, segments: List[Dict], output_file: Path):
-        """Zapisz segmenty"""
+    def _transcribe_audio(self, audio: Union[str, np.ndarray], segment: Dict) -> Dict:
+        """Whisper na pliku lub tablicy float32 16kHz; czasy słów przesunięte o t0 segmentu"""
+        t0 = float(segment['t0'])
+        
+        segments_iter, info = self.model.transcribe(
+            audio,
+            language=self.config.asr.language,
+            beam_size=self.config.asr.beam_size,
+            temperature=self.config.asr.temperature,
+            condition_on_previous_text=self.config.asr.condition_on_previous_text,
+            initial_prompt=self.config.asr.initial_prompt.strip(),
+            word_timestamps=True,
+            vad_filter=False
+        )
+        
+        full_text = []
+        all_words = []
+        confidence_scores = []
+        
+        for whisper_seg in segments_iter:
+            full_text.append(whisper_seg.text.strip())
+            
+            if whisper_seg.words:
+                for word_info in whisper_seg.words:
+                    all_words.append({
+                        'word': word_info.word.strip(),
+                        'start': float(word_info.start) + t0,
+                        'end': float(word_info.end) + t0,
+                        'probability': float(word_info.probability)
+                    })
+            
+            if hasattr(whisper_seg, 'avg_logprob'):
+                confidence_scores.append(whisper_seg.avg_logprob)
+        
+        transcript = " ".join(full_text)
+        avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.0
+        
+        return {
+            **segment,
+            'transcript': transcript,
+            'words': all_words,
+            'confidence': float(avg_confidence),
+            'language': self.config.asr.language,  # Always use configured language (forced, not detected)
+            'num_words': len(all_words)
+        }
+    
+    def _save_segments(self, segments: List[Dict], output_file: Path) -> Path:
+        """Zapisz segmenty (kolumnowo lub JSON - config.segment_format)"""
         serializable = []
         
         for seg in segments:
@@ -196,11 +504,17 @@ class TranscribeStage:
                 seg_copy['confidence'] = float(seg_copy['confidence'])
             serializable.append(seg_copy)
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(serializable, f, indent=2, ensure_ascii=False)
+        output_file = write_segments(
+            serializable, output_file,
+            segment_format=self.config.segment_format,
+            debug_json=self.config.debug_json
+        )
         
         print(f"   💾 Transkrypcja zapisana: {output_file.name}")
+        return output_file
     
     def cancel(self):
         """Anuluj operację"""
-        pass
\ No newline at end of file
+        if self._pool is not None:
+            self._pool.shutdown(cancel=True)
+            self._pool = None
\ No newline at end of file
@@ -1,14 +1,18 @@
 """
 Stage 4: Feature Engineering
-- Acoustic features (RMS, spectral, prosodic)
-- Lexical features (keywords, entities)
+- Acoustic features (RMS, spectral, prosodic) - jedno STFT całego nagrania
+  (FrameFeatures), statystyki segmentów z sum prefiksowych
+- Lexical features (keywords, entities) - keywords przez KeywordMatcher
+  (trie słów z fleksją), NER jednym strumieniem nlp.pipe, cache wyników
+  per hash transkryptu
 - Contextual features (speaker change, position)
 """
 
 import json
 import csv
+import hashlib
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import numpy as np
 import librosa
 import soundfile as sf
@@ -22,7 +26,20 @@ except Exception as exc:  # pragma: no cover - defensive for environments withou
     spacy = None
     _SPACY_AVAILABLE = False
 
+from .audio_store import AudioStore
 from .config import Config
+from .frame_features import FrameFeatures
+from .segment_store import materialize, write_segments
+from .keyword_matcher import KeywordMatcher
+
+ENTITY_LABELS = ('PER', 'ORG', 'LOC', 'GPE')
+# Komponenty potrzebne do NER (reszta - tagger, parser, lemmatizer... - jest wyłączana)
+NER_COMPONENTS = ('tok2vec', 'transformer', 'ner', 'entity_ruler')
+ENTITY_CACHE_DIR = "ner"  # podkatalog cache.cache_dir
+
+
+def transcript_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
 
 
 class FeaturesStage:
@@ -31,7 +48,9 @@ class FeaturesStage:
     def __init__(self, config: Config):
         self.config = config
         self.keywords_db = {}
+        self.keyword_matcher = KeywordMatcher(inflection=config.features.keyword_inflection)
         self.nlp = None
+        self._entity_cache: Optional[Dict[str, Dict]] = None
         
         self._load_keywords()
         self._load_spacy()
@@ -62,6 +81,7 @@ class FeaturesStage:
                     'weight': weight,
                     'category': category
                 }
+                self.keyword_matcher.add(row['token'], token)
 
         print(f"   ✓ Załadowano {len(self.keywords_db)} keywords")
     
@@ -80,6 +100,7 @@ class FeaturesStage:
         try:
             print(f"📥 Ładowanie spaCy model: {model_name} (language: {self.config.language})")
             self.nlp = spacy.load(model_name)
+            self._disable_unused_components()
             print("   ✓ spaCy załadowany")
         except OSError:
             print(f"⚠️ Model spaCy '{model_name}' nie zainstalowany")
@@ -99,6 +120,7 @@ class FeaturesStage:
                     "python", "-m", "spacy", "download", model_name
                 ])
                 self.nlp = spacy.load(model_name)
+                self._disable_unused_components()
                 print("   ✓ spaCy załadowany")
                 return
             except Exception as e:
@@ -109,6 +131,7 @@ class FeaturesStage:
                 try:
                     print(f"   Próba fallback: {fallback}")
                     self.nlp = spacy.load(fallback)
+                    self._disable_unused_components()
                     print(f"   ✓ Używam fallback model: {fallback}")
                     return
                 except OSError:
@@ -118,6 +141,7 @@ class FeaturesStage:
                             "python", "-m", "spacy", "download", fallback
                         ])
                         self.nlp = spacy.load(fallback)
+                        self._disable_unused_components()
                         print(f"   ✓ Używam fallback model: {fallback}")
                         return
                     except:
@@ -126,24 +150,132 @@ class FeaturesStage:
             print(f"⚠️ Nie udało się załadować żadnego modelu spaCy")
             print(f"   Pipeline będzie działać bez entity recognition")
     
+    def _disable_unused_components(self):
+        """Wyłącz komponenty spaCy niepotrzebne do NER (parser, tagger, lemmatizer...)"""
+        disabled = [name for name in self.nlp.pipe_names if name not in NER_COMPONENTS]
+        for name in disabled:
+            self.nlp.disable_pipe(name)
+        if disabled:
+            print(f"   ✓ Wyłączone komponenty spaCy: {', '.join(disabled)}")
+    
+    # === Entity recognition (nlp.pipe + cache) ===
+    
+    def _entity_cache_file(self) -> Optional[Path]:
+        """JSONL z wynikami NER per hash transkryptu (osobny plik per model spaCy)"""
+        if not self.config.cache.enabled:
+            return None
+        meta = getattr(self.nlp, 'meta', {}) or {}
+        model_id = f"{meta.get('lang', 'xx')}_{meta.get('name', 'model')}-{meta.get('version', '0')}"
+        return Path(self.config.cache.cache_dir) / ENTITY_CACHE_DIR / f"{model_id}.jsonl"
+    
+    def _load_entity_cache(self) -> Dict[str, Dict]:
+        if self._entity_cache is None:
+            self._entity_cache = {}
+            cache_file = self._entity_cache_file()
+            if cache_file is not None and cache_file.exists():
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # przerwany zapis
+                        self._entity_cache[record['hash']] = record['result']
+        return self._entity_cache
+    
+    def _store_entity_results(self, results: Dict[str, Dict]) -> None:
+        cache_file = self._entity_cache_file()
+        if cache_file is None or not results:
+            return
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        payload = "".join(
+            json.dumps({'hash': key, 'result': result}, ensure_ascii=False) + "\n"
+            for key, result in results.items()
+        )
+        with open(cache_file, 'a', encoding='utf-8') as f:
+            f.write(payload)
+    
+    def _compute_entities(self, segments: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Encje wszystkich segmentów jednym strumieniem nlp.pipe.
+        
+        Unikalne, niezcache'owane transkrypty idą przez nlp.pipe
+        (features.spacy_batch_size / spacy_n_process); wyniki są zapamiętywane
+        po hashu transkryptu (w pamięci i w cache/ner/).
+        
+        Returns:
+            Dla każdego segmentu {'entities': [...], 'num_tokens': n} albo None (brak tekstu)
+        """
+        cache = self._load_entity_cache()
+        keys = []
+        missing: Dict[str, str] = {}
+        for seg in segments:
+            text = seg.get('transcript', '')
+            if not text:
+                keys.append(None)
+                continue
+            key = transcript_hash(text)
+            keys.append(key)
+            if key not in cache:
+                missing.setdefault(key, text)
+        
+        if missing:
+            print(f"   🏷️ NER: {len(missing)} transkryptów przez nlp.pipe "
+                  f"({len(keys) - len(missing)} z cache / duplikaty)")
+            new_results = {}
+            docs = self.nlp.pipe(
+                missing.values(),
+                batch_size=self.config.features.spacy_batch_size,
+                n_process=self.config.features.spacy_n_process
+            )
+            for key, doc in zip(missing.keys(), docs):
+                new_results[key] = {
+                    'entities': [
+                        {'text': ent.text, 'label': ent.label_}
+                        for ent in doc.ents
+                        if ent.label_ in ENTITY_LABELS
+                    ],
+                    'num_tokens': len(doc)
+                }
+            cache.update(new_results)
+            self._store_entity_results(new_results)
+        
+        return [cache[key] if key is not None else None for key in keys]
+    
     def process(
         self, 
         audio_file: str,
         segments: List[Dict],
-        output_dir: Path
+        output_dir: Path,
+        audio_store: Optional[AudioStore] = None
     ) -> Dict[str, Any]:
         """
         Główna metoda przetwarzania
         
+        audio_store: wspólny bufor PCM (mmap) - bez ponownego dekodowania pliku
+        
         Returns:
             Dict zawierający segments wzbogacone o features
         """
         audio_path = Path(audio_file)
+        segments = materialize(segments)  # LazySegments z cache: jeden odczyt zamiast kilku przebiegów
         
         print(f"🔍 Ekstrakcja cech dla {len(segments)} segmentów...")
         
-        # Wczytaj audio raz (dla wszystkich segmentów)
-        y, sr = librosa.load(str(audio_path), sr=None)
+        # Audio: widok na wspólny mmap albo jednorazowe wczytanie pliku
+        if audio_store is not None:
+            y, sr = audio_store.samples, audio_store.sample_rate
+        else:
+            y, sr = librosa.load(str(audio_path), sr=None)
+        
+        # Cechy akustyczne: jedno przejście po nagraniu zamiast STFT per segment
+        acoustic = None
+        if self.config.features.compute_rms and self.config.features.whole_recording_acoustic:
+            acoustic = self._compute_acoustic_features(segments, y, sr)
+        
+        # Encje: jeden przebieg nlp.pipe dla wszystkich segmentów
+        entity_results = None
+        if self.nlp and self.config.features.compute_entity_density:
+            entity_results = self._compute_entities(segments)
         
         # Przetworz każdy segment
         enriched_segments = []
@@ -153,7 +285,11 @@ class FeaturesStage:
                 print(f"   Przetwarzanie segmentu {i+1}/{len(segments)}")
             
             # Extract features
-            features = self._extract_segment_features(seg, y, sr, len(segments))
+            features = self._extract_segment_features(
+                seg, y, sr, len(segments),
+                acoustic=acoustic[i] if acoustic is not None else None,
+                entity_result=entity_results[i] if entity_results is not None else None
+            )
             
             # Merge z oryginalnym segmentem
             enriched = {**seg, 'features': features}
@@ -163,8 +299,7 @@ class FeaturesStage:
         enriched_segments = self._normalize_features(enriched_segments)
         
         # Zapisz
-        output_file = output_dir / "segments_with_features.json"
-        self._save_segments(enriched_segments, output_file)
+        output_file = self._save_segments(enriched_segments, output_dir / "segments_with_features.json")
         
         print("✅ Stage 4 zakończony")
         
@@ -179,14 +314,21 @@ class FeaturesStage:
         segment: Dict, 
         audio: np.ndarray, 
         sr: int,
-        total_segments: int
+        total_segments: int,
+        acoustic: Optional[Dict[str, float]] = None,
+        entity_result: Optional[Dict] = None
     ) -> Dict[str, Any]:
-        """Ekstrakcja wszystkich cech dla segmentu"""
+        """
+        Ekstrakcja wszystkich cech dla segmentu
+        (acoustic / entity_result: policzone wcześniej dla wszystkich segmentów naraz)
+        """
         
         features = {}
         
         # 1. ACOUSTIC FEATURES
-        if self.config.features.compute_rms:
+        if acoustic is not None:
+            features.update(acoustic)
+        elif self.config.features.compute_rms:
             features.update(self._extract_acoustic_features(segment, audio, sr))
         
         # 2. PROSODIC FEATURES
@@ -194,25 +336,45 @@ class FeaturesStage:
             features.update(self._extract_prosodic_features(segment))
         
         # 3. LEXICAL FEATURES
-        features.update(self._extract_lexical_features(segment))
+        features.update(self._extract_lexical_features(segment, entity_result))
         
         # 4. CONTEXTUAL FEATURES
         features.update(self._extract_contextual_features(segment, total_segments))
         
         return features
     
+    def _compute_acoustic_features(
+        self,
+        segments: List[Dict],
+        audio: np.ndarray,
+        sr: int
+    ) -> List[Dict[str, float]]:
+        """RMS / centroid / flux / ZCR wszystkich segmentów z jednego STFT nagrania"""
+        print(f"   🎛️ STFT całego nagrania ({len(audio) / sr / 60:.0f} min)...")
+        frames = FrameFeatures.compute(audio, sr)
+        stats = frames.segment_stats(
+            [float(seg['t0']) for seg in segments],
+            [float(seg['t1']) for seg in segments]
+        )
+        
+        names = list(stats)
+        return [
+            {name: float(stats[name][i]) for name in names}
+            for i in range(len(segments))
+        ]
+    
     def _extract_acoustic_features(
         self, 
         segment: Dict, 
         audio: np.ndarray, 
         sr: int
     ) -> Dict[str, float]:
-        """Ekstrakcja cech akustycznych"""
+        """Ekstrakcja cech akustycznych (per segment - features.whole_recording_acoustic=False)"""
         
         # Wytnij audio dla tego segmentu
         t0 = int(segment['t0'] * sr)
         t1 = int(segment['t1'] * sr)
-        seg_audio = audio[t0:t1]
+        seg_audio = np.asarray(audio[t0:t1])
         
         if len(seg_audio) == 0:
             return {
@@ -280,7 +442,7 @@ class FeaturesStage:
             'dramatic_pauses': dramatic_pauses
         }
     
-    def _extract_lexical_features(self, segment: Dict) -> Dict[str, Any]:
+    def _extract_lexical_features(self, segment: Dict, entity_result: Optional[Dict] = None) -> Dict[str, Any]:
         """Ekstrakcja cech leksykalnych (keywords, entities)"""
         
         transcript = segment.get('transcript', '').lower()
@@ -293,31 +455,31 @@ class FeaturesStage:
                 'has_question': False
             }
         
-        # 1. Keyword matching
+        # 1. Keyword matching (jedno przejście trie - koszt niezależny od rozmiaru leksykonu)
         keyword_score = 0.0
         matched_keywords = []
         
-        for token, data in self.keywords_db.items():
-            if token in transcript:
-                keyword_score += data['weight']
-                matched_keywords.append({
-                    'token': token,
-                    'weight': data['weight'],
-                    'category': data['category']
-                })
+        positions = self.keyword_matcher.positions(segment.get('transcript', ''))
+        for token, spans in positions.items():
+            data = self.keywords_db[token]
+            keyword_score += data['weight']
+            matched_keywords.append({
+                'token': token,
+                'weight': data['weight'],
+                'category': data['category'],
+                'positions': [list(span) for span in spans]
+            })
         
         # 2. Entity density (jeśli spaCy available)
         entity_density = 0.0
         entities = []
         
         if self.nlp and self.config.features.compute_entity_density:
-            doc = self.nlp(segment.get('transcript', ''))
-            entities = [
-                {'text': ent.text, 'label': ent.label_}
-                for ent in doc.ents
-                if ent.label_ in ['PER', 'ORG', 'LOC', 'GPE']
-            ]
-            entity_density = len(entities) / len(doc) if len(doc) > 0 else 0.0
+            if entity_result is None:
+                entity_result = self._compute_entities([segment])[0]
+            entities = entity_result['entities']
+            num_tokens = entity_result['num_tokens']
+            entity_density = len(entities) / num_tokens if num_tokens > 0 else 0.0
         
         # 3. Question detection
         has_question = '?' in segment.get('transcript', '')
@@ -389,12 +551,16 @@ class FeaturesStage:
         
         return segments
     
-    def _save_segments(self, segments: List[Dict], output_file: Path):
-        """Zapisz segmenty"""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(segments, f, indent=2, ensure_ascii=False)
+    def _save_segments(self, segments: List[Dict], output_file: Path) -> Path:
+        """Zapisz segmenty (kolumnowo lub JSON - config.segment_format)"""
+        output_file = write_segments(
+            segments, output_file,
+            segment_format=self.config.segment_format,
+            debug_json=self.config.debug_json
+        )
         
         print(f"   💾 Features zapisane: {output_file.name}")
+        return output_file
     
     def cancel(self):
         """Anuluj operację"""
@@ -1,10 +1,13 @@
 """
 Stage 5: AI Semantic Scoring with GPT-4o-mini
 - Pre-filtering używając acoustic + keyword scores
-- Deep semantic analysis z GPT (tylko top 40)
+- Deep semantic analysis (tylko top 40) - wymienny backend (semantic_backends):
+  GPT (współbieżnie, rate limit, retry, cache), lokalny NLI (ONNX/int8) lub
+  keywords
 - Composite scoring (acoustic + lexical + semantic)
 """
 
+import hashlib
 import json
 import logging
 import os
@@ -24,7 +27,10 @@ except ImportError:
     from openai import OpenAI
 
 from .config import Config
-from .chat_burst import calculate_chat_burst_score, calculate_final_score, parse_chat_json
+from .chat_burst import calculate_chat_burst_scores, calculate_final_score, parse_chat_json
+from .gpt_scorer import GPTScoreCache, GPTScorer
+from .semantic_backends import GPTBackend, KeywordBackend, NLIBackend, SemanticBackend
+from .segment_store import materialize, write_segments
 from utils.chat_parser import load_chat_robust
 
 # Load environment variables
@@ -38,6 +44,7 @@ class ScoringStage:
     def __init__(self, config: Config):
         self.config = config
         self.openai_client = None
+        self._semantic_backend: Optional[SemanticBackend] = None
         self.chat_data: Dict[int, int] = {}
         self.chat_present: bool = False
         self._load_gpt()
@@ -104,12 +111,17 @@ Array must have {batch_size} elements - one score for each [N]."""
         
         if not api_key:
             print("⚠️ OPENAI_API_KEY nie znaleziony w .env")
-            print("   Używam fallback (bez GPT scoring)")
+            print("   Semantic scoring: lokalny model NLI (lub keywords) - scoring.semantic_backend")
             return
         
         try:
-            self.openai_client = OpenAI(api_key=api_key)
-            print("✓ GPT-4o-mini API załadowane")
+            # Retry robi GPTScorer (backoff + rate limit), nie klient
+            self.openai_client = OpenAI(
+                api_key=api_key,
+                base_url=self.config.scoring.gpt_base_url,
+                max_retries=0
+            )
+            print(f"✓ {self.config.scoring.gpt_model} API załadowane")
         except Exception as e:
             print(f"⚠️ Błąd ładowania GPT: {e}")
             self.openai_client = None
@@ -126,6 +138,7 @@ Array must have {batch_size} elements - one score for each [N]."""
         Returns:
             Dict zawierający segments z finalnym scoring
         """
+        segments = materialize(segments)  # LazySegments z cache → dicty (pre_score, scoring in place)
         print(f"🧠 AI Semantic Scoring dla {len(segments)} segmentów...")
 
         if self.config.mode.lower() == "stream" and not self.chat_data:
@@ -137,16 +150,13 @@ Array must have {batch_size} elements - one score for each [N]."""
         
         print(f"   ✓ Wybrano {len(candidates)} kandydatów do AI eval")
         
-        # STAGE 2: Deep semantic analysis (GPT)
-        print("🤖 Stage 2: GPT Semantic Analysis...")
-        if self.openai_client:
-            candidates = self._semantic_analysis_gpt(
-                candidates,
-                progress_callback=progress_callback
-            )
-        else:
-            print("   ⚠️ GPT niedostępne, używam fallback scoring")
-            candidates = self._semantic_analysis_fallback(candidates)
+        # STAGE 2: Deep semantic analysis (GPT / lokalny NLI / keywords)
+        print("🤖 Stage 2: Semantic Analysis...")
+        candidates = self._semantic_analysis(
+            candidates,
+            self._create_semantic_backend(),
+            progress_callback=progress_callback
+        )
         
         # STAGE 3: Final composite scoring
         print("⚖️ Stage 3: Final Composite Scoring...")
@@ -156,8 +166,7 @@ Array must have {batch_size} elements - one score for each [N]."""
         scored_segments.sort(key=lambda x: x['final_score'], reverse=True)
         
         # Zapisz
-        output_file = output_dir / "scored_segments.json"
-        self._save_segments(scored_segments, output_file)
+        output_file = self._save_segments(scored_segments, output_dir / "scored_segments.json")
         
         # Stats
         avg_score = np.mean([s['final_score'] for s in scored_segments])
@@ -238,82 +247,132 @@ Array must have {batch_size} elements - one score for each [N]."""
         
         return candidates
 
-    def _semantic_analysis_gpt(
+    def _build_gpt_messages(self, transcripts: List[str]) -> List[Dict]:
+        """Wiadomości chat dla batcha transkryptów"""
+        transcripts_text = ""
+        for i, transcript in enumerate(transcripts):
+            transcripts_text += f"\n[{i}] {transcript}\n"
+        
+        return [
+            {"role": "system", "content": self._get_system_prompt()},
+            {"role": "user", "content": self._get_scoring_prompt(transcripts_text, len(transcripts))}
+        ]
+    
+    def _gpt_prompt_version(self) -> str:
+        """Hash treści promptów - zmiana promptu unieważnia cache odpowiedzi"""
+        template = self._get_system_prompt() + self._get_scoring_prompt("{transcripts}", 0)
+        return hashlib.sha1(template.encode('utf-8')).hexdigest()[:12]
+    
+    def _create_gpt_scorer(self) -> GPTScorer:
+        scoring = self.config.scoring
+        cache = None
+        if scoring.gpt_cache and self.config.cache.enabled:
+            cache_file = Path(self.config.cache.cache_dir) / "gpt_scores" / f"{scoring.gpt_model}.jsonl"
+            cache = GPTScoreCache(cache_file)
+        
+        return GPTScorer(
+            self.openai_client,
+            model=scoring.gpt_model,
+            build_messages=self._build_gpt_messages,
+            prompt_version=self._gpt_prompt_version(),
+            cache=cache,
+            batch_size=scoring.gpt_batch_size,
+            max_in_flight=scoring.gpt_max_in_flight,
+            requests_per_minute=scoring.gpt_requests_per_minute,
+            tokens_per_minute=scoring.gpt_tokens_per_minute,
+            max_retries=scoring.gpt_max_retries
+        )
+    
+    def _create_nli_backend(self) -> NLIBackend:
+        scoring = self.config.scoring
+        cache = None
+        if scoring.gpt_cache and self.config.cache.enabled:
+            cache_name = scoring.nli_model.replace('/', '_')
+            cache = GPTScoreCache(Path(self.config.cache.cache_dir) / "semantic_scores" / f"nli_{cache_name}.jsonl")
+        
+        use_cuda = False
+        if self.config.use_gpu and scoring.device >= 0:
+            import torch
+            use_cuda = torch.cuda.is_available()
+        
+        return NLIBackend(
+            scoring.nli_model,
+            scoring.interest_labels or {},
+            language=self.config.language,
+            batch_size=scoring.batch_size,
+            max_length=scoring.nli_max_length,
+            workers=scoring.nli_workers,
+            use_onnx=scoring.nli_onnx,
+            quantize=scoring.nli_quantize,
+            device=f"cuda:{scoring.device}" if use_cuda else "cpu",
+            cache=cache
+        )
+    
+    def _create_semantic_backend(self) -> SemanticBackend:
+        """
+        Backend wg scoring.semantic_backend:
+        auto = GPT (jest klucz API) → lokalny NLI → keywords
+        """
+        choice = self.config.scoring.semantic_backend.lower()
+        
+        if choice in ("auto", "gpt") and self.openai_client:
+            return GPTBackend(self._create_gpt_scorer())
+        if choice == "gpt":
+            print("   ⚠️ GPT niedostępne, używam fallback scoring")
+            return KeywordBackend()
+        
+        if choice in ("auto", "nli"):
+            backend = self._create_nli_backend()
+            try:
+                backend.load()
+                return backend
+            except Exception as e:
+                print(f"   ⚠️ Lokalny model NLI niedostępny ({e}), używam fallback scoring")
+                logger.warning("NLI backend niedostępny: %s", e)
+        
+        return KeywordBackend()
+    
+    def _semantic_analysis(
         self,
         candidates: List[Dict],
+        backend: SemanticBackend,
         progress_callback: Optional[Callable] = None
     ) -> List[Dict]:
-        """Deep semantic analysis używając GPT-4o-mini"""
+        """Deep semantic analysis wybranym backendem (None z backendu → 0.5)"""
         
         if not candidates:
             return []
         
-        # Batch processing - 10 segmentów na raz
-        batch_size = 10
-        total = len(candidates)
+        self._semantic_backend = backend
+        scores = backend.score(candidates, progress_callback=progress_callback)
         
-        for batch_idx in range(0, total, batch_size):
-            batch = candidates[batch_idx:batch_idx + batch_size]
-            
-            # Progress
-            progress_pct = batch_idx / total
-            if progress_callback:
-                progress_callback(
-                    progress_pct,
-                    f"GPT eval batch {batch_idx//batch_size + 1}/{(total + batch_size - 1)//batch_size}"
-                )
-            
-            # Przygotuj transkrypty
-            transcripts_text = ""
-            for i, seg in enumerate(batch):
-                transcript = seg.get('transcript', '')[:400]  # Max 400 chars
-                transcripts_text += f"\n[{i}] {transcript}\n"
-
-            # Get language-aware prompts
-            system_prompt = self._get_system_prompt()
-            user_prompt = self._get_scoring_prompt(transcripts_text, len(batch))
-
-            try:
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    max_tokens=200,
-                    temperature=0.3
-                )
-                
-                result = json.loads(response.choices[0].message.content)
-                scores = result.get('scores', [])
-                
-                # Assign scores
-                for i, seg in enumerate(batch):
-                    if i < len(scores):
-                        seg['semantic_score'] = float(min(max(scores[i], 0.0), 1.0))
-                    else:
-                        seg['semantic_score'] = 0.5
-                
-                print(f"   ✓ Batch {batch_idx//batch_size + 1}: avg score {np.mean(scores):.2f}")
-                
-            except Exception as e:
-                print(f"   ⚠️ GPT batch {batch_idx//batch_size + 1} error: {e}")
-                # Fallback to neutral scores
-                for seg in batch:
-                    seg['semantic_score'] = 0.5
+        failed = 0
+        for seg, score in zip(candidates, scores):
+            if score is None:
+                # Brak wyniku (np. batch GPT nieudany po wszystkich próbach) → neutralny score
+                failed += 1
+                score = 0.5
+            seg['semantic_score'] = score
+        
+        avg = np.mean([s['semantic_score'] for s in candidates])
+        print(f"   ✓ {backend.summary()}, avg score {avg:.2f}")
+        if failed:
+            logger.warning("Semantic scoring (%s): %d segmentów bez wyniku → 0.5", backend.name, failed)
+            print(f"   ⚠️ {failed} segmentów bez wyniku → 0.5")
         
         return candidates
     
+    def _semantic_analysis_gpt(
+        self,
+        candidates: List[Dict],
+        progress_callback: Optional[Callable] = None
+    ) -> List[Dict]:
+        """Deep semantic analysis używając GPT (współbieżnie, z cache per transkrypt)"""
+        return self._semantic_analysis(candidates, GPTBackend(self._create_gpt_scorer()), progress_callback)
+    
     def _semantic_analysis_fallback(self, candidates: List[Dict]) -> List[Dict]:
         """Fallback scoring bez GPT (używa tylko keywords)"""
-        for seg in candidates:
-            features = seg.get('features', {})
-            keyword_score = features.get('keyword_score', 0)
-            # Simple heuristic
-            seg['semantic_score'] = min(keyword_score / 15.0, 1.0)
-        
-        return candidates
+        return self._semantic_analysis(candidates, KeywordBackend())
     
     def _compute_final_scores(
         self,
@@ -328,7 +387,14 @@ Array must have {batch_size} elements - one score for each [N]."""
         scored = []
         weights = self.config.get_effective_weights(self.chat_present)
 
-        for seg in all_segments:
+        # Chat burst wszystkich segmentów naraz (gęsta tablica czatu budowana raz)
+        chat_burst_scores = calculate_chat_burst_scores(
+            [seg.get('t0', 0.0) for seg in all_segments],
+            [seg.get('t1', seg.get('t0', 0.0)) for seg in all_segments],
+            chat_data=self.chat_data,
+        )
+
+        for seg, chat_burst_score in zip(all_segments, chat_burst_scores):
             seg_id = seg['id']
             features = seg.get('features', {})
 
@@ -336,11 +402,7 @@ Array must have {batch_size} elements - one score for each [N]."""
             acoustic_score = float(np.clip(seg.get('pre_score', 0) * 0.6, 0, 1))
             keyword_score = min(features.get('keyword_score', 0) / 10, 1.0)
             speaker_change = features.get('speaker_change_prob', 0.5)
-            chat_burst_score = calculate_chat_burst_score(
-                segment_start=seg.get('t0', 0.0),
-                segment_end=seg.get('t1', seg.get('t0', 0.0)),
-                chat_data=self.chat_data,
-            )
+            chat_burst_score = float(chat_burst_score)
 
             if seg_id in ai_scores:
                 # Full formula z GPT
@@ -387,8 +449,8 @@ Array must have {batch_size} elements - one score for each [N]."""
         
         return scored
     
-    def _save_segments(self, segments: List[Dict], output_file: Path):
-        """Zapisz scored segments"""
+    def _save_segments(self, segments: List[Dict], output_file: Path) -> Path:
+        """Zapisz scored segments (kolumnowo lub JSON - config.segment_format)"""
         serializable = []
         for seg in segments:
             seg_copy = seg.copy()
@@ -396,11 +458,16 @@ Array must have {batch_size} elements - one score for each [N]."""
                 seg_copy['final_score'] = float(seg_copy['final_score'])
             serializable.append(seg_copy)
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(serializable, f, indent=2, ensure_ascii=False)
+        output_file = write_segments(
+            serializable, output_file,
+            segment_format=self.config.segment_format,
+            debug_json=self.config.debug_json
+        )
         
         print(f"   💾 Scored segments zapisane: {output_file.name}")
+        return output_file
     
     def cancel(self):
         """Anuluj operację"""
-        pass
\ No newline at end of file
+        if self._semantic_backend is not None:
+            self._semantic_backend.cancel()
\ No newline at end of file
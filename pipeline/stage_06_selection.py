@@ -1,22 +1,28 @@
 """
 Stage 6: Intelligent Clip Selection v1.1
-- Greedy selection z Non-Maximum Suppression
+- Greedy selection z Non-Maximum Suppression (IntervalSet - bisect po wybranych)
 - Smart merge sąsiednich segmentów (NAPRAWIONY gap bug)
 - Temporal coverage optimization (DYNAMICZNE dla długich materiałów)
 - Duration adjustment
+- Opcjonalnie (selection.engine: dp): dokładna selekcja DP z budżetem czasu
 """
 
+import copy
 import json
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import numpy as np
 from collections import defaultdict
 
 from .config import Config
+from .interval_dp import DPSelection, select_budgeted
+from .interval_set import IntervalSet, conflicts_with
 
 
 class SelectionStage:
     """Stage 6: Clip Selection v1.1"""
+
+    verbose = True  # False = bez printów heurystyk (podgląd SelectionIndex przy każdym ruchu suwaka)
     
     def __init__(self, config: Config):
         self.config = config
@@ -81,23 +87,14 @@ class SelectionStage:
                 candidates = relaxed_candidates
                 base_threshold = relaxed_threshold
 
-        # STEP 2: Greedy selection + NMS
-        selected = self._greedy_selection_with_nms(candidates)
-        print(f"   Po greedy selection: {len(selected)} klipów")
-        
-        # STEP 3: Smart merge sąsiednich segmentów (NAPRAWIONY!)
-        merged = self._smart_merge(selected, segments)
-        print(f"   Po smart merge: {len(merged)} klipów")
-        
-        # STEP 4: Temporal coverage optimization (DYNAMICZNE dla długich materiałów!)
-        balanced = self._optimize_temporal_coverage(merged, total_duration)
-        print(f"   Po balance coverage: {len(balanced)} klipów")
-
-        # STEP 5: Duration adjustment (trim if needed)
-        final_clips = self._adjust_duration(balanced)
-        print(f"   Final: {len(final_clips)} klipów")
-
-        final_clips = self._top_up_if_needed(final_clips, segments, merged_segments, min_dur)
+        # STEP 2-5: Greedy (NMS → merge → coverage → trim → top-up) albo dokładne DP
+        selection_report = None
+        if getattr(self.config.selection, 'engine', 'greedy') == 'dp':
+            final_clips, selection_report = self._select_dp(
+                candidates, segments, merged_segments, total_duration, min_dur
+            )
+        else:
+            final_clips = self._select_greedy(candidates, segments, merged_segments, total_duration, min_dur)
 
         # Calculate stats
         total_clip_duration = sum(clip['duration'] for clip in final_clips)
@@ -140,8 +137,109 @@ class SelectionStage:
             'total_duration': total_clip_duration,
             'num_clips': len(final_clips),
             'num_shorts': len(shorts_clips),
-            'output_file': str(output_file)
+            'output_file': str(output_file),
+            'selection_report': selection_report
         }
+
+    def _select_greedy(
+        self,
+        candidates: List[Dict],
+        segments: List[Dict],
+        merged_segments: List[Dict],
+        total_duration: float,
+        min_dur: int
+    ) -> List[Dict]:
+        """Silnik greedy: heurystyki po kolei (uwaga: _adjust_duration modyfikuje klipy)"""
+        # STEP 2: Greedy selection + NMS
+        selected = self._greedy_selection_with_nms(candidates)
+        print(f"   Po greedy selection: {len(selected)} klipów")
+        
+        # STEP 3: Smart merge sąsiednich segmentów (NAPRAWIONY!)
+        merged = self._smart_merge(selected, segments)
+        print(f"   Po smart merge: {len(merged)} klipów")
+        
+        # STEP 4: Temporal coverage optimization (DYNAMICZNE dla długich materiałów!)
+        balanced = self._optimize_temporal_coverage(merged, total_duration)
+        print(f"   Po balance coverage: {len(balanced)} klipów")
+
+        # STEP 5: Duration adjustment (trim if needed)
+        final_clips = self._adjust_duration(balanced)
+        print(f"   Final: {len(final_clips)} klipów")
+
+        return self._top_up_if_needed(final_clips, segments, merged_segments, min_dur)
+
+    def _select_dp(
+        self,
+        candidates: List[Dict],
+        segments: List[Dict],
+        merged_segments: List[Dict],
+        total_duration: float,
+        min_dur: int
+    ) -> Tuple[List[Dict], Dict[str, Any]]:
+        """
+        Silnik DP: max Σ final_score przy budżecie target × duration_tolerance,
+        min_time_gap, max_clips_per_bin i max_clips (pipeline/interval_dp.py).
+        Greedy liczony na kopii danych - do raportu porównawczego.
+        """
+        cfg = self.config.selection
+        num_bins, max_per_bin, bin_size = self._coverage_limits(total_duration)
+        budget = cfg.target_total_duration * cfg.duration_tolerance
+        final_clips, result = self._dp_clips(candidates, total_duration)
+
+        greedy_clips = self._select_greedy(
+            copy.deepcopy(candidates), copy.deepcopy(segments), copy.deepcopy(merged_segments),
+            total_duration, min_dur
+        )
+        greedy_score = float(sum(c.get('final_score', 0) for c in greedy_clips))
+        greedy_bins = defaultdict(int)
+        for clip in greedy_clips:
+            greedy_bins[self._bin_index(clip['t0'], bin_size, num_bins)] += 1
+        # Top-up/coverage fallback potrafią przekroczyć limity, które DP respektuje
+        greedy_within_limits = (
+            len(greedy_clips) <= cfg.max_clips
+            and max(greedy_bins.values(), default=0) <= max_per_bin
+            and sum(c.get('duration', 0) for c in greedy_clips) <= budget
+        )
+
+        report = {
+            'engine': 'dp',
+            'dp_score': result.score,
+            'greedy_score': greedy_score,
+            'gain': result.score - greedy_score,
+            'upper_bound': result.upper_bound,
+            'optimal': result.optimal,
+            'budget_step': result.step,
+            'iterations': result.iterations,
+            'dp_duration': float(sum(c['duration'] for c in final_clips)),
+            'greedy_duration': float(sum(c.get('duration', 0) for c in greedy_clips)),
+            'greedy_within_limits': greedy_within_limits,
+        }
+        status = "optimum" if result.optimal else f"≤ {result.upper_bound:.2f}"
+        print(f"   🧮 DP: {len(final_clips)} klipów, Σscore {result.score:.2f} ({status}, "
+              f"krok {result.step:.1f}s, {result.iterations} iter.)")
+        print(f"   🧮 Greedy dla porównania: {len(greedy_clips)} klipów, Σscore {greedy_score:.2f} "
+              f"(zysk DP: {report['gain']:+.2f}"
+              f"{'' if greedy_within_limits else ', greedy poza limitami'})")
+        return final_clips, report
+
+    def _dp_clips(self, candidates: List[Dict], total_duration: float) -> Tuple[List[Dict], DPSelection]:
+        """Klipy wybrane przez select_budgeted (kopie kandydatów) + wynik DP"""
+        cfg = self.config.selection
+        num_bins, max_per_bin, bin_size = self._coverage_limits(total_duration)
+        result = select_budgeted(
+            [c['t0'] for c in candidates],
+            [c['t1'] for c in candidates],
+            [c.get('final_score', 0) for c in candidates],
+            [self._bin_index(c['t0'], bin_size, num_bins) for c in candidates],
+            budget_seconds=cfg.target_total_duration * cfg.duration_tolerance,
+            min_gap=cfg.min_time_gap,
+            max_per_bin=max_per_bin,
+            max_clips=cfg.max_clips,
+            step=getattr(cfg, 'dp_budget_step', 1.0),
+            max_cells=getattr(cfg, 'dp_max_cells', 12_000_000),
+            iterations=getattr(cfg, 'dp_iterations', 20)
+        )
+        return [dict(candidates[i]) for i in result.indices], result
     
     def _filter_by_duration(self, segments: List[Dict]) -> List[Dict]:
         """Filter segmenty po minimalnej długości"""
@@ -248,17 +346,20 @@ class SelectionStage:
         max_clips = self.config.selection.max_clips
         min_gap = self.config.selection.min_time_gap
         
+        # Wybrane posortowane po czasie - kolizja sprawdzana tylko z dwoma sąsiadami
+        chosen = IntervalSet(min_gap)
+        
         for candidate in sorted_candidates:
             # Check if we're done
             if len(selected) >= max_clips:
                 break
             
-            current_total = sum(s['duration'] for s in selected)
+            current_total = chosen.total_duration  # suma na bieżąco (bez przeliczania listy)
             if current_total >= target_duration:
                 break
             
             # Check temporal overlap/proximity z już wybranymi
-            if self._has_overlap(candidate, selected, min_gap):
+            if chosen.conflicts(candidate['t0'], candidate['t1']):
                 continue
             
             # Check if adding this would exceed max duration
@@ -266,6 +367,7 @@ class SelectionStage:
                 continue
             
             selected.append(candidate)
+            chosen.add(candidate['t0'], candidate['t1'], candidate, duration=candidate['duration'])
         
         return selected
     
@@ -275,19 +377,11 @@ class SelectionStage:
         selected: List[Dict],
         min_gap: float
     ) -> bool:
-        """Sprawdź czy kandydat ma overlap z wybranymi"""
-        for sel in selected:
-            # Check overlap
-            if not (candidate['t1'] < sel['t0'] or candidate['t0'] > sel['t1']):
-                return True
-            
-            # Check minimum gap
-            if sel['t0'] - candidate['t1'] < min_gap and sel['t0'] > candidate['t1']:
-                return True
-            if candidate['t0'] - sel['t1'] < min_gap and candidate['t0'] > sel['t1']:
-                return True
-        
-        return False
+        """Sprawdź czy kandydat ma overlap z wybranymi (pełny przegląd - dowolna lista)"""
+        return any(
+            conflicts_with(candidate['t0'], candidate['t1'], sel['t0'], sel['t1'], min_gap)
+            for sel in selected
+        )
     
     def _smart_merge(
         self,
@@ -343,7 +437,8 @@ class SelectionStage:
                     
                     # BEZPIECZEŃSTWO: Sprawdź czy merge nie utworzył za długiego klipu
                     if merged_clip['duration'] > self.config.selection.max_clip_duration * 1.1:
-                        print(f"   ⚠️ Merge {current['id']}+{next_selected['id']} = {merged_clip['duration']:.1f}s > max, pomijam")
+                        if self.verbose:
+                            print(f"   ⚠️ Merge {current['id']}+{next_selected['id']} = {merged_clip['duration']:.1f}s > max, pomijam")
                         merged.append(current)
                         i += 1
                         continue
@@ -395,6 +490,28 @@ class SelectionStage:
             idx += 1
         return merged
     
+    def _coverage_limits(self, total_duration: float) -> Tuple[int, int, float]:
+        """(liczba faz, max klipów per faza, długość fazy [s])"""
+        num_bins = self.config.selection.position_bins
+        max_per_bin = self.config.selection.max_clips_per_bin
+        
+        # NOWE v1.1: Dynamiczne skalowanie dla długich materiałów
+        hours = total_duration / 3600
+        if hours > 12:
+            # Bardzo długie materiały (>12h): zwiększ limit per bin
+            max_per_bin = max(max_per_bin, 8)  # Min 8 klipów per bin
+            if self.verbose:
+                print(f"   📈 Długi materiał ({hours:.1f}h) → max_per_bin: {max_per_bin}")
+        elif hours > 6:
+            # Długie materiały (6-12h): trochę zwiększ
+            max_per_bin = max(max_per_bin, 6)
+        
+        return num_bins, max_per_bin, total_duration / num_bins
+
+    @staticmethod
+    def _bin_index(t0: float, bin_size: float, num_bins: int) -> int:
+        return min(int(t0 / bin_size), num_bins - 1)  # Clamp
+
     def _optimize_temporal_coverage(
         self,
         clips: List[Dict],
@@ -409,28 +526,13 @@ class SelectionStage:
         if not clips:
             return []
         
-        num_bins = self.config.selection.position_bins
-        max_per_bin = self.config.selection.max_clips_per_bin
-        
-        # NOWE v1.1: Dynamiczne skalowanie dla długich materiałów
+        num_bins, max_per_bin, bin_size = self._coverage_limits(total_duration)
         hours = total_duration / 3600
-        if hours > 12:
-            # Bardzo długie materiały (>12h): zwiększ limit per bin
-            max_per_bin = max(max_per_bin, 8)  # Min 8 klipów per bin
-            print(f"   📈 Długi materiał ({hours:.1f}h) → max_per_bin: {max_per_bin}")
-        elif hours > 6:
-            # Długie materiały (6-12h): trochę zwiększ
-            max_per_bin = max(max_per_bin, 6)
-        
-        # Create time bins
-        bin_size = total_duration / num_bins
-        bins = defaultdict(list)
         
         # Assign clips to bins
+        bins = defaultdict(list)
         for clip in clips:
-            bin_idx = int(clip['t0'] / bin_size)
-            bin_idx = min(bin_idx, num_bins - 1)  # Clamp
-            bins[bin_idx].append(clip)
+            bins[self._bin_index(clip['t0'], bin_size, num_bins)].append(clip)
         
         # Select top N from each bin
         balanced = []
@@ -454,7 +556,8 @@ class SelectionStage:
             min_clips_required = max(min_clips_required, 10)  # Min 10 dla długich
         
         if len(balanced) < min_clips_required:
-            print(f"   ⚠️ Tylko {len(balanced)} klipów po balansowaniu (min: {min_clips_required}), dodaję więcej...")
+            if self.verbose:
+                print(f"   ⚠️ Tylko {len(balanced)} klipów po balansowaniu (min: {min_clips_required}), dodaję więcej...")
             # Sort all clips by score and take top ones
             all_sorted = sorted(clips, key=lambda x: x.get('final_score', 0), reverse=True)
             balanced = all_sorted[:min_clips_required]
@@ -483,7 +586,8 @@ class SelectionStage:
             # Minimalny overshoot - nie tnij agresywnie
             return clips
 
-        print(f"   ⚠️ Total {total:.1f}s przekracza target {target:.1f}s, trimming...")
+        if self.verbose:
+            print(f"   ⚠️ Total {total:.1f}s przekracza target {target:.1f}s, trimming...")
 
         max_trim_fraction = 0.15
         min_duration_guard = max(6, int(self.config.selection.min_clip_duration))
@@ -1,10 +1,12 @@
 """
 Stage 7: Video Export & Assembly
-- Extract individual clips z source video
+- Extract individual clips z source video (równolegle - EncoderPool)
 - Generate title cards
-- Add transitions (fade in/out)
+- Add transitions (fade in/out, równolegle)
 - Concatenate wszystko
 - Optional: hardsub version
+- Opcjonalnie (export.single_pass): wszystko powyżej jednym grafem filter_complex
+  i jednym kodowaniem (hardsub w tym samym przebiegu)
 """
 
 import subprocess
@@ -17,12 +19,23 @@ from dotenv import load_dotenv
 from openai import OpenAI
 
 from .config import Config
+from .encoder_pool import EncodeError, EncodeJob, EncoderPool, encoder_workers
 load_dotenv()
 
 class ExportStage:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, cache_manager=None, max_encode_workers: Optional[int] = None):
         self.config = config
         self._check_ffmpeg()
+
+        # Limit slotów enkodera z zewnątrz (pojemność ffmpeg w ResourceBudget przy wielu jobach)
+        self.max_encode_workers = max_encode_workers
+
+        # Opcjonalny CacheManager - wycięte i "faded" klipy MP4 są cache'owane per (input, t0, t1, parametry)
+        self.cache_manager = cache_manager
+
+        # Pula enkoderów aktualnie działającego kroku (cancel() ją zatrzymuje)
+        self._cancelled = False
+        self._encoder_pool: Optional[EncoderPool] = None
         
         # Initialize GPT
         self.openai_client = None
@@ -140,11 +153,22 @@ class ExportStage:
         clips_dir.mkdir(exist_ok=True)
         titles_dir.mkdir(exist_ok=True)
         
+        # Tryb jednego przebiegu: cięcie + fade + title cards + concat (+ hardsub) jednym ffmpeg
+        if self.config.export.single_pass:
+            try:
+                return self._export_single_pass(
+                    input_path, clips, segments, output_dir, titles_dir, progress_callback, part_number
+                )
+            except InterruptedError:
+                raise
+            except Exception as e:
+                print(f"   ⚠️ Eksport jednym przebiegiem nieudany ({str(e)[:200]}) - tryb klasyczny")
+
         # STEP 1: Extract individual clips
         if progress_callback:
             progress_callback(0.1, "Wycinanie klipów...")
         
-        self._extract_clips(input_path, clips, clips_dir)
+        self._extract_clips(input_path, clips, clips_dir, progress_callback)
         
         # STEP 2: Generate title cards (if enabled)
         title_cards_generated = False
@@ -165,7 +189,7 @@ class ExportStage:
         if progress_callback:
             progress_callback(0.5, "Dodawanie przejść...")
         
-        faded_clips = self._add_transitions(clips, clips_dir)
+        faded_clips = self._add_transitions(clips, clips_dir, progress_callback)
         
         # STEP 4: Concatenate wszystko
         if progress_callback:
@@ -205,19 +229,233 @@ class ExportStage:
             'num_clips': len(clips)
         }
     
+    def _output_path(self, output_dir: Path, input_file: Path, part_number: Optional[int] = None) -> Path:
+        """Nazwa filmu wynikowego (z numerem części przy multi-part)"""
+        date_str = datetime.now().strftime("%Y-%m-%d")
+        part_suffix = f"_PART{part_number}" if part_number else ""
+        return output_dir / f"SEJM_HIGHLIGHTS_{input_file.stem}_{date_str}{part_suffix}.mp4"
+
+    @staticmethod
+    def _escape_filter_path(path: Path) -> str:
+        """Ścieżka do opcji filtra ffmpeg (Windows: / zamiast \\, escape ':')"""
+        return str(path.absolute()).replace('\\', '/').replace(':', '\\:')
+
+    def _build_single_pass_graph(
+        self,
+        input_file: Path,
+        clips: List[Dict],
+        title_files: Optional[List[Optional[Path]]] = None,
+        subtitles_file: Optional[Path] = None
+    ) -> tuple:
+        """
+        Argumenty wejść i graf filter_complex dla eksportu jednym przebiegiem.
+
+        Każdy klip (i title card) to osobne wejście tego samego pliku z `-ss`
+        (seek po keyframe'ach) - liniowe czytanie wielogodzinnego źródła
+        dekodowałoby cały materiał. Źródło jest czytane tylko w oknach klipów,
+        a cięcie/fade/concat dzieją się w jednym grafie z jednym kodowaniem.
+
+        Returns:
+            (input_args, graph, output_labels) - output_labels: [(wideo, audio), ...]
+            dla filmu głównego i (gdy subtitles_file) wersji hardsub
+        """
+        export = self.config.export
+        fade_in, fade_out = export.fade_in_duration, export.fade_out_duration
+        audio_format = "aformat=sample_fmts=fltp:sample_rates=48000:channel_layouts=stereo"
+        source = str(input_file)
+
+        input_args: List[str] = []
+        lines: List[str] = []
+        concat_pads: List[str] = []
+        n_inputs = 0
+
+        for i, clip in enumerate(clips):
+            t0, t1 = self._clip_cut_range(clip)
+            duration = t1 - t0
+
+            title_file = title_files[i] if title_files else None
+            if title_file is not None:
+                # Title card: czarne klatki źródła (ta sama rozdzielczość/fps) + drawtext, cisza
+                card = export.title_card_duration
+                input_args += ['-ss', f"{t0:.3f}", '-t', f"{card:.3f}", '-i', source]
+                lines.append(
+                    f"[{n_inputs}:v]trim=duration={card:.3f},setpts=PTS-STARTPTS,"
+                    f"drawbox=x=0:y=0:w=iw:h=ih:color={export.title_bgcolor}@1:t=fill,"
+                    f"drawtext=textfile='{self._escape_filter_path(title_file)}':fontsize={export.title_fontsize}:"
+                    f"fontcolor={export.title_fontcolor}:x=(w-text_w)/2:y=(h-text_h)/2,format=yuv420p[tv{i}]"
+                )
+                lines.append(f"anullsrc=channel_layout=stereo:sample_rate=48000,atrim=duration={card:.3f},{audio_format}[ta{i}]")
+                concat_pads.append(f"[tv{i}][ta{i}]")
+                n_inputs += 1
+
+            fade_out_start = max(0.0, duration - fade_out)
+            input_args += ['-ss', f"{t0:.3f}", '-t', f"{duration:.3f}", '-i', source]
+            lines.append(
+                f"[{n_inputs}:v]trim=duration={duration:.3f},setpts=PTS-STARTPTS,"
+                f"fade=t=in:st=0:d={fade_in},fade=t=out:st={fade_out_start:.3f}:d={fade_out},format=yuv420p[v{i}]"
+            )
+            lines.append(
+                f"[{n_inputs}:a]atrim=duration={duration:.3f},asetpts=PTS-STARTPTS,"
+                f"afade=t=in:st=0:d={fade_in},afade=t=out:st={fade_out_start:.3f}:d={fade_out},{audio_format}[a{i}]"
+            )
+            concat_pads.append(f"[v{i}][a{i}]")
+            n_inputs += 1
+
+        lines.append(f"{''.join(concat_pads)}concat=n={len(concat_pads)}:v=1:a=1[vcat][acat]")
+        outputs = [('[vcat]', '[acat]')]
+
+        if subtitles_file is not None:
+            # Hardsub w tym samym przebiegu: jeden dekoding/graf, dwa wyjścia
+            style = f"Fontsize={export.subtitle_fontsize},Bold=1,Outline=2,Shadow=1,MarginV=40"
+            lines.append("[vcat]split=2[vmain][vsubin]")
+            lines.append("[acat]asplit=2[amain][asub]")
+            lines.append(f"[vsubin]subtitles='{self._escape_filter_path(subtitles_file)}':force_style='{style}'[vsub]")
+            outputs = [('[vmain]', '[amain]'), ('[vsub]', '[asub]')]
+
+        return input_args, ";\n".join(lines), outputs
+
+    def _export_single_pass(
+        self,
+        input_file: Path,
+        clips: List[Dict],
+        segments: List[Dict],
+        output_dir: Path,
+        titles_dir: Path,
+        progress_callback: Optional[Callable] = None,
+        part_number: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Eksport jednym ffmpeg: trim/atrim + fade/afade + title cards + concat (+ hardsub)"""
+        export = self.config.export
+        print(f"   Eksport jednym przebiegiem (filter_complex, {len(clips)} klipów)...")
+        if progress_callback:
+            progress_callback(0.1, "Eksport jednym przebiegiem...")
+
+        output_file = self._output_path(output_dir, input_file, part_number)
+        hardsub_file = None
+        subtitles_file = None
+        if export.generate_hardsub and export.fuse_hardsub:
+            subtitles_file = output_dir / "full_subtitles.srt"
+            self._build_srt(clips, segments, subtitles_file)
+            hardsub_file = output_dir / output_file.name.replace('.mp4', '_HARDSUB.mp4')
+
+        title_files = None
+        if export.add_transitions:
+            title_files = []
+            for i, clip in enumerate(clips):
+                title_file = titles_dir / f"title_{i+1:03d}.txt"
+                title_file.write_text(clip.get('title', 'Ciekawy moment'), encoding='utf-8')
+                title_files.append(title_file)
+
+        def run(with_titles: bool):
+            input_args, graph, outputs = self._build_single_pass_graph(
+                input_file, clips, title_files if with_titles else None, subtitles_file
+            )
+            graph_file = titles_dir / "export_graph.txt"
+            graph_file.write_text(graph, encoding='utf-8')
+
+            cmd = ['ffmpeg', '-y', *input_args, '-filter_complex_script', str(graph_file.absolute())]
+            for (video, audio), target in zip(outputs, [output_file, hardsub_file]):
+                cmd += [
+                    '-map', video, '-map', audio,
+                    '-c:v', export.video_codec,
+                    '-preset', export.video_preset,
+                    '-crf', str(export.crf),
+                    '-c:a', export.audio_codec,
+                    '-b:a', export.audio_bitrate,
+                    '-movflags', export.movflags,
+                    str(target.absolute())
+                ]
+            self._run_encodes([EncodeJob(cmd, "single-pass")])
+
+        try:
+            run(with_titles=title_files is not None)
+        except subprocess.CalledProcessError as e:
+            error_msg = e.stderr.decode(errors='replace') if e.stderr else str(e)
+            if title_files is None or ('drawtext' not in error_msg and 'Fontconfig' not in error_msg):
+                raise
+            print("   ⚠️ Błąd title cards (drawtext/fontconfig) - eksport bez title cards")
+            run(with_titles=False)
+
+        print(f"   ✓ Film zapisany: {output_file.name}")
+        if hardsub_file:
+            print(f"   ✓ Hardsub zapisany: {hardsub_file.name}")
+
+        # Hardsub poza grafem (fuse_hardsub: false) - osobne kodowanie jak w trybie klasycznym
+        if export.generate_hardsub and not export.fuse_hardsub:
+            if progress_callback:
+                progress_callback(0.9, "Generowanie wersji z napisami...")
+            try:
+                hardsub_file = self._generate_hardsub(output_file, clips, segments, output_dir)
+            except Exception as e:
+                print(f"   ⚠️ Błąd hardsub: {e}")
+
+        print("✅ Stage 7 zakończony")
+        return {
+            'output_file': str(output_file),
+            'output_file_hardsub': str(hardsub_file) if hardsub_file else None,
+            'num_clips': len(clips)
+        }
+
+    def _encoder_threads_args(self) -> List[str]:
+        """Wątki na enkoder (0 = domyślne ffmpeg)"""
+        threads = self.config.export.encoder_threads
+        return ['-threads', str(threads)] if threads > 0 else []
+
+    def encode_slots(self) -> int:
+        """Liczba równoległych ffmpeg: export.encode_workers, najwyżej max_encode_workers"""
+        workers = encoder_workers(self.config.export.encode_workers, self.config.export.encoder_threads)
+        if self.max_encode_workers:
+            workers = min(workers, self.max_encode_workers)
+        return workers
+
+    def _run_encodes(
+        self,
+        jobs: List[EncodeJob],
+        progress_callback: Optional[Callable] = None,
+        progress_range: tuple = (0.0, 1.0),
+        message: str = "",
+        fail_fast: bool = True
+    ) -> list:
+        """Uruchom zadania ffmpeg w puli (encode_slots() slotów)"""
+        pool = EncoderPool(self.encode_slots())
+        self._encoder_pool = pool
+        if self._cancelled:
+            pool.cancel()
+
+        start, end = progress_range
+
+        def on_done(done: int, total: int, job: EncodeJob):
+            if progress_callback:
+                progress_callback(start + (end - start) * done / total, f"{message} {done}/{total} ({job.label})")
+
+        try:
+            return pool.run(jobs, progress_callback=on_done, fail_fast=fail_fast)
+        finally:
+            self._encoder_pool = None
+
     def _extract_clips(
         self,
         input_file: Path,
         clips: List[Dict],
-        output_dir: Path
+        output_dir: Path,
+        progress_callback: Optional[Callable] = None
     ):
-        """Extract individual clips from source video"""
+        """Extract individual clips from source video (do encode_workers naraz)"""
         print(f"   Wycinanie {len(clips)} klipów...")
+        cached_count = 0
+        jobs = []
+        pending = []  # (indeks klipu, plik wyjściowy)
         
         for i, clip in enumerate(clips):
             # Pre/post roll
-            t0 = max(0, clip['t0'] - self.config.export.clip_preroll)
-            t1 = clip['t1'] + self.config.export.clip_postroll
+            t0, t1 = self._clip_cut_range(clip)
+
+            # Cache hit → pomiń ffmpeg
+            cached_file = self._get_cached_clip('export_clip', clip)
+            if cached_file:
+                clip['clip_file'] = str(cached_file)
+                cached_count += 1
+                continue
             
             output_file = output_dir / f"clip_{i+1:03d}.mp4"
             
@@ -230,28 +468,49 @@ class ExportStage:
                 '-c:v', self.config.export.video_codec,
                 '-preset', self.config.export.video_preset,
                 '-crf', str(self.config.export.crf),
+                *self._encoder_threads_args(),
                 '-c:a', self.config.export.audio_codec,
                 '-b:a', self.config.export.audio_bitrate,
                 '-movflags', self.config.export.movflags,
                 '-y',
                 str(output_file)
             ]
-            
-            try:
-                subprocess.run(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=True
-                )
-                
-                clip['clip_file'] = str(output_file)
-                
-            except subprocess.CalledProcessError as e:
-                print(f"   ⚠️ Błąd wycinania klipu {i+1}: {e.stderr.decode()}")
-                raise
+            jobs.append(EncodeJob(cmd, f"klip {i+1}"))
+            pending.append((i, output_file))
+
+        try:
+            self._run_encodes(jobs, progress_callback, (0.1, 0.3), "Wycinanie klipów")
+        except EncodeError as e:
+            error_msg = e.stderr.decode(errors='replace') if e.stderr else str(e)
+            print(f"   ⚠️ Błąd wycinania ({e.job.label}): {error_msg}")
+            raise
+
+        for i, output_file in pending:
+            clips[i]['clip_file'] = str(self._save_clip_to_cache(output_file, 'export_clip', clips[i]))
         
-        print(f"   ✓ Wycięto {len(clips)} klipów")
+        cache_info = f" ({cached_count} z cache)" if cached_count else ""
+        print(f"   ✓ Wycięto {len(clips)} klipów{cache_info}")
+
+    def _clip_cut_range(self, clip: Dict) -> tuple:
+        """Zakres cięcia klipu w źródle (z pre/post roll)"""
+        t0 = max(0, clip['t0'] - self.config.export.clip_preroll)
+        t1 = clip['t1'] + self.config.export.clip_postroll
+        return t0, t1
+
+    def _clip_cache_upstream(self, clip: Dict) -> Dict[str, float]:
+        """Dane identyfikujące plik klipu w cache (input hash jest w katalogu cache)"""
+        t0, t1 = self._clip_cut_range(clip)
+        return {'t0': round(t0, 3), 't1': round(t1, 3), 'duration': round(clip['duration'], 3)}
+
+    def _get_cached_clip(self, entry: str, clip: Dict) -> Optional[Path]:
+        if not self.cache_manager:
+            return None
+        return self.cache_manager.get_cached_file(entry, self._clip_cache_upstream(clip))
+
+    def _save_clip_to_cache(self, clip_file: Path, entry: str, clip: Dict) -> Path:
+        if not self.cache_manager:
+            return clip_file
+        return self.cache_manager.save_file_to_cache(clip_file, entry, self._clip_cache_upstream(clip))
     
     def _generate_title_cards(
         self,
@@ -311,19 +570,29 @@ class ExportStage:
     def _add_transitions(
         self,
         clips: List[Dict],
-        clips_dir: Path
+        clips_dir: Path,
+        progress_callback: Optional[Callable] = None
     ) -> List[str]:
-        """Add fade in/out transitions to clips"""
+        """Add fade in/out transitions to clips (do encode_workers naraz)"""
         print(f"   Dodawanie przejść do {len(clips)} klipów...")
         
         fade_in = self.config.export.fade_in_duration
         fade_out = self.config.export.fade_out_duration
         
         faded_files = []
+        cached_count = 0
+        jobs = []
+        pending = []  # (pozycja w faded_files, indeks klipu, plik wyjściowy)
         
         for i, clip in enumerate(clips):
             if 'clip_file' not in clip:
                 continue
+
+            cached_file = self._get_cached_clip('export_faded', clip)
+            if cached_file:
+                faded_files.append(str(cached_file))
+                cached_count += 1
+                continue
             
             input_file = Path(clip['clip_file'])
             output_file = clips_dir / f"clip_{i+1:03d}_faded.mp4"
@@ -341,27 +610,27 @@ class ExportStage:
                 '-c:v', self.config.export.video_codec,
                 '-preset', 'fast',
                 '-crf', str(self.config.export.crf),
+                *self._encoder_threads_args(),
                 '-c:a', self.config.export.audio_codec,
                 '-b:a', self.config.export.audio_bitrate,
                 '-y',
                 str(output_file)
             ]
-            
-            try:
-                subprocess.run(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=True
-                )
-                
-                faded_files.append(str(output_file))
-                
-            except subprocess.CalledProcessError as e:
+            jobs.append(EncodeJob(cmd, f"klip {i+1}"))
+            pending.append((len(faded_files), i, output_file))
+            faded_files.append(None)
+
+        # Błąd fade nie przerywa eksportu - fallback na wycięty klip
+        errors = self._run_encodes(jobs, progress_callback, (0.5, 0.7), "Dodawanie przejść", fail_fast=False)
+        for (pos, i, output_file), error in zip(pending, errors):
+            if error is not None:
                 print(f"   ⚠️ Błąd fade dla klipu {i+1}, używam original")
-                faded_files.append(clip['clip_file'])
+                faded_files[pos] = clips[i]['clip_file']
+            else:
+                faded_files[pos] = str(self._save_clip_to_cache(output_file, 'export_faded', clips[i]))
         
-        print(f"   ✓ Dodano przejścia")
+        cache_info = f" ({cached_count} z cache)" if cached_count else ""
+        print(f"   ✓ Dodano przejścia{cache_info}")
         return faded_files
     
     def _concatenate_clips(
@@ -407,10 +676,7 @@ class ExportStage:
             print(f"      ... ({len(concat_list) - 3} więcej)")
         
         # Generate output filename with part number if multi-part
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        source_name = input_file.stem
-        part_suffix = f"_PART{part_number}" if part_number else ""
-        output_file = output_dir / f"SEJM_HIGHLIGHTS_{source_name}_{date_str}{part_suffix}.mp4"
+        output_file = self._output_path(output_dir, input_file, part_number)
         
         # Concatenate
         cmd = [
@@ -759,8 +1025,11 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
     
     def cancel(self):
-        """Anuluj operację"""
-        pass
+        """Anuluj operację: zatrzymaj działające enkodery (fail-fast dla całego kroku)"""
+        self._cancelled = True
+        pool = self._encoder_pool
+        if pool is not None:
+            pool.cancel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,350 @@
+"""
+Stage Graph
+Deklaratywny graf etapów pipeline'u + scheduler na puli wątków.
+
+Każdy etap deklaruje jakie klucze kontekstu czyta (inputs) i jakie produkuje
+(outputs). Zależności wynikają z danych: etap startuje, gdy wszystkie jego
+inputs są dostępne. Etapy niezależne (np. Shorts i Export) działają równolegle.
+
+Opcjonalny ResourceBudget (współdzielony przez wiele uruchomień, patrz
+pipeline/job_queue.py) ogranicza ile etapów naraz zużywa dany zasób
+(sloty ffmpeg, instancje modelu ASR, RAM).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+StageFunc = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+@dataclass
+class StageNode:
+    """Pojedynczy etap w grafie"""
+    name: str
+    func: StageFunc
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    resources: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class StageTiming:
+    """Zmierzony czas (wall time) etapu"""
+    name: str
+    start: float
+    end: float
+    waited: float = 0.0  # Czas oczekiwania na zasoby (nie wliczany do duration)
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.end - self.start)
+
+
+class StageGraph:
+    """Graf etapów: węzły + zależności wyliczane z inputs/outputs"""
+
+    def __init__(self):
+        self.nodes: Dict[str, StageNode] = {}
+        self._producers: Dict[str, str] = {}
+
+    def add_stage(
+        self,
+        name: str,
+        func: StageFunc,
+        inputs: Tuple[str, ...] = (),
+        outputs: Tuple[str, ...] = (),
+        resources: Optional[Dict[str, int]] = None
+    ) -> StageNode:
+        """
+        Dodaj etap do grafu
+
+        Args:
+            resources: Zapotrzebowanie etapu na zasoby, np. {'ffmpeg': 1, 'ram_mb': 2048}
+        """
+        if name in self.nodes:
+            raise ValueError(f"Stage '{name}' already defined")
+
+        for key in outputs:
+            if key in self._producers:
+                raise ValueError(
+                    f"Output '{key}' produced by both '{self._producers[key]}' and '{name}'"
+                )
+
+        node = StageNode(
+            name=name,
+            func=func,
+            inputs=tuple(inputs),
+            outputs=tuple(outputs),
+            resources=dict(resources or {})
+        )
+        self.nodes[name] = node
+        for key in node.outputs:
+            self._producers[key] = name
+
+        return node
+
+    def dependencies(self, name: str) -> Set[str]:
+        """Etapy, które muszą się zakończyć przed startem `name`"""
+        node = self.nodes[name]
+        return {self._producers[key] for key in node.inputs if key in self._producers}
+
+    def validate(self, initial_keys: Set[str]):
+        """
+        Sprawdź czy każdy input ma źródło (kontekst startowy lub inny etap)
+        i czy graf nie zawiera cykli.
+        """
+        for node in self.nodes.values():
+            for key in node.inputs:
+                if key not in self._producers and key not in initial_keys:
+                    raise ValueError(f"Stage '{node.name}' requires unknown input '{key}'")
+
+        self.topological_order()
+
+    def topological_order(self) -> List[str]:
+        """Kolejność topologiczna (stabilna względem kolejności dodawania)"""
+        remaining = {name: set(self.dependencies(name)) for name in self.nodes}
+        order: List[str] = []
+
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle detected in stage graph: {sorted(remaining)}")
+
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+        return order
+
+    def critical_path(self, timings: Dict[str, StageTiming]) -> Tuple[List[str], float]:
+        """
+        Najdłuższa (wg zmierzonych czasów) ścieżka w grafie.
+
+        Returns:
+            (lista etapów na ścieżce krytycznej, suma ich czasów w sekundach)
+        """
+        best: Dict[str, float] = {}
+        parent: Dict[str, Optional[str]] = {}
+
+        for name in self.topological_order():
+            if name not in timings:
+                continue
+
+            best_dep, best_len = None, 0.0
+            for dep in self.dependencies(name):
+                if dep in best and best[dep] > best_len:
+                    best_dep, best_len = dep, best[dep]
+
+            best[name] = best_len + timings[name].duration
+            parent[name] = best_dep
+
+        if not best:
+            return [], 0.0
+
+        tail = max(best, key=best.get)
+        path = []
+        node: Optional[str] = tail
+        while node is not None:
+            path.append(node)
+            node = parent[node]
+
+        return list(reversed(path)), best[tail]
+
+
+class ResourceBudget:
+    """
+    Budżet zasobów współdzielony przez wiele uruchomień pipeline'u.
+
+    Etap rezerwuje wszystkie swoje zasoby naraz (all-or-nothing), więc dwa
+    etapy nie mogą się zakleszczyć trzymając po części zasobów. Żądanie
+    większe niż pojemność jest przycinane do pojemności (etap i tak się wykona,
+    tylko sam). Zasoby nieznane budżetowi są ignorowane.
+    """
+
+    def __init__(self, capacities: Dict[str, int]):
+        self.capacities = {name: max(1, int(amount)) for name, amount in capacities.items()}
+        self._available = dict(self.capacities)
+        self._cond = threading.Condition()
+        self.peak_usage = {name: 0 for name in self.capacities}
+
+    @classmethod
+    def from_config(cls, queue_config) -> 'ResourceBudget':
+        """Zbuduj budżet z QueueConfig"""
+        return cls({
+            'ffmpeg': queue_config.ffmpeg_slots,
+            'asr': queue_config.asr_instances,
+            'ram_mb': queue_config.ram_budget_mb,
+        })
+
+    def _normalize(self, demand: Dict[str, int]) -> Dict[str, int]:
+        return {
+            name: min(int(amount), self.capacities[name])
+            for name, amount in (demand or {}).items()
+            if name in self.capacities and amount > 0
+        }
+
+    def _fits(self, demand: Dict[str, int]) -> bool:
+        return all(self._available[name] >= amount for name, amount in demand.items())
+
+    def acquire(
+        self,
+        demand: Dict[str, int],
+        check_cancelled: Optional[Callable[[], None]] = None,
+        poll_interval: float = 0.5
+    ) -> Dict[str, int]:
+        """
+        Zablokuj do momentu aż cały `demand` jest dostępny i zarezerwuj go.
+
+        Returns:
+            Faktycznie zarezerwowane zasoby (przekaż do release())
+        """
+        demand = self._normalize(demand)
+        with self._cond:
+            while not self._fits(demand):
+                if check_cancelled:
+                    check_cancelled()
+                self._cond.wait(timeout=poll_interval)
+
+            for name, amount in demand.items():
+                self._available[name] -= amount
+                used = self.capacities[name] - self._available[name]
+                self.peak_usage[name] = max(self.peak_usage[name], used)
+
+        return demand
+
+    def release(self, reserved: Dict[str, int]):
+        """Zwolnij zasoby zarezerwowane przez acquire()"""
+        with self._cond:
+            for name, amount in reserved.items():
+                self._available[name] = min(self.capacities[name], self._available[name] + amount)
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(
+        self,
+        demand: Dict[str, int],
+        check_cancelled: Optional[Callable[[], None]] = None
+    ) -> Iterator[Dict[str, int]]:
+        """Context manager: acquire() + release()"""
+        reserved = self.acquire(demand, check_cancelled=check_cancelled)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+    def in_use(self) -> Dict[str, int]:
+        """Aktualnie zajęte zasoby"""
+        with self._cond:
+            return {name: self.capacities[name] - self._available[name] for name in self.capacities}
+
+
+class StageScheduler:
+    """
+    Uruchamia etapy grafu na puli wątków.
+
+    Etap trafia do puli gdy wszystkie zależności się zakończyły (i gdy
+    ResourceBudget ma wolne zasoby, jeśli podano). Przy błędzie nowe etapy
+    nie są już uruchamiane, scheduler czeka na trwające i rzuca pierwszy
+    wyjątek dalej.
+    """
+
+    def __init__(
+        self,
+        graph: StageGraph,
+        max_workers: int = 4,
+        check_cancelled: Optional[Callable[[], None]] = None,
+        resource_budget: Optional[ResourceBudget] = None
+    ):
+        self.graph = graph
+        self.max_workers = max(1, int(max_workers or 1))
+        self.check_cancelled = check_cancelled
+        self.resource_budget = resource_budget
+        self.timings: Dict[str, StageTiming] = {}
+        self._lock = threading.Lock()
+
+    def run(self, context: Dict[str, Any]) -> Dict[str, StageTiming]:
+        """
+        Wykonaj cały graf.
+
+        Args:
+            context: Kontekst startowy; wyniki etapów są do niego dopisywane
+
+        Returns:
+            Dict stage_name -> StageTiming
+        """
+        self.graph.validate(set(context.keys()))
+
+        pending = {name: set(self.graph.dependencies(name)) for name in self.graph.topological_order()}
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+            while pending or running:
+                if error is None:
+                    ready = [name for name, deps in pending.items() if not deps]
+                    for name in ready:
+                        try:
+                            if self.check_cancelled:
+                                self.check_cancelled()
+                        except Exception as e:
+                            error = e
+                            break
+                        del pending[name]
+                        future = pool.submit(self._run_node, self.graph.nodes[name], context)
+                        running[future] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    exc = future.exception()
+                    if exc is not None:
+                        if error is None:
+                            error = exc
+                        continue
+                    for deps in pending.values():
+                        deps.discard(name)
+
+        if error is not None:
+            raise error
+
+        return self.timings
+
+    def _run_node(self, node: StageNode, context: Dict[str, Any]):
+        """Wykonaj pojedynczy etap i zapisz jego outputs do kontekstu"""
+        with self._lock:
+            inputs = {key: context.get(key) for key in node.inputs}
+
+        reserved: Dict[str, int] = {}
+        wait_start = time.time()
+        if self.resource_budget and node.resources:
+            reserved = self.resource_budget.acquire(node.resources, check_cancelled=self.check_cancelled)
+
+        start = time.time()
+        try:
+            produced = node.func(inputs) or {}
+        finally:
+            end = time.time()
+            if reserved:
+                self.resource_budget.release(reserved)
+            with self._lock:
+                self.timings[node.name] = StageTiming(node.name, start, end, waited=start - wait_start)
+
+        missing = [key for key in node.outputs if key not in produced]
+        if missing:
+            raise RuntimeError(f"Stage '{node.name}' did not produce: {missing}")
+
+        with self._lock:
+            for key in node.outputs:
+                context[key] = produced[key]
@@ -0,0 +1,114 @@
+"""
+Transcript Checkpoint
+Dziennik transkrypcji (JSONL, tylko dopisywanie) zapisywany po każdym batchu.
+
+Dotąd segments_with_transcript.json powstawał dopiero na końcu Stage 3 -
+przerwanie na segmencie 2900/3000 oznaczało utratę całej transkrypcji.
+TranscribeStage dopisuje teraz każdy batch do dziennika (jedna linia JSON na
+segment, fsync po batchu), a przy kolejnym uruchomieniu transkrybuje tylko
+brakujące segmenty.
+
+Rekordy są kluczowane zakresem czasu segmentu (t0, t1 z dokładnością do ms),
+a dziennik leży w cache pod kluczem konfiguracji ASR i inputu
+(CacheManager.transcript_checkpoint) - nie zależy od konfiguracji VAD.
+Po zmianie parametrów VAD segmenty o niezmienionych granicach są więc
+przenoszone bez ponownej transkrypcji. Każdy rekord zapisuje też id segmentu
+i hash konfiguracji VAD, z którą powstał (diagnostyka).
+
+    checkpoint = TranscriptCheckpoint(path, vad_key=vad_hash)
+    restored = checkpoint.restore(vad_segments)   # None = do transkrypcji
+    checkpoint.append(transcribed_batch)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# Pola dopisywane do segmentu VAD przez transkrypcję
+TRANSCRIPT_FIELDS = ('transcript', 'words', 'confidence', 'language', 'num_words')
+
+
+def span_key(segment: Dict) -> str:
+    """Klucz segmentu: zakres czasu w ms (niezależny od id i konfiguracji VAD)"""
+    return f"{round(float(segment['t0']) * 1000)}-{round(float(segment['t1']) * 1000)}"
+
+
+class TranscriptCheckpoint:
+    """Dziennik transkrypcji JSONL (picklowalny - używany też w workerach ASR)"""
+
+    def __init__(self, path: Union[str, Path], vad_key: str = ""):
+        self.path = Path(path)
+        self.vad_key = vad_key
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        Rekordy z dziennika: span_key → pola transkrypcji.
+        Uszkodzona ostatnia linia (przerwany zapis) jest pomijana; segmenty
+        z błędem transkrypcji nie są przywracane (zostaną powtórzone).
+        """
+        records: Dict[str, Dict] = {}
+        if not self.path.exists():
+            return records
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('error'):
+                    records.pop(record.get('span'), None)
+                    continue
+                records[record['span']] = record['fields']
+        return records
+
+    def restore(self, segments: List[Dict], records: Optional[Dict[str, Dict]] = None) -> List[Optional[Dict]]:
+        """
+        Dla każdego segmentu: segment z przywróconą transkrypcją albo None.
+        Id i pozostałe pola pochodzą z bieżącego segmentu VAD.
+        """
+        if records is None:
+            records = self.load()
+        restored: List[Optional[Dict]] = []
+        for seg in segments:
+            fields = records.get(span_key(seg))
+            restored.append({**seg, **fields} if fields is not None else None)
+        return restored
+
+    def append(self, segments: List[Dict]) -> None:
+        """Dopisz batch (jeden write + fsync - linie nie przeplatają się między workerami)"""
+        if not segments:
+            return
+
+        lines = []
+        for seg in segments:
+            record = {
+                'span': span_key(seg),
+                'id': seg.get('id'),
+                'vad': self.vad_key,
+                'fields': {field: seg[field] for field in TRANSCRIPT_FIELDS if field in seg},
+            }
+            if seg.get('error'):
+                record['error'] = seg['error']
+            lines.append(json.dumps(record, ensure_ascii=False, default=_json_default))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = ("\n".join(lines) + "\n").encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def __repr__(self) -> str:
+        return f"TranscriptCheckpoint({self.path})"
+
+
+def _json_default(obj):
+    if hasattr(obj, 'item'):
+        return obj.item()
+    return str(obj)
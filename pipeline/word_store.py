@@ -0,0 +1,132 @@
+"""
+Word Store
+Indeks czasowy słów z wcześniejszych transkrypcji tego samego nagrania.
+
+Zmiana vad.threshold czy min_silence_duration przesuwa granice segmentów
+o ułamki sekund - dziennik transkrypcji (TranscriptCheckpoint) kluczowany
+dokładnymi granicami wtedy nie trafia. WordStore składa wszystkie rekordy
+dziennika w:
+- pokrycie: rozłączne, posortowane przedziały już przetranskrybowanego audio,
+- słowa posortowane po środku słowa (bisect).
+
+Dla nowego segmentu VAD:
+    gaps = store.gaps(t0, t1)      # nieprzetranskrybowane fragmenty
+    words = store.words(t0, t1)    # słowa o środku w [t0, t1)
+Segment całkowicie pokryty nie idzie do Whispera; częściowo pokryty -
+transkrybowane są tylko luki.
+
+Rekordy nachodzące na siebie (np. dwa przebiegi z różnym VAD) nie dublują
+słów: z każdego kolejnego rekordu brane są tylko słowa z jeszcze
+niepokrytej części.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Tuple
+
+MERGE_TOLERANCE = 0.01  # s - przedziały stykające się (zaokrąglenia ms) są łączone
+
+
+def parse_span(span: str) -> Tuple[float, float]:
+    """'t0ms-t1ms' (klucz TranscriptCheckpoint) → (t0, t1) w sekundach"""
+    t0_ms, t1_ms = span.split('-')
+    return int(t0_ms) / 1000.0, int(t1_ms) / 1000.0
+
+
+def _word_mid(word: Dict) -> float:
+    return (float(word['start']) + float(word['end'])) / 2.0
+
+
+class WordStore:
+    """Pokrycie (przedziały) + słowa z bisect po czasie"""
+
+    def __init__(self):
+        self._cov_starts: List[float] = []
+        self._cov_ends: List[float] = []
+        self._spans: List[Tuple[float, float, float]] = []  # (t0, t1, confidence)
+        self._mids: List[float] = []
+        self._words: List[Dict] = []
+        self._sorted = True
+
+    @classmethod
+    def from_records(cls, records: Dict[str, Dict]) -> 'WordStore':
+        """Z rekordów TranscriptCheckpoint.load() (kolejność dziennika - pierwszy wygrywa)"""
+        store = cls()
+        for span, fields in records.items():
+            t0, t1 = parse_span(span)
+            store.add(t0, t1, fields.get('words', []), fields.get('confidence', 0.0))
+        return store
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def add(self, t0: float, t1: float, words: Iterable[Dict], confidence: float = 0.0) -> None:
+        """Dodaj przetranskrybowany przedział; słowa z już pokrytej części są pomijane"""
+        if t1 <= t0:
+            return
+        new_parts = self.gaps(t0, t1)
+        if not new_parts:
+            return
+
+        for word in words:
+            mid = _word_mid(word)
+            if any(a <= mid < b for a, b in new_parts):
+                self._mids.append(mid)
+                self._words.append(word)
+                self._sorted = False
+
+        insort(self._spans, (t0, t1, float(confidence)))
+        self._insert_coverage(t0, t1)
+
+    def _insert_coverage(self, t0: float, t1: float) -> None:
+        # Przedziały nachodzące/stykające się z [t0, t1] → jeden scalony
+        lo = bisect_left(self._cov_ends, t0 - MERGE_TOLERANCE)
+        hi = bisect_right(self._cov_starts, t1 + MERGE_TOLERANCE)
+        if lo < hi:
+            t0 = min(t0, self._cov_starts[lo])
+            t1 = max(t1, self._cov_ends[hi - 1])
+        self._cov_starts[lo:hi] = [t0]
+        self._cov_ends[lo:hi] = [t1]
+
+    def gaps(self, t0: float, t1: float, min_gap: float = 0.0) -> List[Tuple[float, float]]:
+        """Niepokryte fragmenty [t0, t1) (krótsze niż min_gap są pomijane)"""
+        result = []
+        cursor = t0
+        idx = bisect_right(self._cov_ends, t0)
+        while idx < len(self._cov_starts) and self._cov_starts[idx] < t1:
+            start = self._cov_starts[idx]
+            if start - cursor > max(min_gap, MERGE_TOLERANCE):
+                result.append((cursor, start))
+            cursor = max(cursor, self._cov_ends[idx])
+            idx += 1
+        if t1 - cursor > max(min_gap, MERGE_TOLERANCE):
+            result.append((cursor, t1))
+        return result
+
+    def covered(self, t0: float, t1: float) -> float:
+        """Ile sekund z [t0, t1) jest pokryte"""
+        return (t1 - t0) - sum(b - a for a, b in self.gaps(t0, t1))
+
+    def _ensure_sorted(self) -> None:
+        # Sortowanie raz po serii add() (stabilne - kolejność dziennika przy remisach)
+        if not self._sorted:
+            order = sorted(range(len(self._mids)), key=self._mids.__getitem__)
+            self._mids = [self._mids[i] for i in order]
+            self._words = [self._words[i] for i in order]
+            self._sorted = True
+
+    def words(self, t0: float, t1: float) -> List[Dict]:
+        """Słowa o środku w [t0, t1) (czasy bezwzględne)"""
+        self._ensure_sorted()
+        return self._words[bisect_left(self._mids, t0):bisect_left(self._mids, t1)]
+
+    def confidence(self, t0: float, t1: float) -> float:
+        """Średnia pewność rekordów nachodzących na [t0, t1), ważona długością części wspólnej"""
+        total = weight = 0.0
+        for a, b, conf in self._spans[:bisect_left(self._spans, (t1,))]:
+            overlap = min(b, t1) - max(a, t0)
+            if overlap > 0:
+                total += conf * overlap
+                weight += overlap
+        return total / weight if weight else 0.0
@@ -2,6 +2,7 @@
 from pathlib import Path
 from pipeline.stage_07_export import ExportStage
 from pipeline.config import Config
+from pipeline.segment_store import load_segments
 import json
 
 # Wczytaj dane
@@ -12,8 +13,7 @@ segments_file = temp_dir / "scored_segments.json"
 if clips_file.exists():
     with open(clips_file) as f:
         clips = json.load(f)
-    with open(segments_file) as f:
-        segments = json.load(f)
+    segments = load_segments(segments_file)  # .json lub .segs
     
     config = Config.load_default()
     stage = ExportStage(config)
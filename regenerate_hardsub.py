@@ -10,6 +10,7 @@ import json
 import logging
 from pipeline.stage_07_export import ExportStage
 from pipeline.config import Config
+from pipeline.segment_store import load_segments
 from shorts import Segment, ShortsGenerator
 
 TEMP_DIR = Path("temp/43. posiedzenie Sejmu - dzień 3. 17 października 2025r. - Sejm RP (720p, h264, youtube) (1)_20251020_222521")
@@ -20,8 +21,7 @@ VIDEO_FILE = OUTPUT_DIR / "SEJM_HIGHLIGHTS_43. posiedzenie Sejmu - dzień 3. 17
 def regenerate_hardsub() -> None:
     with open(TEMP_DIR / "selected_clips.json", encoding='utf-8') as f:
         clips = json.load(f)
-    with open(TEMP_DIR / "scored_segments.json", encoding='utf-8') as f:
-        segments = json.load(f)
+    segments = load_segments(TEMP_DIR / "scored_segments.json")
 
     config = Config.load_default()
     stage = ExportStage(config)
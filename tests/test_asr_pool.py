@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.asr_pool import ASRWorkerPool, lpt_shards, worker_cpu_threads
+from pipeline.audio_store import AudioStore
+from pipeline.config import Config
+
+SR = 16000
+
+
+class FakeStage:
+    """Udaje TranscribeStage w procesie workera (bez modelu): transkrypt = średnia próbek"""
+
+    def __init__(self, config):
+        self.config = config
+
+    def transcribe_segments(self, audio_path, segments, audio_store, checkpoint=None):
+        return [
+            {**seg, 'transcript': f"{audio_store.slice(seg['t0'], seg['t1']).mean():.1f}",
+             'cpu_threads': self.config.asr.cpu_threads}
+            for seg in segments
+        ]
+
+
+def make_segments(durations):
+    segments, t = [], 0.0
+    for i, d in enumerate(durations):
+        segments.append({'id': f"seg_{i:04d}", 't0': t, 't1': t + d, 'duration': float(d)})
+        t += d
+    return segments
+
+
+def test_lpt_balances_by_duration():
+    durations = [7, 5, 4, 4, 3, 3, 2, 1, 1]
+    shards = lpt_shards(make_segments(durations), 3)
+    loads = sorted(sum(durations[i] for i in shard) for shard in shards)
+    assert loads == [10, 10, 10]
+    assert sorted(i for shard in shards for i in shard) == list(range(len(durations)))
+    assert all(shard == sorted(shard) for shard in shards)
+
+    assert lpt_shards(make_segments([1, 2]), 8) == [[1], [0]]  # puste shardy pominięte
+
+
+def test_worker_threads_split_cores(monkeypatch):
+    config = Config()
+    monkeypatch.setattr("os.cpu_count", lambda: 16)
+    assert worker_cpu_threads(config, 4) == 4
+    config.asr.cpu_threads = 3
+    assert worker_cpu_threads(config, 4) == 3
+
+
+def test_pool_merges_results_in_segment_order(tmp_path):
+    durations = [3, 1, 2, 5, 1, 1, 4, 2]
+    segments = make_segments(durations)
+    audio = np.concatenate([np.full(d * SR, i, dtype='<f4') for i, d in enumerate(durations)])
+    pcm = tmp_path / "audio.f32"
+    audio.tofile(pcm)
+
+    config = Config()
+    config.asr.cpu_threads = 2
+    pool = ASRWorkerPool(config, workers=2, stage_factory=FakeStage)
+    progress = []
+    try:
+        result = pool.transcribe(AudioStore(pcm, SR), segments, lambda p, msg: progress.append(p))
+    finally:
+        pool.shutdown()
+
+    assert [s['id'] for s in result] == [s['id'] for s in segments]
+    assert [s['transcript'] for s in result] == [f"{i:.1f}" for i in range(len(segments))]
+    assert {s['cpu_threads'] for s in result} == {2}
+    assert progress[-1] == 1.0
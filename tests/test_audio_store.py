@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.audio_store import AudioStore
+
+SR = 16000
+
+
+def write_wav(path, seconds=3.0, channels=1):
+    t = np.arange(int(seconds * SR)) / SR
+    audio = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    if channels > 1:
+        audio = np.stack([audio] * channels, axis=1)
+    sf.write(str(path), audio, SR, subtype='FLOAT')
+    return audio
+
+
+def test_from_wav_converts_once_and_slices_without_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr("pipeline.audio_store.CONVERT_BLOCK_FRAMES", 1000)  # wiele bloków
+    audio = write_wav(tmp_path / "audio_normalized.wav")
+
+    store = AudioStore.from_wav(tmp_path / "audio_normalized.wav", SR)
+    assert store.path == tmp_path / "audio_normalized.f32"
+    assert len(store) == len(audio)
+    assert store.duration == pytest.approx(3.0)
+    np.testing.assert_array_equal(np.asarray(store.samples), audio)
+
+    seg = store.slice(1.0, 1.5)
+    assert len(seg) == SR // 2
+    assert np.shares_memory(seg, store.samples)
+    assert len(store.slice(2.5, 10.0)) == SR // 2  # obcięte do końca nagrania
+
+    mtime = store.path.stat().st_mtime_ns
+    AudioStore.from_wav(tmp_path / "audio_normalized.wav", SR)
+    assert store.path.stat().st_mtime_ns == mtime  # bez ponownej konwersji
+
+
+def test_stereo_wav_is_downmixed(tmp_path):
+    audio = write_wav(tmp_path / "stereo.wav", seconds=1.0, channels=2)
+    store = AudioStore.from_wav(tmp_path / "stereo.wav", SR)
+    np.testing.assert_allclose(np.asarray(store.samples), audio.mean(axis=1), atol=1e-7)
+
+
+def test_from_ingest_prefers_pcm(tmp_path):
+    pcm = tmp_path / "audio_normalized.f32"
+    np.arange(SR, dtype='<f4').tofile(pcm)
+
+    store = AudioStore.from_ingest({'audio_pcm_f32': str(pcm), 'audio_normalized': 'missing.wav'}, SR)
+    assert store.path == pcm and store.duration == pytest.approx(1.0)
+    assert AudioStore.from_ingest({'audio_normalized': str(tmp_path / "missing.wav")}, SR) is None
+
+    tensor = store.as_tensor(0.5)
+    assert tensor.shape[0] == SR // 2 and float(tensor[0]) == SR // 2
+
+
+def test_iter_chunks_overlap_covers_everything(tmp_path):
+    pcm = tmp_path / "a.f32"
+    np.zeros(10 * SR + 123, dtype='<f4').tofile(pcm)
+    store = AudioStore(pcm, SR)
+
+    chunks = list(store.iter_chunks(4.0, overlap=1.0))
+    starts = [start for start, _ in chunks]
+    assert starts == [0, 3 * SR, 6 * SR, 9 * SR]
+    assert starts[-1] + len(chunks[-1][1]) == len(store)
+    assert all(len(c) == 4 * SR for _, c in chunks[:-1])
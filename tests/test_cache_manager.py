@@ -0,0 +1,256 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.cache_manager import CacheManager, artifact_hash
+from pipeline.config import Config
+from pipeline.segment_store import LazySegments, materialize
+
+
+def make_input(tmp_path, content=b"fake video content"):
+    path = tmp_path / "sejm.mp4"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_scoring_change_keeps_vad_and_transcribe_keys(tmp_path):
+    config = Config()
+    input_file = make_input(tmp_path)
+    vad_result = {"segments": [{"t0": 0.0, "t1": 5.0}]}
+    features_result = {"segments": [{"t0": 0.0, "t1": 5.0, "rms": 0.3}]}
+
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(input_file, config)
+    cache.save_to_cache(vad_result, "vad")
+    assert not cache.is_cache_valid("transcribe", upstream=vad_result)
+    cache.save_to_cache({"segments": [{"text": "Panie Marszałku"}]}, "transcribe")
+    assert not cache.is_cache_valid("scoring", upstream=features_result)
+    cache.save_to_cache({"segments": [{"score": 0.7}]}, "scoring")
+
+    config.scoring.weight_semantic += 0.1
+    rerun = CacheManager(tmp_path / "cache")
+    rerun.initialize_cache_key(input_file, config)
+
+    assert rerun.is_cache_valid("vad")
+    assert rerun.is_cache_valid("transcribe", upstream=rerun.load_from_cache("vad"))
+    assert rerun.load_from_cache("transcribe")["segments"][0]["text"] == "Panie Marszałku"
+    assert not rerun.is_cache_valid("scoring", upstream=features_result)
+
+
+def test_transcribe_key_follows_vad_artifact(tmp_path):
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(make_input(tmp_path), Config())
+
+    key_a = cache.stage_key("transcribe", {"segments": [{"t0": 0.0, "t1": 5.0}]})
+    key_b = cache.stage_key("transcribe", {"segments": [{"t0": 0.0, "t1": 6.0}]})
+    assert key_a != key_b
+
+
+def test_features_key_ignores_throughput_settings(tmp_path):
+    config = Config()
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(make_input(tmp_path), config)
+    upstream = {"segments": [{"t0": 0.0, "t1": 5.0, "transcript": "Wysoka Izbo"}]}
+    key = cache.stage_key("features", upstream)
+
+    config.features.spacy_batch_size *= 2
+    config.features.spacy_n_process = 4
+    cache.initialize_cache_key(make_input(tmp_path), config)
+    assert cache.stage_key("features", upstream) == key
+
+    config.features.spacy_model = "pl_core_news_md"
+    cache.initialize_cache_key(make_input(tmp_path), config)
+    assert cache.stage_key("features", upstream) != key
+
+
+def test_artifact_hash_stable_across_json_roundtrip():
+    fresh = {"segments": [{"t0": np.float32(1.5), "rms": np.float64(0.25), "ids": (1, 2)}]}
+    loaded = json.loads(json.dumps(fresh, default=lambda o: o.item()))
+    assert artifact_hash(fresh) == artifact_hash(loaded)
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    cache_dir = tmp_path / "cache"
+    config = Config()
+    payload = {"blob": "x" * 4000}
+
+    inputs = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.mp4"
+        path.write_bytes(name.encode() * 100)
+        inputs.append(str(path))
+
+    cache = CacheManager(cache_dir, max_size_gb=10_000 / 1024 ** 3)
+    for input_file in inputs[:2]:
+        cache.initialize_cache_key(input_file, config)
+        cache.save_to_cache(payload, "vad")
+
+    # Użyj ponownie "a" → "b" staje się najdawniej używany
+    cache.initialize_cache_key(inputs[0], config)
+    assert cache.is_cache_valid("vad")
+    cache.load_from_cache("vad")
+
+    cache.initialize_cache_key(inputs[2], config)
+    cache.save_to_cache(payload, "vad")
+
+    stats = cache.get_cache_stats()
+    assert stats["total_bytes"] <= stats["max_bytes"]
+    assert stats["num_entries"] == 2
+    assert stats["evicted"]["entries"] == 1
+
+    for input_file, expected in zip(inputs, (True, False, True)):
+        cache.initialize_cache_key(input_file, config)
+        assert cache.is_cache_valid("vad") is expected
+
+
+def test_lru_skips_entries_of_other_running_jobs(tmp_path):
+    cache_dir = tmp_path / "cache"
+    config = Config()
+    payload = {"blob": "x" * 4000}
+    limit_gb = 6_000 / 1024 ** 3
+    inputs = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.mp4"
+        path.write_bytes(name.encode() * 100)
+        inputs.append(str(path))
+
+    # Dwa joby kolejki naraz, każdy z własnym CacheManagerem
+    job_a = CacheManager(cache_dir, max_size_gb=limit_gb)
+    job_a.initialize_cache_key(inputs[0], config)
+    job_a.save_to_cache(payload, "vad")
+
+    job_b = CacheManager(cache_dir, max_size_gb=limit_gb)
+    job_b.initialize_cache_key(inputs[1], config)
+    job_b.save_to_cache(payload, "vad")  # ponad limit, ale "a" jest w użyciu
+    assert job_a.is_cache_valid("vad")
+
+    # Po zakończeniu joba "a" jego wpisy wracają do LRU
+    job_a.release()
+    job_b.initialize_cache_key(inputs[2], config)
+    job_b.save_to_cache(payload, "vad")
+    job_b.release()
+
+    assert job_b.get_cache_stats()["evicted"]["entries"] == 2
+    for input_file, expected in zip(inputs, (False, False, True)):
+        job_b.initialize_cache_key(input_file, config)
+        assert job_b.is_cache_valid("vad") is expected
+    job_b.release()
+
+
+def test_stats_report_bytes_and_hit_rates(tmp_path):
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(make_input(tmp_path), Config())
+
+    assert not cache.is_cache_valid("vad")
+    cache.save_to_cache({"segments": []}, "vad")
+    assert cache.is_cache_valid("vad")
+
+    stats = cache.get_cache_stats()
+    assert stats["session"]["vad"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert stats["lifetime"]["vad"]["hits"] == 1
+    assert stats["bytes_by_stage"]["vad"] > 0
+    assert stats["stages"]["vad"]["cached"] is True
+    assert stats["stages"]["scoring"]["cached"] is False
+
+
+def test_disabled_cache(tmp_path):
+    cache = CacheManager(tmp_path / "cache", force_recompute=True)
+    cache.initialize_cache_key(make_input(tmp_path), Config())
+    assert not cache.is_cache_valid("vad")
+    assert cache.get_cache_stats() == {"enabled": False, "reason": "force_recompute"}
+
+
+def test_features_key_tracks_keywords_file(tmp_path):
+    keywords = tmp_path / "keywords.csv"
+    keywords.write_text("token,weight,category\nskandal,2.0,emocje\n", encoding="utf-8")
+    config = Config()
+    config.features.keywords_file = str(keywords)
+
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(make_input(tmp_path), config)
+    before = cache.calculate_config_hash(config, "features")
+
+    keywords.write_text("token,weight,category\nskandal,3.0,emocje\n", encoding="utf-8")
+    assert cache.calculate_config_hash(config, "features") != before
+
+
+def test_file_entries_roundtrip_and_encode_params(tmp_path):
+    config = Config()
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(make_input(tmp_path), config)
+    clip = {"t0": 10.0, "t1": 25.0}
+
+    assert cache.get_cached_file("export_clip", clip) is None
+
+    rendered = tmp_path / "clip_001.mp4"
+    rendered.write_bytes(b"mp4 data")
+    cached = cache.save_file_to_cache(rendered, "export_clip", clip)
+    assert not rendered.exists()
+    assert cached.suffix == ".mp4" and cached.read_bytes() == b"mp4 data"
+    assert cache.get_cached_file("export_clip", clip) == cached
+
+    config.export.crf = 18  # Inne parametry kodowania → inny klucz
+    assert cache.get_cached_file("export_clip", clip) is None
+    assert cache.get_cache_stats()["session"]["export_clip"]["hits"] == 1
+
+
+def test_register_custom_stage(tmp_path):
+    config = Config()
+    cache = CacheManager(tmp_path / "cache")
+    cache.register_stage("selection", lambda cfg: {"target": cfg.selection.target_total_duration})
+    cache.initialize_cache_key(make_input(tmp_path), config)
+
+    cache.save_to_cache({"clips": [1, 2]}, "selection", upstream={"segments": []})
+    assert cache.is_cache_valid("selection", upstream={"segments": []})
+    assert "selection" in cache.get_cache_stats()["stages"]
+
+    with pytest.raises(ValueError):
+        cache.register_stage("thumbs", lambda cfg: {}, kind="file")
+    with pytest.raises(ValueError):
+        cache.stage_key("unknown")
+
+
+def test_segments_entries_stored_columnar(tmp_path):
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(make_input(tmp_path), Config())
+    result = {
+        "segments": [{"t0": np.float64(0.5), "words": [{"word": "Sejm", "start": 0.5}]}],
+        "total_words": 1,
+    }
+    cache.save_to_cache(result, "transcribe", upstream=[])
+
+    entry = cache.get_cache_file_path("transcribe", upstream=[]).with_suffix(".segs")
+    assert entry.is_dir()
+    assert cache.is_cache_valid("transcribe", upstream=[])
+    loaded = cache.load_from_cache("transcribe", upstream=[])
+    assert loaded == {"segments": [{"t0": 0.5, "words": [{"word": "Sejm", "start": 0.5}]}], "total_words": 1}
+    assert artifact_hash(loaded["segments"]) == artifact_hash(result["segments"])
+    assert cache.get_cache_stats()["bytes_by_stage"]["transcribe"] > 0
+
+    legacy = CacheManager(tmp_path / "legacy", segment_format="json")
+    legacy.initialize_cache_key(make_input(tmp_path), Config())
+    legacy.save_to_cache(result, "transcribe", upstream=[])
+    assert legacy.get_cache_file_path("transcribe", upstream=[]).is_file()
+    assert legacy.load_from_cache("transcribe", upstream=[])["total_words"] == 1
+
+
+def test_lazy_load_hashes_without_decoding(tmp_path, monkeypatch):
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(make_input(tmp_path), Config())
+    segments = [{"t0": float(i), "t1": i + 5.0, "transcript": f"wypowiedź {i}"} for i in range(50)]
+    cache.save_to_cache({"segments": segments}, "transcribe", upstream=[])
+    features_key = cache.stage_key("features", segments)
+
+    loaded = cache.load_from_cache("transcribe", upstream=[], lazy=True)["segments"]
+    assert isinstance(loaded, LazySegments)
+    assert loaded[3] == segments[3] and materialize(loaded) == segments
+
+    monkeypatch.setattr(LazySegments, "to_list", lambda self: pytest.fail("segmenty dekodowane"))
+    monkeypatch.setattr(LazySegments, "__iter__", lambda self: pytest.fail("segmenty dekodowane"))
+    assert artifact_hash(loaded) == artifact_hash(segments)
+    assert cache.stage_key("features", loaded) == features_key
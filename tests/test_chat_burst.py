@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.chat_burst import ChatTimeline, calculate_chat_burst_score, calculate_chat_burst_scores
+
+
+def make_chat(seconds=3600, seed=0):
+    """Czat z lukami (brak kluczy), tłem i burstami"""
+    rng = np.random.default_rng(seed)
+    chat = {}
+    for sec in range(seconds):
+        if rng.random() < 0.2:
+            continue  # sekunda bez wiadomości
+        count = int(rng.poisson(3))
+        if rng.random() < 0.02:
+            count += int(rng.integers(20, 200))
+        chat[sec] = count
+    return chat
+
+
+def make_segments(seconds, count=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    t0s = rng.uniform(-5, seconds + 50, count)
+    t1s = t0s + rng.uniform(-1, 40, count)  # także t1 < t0 i segmenty za końcem czatu
+    return t0s.tolist(), t1s.tolist()
+
+
+def test_vectorized_matches_scalar():
+    chat = make_chat()
+    t0s, t1s = make_segments(3600)
+    t0s += [0.0, 0.9, 179.5, 180.0, 3599.9, 3650.0]
+    t1s += [0.0, 0.2, 181.0, 400.0, 3600.0, 3660.0]
+
+    expected = [calculate_chat_burst_score(a, b, chat) for a, b in zip(t0s, t1s)]
+    assert calculate_chat_burst_scores(t0s, t1s, chat).tolist() == expected
+
+    for window, extension in [(30, 0), (1, 3), (600, 25)]:
+        expected = [calculate_chat_burst_score(a, b, chat, window, extension) for a, b in zip(t0s, t1s)]
+        assert ChatTimeline(chat).burst_scores(t0s, t1s, window, extension).tolist() == expected
+
+
+def test_sparse_keys_and_empty_chat():
+    chat = {5: 40, 7: 1, 1000: 3}
+    t0s, t1s = make_segments(1100, count=500)
+    expected = [calculate_chat_burst_score(a, b, chat) for a, b in zip(t0s, t1s)]
+    assert calculate_chat_burst_scores(t0s, t1s, chat).tolist() == expected
+
+    assert calculate_chat_burst_scores([0.0, 10.0], [5.0, 20.0], {}).tolist() == [0.0, 0.0]
+    zeros = {0: 0, 1: 0}
+    assert calculate_chat_burst_scores([0.0, 50.0], [5.0, 60.0], zeros).tolist() == [
+        calculate_chat_burst_score(0.0, 5.0, zeros),
+        calculate_chat_burst_score(50.0, 60.0, zeros),
+    ]
+
+
+def test_window_max_uses_sparse_table():
+    rng = np.random.default_rng(2)
+    chat = {i: int(v) for i, v in enumerate(rng.integers(0, 1000, 777))}
+    timeline = ChatTimeline(chat)
+    starts = rng.integers(0, 800, 300)
+    ends = starts + rng.integers(0, 300, 300)
+    counts = timeline.counts
+    expected = [int(counts[a:min(b, 776) + 1].max()) if a <= 776 else 0 for a, b in zip(starts, ends)]
+    assert timeline.window_max(starts, ends).tolist() == expected
@@ -0,0 +1,114 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.encoder_pool import EncodeError, EncodeJob, EncoderPool, encoder_workers
+from pipeline.stage_07_export import ExportStage
+
+
+def sleep_job(seconds, marker: Path, exit_code=0):
+    """Proces zamiast ffmpeg: śpi, zapisuje znacznik, kończy się kodem exit_code"""
+    code = f"import time, sys; time.sleep({seconds}); open({str(marker)!r}, 'w').close(); sys.exit({exit_code})"
+    return EncodeJob([sys.executable, "-c", code], marker.name)
+
+
+def test_runs_jobs_concurrently_with_progress(tmp_path):
+    jobs = [sleep_job(0.6, tmp_path / f"clip_{i}") for i in range(4)]
+    progress = []
+
+    start = time.perf_counter()
+    errors = EncoderPool(workers=4).run(jobs, progress_callback=lambda done, total, job: progress.append((done, total)))
+    elapsed = time.perf_counter() - start
+
+    assert errors == [None] * 4
+    assert all((tmp_path / f"clip_{i}").exists() for i in range(4))
+    assert elapsed < 4 * 0.6  # nie sekwencyjnie
+    assert progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+
+def test_fail_fast_kills_running_and_skips_queued(tmp_path):
+    jobs = [sleep_job(0.0, tmp_path / "bad", exit_code=3)]
+    jobs += [sleep_job(10.0, tmp_path / f"slow_{i}") for i in range(5)]
+
+    start = time.perf_counter()
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        EncoderPool(workers=2).run(jobs)
+
+    assert error.value.returncode == 3
+    assert error.value.job.label == "bad"
+    assert time.perf_counter() - start < 5.0
+    assert not any((tmp_path / f"slow_{i}").exists() for i in range(5))
+
+
+def test_errors_returned_without_fail_fast(tmp_path):
+    jobs = [sleep_job(0.0, tmp_path / "ok"), sleep_job(0.0, tmp_path / "bad", exit_code=1)]
+    errors = EncoderPool(workers=2).run(jobs, fail_fast=False)
+    assert errors[0] is None
+    assert isinstance(errors[1], subprocess.CalledProcessError)
+
+
+def test_export_stage_cancel_stops_encodes(tmp_path, monkeypatch):
+    monkeypatch.setattr(ExportStage, "_check_ffmpeg", lambda self: None)
+    config = Config()
+    config.export.encode_workers = 2
+    stage = ExportStage(config)
+    jobs = [sleep_job(10.0, tmp_path / f"clip_{i}") for i in range(4)]
+
+    threading.Timer(0.5, stage.cancel).start()
+    start = time.perf_counter()
+    with pytest.raises(InterruptedError):
+        stage._run_encodes(jobs)
+    assert time.perf_counter() - start < 5.0
+    assert stage._encoder_pool is None
+
+    # Po anulowaniu kolejne kroki eksportu nie startują enkoderów
+    with pytest.raises(InterruptedError):
+        stage._run_encodes([sleep_job(0.0, tmp_path / "late")])
+    assert not (tmp_path / "late").exists()
+
+
+def test_encoder_workers_default(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 16)
+    assert encoder_workers(0, 4) == 4
+    assert encoder_workers(0, 32) == 1
+    assert encoder_workers(3, 4) == 3
+
+
+def test_export_stage_caps_pool_by_budget(monkeypatch):
+    monkeypatch.setattr(ExportStage, "_check_ffmpeg", lambda self: None)
+    monkeypatch.setattr("os.cpu_count", lambda: 16)
+    config = Config()
+    config.export.encoder_threads = 2
+
+    assert ExportStage(config).encode_slots() == 8
+    assert ExportStage(config, max_encode_workers=3).encode_slots() == 3
+
+
+def test_extract_clips_reports_failed_clip_without_stderr(tmp_path, monkeypatch):
+    monkeypatch.setattr(ExportStage, "_check_ffmpeg", lambda self: None)
+
+    class NoStderrProcess:
+        """ffmpeg kończy się błędem bez przechwyconego stderr"""
+        returncode = 1
+
+        def __init__(self, cmd, **kwargs):
+            pass
+
+        def communicate(self):
+            return None, None
+
+        def kill(self):
+            pass
+    monkeypatch.setattr(subprocess, "Popen", NoStderrProcess)
+
+    clips = [{'t0': 10.0, 't1': 20.0, 'duration': 10.0}]
+    with pytest.raises(EncodeError) as error:
+        ExportStage(Config())._extract_clips(tmp_path / "sejm.mp4", clips, tmp_path)
+    assert error.value.job.label == "klip 1"
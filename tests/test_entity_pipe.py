@@ -0,0 +1,113 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.keyword_matcher import KeywordMatcher
+from pipeline.stage_04_features import FeaturesStage
+
+
+def make_nlp():
+    """Pusty polski pipeline z entity_ruler (bez pobierania modeli) + zbędny komponent"""
+    nlp = spacy.blank("pl")
+    ruler = nlp.add_pipe("entity_ruler")
+    ruler.add_patterns([
+        {"label": "PER", "pattern": "Kowalski"},
+        {"label": "ORG", "pattern": "Sejm"},
+        {"label": "MISC", "pattern": "ustawa"},
+    ])
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+class CountingNLP:
+    """Opakowanie nlp: zlicza teksty przepuszczone przez pipe / __call__"""
+
+    def __init__(self, nlp):
+        self.nlp = nlp
+        self.meta = nlp.meta
+        self.pipe_texts = []
+        self.calls = 0
+
+    def pipe(self, texts, **kwargs):
+        texts = list(texts)
+        self.pipe_texts.extend(texts)
+        return self.nlp.pipe(texts, **kwargs)
+
+    def __call__(self, text):
+        self.calls += 1
+        return self.nlp(text)
+
+
+def make_stage(tmp_path, nlp):
+    config = Config()
+    config.cache.cache_dir = tmp_path / "cache"
+    stage = FeaturesStage.__new__(FeaturesStage)
+    stage.config = config
+    stage.keywords_db = {}
+    stage.keyword_matcher = KeywordMatcher()
+    stage.nlp = nlp
+    stage._entity_cache = None
+    return stage
+
+
+SEGMENTS = [
+    {'transcript': 'Pan Kowalski przemawia w Sejm dzisiaj'},
+    {'transcript': 'ustawa o niczym'},
+    {'transcript': ''},
+    {'transcript': 'Pan Kowalski przemawia w Sejm dzisiaj'},
+]
+
+
+def test_pipe_matches_per_segment_nlp(tmp_path):
+    nlp = make_nlp()
+    stage = make_stage(tmp_path, CountingNLP(nlp))
+
+    results = stage._compute_entities(SEGMENTS)
+    for seg, result in zip(SEGMENTS, results):
+        if not seg['transcript']:
+            continue
+        lexical = stage._extract_lexical_features(seg, result)
+        doc = nlp(seg['transcript'])
+        expected = [{'text': e.text, 'label': e.label_} for e in doc.ents if e.label_ in ('PER', 'ORG', 'LOC', 'GPE')]
+        assert lexical['entities'] == expected[:3]
+        assert lexical['entity_density'] == pytest.approx(len(expected) / len(doc) if len(doc) else 0.0)
+
+    assert results[2] is None
+    assert results[0]['entities'] == [{'text': 'Kowalski', 'label': 'PER'}, {'text': 'Sejm', 'label': 'ORG'}]
+    # Duplikaty i puste transkrypty nie idą przez pipeline
+    assert stage.nlp.pipe_texts == [SEGMENTS[0]['transcript'], SEGMENTS[1]['transcript']]
+    assert stage.nlp.calls == 0
+
+
+def test_entity_cache_persists_between_runs(tmp_path):
+    first = make_stage(tmp_path, CountingNLP(make_nlp()))
+    expected = first._compute_entities(SEGMENTS)
+
+    second = make_stage(tmp_path, CountingNLP(make_nlp()))
+    extra = {'transcript': 'Sejm obraduje'}
+    results = second._compute_entities(SEGMENTS + [extra])
+
+    assert results[:4] == expected
+    assert second.nlp.pipe_texts == ['Sejm obraduje']
+
+
+def test_entity_cache_disabled_keeps_memory_only(tmp_path):
+    stage = make_stage(tmp_path, CountingNLP(make_nlp()))
+    stage.config.cache.enabled = False
+    stage._compute_entities(SEGMENTS)
+    stage._compute_entities(SEGMENTS)
+    assert len(stage.nlp.pipe_texts) == 2
+    assert not (tmp_path / "cache").exists()
+
+
+def test_unused_components_disabled(tmp_path):
+    stage = make_stage(tmp_path, make_nlp())
+    stage._disable_unused_components()
+    assert stage.nlp.pipe_names == ['entity_ruler']
+    assert 'sentencizer' in stage.nlp.disabled
@@ -0,0 +1,84 @@
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.cache_manager import CacheManager
+from pipeline.config import Config
+from pipeline.stage_07_export import ExportStage
+
+
+def fake_ffmpeg(calls):
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        Path(cmd[-1]).write_bytes(b"mp4")
+        return subprocess.CompletedProcess(cmd, 0, b"", b"")
+    return run
+
+
+def fake_popen(calls):
+    """Popen dla EncoderPool (cięcie i fade)"""
+    class FakeProcess:
+        returncode = 0
+
+        def __init__(self, cmd, **kwargs):
+            calls.append(cmd)
+            Path(cmd[-1]).write_bytes(b"mp4")
+
+        def communicate(self):
+            return b"", b""
+
+        def kill(self):
+            pass
+    return FakeProcess
+
+
+def run_export(tmp_path, cache, clips, calls, monkeypatch, run_name):
+    monkeypatch.setattr(ExportStage, "_check_ffmpeg", lambda self: None)
+    monkeypatch.setattr(subprocess, "run", fake_ffmpeg(calls))
+    monkeypatch.setattr(subprocess, "Popen", fake_popen(calls))
+
+    config = Config()
+    config.export.add_transitions = False
+    session_dir = tmp_path / run_name
+    session_dir.mkdir()
+    stage = ExportStage(config, cache_manager=cache)
+    stage.process(
+        input_file=str(tmp_path / "sejm.mp4"),
+        clips=[dict(c) for c in clips],
+        segments=[],
+        output_dir=tmp_path,
+        session_dir=session_dir,
+    )
+
+
+def test_rerun_skips_to_concat(tmp_path, monkeypatch):
+    (tmp_path / "sejm.mp4").write_bytes(b"video")
+    clips = [
+        {"t0": 10.0, "t1": 40.0, "duration": 30.0, "title": "A"},
+        {"t0": 100.0, "t1": 130.0, "duration": 30.0, "title": "B"},
+    ]
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(str(tmp_path / "sejm.mp4"), Config())
+
+    first_calls = []
+    run_export(tmp_path, cache, clips, first_calls, monkeypatch, "run1")
+    assert len(first_calls) == 5  # 2 cięcia + 2 fade + concat
+
+    # Druga część z innym podziałem/tytułami, te same klipy → tylko concat
+    second_calls = []
+    reordered = [dict(clips[1], title="Nowy tytuł"), clips[0]]
+    run_export(tmp_path, cache, reordered, second_calls, monkeypatch, "run2")
+    assert len(second_calls) == 1
+    assert "concat" in second_calls[0]
+
+    concat_list = (tmp_path / "run2" / "concat_list.txt").read_text(encoding="utf-8")
+    assert concat_list.count("export_faded_") == 2
+
+
+def test_export_without_cache_manager_writes_session_files(tmp_path, monkeypatch):
+    (tmp_path / "sejm.mp4").write_bytes(b"video")
+    calls = []
+    run_export(tmp_path, None, [{"t0": 0.0, "t1": 10.0, "duration": 10.0}], calls, monkeypatch, "run")
+    assert (tmp_path / "run" / "clips" / "clip_001_faded.mp4").exists()
@@ -0,0 +1,86 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline import fingerprint as fp
+from pipeline.cache_manager import CacheManager
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Mniejsze bloki, żeby testowe pliki miały kilkaset KB zamiast >24MB"""
+    monkeypatch.setattr(fp, "SAMPLE_EDGE_BYTES", 4096)
+    monkeypatch.setattr(fp, "SAMPLE_BLOCK_BYTES", 512)
+    monkeypatch.setattr(fp, "LEGACY_EDGE_BYTES", 4096)
+
+
+def write_vod(path, middle: bytes, size=200_000):
+    board = b"PLANSZA SEJMU " * 1000  # identyczne intro/outro
+    body = (middle * (size // len(middle) + 1))[:size]
+    path.write_bytes(board + body + board)
+    return path
+
+
+def test_sampled_detects_different_middle_with_same_edges(tmp_path, small_blocks):
+    a = write_vod(tmp_path / "a.mp4", b"posiedzenie 1 ")
+    b = write_vod(tmp_path / "b.mp4", b"posiedzenie 2 ")
+
+    assert fp.edges_hash(a) == fp.edges_hash(b)  # stary tryb koliduje
+    assert fp.sampled_hash(a, samples=32) != fp.sampled_hash(b, samples=32)
+    assert fp.tree_hash(a, chunk_bytes=8192) != fp.tree_hash(b, chunk_bytes=8192)
+    assert fp.sampled_hash(a, samples=32) == fp.sampled_hash(a, samples=32)
+
+
+def test_tree_hash_parallel_matches_serial(tmp_path):
+    path = tmp_path / "vod.mp4"
+    path.write_bytes(os.urandom(300_000))
+    serial = fp.tree_hash(path, workers=1, chunk_bytes=16384)
+    assert fp.tree_hash(path, workers=4, chunk_bytes=16384) == serial
+    assert len(serial) == 16
+
+    empty = tmp_path / "empty.mp4"
+    empty.write_bytes(b"")
+    assert fp.tree_hash(empty) and fp.sampled_hash(empty)
+
+
+def test_sidecar_prevents_rehash(tmp_path, monkeypatch):
+    path = write_vod(tmp_path / "vod.mp4", b"x")
+    first = fp.fingerprint(path)
+    assert (tmp_path / "vod.mp4.fingerprint.json").exists()
+
+    def boom(*args, **kwargs):
+        raise AssertionError("rehashed")
+
+    monkeypatch.setattr(fp, "compute_fingerprint", boom)
+    assert fp.fingerprint(path) == first
+
+    # Zmieniony plik (rozmiar/mtime) → sidecar nieważny
+    path.write_bytes(path.read_bytes() + b"!")
+    with pytest.raises(AssertionError, match="rehashed"):
+        fp.fingerprint(path)
+
+
+def test_sidecar_falls_back_to_cache_dir(tmp_path):
+    path = write_vod(tmp_path / "vod.mp4", b"x")
+    # Katalog w miejscu sidecara = nie da się go zapisać obok pliku
+    (tmp_path / "vod.mp4.fingerprint.json").mkdir()
+
+    value = fp.fingerprint(path, fallback_dir=tmp_path / "cache")
+    assert list((tmp_path / "cache" / fp.FINGERPRINT_DIR).glob("*.json"))
+    assert fp.cached_fingerprint(path, fallback_dir=tmp_path / "cache") == value
+
+
+def test_prefetch_shares_result_with_cache_manager(tmp_path):
+    path = write_vod(tmp_path / "vod.mp4", b"y")
+    cache = CacheManager(tmp_path / "cache", hash_mode="full")
+
+    future = cache.prefetch_input_hash(str(path))
+    assert future.result(timeout=10) == cache.calculate_input_hash(str(path))
+    assert fp.cached_fingerprint(path, mode="full") == future.result()
+
+    with pytest.raises(ValueError):
+        CacheManager(tmp_path / "cache", hash_mode="md5")
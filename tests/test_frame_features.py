@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.frame_features import FrameFeatures
+from pipeline.stage_04_features import FeaturesStage
+
+SR = 16000
+
+
+def make_recording(seconds=180, seed=0):
+    """Ton o zmiennej wysokości z modulacją głośności + szum; segmenty 5-30s z przerwami"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * SR) / SR
+    tone = np.sin(2 * np.pi * (200 + 100 * np.sin(t / 7)) * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 0.5 * t))
+    audio = (0.2 * tone + 0.02 * rng.standard_normal(len(t))).astype(np.float32)
+
+    segments, start = [], 0.0
+    while start < seconds - 10:
+        duration = float(rng.uniform(5, 30))
+        segments.append({'t0': start, 't1': min(start + duration, float(seconds))})
+        start += duration + float(rng.uniform(0.5, 2.0))
+    return audio, segments
+
+
+def make_stage():
+    stage = FeaturesStage.__new__(FeaturesStage)
+    stage.config = Config()
+    return stage
+
+
+def test_whole_recording_matches_per_segment_librosa():
+    audio, segments = make_recording()
+    stage = make_stage()
+
+    legacy = [stage._extract_acoustic_features(seg, audio, SR) for seg in segments]
+    vectorized = stage._compute_acoustic_features(segments, audio, SR)
+
+    assert len(segments) > 5
+    for name in ('rms', 'spectral_centroid', 'spectral_flux', 'zcr'):
+        expected = np.array([f[name] for f in legacy])
+        actual = np.array([f[name] for f in vectorized])
+        np.testing.assert_allclose(actual, expected, rtol=0.03, err_msg=name)
+
+
+def test_block_size_does_not_change_result():
+    audio, segments = make_recording(seconds=60, seed=1)
+    t0s = [s['t0'] for s in segments]
+    t1s = [s['t1'] for s in segments]
+
+    whole = FrameFeatures.compute(audio, SR, block_frames=10 ** 6).segment_stats(t0s, t1s)
+    blocked = FrameFeatures.compute(audio, SR, block_frames=37).segment_stats(t0s, t1s)
+    for name in whole:
+        np.testing.assert_allclose(blocked[name], whole[name], rtol=1e-5, atol=1e-9, err_msg=name)
+
+
+def test_empty_and_out_of_range_segments_are_zero():
+    audio, _ = make_recording(seconds=20)
+    frames = FrameFeatures.compute(audio, SR)
+    stats = frames.segment_stats([5.0, 30.0, 19.99], [5.0, 40.0, 25.0])
+
+    assert all(stats[name][0] == 0.0 and stats[name][1] == 0.0 for name in stats)
+    assert stats['rms'][2] > 0  # końcówka nagrania
+    assert frames.num_frames == 1 + len(audio) // 512
+
+    silent = FrameFeatures.compute(np.zeros(SR, dtype=np.float32), SR).segment_stats([0.0], [1.0])
+    assert silent['spectral_centroid'][0] == 0.0 and silent['zcr'][0] == 0.0
@@ -0,0 +1,228 @@
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.gpt_scorer import GPTScoreCache, GPTScorer, TokenBucket
+from pipeline.stage_05_scoring_gpt import ScoringStage
+
+
+def expected_score(transcript):
+    return (len(transcript) % 10) / 10
+
+
+class MockOpenAI:
+    """Lokalny serwer zgodny z /v1/chat/completions; score = len(transkryptu) % 10 / 10"""
+
+    def __init__(self, delay=0.05, fail_first=0, fail_status=429, always_fail=False, missing_last=0, retry_after="0"):
+        self.delay = delay
+        self.retry_after = retry_after
+        self.missing_last = missing_last  # tyle ostatnich score'ów model "gubi" w odpowiedzi
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.always_fail = always_fail
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with mock.lock:
+                    mock.requests += 1
+                    number = mock.requests
+                    mock.in_flight += 1
+                    mock.max_in_flight = max(mock.max_in_flight, mock.in_flight)
+                try:
+                    time.sleep(mock.delay)
+                    if mock.always_fail or number <= mock.fail_first:
+                        self._send(mock.fail_status, {"error": {"message": "busy"}}, {"Retry-After": mock.retry_after})
+                        return
+                    prompt = body["messages"][1]["content"]
+                    transcripts = re.findall(r"^\[\d+\] (.*)$", prompt, flags=re.M)
+                    scores = [expected_score(t) for t in transcripts]
+                    content = json.dumps({"scores": scores[:len(scores) - mock.missing_last]})
+                    self._send(200, {
+                        "id": "mock", "object": "chat.completion", "created": 0, "model": body["model"],
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                    })
+                finally:
+                    with mock.lock:
+                        mock.in_flight -= 1
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def client(self):
+        return openai.OpenAI(api_key="test", base_url=f"http://127.0.0.1:{self.server.server_port}/v1", max_retries=0)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(MockOpenAI(**kwargs))
+        return servers[-1]
+
+    yield start
+    for mock in servers:
+        mock.close()
+
+
+def make_stage(tmp_path, client):
+    config = Config()
+    config.cache.cache_dir = tmp_path / "cache"
+    stage = ScoringStage.__new__(ScoringStage)
+    stage.config = config
+    stage.openai_client = client
+    stage._semantic_backend = None
+    return stage
+
+
+def make_candidates(n):
+    return [{'id': f"seg_{i:04d}", 'transcript': f"Wypowiedź numer {i} " + "x" * (i % 13)} for i in range(n)]
+
+
+def test_concurrent_scoring_and_cached_rerun(tmp_path, server):
+    mock = server(delay=0.05)
+    stage = make_stage(tmp_path, mock.client())
+    candidates = make_candidates(300)
+
+    start = time.perf_counter()
+    scored = stage._semantic_analysis_gpt(candidates)
+    elapsed = time.perf_counter() - start
+
+    assert [c['semantic_score'] for c in scored] == [expected_score(c['transcript']) for c in candidates]
+    assert mock.requests == 30
+    assert 1 < mock.max_in_flight <= stage.config.scoring.gpt_max_in_flight
+    assert elapsed < 30 * mock.delay  # szybciej niż sekwencyjnie
+
+    # Ponowne uruchomienie (nowy stage, inny podział na batche) - zero zapytań
+    rerun = make_stage(tmp_path, mock.client())
+    rerun.config.scoring.gpt_batch_size = 7
+    rescored = rerun._semantic_analysis_gpt(make_candidates(300))
+    assert mock.requests == 30
+    assert [c['semantic_score'] for c in rescored] == [c['semantic_score'] for c in scored]
+    assert rerun._semantic_backend.stats['cached'] == 300
+
+
+def test_rate_limited_requests_are_retried(tmp_path, server):
+    mock = server(delay=0.0, fail_first=3, fail_status=429)
+    stage = make_stage(tmp_path, mock.client())
+    stage.config.scoring.gpt_max_in_flight = 1
+    scored = stage._semantic_analysis_gpt(make_candidates(20))
+
+    assert [c['semantic_score'] for c in scored] == [expected_score(c['transcript']) for c in scored]
+    assert stage._semantic_backend.stats['retries'] == 3
+    assert mock.requests == 5
+
+
+def test_failed_batches_fall_back_and_are_not_cached(tmp_path, server):
+    mock = server(delay=0.0, always_fail=True, fail_status=503)
+    cache = GPTScoreCache(tmp_path / "scores.jsonl")
+    stage = make_stage(tmp_path, mock.client())
+    scorer = GPTScorer(mock.client(), "gpt-4o-mini", stage._build_gpt_messages, "v1",
+                       cache=cache, batch_size=5, max_retries=2, backoff_base=0.0)
+
+    assert scorer.score(["a", "b", "c"]) == [None, None, None]
+    assert scorer.stats['failed_batches'] == 1
+    assert mock.requests == 3
+    assert not (tmp_path / "scores.jsonl").exists()
+
+
+def test_missing_scores_are_not_cached(tmp_path, server):
+    short = server(delay=0.0, missing_last=1)
+    cache_path = tmp_path / "scores.jsonl"
+    stage = make_stage(tmp_path, short.client())
+    scorer = GPTScorer(short.client(), "gpt-4o-mini", stage._build_gpt_messages, "v1",
+                       cache=GPTScoreCache(cache_path), batch_size=3)
+
+    assert scorer.score(["a", "bb", "ccc"]) == [expected_score("a"), expected_score("bb"), None]
+
+    # Kolejny przebieg pyta tylko o brakujący transkrypt
+    full = server(delay=0.0)
+    rerun = GPTScorer(full.client(), "gpt-4o-mini", stage._build_gpt_messages, "v1",
+                      cache=GPTScoreCache(cache_path), batch_size=3)
+    assert rerun.score(["a", "bb", "ccc"]) == [expected_score(t) for t in ("a", "bb", "ccc")]
+    assert rerun.stats['cached'] == 2
+    assert full.requests == 1
+
+
+def test_cancel_interrupts_retry_backoff(tmp_path, server):
+    mock = server(delay=0.0, always_fail=True, fail_status=429, retry_after="30")
+    stage = make_stage(tmp_path, mock.client())
+    scorer = GPTScorer(mock.client(), "gpt-4o-mini", stage._build_gpt_messages, "v1", batch_size=1)
+    threading.Timer(0.3, scorer.cancel).start()
+
+    start = time.perf_counter()
+    with pytest.raises(InterruptedError):
+        scorer.score(["a", "b"])
+    assert time.perf_counter() - start < 5  # bez czekania 30 s Retry-After
+    assert mock.requests == 2
+
+
+def test_non_retryable_error_is_not_retried(tmp_path, server):
+    mock = server(delay=0.0, always_fail=True, fail_status=400)
+    stage = make_stage(tmp_path, mock.client())
+    scored = stage._semantic_analysis_gpt(make_candidates(3))
+    assert [c['semantic_score'] for c in scored] == [0.5, 0.5, 0.5]
+    assert mock.requests == 1
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(60, clock=lambda: now[0], sleep=sleep)  # 1 żeton / s
+    for _ in range(60):
+        assert bucket.acquire() == 0.0
+    assert bucket.acquire(2) == pytest.approx(2.0)
+    assert sum(sleeps) == pytest.approx(2.0)
+
+
+def test_token_bucket_wait_is_cancellable():
+    cancelled = threading.Event()
+    bucket = TokenBucket(60, capacity=1, cancelled=cancelled)
+    bucket.acquire()
+    threading.Timer(0.2, cancelled.set).start()
+
+    start = time.perf_counter()
+    with pytest.raises(InterruptedError):
+        bucket.acquire(1)  # żeton za ~1 s
+    assert time.perf_counter() - start < 0.9
@@ -0,0 +1,124 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_01_ingest import IngestStage, parse_loudnorm_stats
+
+PROBE = {
+    "format": {"duration": "7200.0"},
+    "streams": [
+        {"codec_type": "video", "width": 1280, "height": 720, "r_frame_rate": "25/1", "codec_name": "h264"},
+        {"codec_type": "audio", "codec_name": "aac"},
+    ],
+}
+
+LOUDNORM_STDERR = """
+[Parsed_loudnorm_2 @ 0x55d]
+{
+	"input_i" : "-27.61",
+	"input_tp" : "-4.47",
+	"input_lra" : "18.06",
+	"input_thresh" : "-39.20",
+	"output_i" : "-16.58",
+	"output_tp" : "-1.50",
+	"output_lra" : "14.78",
+	"output_thresh" : "-27.71",
+	"normalization_type" : "dynamic",
+	"target_offset" : "0.58"
+}
+"""
+
+
+def fake_tools(calls, stderr=LOUDNORM_STDERR):
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        if cmd[0] == 'ffprobe':
+            return subprocess.CompletedProcess(cmd, 0, json.dumps(PROBE), "")
+        # Zapisz każdy plikowy output ffmpeg (argument po -y)
+        for i, arg in enumerate(cmd):
+            if arg == '-y':
+                Path(cmd[i + 1]).write_bytes(b"RIFF")
+        return subprocess.CompletedProcess(cmd, 0, b"", stderr.encode())
+    return run
+
+
+def run_ingest(tmp_path, monkeypatch, config, stderr=LOUDNORM_STDERR):
+    monkeypatch.setattr(IngestStage, "_check_ffmpeg", lambda self: None)
+    calls = []
+    monkeypatch.setattr(subprocess, "run", fake_tools(calls, stderr))
+    video = tmp_path / "sejm.mp4"
+    video.write_bytes(b"video")
+    result = IngestStage(config).process(str(video), tmp_path)
+    return result, calls
+
+
+def test_video_decoded_once_with_two_pass_loudnorm(tmp_path, monkeypatch):
+    config = Config()
+    config.audio.write_pcm_f32 = True
+    result, calls = run_ingest(tmp_path, monkeypatch, config)
+
+    ffmpeg_calls = [c for c in calls if c[0] == 'ffmpeg']
+    video_reads = [c for c in ffmpeg_calls if str(tmp_path / "sejm.mp4") in c]
+    assert len(video_reads) == 1
+
+    extract = " ".join(video_reads[0])
+    assert "asplit=2" in extract and "print_format=json" in extract and "-f null" in extract
+
+    normalize = " ".join(ffmpeg_calls[1])
+    assert str(tmp_path / "audio_raw.wav") in ffmpeg_calls[1]
+    assert "measured_I=-27.61" in normalize and "linear=true" in normalize
+    assert "offset=0.58" in normalize
+    assert "pcm_f32le" in normalize
+
+    assert result['loudness']['input_i'] == -27.61
+    assert result['audio_pcm_f32'] == str(tmp_path / "audio_normalized.f32")
+    assert Path(result['audio_normalized']).exists()
+    assert result['metadata']['duration'] == 7200.0
+
+
+def test_falls_back_to_dynamic_loudnorm_without_stats(tmp_path, monkeypatch):
+    config = Config()
+    config.audio.write_pcm_f32 = False
+    result, calls = run_ingest(tmp_path, monkeypatch, config, stderr="no stats")
+
+    normalize = " ".join(calls[-1])
+    assert "loudnorm=I=-16.0" in normalize and "measured_I" not in normalize
+    assert result['loudness'] is None
+    assert result['audio_pcm_f32'] is None
+    assert "asplit" not in normalize
+
+
+def test_single_pass_and_no_normalization(tmp_path, monkeypatch):
+    config = Config()
+    config.audio.loudnorm_two_pass = False
+    _, calls = run_ingest(tmp_path, monkeypatch, config)
+    assert "loudnorm" not in " ".join(calls[1])  # ekstrakcja bez gałęzi pomiarowej
+    assert "loudnorm" in " ".join(calls[2])
+
+    config = Config()
+    config.audio.normalization = "none"
+    _, calls = run_ingest(tmp_path, monkeypatch, config)
+    assert all("loudnorm" not in " ".join(c) for c in calls)
+
+
+def test_parse_loudnorm_stats_rejects_silence():
+    assert parse_loudnorm_stats(LOUDNORM_STDERR)['target_offset'] == 0.58
+    silent = LOUDNORM_STDERR.replace('"-27.61"', '"-inf"')
+    assert parse_loudnorm_stats(silent) is None
+    assert parse_loudnorm_stats("") is None
+
+
+def test_pcm_branch_is_mono_for_stereo_audio(tmp_path, monkeypatch):
+    config = Config()
+    config.audio.channels = 2
+    config.audio.write_pcm_f32 = True
+    _, calls = run_ingest(tmp_path, monkeypatch, config)
+
+    normalize = calls[-1]
+    graph = normalize[normalize.index('-filter_complex') + 1]
+    assert "channel_layouts=stereo" in graph  # WAV zostaje stereo
+    assert graph.endswith("[pcmsrc]aformat=channel_layouts=mono[pcm]")  # AudioStore czyta mono
@@ -0,0 +1,164 @@
+import itertools
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.interval_dp import compatible_predecessors, select_budgeted
+from pipeline.interval_set import conflicts_with
+from pipeline.stage_06_selection import SelectionStage
+
+
+def random_instance(rng, n, horizon=300.0):
+    t0s = [float(x) for x in rng.integers(0, int(horizon), n)]
+    t1s = [t0 + float(d) for t0, d in zip(t0s, rng.integers(8, 60, n))]
+    scores = [float(x) for x in rng.uniform(0, 1, n).round(2)]
+    bins = [min(int(t0 / (horizon / 5)), 4) for t0 in t0s]
+    return t0s, t1s, scores, bins
+
+
+def feasible(indices, t0s, t1s, bins, budget, min_gap, max_per_bin, max_clips):
+    if len(indices) > max_clips:
+        return False
+    if sum(t1s[i] - t0s[i] for i in indices) > budget + 1e-9:
+        return False
+    if indices and np.bincount([bins[i] for i in indices]).max() > max_per_bin:
+        return False
+    return not any(
+        conflicts_with(t0s[a], t1s[a], t0s[b], t1s[b], min_gap)
+        for a, b in itertools.combinations(indices, 2)
+    )
+
+
+def brute_force(t0s, t1s, scores, bins, budget, min_gap, max_per_bin, max_clips):
+    best = 0.0
+    for r in range(1, min(len(t0s), max_clips) + 1):
+        for combo in itertools.combinations(range(len(t0s)), r):
+            if feasible(list(combo), t0s, t1s, bins, budget, min_gap, max_per_bin, max_clips):
+                best = max(best, sum(scores[i] for i in combo))
+    return best
+
+
+def test_predecessors_match_pairwise_check():
+    rng = np.random.default_rng(3)
+    t0s, t1s, _, _ = random_instance(rng, 40)
+    order = sorted(range(40), key=lambda k: (t1s[k], t0s[k]))
+    s0 = [t0s[k] for k in order]
+    s1 = [t1s[k] for k in order]
+    pred = compatible_predecessors(s0, s1, 10.0)
+    for i in range(40):
+        expected = max(
+            (j for j in range(i) if not conflicts_with(s0[i], s1[i], s0[j], s1[j], 10.0)),
+            default=-1
+        )
+        assert pred[i] == expected
+
+
+@pytest.mark.parametrize("min_gap", [0.0, 10.0])
+def test_exact_without_count_limits(min_gap):
+    """Bez aktywnych limitów liczby klipów DP = dokładne optimum"""
+    rng = np.random.default_rng(int(min_gap))
+    for _ in range(25):
+        t0s, t1s, scores, bins = random_instance(rng, 10)
+        budget = float(rng.integers(40, 200))
+        result = select_budgeted(t0s, t1s, scores, bins, budget, min_gap, max_per_bin=10, max_clips=10)
+        assert result.optimal
+        assert result.score == pytest.approx(brute_force(t0s, t1s, scores, bins, budget, min_gap, 10, 10), abs=1e-6)
+
+
+def test_count_limits_feasible_and_bounded():
+    rng = np.random.default_rng(7)
+    for _ in range(40):
+        t0s, t1s, scores, bins = random_instance(rng, 10)
+        budget = float(rng.integers(40, 200))
+        max_per_bin, max_clips = int(rng.integers(1, 3)), int(rng.integers(2, 5))
+        result = select_budgeted(t0s, t1s, scores, bins, budget, 5.0, max_per_bin, max_clips)
+        best = brute_force(t0s, t1s, scores, bins, budget, 5.0, max_per_bin, max_clips)
+
+        assert feasible(result.indices, t0s, t1s, bins, budget, 5.0, max_per_bin, max_clips)
+        assert result.score == pytest.approx(sum(scores[i] for i in result.indices))
+        assert result.score <= best + 1e-9
+        assert result.upper_bound >= best - 1e-3
+        if result.optimal:
+            assert result.score == pytest.approx(best, abs=1e-3)
+
+
+def test_upper_bound_valid_for_fractional_durations():
+    # A+B (2 × 5.5 s) mieszczą się w 11 s, ale po zaokrągleniu w górę (2 × 6) już nie
+    t0s, t1s, scores, bins = [0.0, 20.0, 40.0], [5.5, 25.5, 46.0], [1.0, 1.0, 1.05], [0, 0, 0]
+    result = select_budgeted(t0s, t1s, scores, bins, 11.0, 0.0, max_per_bin=10, max_clips=10)
+    assert result.upper_bound >= 2.0 - 1e-6
+    assert not result.optimal
+
+    rng = np.random.default_rng(5)
+    for _ in range(30):
+        t0s, t1s, scores, bins = random_instance(rng, 9)
+        t1s = [t1 + float(x) for t1, x in zip(t1s, rng.uniform(0, 1, 9).round(2))]
+        budget = float(rng.integers(40, 200)) + 0.5
+        max_per_bin, max_clips = int(rng.integers(1, 4)), int(rng.integers(2, 6))
+        result = select_budgeted(t0s, t1s, scores, bins, budget, 5.0, max_per_bin, max_clips)
+        best = brute_force(t0s, t1s, scores, bins, budget, 5.0, max_per_bin, max_clips)
+
+        assert feasible(result.indices, t0s, t1s, bins, budget, 5.0, max_per_bin, max_clips)
+        assert result.upper_bound >= best - 1e-3
+        if result.optimal:
+            assert result.score == pytest.approx(best, abs=1e-3)
+
+
+def test_budget_step_grows_with_max_cells():
+    rng = np.random.default_rng(11)
+    t0s, t1s, scores, bins = random_instance(rng, 200, horizon=20000.0)
+    result = select_budgeted(t0s, t1s, scores, bins, 3000.0, 10.0, 100, 200, max_cells=60_000)
+    assert result.step == pytest.approx(10.0)
+    assert feasible(result.indices, t0s, t1s, bins, 3000.0, 10.0, 100, 200)
+
+
+def make_stage(engine, max_clips_per_bin=4):
+    stage = SelectionStage.__new__(SelectionStage)
+    stage.config = Config()
+    stage.config.selection.engine = engine
+    stage.config.selection.target_total_duration = 900.0
+    stage.config.selection.max_clips = 40  # jak limit w _top_up_if_needed
+    stage.config.selection.max_clips_per_bin = max_clips_per_bin
+    stage.config.shorts.enabled = False
+    return stage
+
+
+def make_segments(n, seed, total_duration):
+    rng = np.random.default_rng(seed)
+    t0s = np.sort(rng.uniform(0, total_duration - 120, n))
+    return [
+        {
+            'id': f"seg_{i:04d}", 't0': float(t0), 't1': float(t0 + d), 'duration': float(d),
+            'final_score': float(s), 'transcript': '', 'features': {}, 'subscores': {}
+        }
+        for i, (t0, d, s) in enumerate(zip(t0s, rng.uniform(8, 90, n), rng.uniform(0.3, 1.0, n)))
+    ]
+
+
+@pytest.mark.parametrize("max_clips_per_bin", [4, 40])
+def test_stage_dp_engine_vs_greedy(tmp_path, max_clips_per_bin):
+    total_duration = 4 * 3600.0
+    segments = make_segments(400, 5, total_duration)
+
+    stage = make_stage("dp", max_clips_per_bin)
+    result = stage.process(segments, total_duration, tmp_path)
+    report = result['selection_report']
+    cfg = stage.config.selection
+
+    if report['greedy_within_limits']:
+        assert report['dp_score'] >= report['greedy_score'] - 1e-6
+    assert report['dp_score'] <= report['upper_bound'] + 1e-6
+    assert report['dp_duration'] <= cfg.target_total_duration * cfg.duration_tolerance
+    assert len(result['clips']) <= cfg.max_clips
+    clips = result['clips']
+    assert all(not conflicts_with(a['t0'], a['t1'], b['t0'], b['t1'], cfg.min_time_gap)
+               for a, b in itertools.combinations(clips, 2))
+
+    greedy = make_stage("greedy", max_clips_per_bin).process(make_segments(400, 5, total_duration), total_duration, tmp_path)
+    assert greedy['selection_report'] is None
+    assert sum(c['final_score'] for c in greedy['clips']) == pytest.approx(report['greedy_score'])
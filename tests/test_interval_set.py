@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.interval_set import IntervalSet
+from pipeline.stage_06_selection import SelectionStage
+
+
+def reference_greedy_nms(candidates, target_duration, max_clips, min_gap):
+    """Poprzednia implementacja (pełny przegląd wybranych + suma od zera) - wzorzec"""
+
+    def has_overlap(candidate, selected):
+        for sel in selected:
+            if not (candidate['t1'] < sel['t0'] or candidate['t0'] > sel['t1']):
+                return True
+            if sel['t0'] - candidate['t1'] < min_gap and sel['t0'] > candidate['t1']:
+                return True
+            if candidate['t0'] - sel['t1'] < min_gap and candidate['t0'] > sel['t1']:
+                return True
+        return False
+
+    selected = []
+    for candidate in sorted(candidates, key=lambda x: x['final_score'], reverse=True):
+        if len(selected) >= max_clips:
+            break
+        current_total = sum(s['duration'] for s in selected)
+        if current_total >= target_duration:
+            break
+        if has_overlap(candidate, selected):
+            continue
+        if current_total + candidate['duration'] > target_duration * 1.2:
+            continue
+        selected.append(candidate)
+    return selected
+
+
+def make_candidates(n, seed, hours=12.0):
+    rng = np.random.default_rng(seed)
+    t0s = np.round(rng.uniform(0, hours * 3600, n), 1)  # zaokrąglenie → styczne przedziały i remisy
+    durations = np.round(rng.uniform(8, 120, n), 1)
+    scores = np.round(rng.uniform(0, 1, n), 2)
+    return [
+        {'id': f"seg_{i:05d}", 't0': float(t0), 't1': float(t0 + d), 'duration': float(d), 'final_score': float(s)}
+        for i, (t0, d, s) in enumerate(zip(t0s, durations, scores))
+    ]
+
+
+def make_stage(target, max_clips, min_gap):
+    stage = SelectionStage.__new__(SelectionStage)
+    stage.config = Config()
+    stage.config.selection.target_total_duration = target
+    stage.config.selection.max_clips = max_clips
+    stage.config.selection.min_time_gap = min_gap
+    return stage
+
+
+@pytest.mark.parametrize("target,max_clips,min_gap", [
+    (900.0, 40, 10.0),
+    (4 * 3600.0, 1000, 10.0),
+    (6 * 3600.0, 5000, 0.0),
+    (2 * 3600.0, 300, 45.5),
+])
+def test_greedy_nms_identical_to_reference(target, max_clips, min_gap):
+    for seed in range(3):
+        candidates = make_candidates(3000, seed)
+        stage = make_stage(target, max_clips, min_gap)
+        result = stage._greedy_selection_with_nms(candidates)
+        expected = reference_greedy_nms(candidates, target, max_clips, min_gap)
+        assert [c['id'] for c in result] == [c['id'] for c in expected]
+
+
+def test_interval_set_neighbors_and_total():
+    chosen = IntervalSet(min_gap=5.0)
+    for t0, t1 in [(100.0, 110.0), (0.0, 10.0), (50.0, 60.0)]:
+        assert not chosen.conflicts(t0, t1)
+        chosen.add(t0, t1, (t0, t1))
+
+    assert list(chosen) == [(0.0, 10.0), (50.0, 60.0), (100.0, 110.0)]
+    assert chosen.total_duration == 30.0
+    assert chosen.neighbors(55.0) == (1, 2)
+    assert chosen.neighbors(-1.0) == (None, 0)
+
+    assert chosen.conflicts(60.0, 70.0)     # styczny (przedziały domknięte)
+    assert chosen.conflicts(63.0, 70.0)     # odstęp 3 < 5
+    assert chosen.conflicts(20.0, 200.0)    # obejmuje kilka przedziałów
+    assert not chosen.conflicts(65.0, 95.0)  # odstęp dokładnie 5
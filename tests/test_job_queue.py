@@ -0,0 +1,304 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.job_queue import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    PipelineJobQueue,
+)
+from pipeline.stage_graph import ResourceBudget, StageGraph, StageScheduler
+
+
+class FakeProcessor:
+    """Minimalny processor: jeden etap 'encode' rezerwujący slot ffmpeg"""
+
+    def __init__(self, config, resource_budget, duration=0.2, fail=False):
+        self.config = config
+        self.resource_budget = resource_budget
+        self.duration = duration
+        self.fail = fail
+        self.run_id = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise InterruptedError("Processing cancelled by user")
+
+    def process(self, input_file):
+        self.run_id = f"run_{Path(input_file).stem}"
+
+        def encode(ctx):
+            deadline = time.time() + self.duration
+            while time.time() < deadline:
+                self._check_cancelled()
+                time.sleep(0.01)
+            if self.fail:
+                raise RuntimeError("ffmpeg failed")
+            return {"output": f"{ctx['input_file']}.mp4"}
+
+        graph = StageGraph()
+        graph.add_stage("encode", encode, inputs=("input_file",), outputs=("output",),
+                        resources={"ffmpeg": 1})
+        context = {"input_file": input_file}
+        StageScheduler(graph, check_cancelled=self._check_cancelled,
+                       resource_budget=self.resource_budget).run(context)
+        return {"export_results": [{"output_file": context["output"]}]}
+
+
+def make_inputs(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"sejm_{i}.mp4"
+        path.write_bytes(b"x")
+        paths.append(str(path))
+    return paths
+
+
+def test_jobs_run_concurrently_within_budget(tmp_path):
+    budget = ResourceBudget({"ffmpeg": 2, "asr": 1, "ram_mb": 1000})
+    queue = PipelineJobQueue(
+        Config(), max_concurrent_jobs=4, resource_budget=budget,
+        processor_factory=lambda cfg, b: FakeProcessor(cfg, b, duration=0.2),
+    )
+
+    start = time.time()
+    jobs = [queue.submit(p) for p in make_inputs(tmp_path, 4)]
+    assert queue.wait(timeout=5)
+    elapsed = time.time() - start
+    queue.shutdown()
+
+    assert all(job.status == JOB_DONE for job in jobs)
+    assert budget.peak_usage["ffmpeg"] == 2
+    # 4 joby x 0.2s przy 2 slotach ffmpeg ≈ 0.4s (serial ≈ 0.8s)
+    assert elapsed < 0.7
+    assert jobs[0].to_dict()["outputs"] == [jobs[0].input_file + ".mp4"]
+
+
+def test_duplicate_input_returns_active_job(tmp_path):
+    queue = PipelineJobQueue(
+        Config(), max_concurrent_jobs=2,
+        processor_factory=lambda cfg, b: FakeProcessor(cfg, b, duration=0.2),
+    )
+    (input_file,) = make_inputs(tmp_path, 1)
+
+    first = queue.submit(input_file)
+    second = queue.submit(str(Path(input_file).parent / "." / Path(input_file).name))
+    assert second is first
+    assert len(queue.list_jobs()) == 1
+
+    queue.wait(timeout=5)
+    third = queue.submit(input_file)  # po zakończeniu można przetworzyć ponownie
+    assert third is not first
+    queue.wait(timeout=5)
+    queue.shutdown()
+
+
+def test_cancel_queued_and_running_jobs(tmp_path):
+    queue = PipelineJobQueue(
+        Config(), max_concurrent_jobs=1,
+        processor_factory=lambda cfg, b: FakeProcessor(cfg, b, duration=5),
+    )
+    running_input, queued_input = make_inputs(tmp_path, 2)
+
+    running = queue.submit(running_input)
+    queued = queue.submit(queued_input)
+    time.sleep(0.1)
+
+    assert queue.cancel(queued.job_id)
+    assert queue.cancel(running.job_id)
+    assert queue.wait(timeout=2)
+    queue.shutdown()
+
+    assert queued.status == JOB_CANCELLED
+    assert running.status == JOB_CANCELLED
+    assert not queue.cancel(running.job_id)
+
+
+def test_failed_job_reports_error_and_state_file(tmp_path):
+    state_file = tmp_path / "jobs.json"
+    queue = PipelineJobQueue(
+        Config(), max_concurrent_jobs=1, state_file=state_file,
+        processor_factory=lambda cfg, b: FakeProcessor(cfg, b, duration=0, fail=True),
+    )
+    job = queue.submit(make_inputs(tmp_path, 1)[0])
+    queue.wait(timeout=5)
+    queue.shutdown()
+
+    assert job.status == JOB_FAILED
+    assert "ffmpeg failed" in job.error
+    assert '"FAILED"' in state_file.read_text(encoding="utf-8")
+
+
+def test_each_job_gets_own_config_copy(tmp_path):
+    configs = []
+
+    def factory(cfg, budget):
+        configs.append(cfg)
+        cfg.selection.target_total_duration = 1.0  # jak HighlightPacker
+        return FakeProcessor(cfg, budget, duration=0)
+
+    config = Config()
+    original = config.selection.target_total_duration
+    queue = PipelineJobQueue(config, max_concurrent_jobs=2, processor_factory=factory)
+    for path in make_inputs(tmp_path, 2):
+        queue.submit(path)
+    queue.wait(timeout=5)
+    queue.shutdown()
+
+    assert len(configs) == 2 and configs[0] is not configs[1]
+    assert config.selection.target_total_duration == original
+
+
+def test_resource_budget_clamps_and_ignores_unknown():
+    budget = ResourceBudget({"ram_mb": 100})
+    reserved = budget.acquire({"ram_mb": 500, "gpu": 3})
+    assert reserved == {"ram_mb": 100}
+    assert budget.in_use() == {"ram_mb": 100}
+    budget.release(reserved)
+    assert budget.in_use() == {"ram_mb": 0}
+
+
+def test_resource_wait_honours_cancel():
+    budget = ResourceBudget({"asr": 1})
+    held = budget.acquire({"asr": 1})
+
+    def cancelled():
+        raise InterruptedError("Processing cancelled by user")
+
+    with pytest.raises(InterruptedError):
+        budget.acquire({"asr": 1}, check_cancelled=cancelled, poll_interval=0.01)
+    budget.release(held)
+
+
+def _stub_processor(ingest_delay):
+    """PipelineProcessor bez __init__ (stage'y wymagają ffmpeg/modeli)"""
+    from pipeline.cache_manager import CacheManager
+    from pipeline.processor import PipelineProcessor
+
+    class Stage:
+        def __init__(self, result, delay=0.0):
+            self.result, self.delay = result, delay
+
+        def process(self, **kwargs):
+            time.sleep(self.delay)
+            return self.result
+
+        def encode_slots(self):
+            return 1
+
+        def asr_slots(self):
+            return 1
+
+    config = Config()
+    config.youtube.enabled = False
+    config.shorts.enabled = False
+
+    processor = PipelineProcessor.__new__(PipelineProcessor)
+    processor.config = config
+    processor.resource_budget = None
+    processor.progress_callback = None
+    processor._cancelled = False
+    processor.timing_stats = {}
+    processor._cached_stages = set()
+    processor.run_id = None
+    processor.highlight_packer = None
+    processor.cache_manager = CacheManager(Path("cache"), enabled=False)
+    processor.stages = {
+        'ingest': Stage({'audio_normalized': 'a.wav', 'metadata': {'duration': 100}}, ingest_delay),
+        'vad': Stage({'segments': []}),
+        'transcribe': Stage({'segments': []}),
+        'features': Stage({'segments': []}),
+        'scoring': Stage({'segments': []}),
+        'selection': Stage({'clips': []}),
+        'export': Stage({'output_file': 'out.mp4'}),
+    }
+    processor._generate_standard_thumbnail = lambda *args: {'thumbnail_path': None}
+    return processor
+
+
+def test_processor_single_flight_is_per_input(tmp_path, monkeypatch):
+    from pipeline.processor import PipelineProcessor
+
+    monkeypatch.setattr(PipelineProcessor, "_active_inputs", {})
+    monkeypatch.setattr(
+        PipelineProcessor, "_create_session_directory_with_run_id",
+        lambda self, input_file: tmp_path,
+    )
+    first_input, second_input = make_inputs(tmp_path, 2)
+    outcomes = {}
+
+    def run(name, input_file):
+        try:
+            outcomes[name] = PipelineProcessor.process(_stub_processor(0.3), input_file)['success']
+        except RuntimeError as e:
+            outcomes[name] = str(e)
+
+    threads = [
+        threading.Thread(target=run, args=("a", first_input)),
+        threading.Thread(target=run, args=("b", second_input)),
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    run("duplicate", first_input)
+    for t in threads:
+        t.join()
+
+    assert outcomes["a"] is True
+    assert outcomes["b"] is True
+    assert "already running" in outcomes["duplicate"]
+    assert PipelineProcessor._active_inputs == {}
+    assert not PipelineProcessor._is_running
+
+
+def test_export_reserves_encoder_pool_slots_within_budget(monkeypatch):
+    from pipeline.stage_07_export import ExportStage
+
+    monkeypatch.setattr("os.cpu_count", lambda: 16)
+    monkeypatch.setattr(ExportStage, "_check_ffmpeg", lambda self: None)
+    processor = _stub_processor(0.0)
+    processor.config.export.encode_workers = 0
+    processor.config.export.encoder_threads = 4
+
+    # Bez budżetu: tyle slotów, ile enkoderów uruchomi pula (16 rdzeni / 4 wątki)
+    processor.stages['export'] = ExportStage(processor.config)
+    assert processor._build_stage_graph().nodes['export'].resources['ffmpeg'] == 4
+
+    # Z budżetem: pula przycięta do pojemności ffmpeg, eksport rezerwuje całość
+    processor.resource_budget = ResourceBudget({"ffmpeg": 2})
+    processor.stages['export'] = ExportStage(processor.config, max_encode_workers=processor._budget_capacity('ffmpeg'))
+    assert processor._build_stage_graph().nodes['export'].resources['ffmpeg'] == 2
+
+
+def test_transcribe_reserves_asr_pool_instances_within_budget():
+    from pipeline.stage_03_transcribe import TranscribeStage
+
+    processor = _stub_processor(0.0)
+    processor.config.use_gpu = False
+    processor.config.asr.workers = 4  # ASRWorkerPool: 4 procesy, model w każdym
+
+    processor.stages['transcribe'] = TranscribeStage(processor.config)
+    demand = processor._build_stage_graph().nodes['transcribe'].resources
+    assert demand['asr'] == 4
+    assert demand['ram_mb'] == 4 * processor.STAGE_RESOURCES['transcribe']['ram_mb']
+
+    # Z budżetem: pula przycięta do liczby instancji ASR
+    processor.resource_budget = ResourceBudget({"asr": 2, "ram_mb": 16000})
+    processor.stages['transcribe'] = TranscribeStage(processor.config, max_workers=processor._budget_capacity('asr'))
+    assert processor.stages['transcribe'].asr_slots() == 2
+    assert processor._build_stage_graph().nodes['transcribe'].resources['asr'] == 2
+
+    # GPU: jeden model w procesie
+    processor.config.use_gpu = True
+    assert processor.stages['transcribe'].asr_slots() == 1
@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.keyword_matcher import KeywordMatcher, polish_stem
+from pipeline.stage_04_features import FeaturesStage
+
+KEYWORDS_CSV = Path(__file__).resolve().parents[1] / "models" / "keywords.csv"
+
+
+def make_matcher(*keywords, inflection=True):
+    matcher = KeywordMatcher(inflection=inflection)
+    for keyword in keywords:
+        matcher.add(keyword)
+    return matcher
+
+
+def tokens(matcher, text):
+    return [m.token for m in matcher.find(text)]
+
+
+def test_polish_inflection():
+    matcher = make_matcher("Kaczyński", "afera", "korupcja", "Tusk", "rząd")
+    text = "Wniosek Kaczyńskiego o aferze korupcji: Tuskiem i rządu nikt nie pyta."
+    assert tokens(matcher, text) == ["kaczyński", "afera", "korupcja", "tusk", "rząd"]
+    assert polish_stem("kaczyński") == "kaczyńsk"
+    assert polish_stem("dług") == "dług"
+
+
+def test_word_boundaries_and_acronyms():
+    matcher = make_matcher("PO", "UE", "PiS", "rząd", "500+")
+    # "po" / "porządek" / "pisać" nie są dopasowaniami
+    assert tokens(matcher, "po porządku obrad będziemy pisać") == []
+    text = "Rząd PiS-u i PO w UE: program 500+ działa"
+    assert tokens(matcher, text) == ["rząd", "pis", "po", "ue", "500+"]
+
+
+def test_phrases_overlaps_and_positions():
+    matcher = make_matcher("koalicja", "Koalicja Obywatelska", "łamie prawo", "prawo")
+    text = "Posłowie Koalicji Obywatelskiej mówią, że rząd łamie prawo."
+    matches = matcher.find(text)
+    assert [m.token for m in matches] == ["koalicja", "koalicja obywatelska", "łamie prawo", "prawo"]
+    span = next(m for m in matches if m.token == "koalicja obywatelska")
+    assert text[span.start:span.end] == "Koalicji Obywatelskiej"
+    assert matcher.positions("prawo i prawo")["prawo"] == [(0, 5), (8, 13)]
+
+
+def test_inflection_disabled_matches_whole_words_only():
+    matcher = make_matcher("afera", inflection=False)
+    assert tokens(matcher, "afera i aferze") == ["afera"]
+
+
+def test_lexical_features_use_matcher():
+    stage = FeaturesStage.__new__(FeaturesStage)
+    stage.config = Config()
+    stage.config.features.keywords_file = str(KEYWORDS_CSV)
+    stage.config.features.compute_entity_density = False
+    stage.nlp = None
+    stage.keywords_db = {}
+    stage.keyword_matcher = KeywordMatcher()
+    stage._load_keywords()
+
+    assert len(stage.keyword_matcher) == len(stage.keywords_db)
+    features = stage._extract_lexical_features({'transcript': 'Pan Tusk mówi o aferze Kaczyńskiego po, porządek obrad.'})
+    found = {kw['token']: kw for kw in features['matched_keywords']}
+    assert set(found) == {"tusk", "afera", "kaczyński", "porządek obrad"}
+    assert features['keyword_score'] == sum(stage.keywords_db[t]['weight'] for t in found)
+    assert found["tusk"]['positions'] == [[4, 8]]
@@ -0,0 +1,148 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.segment_store import (
+    LazySegments,
+    load_segments,
+    resolve_segments_path,
+    save_segments_columnar,
+    write_segments,
+)
+
+
+def make_segments():
+    return [
+        {
+            'id': 'seg_0000',
+            't0': 0.0,
+            't1': 12.5,
+            'transcript': 'Panie marszałku, Wysoka Izbo',
+            'words': [
+                {'word': 'Panie', 'start': 0.0, 'end': 0.4, 'probability': 0.98},
+                {'word': 'marszałku,', 'start': 0.4, 'end': 1.1, 'probability': 0.91},
+            ],
+            'features': {'rms': 0.12, 'matched_keywords': ['marszałek'], 'nested': {'a': 1}},
+            'final_score': np.float64(0.73),
+            'speaker': None,
+            'is_question': False,
+        },
+        {
+            'id': 'seg_0001',
+            't0': 13.0,
+            'count': 7,
+            't1': 20.0,
+            'transcript': '',
+            'words': [],
+            'features': {'rms': 0.3, 'matched_keywords': [], 'nested': {'a': 2}},
+            'final_score': 0.41,
+            'is_question': True,
+            'gpt_reason': {'label': 'kłótnia'},
+        },
+    ]
+
+
+def expected(segments):
+    return json.loads(json.dumps(segments, default=lambda o: o.item()))
+
+
+def test_roundtrip_matches_json(tmp_path):
+    segments = make_segments()
+    save_segments_columnar(segments, tmp_path / "scored.segs")
+
+    loaded = load_segments(tmp_path / "scored.segs")
+    assert loaded == expected(segments)
+    # Brakujący klucz nie pojawia się, None zostaje None
+    assert 'gpt_reason' not in loaded[0] and loaded[1]['gpt_reason'] == {'label': 'kłótnia'}
+    assert loaded[0]['speaker'] is None and 'speaker' not in loaded[1]
+    assert isinstance(loaded[1]['t0'], float) and isinstance(loaded[1]['count'], int)
+
+
+def test_lazy_column_access_is_mmapped(tmp_path):
+    path = save_segments_columnar(make_segments(), tmp_path / "scored.segs")
+    lazy = load_segments(path, lazy=True)
+
+    assert isinstance(lazy, LazySegments)
+    assert len(lazy) == 2
+    scores = lazy.column('final_score')
+    assert isinstance(scores, np.memmap)
+    assert scores.tolist() == pytest.approx([0.73, 0.41])
+    assert lazy.column('features/rms').tolist() == pytest.approx([0.12, 0.3])
+    assert lazy[-1]['id'] == 'seg_0001'
+    assert [s['id'] for s in lazy] == ['seg_0000', 'seg_0001']
+    assert lazy[0:1] == expected(make_segments())[0:1]
+
+
+def test_mixed_nested_and_scalar_values_fall_back(tmp_path):
+    segments = [{'features': {'rms': 1.0}}, {'features': 0.5}, {'features': {}}]
+    save_segments_columnar(segments, tmp_path / "s.segs")
+    assert load_segments(tmp_path / "s.segs") == segments
+
+    segments = [{'f': {'a': 1}}, {'f': {'a': {'b': 2}}}]
+    save_segments_columnar(segments, tmp_path / "t.segs")
+    assert load_segments(tmp_path / "t.segs") == segments
+
+
+def test_empty_segments(tmp_path):
+    save_segments_columnar([], tmp_path / "empty.segs", extra={'total_words': 0})
+    lazy = load_segments(tmp_path / "empty.segs", lazy=True)
+    assert lazy.to_list() == []
+    assert lazy.extra == {'total_words': 0}
+
+
+def test_write_segments_formats_and_debug_json(tmp_path):
+    segments = make_segments()
+
+    out = write_segments(segments, tmp_path / "scored_segments.json")
+    assert out == tmp_path / "scored_segments.segs"
+    assert not (tmp_path / "scored_segments.json").exists()
+    # Czytelnicy podają starą nazwę .json - działa też dla .segs
+    assert resolve_segments_path(tmp_path / "scored_segments.json") == out
+    assert load_segments(tmp_path / "scored_segments.json") == expected(segments)
+
+    write_segments(segments, tmp_path / "scored_segments.json", debug_json=True)
+    with open(tmp_path / "scored_segments.json", encoding='utf-8') as f:
+        assert json.load(f) == expected(segments)
+
+    out = write_segments(segments, tmp_path / "x.json", segment_format="json")
+    assert out == tmp_path / "x.json"
+    assert not (tmp_path / "x.segs").exists()
+    assert load_segments(out) == expected(segments)
+
+    with pytest.raises(ValueError):
+        write_segments(segments, tmp_path / "y.json", segment_format="parquet")
+    with pytest.raises(FileNotFoundError):
+        load_segments(tmp_path / "missing.json")
+
+
+def test_mixed_int_float_column_keeps_types(tmp_path):
+    # Cache hashuje wczytane segmenty (artifact_hash) - 13 nie może stać się 13.0
+    segments = [{'t0': 13}, {'t0': 13.5}, {'t0': True}]
+    save_segments_columnar(segments, tmp_path / "m.segs")
+    loaded = load_segments(tmp_path / "m.segs")
+    assert loaded == segments
+    assert [type(s['t0']) for s in loaded] == [int, float, bool]
+
+
+@pytest.mark.parametrize("stage_path", [
+    "pipeline.stage_03_transcribe.TranscribeStage",
+    "pipeline.stage_04_features.FeaturesStage",
+    "pipeline.stage_05_scoring_gpt.ScoringStage",
+])
+def test_stages_save_with_config_format(tmp_path, stage_path):
+    import importlib
+    from pipeline.config import Config
+
+    module_name, class_name = stage_path.rsplit(".", 1)
+    stage = object.__new__(getattr(importlib.import_module(module_name), class_name))  # bez ładowania modeli
+    stage.config = Config()
+    stage.config.debug_json = True
+
+    out = stage._save_segments(make_segments(), tmp_path / "segments.json")
+    assert out == tmp_path / "segments.segs"
+    assert (tmp_path / "segments.json").exists()
@@ -0,0 +1,101 @@
+import copy
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.selection_index import SelectionIndex
+from pipeline.stage_06_selection import SelectionStage
+
+
+def make_segments(n, seed, total_duration):
+    rng = np.random.default_rng(seed)
+    t0s = np.sort(rng.uniform(0, total_duration - 150, n))
+    durations = np.round(rng.uniform(3, 140, n), 1)  # także krótkie bursty i za długie
+    scores = np.round(rng.beta(2, 4, n), 2)  # remisy
+    return [
+        {
+            'id': f"seg_{i:04d}", 't0': float(t0), 't1': float(t0 + d), 'duration': float(d),
+            'final_score': float(s), 'transcript': '', 'features': {}, 'subscores': {}
+        }
+        for i, (t0, d, s) in enumerate(zip(t0s, durations, scores))
+    ]
+
+
+def make_config():
+    config = Config()
+    config.shorts.enabled = False
+    return config
+
+
+@pytest.mark.parametrize("hours,n", [(2.0, 300), (8.0, 1500), (14.0, 3000)])
+def test_preview_matches_stage_process(tmp_path, capsys, hours, n):
+    total_duration = hours * 3600
+    segments = make_segments(n, int(hours), total_duration)
+    config = make_config()
+    index = SelectionIndex(copy.deepcopy(segments), total_duration, config)
+
+    for threshold in (0.2, 0.35, 0.5, 0.7, 0.95):
+        for target, max_clips in ((600.0, 10), (900.0, 40), (2400.0, 40), (7200.0, 200)):
+            preview = index.preview(min_score_threshold=threshold, target_total_duration=target, max_clips=max_clips)
+
+            stage_config = make_config()
+            stage_config.selection.min_score_threshold = threshold
+            stage_config.selection.target_total_duration = target
+            stage_config.selection.max_clips = max_clips
+            expected = SelectionStage(stage_config).process(copy.deepcopy(segments), total_duration, tmp_path)
+
+            assert [(c['id'], c['t0'], c['t1']) for c in preview.clips] == \
+                [(c['id'], c['t0'], c['t1']) for c in expected['clips']]
+            assert preview.total_duration == pytest.approx(expected['total_duration'])
+            assert sum(preview.bin_counts) == preview.num_clips
+    capsys.readouterr()
+
+
+def test_candidate_totals_and_index_not_mutated():
+    total_duration = 3 * 3600.0
+    segments = make_segments(500, 1, total_duration)
+    index = SelectionIndex(segments, total_duration, make_config())
+    snapshot = copy.deepcopy(index.segments)
+
+    for threshold in (0.3, 0.5, 0.8):
+        count, seconds = index.candidate_totals(threshold)
+        expected = [s for s in index.segments if s['final_score'] >= threshold and 8 <= s['duration'] <= 120]
+        assert count == len(expected)
+        assert seconds == pytest.approx(sum(s['duration'] for s in expected))
+        index.preview(min_score_threshold=threshold, target_total_duration=600.0)
+
+    assert index.segments == snapshot  # _adjust_duration działa na kopiach
+
+
+def test_empty_index():
+    index = SelectionIndex([], 3600.0, make_config())
+    preview = index.preview()
+    assert preview.clips == [] and preview.total_duration == 0.0
+    assert index.candidate_totals(0.5) == (0, 0.0)
+
+
+@pytest.mark.parametrize("engine", ["greedy", "dp"])
+def test_preview_defaults_to_run_min_score_and_engine(tmp_path, capsys, engine):
+    total_duration = 14 * 3600.0
+    segments = make_segments(800, 3, total_duration)
+    config = make_config()
+    config.selection.engine = engine
+    config.selection.target_total_duration = 900.0
+    config.selection.max_clips = 20
+    index = SelectionIndex(copy.deepcopy(segments), total_duration, config, min_score=0.6)
+
+    capsys.readouterr()
+    preview = index.preview()
+    assert capsys.readouterr().out == ""  # podgląd przy ruchu suwaka bez printów Stage 6
+
+    expected = SelectionStage(config).process(copy.deepcopy(segments), total_duration, tmp_path, min_score=0.6)
+    assert preview.engine == engine
+    assert [(c['id'], c['t0'], c['t1']) for c in preview.clips] == \
+        [(c['id'], c['t0'], c['t1']) for c in expected['clips']]
+    assert index.preview(min_score=0.0).threshold < preview.threshold
+    capsys.readouterr()
@@ -0,0 +1,220 @@
+import shutil
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.gpt_scorer import GPTScoreCache
+from pipeline.semantic_backends import KeywordBackend, NLIBackend, find_onnx_file
+from pipeline.stage_05_scoring_gpt import ScoringStage
+
+LABELS = {"ostra kłótnia": 2.0, "żart": 1.0, "procedura": -2.0}
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """Losowy mini-BERT z etykietami NLI (bez pobierania modeli)"""
+    model_dir = tmp_path_factory.mktemp("tiny_nli")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list("abcdefghijklmnoprstuwyząęółśżźćń.")
+    (model_dir / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = transformers.BertTokenizer(vocab_file=str(model_dir / "vocab.txt"))
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=64, num_labels=3,
+        id2label={0: "contradiction", 1: "neutral", 2: "entailment"},
+        label2id={"contradiction": 0, "neutral": 1, "entailment": 2},
+    )
+    transformers.BertForSequenceClassification(config).save_pretrained(model_dir)
+    tokenizer.save_pretrained(model_dir)
+    return model_dir
+
+
+def make_segments():
+    texts = ["pan poseł kłamie", "dziękuję bardzo", "to jest żart", "", "pan poseł kłamie", "głosowanie nad poprawką"]
+    return [{'id': f"seg_{i}", 'transcript': t, 'features': {'keyword_score': 3.0 * i}} for i, t in enumerate(texts)]
+
+
+def reference_scores(model_dir, segments):
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_dir)
+    model = transformers.AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+    weights = np.array(list(LABELS.values()))
+    scores = []
+    for seg in segments:
+        if not seg['transcript']:
+            scores.append(0.5)
+            continue
+        hypotheses = [f"Ten fragment to {label}." for label in LABELS]
+        enc = tokenizer([seg['transcript']] * len(hypotheses), hypotheses, padding=True, return_tensors="pt")
+        with torch.no_grad():
+            logits = model(**enc).logits[:, [0, 2]]
+        p = torch.softmax(logits, dim=1)[:, 1].numpy()
+        scores.append(0.5 + 0.5 * float(weights @ p) / np.abs(weights).sum())
+    return scores
+
+
+def test_nli_backend_matches_reference(tiny_model):
+    segments = make_segments()
+    backend = NLIBackend(str(tiny_model), LABELS, batch_size=4, workers=2, quantize=False)
+    scores = backend.score(segments)
+    assert scores == pytest.approx(reference_scores(tiny_model, segments), abs=1e-5)
+    assert backend.stats['pairs'] == 4 * len(LABELS)  # pusty i zduplikowany transkrypt pominięte
+
+
+def test_quantized_and_single_worker_are_close(tiny_model):
+    segments = make_segments()
+    exact = NLIBackend(str(tiny_model), LABELS, quantize=False).score(segments)
+    single = NLIBackend(str(tiny_model), LABELS, batch_size=1, workers=1, quantize=False).score(segments)
+    quantized = NLIBackend(str(tiny_model), LABELS, quantize=True).score(segments)
+    assert single == pytest.approx(exact, abs=1e-5)
+    assert quantized == pytest.approx(exact, abs=0.05)
+    assert all(0.0 <= s <= 1.0 for s in quantized)
+
+
+def test_cached_scores_skip_model(tiny_model, tmp_path):
+    segments = make_segments()
+    first = NLIBackend(str(tiny_model), LABELS, quantize=False, cache=GPTScoreCache(tmp_path / "nli.jsonl"))
+    expected = first.score(segments)
+
+    second = NLIBackend(str(tiny_model), LABELS, quantize=False, cache=GPTScoreCache(tmp_path / "nli.jsonl"))
+    assert second.score(segments) == expected
+    assert second.runner is None  # model nie był ładowany
+
+    changed = NLIBackend(str(tiny_model), {"ostra kłótnia": 1.0}, quantize=False, cache=GPTScoreCache(tmp_path / "nli.jsonl"))
+    changed.score(segments)
+    assert changed.runner is not None  # inne hipotezy = inny klucz cache
+
+
+def test_find_onnx_file_prefers_quantized(tmp_path):
+    assert find_onnx_file(str(tmp_path)) is None
+    (tmp_path / "onnx").mkdir()
+    (tmp_path / "onnx" / "model.onnx").write_bytes(b"")
+    (tmp_path / "onnx" / "model_quantized.onnx").write_bytes(b"")
+    assert find_onnx_file(str(tmp_path)).name == "model_quantized.onnx"
+    assert find_onnx_file(str(tmp_path), quantize=False).name == "model.onnx"
+
+
+def fake_onnxruntime(fail=False):
+    """Moduł onnxruntime z sesją liczącą model PyTorch z katalogu nad plikiem .onnx"""
+    class InferenceSession:
+        feeds = []
+
+        def __init__(self, path, options, providers):
+            if fail:
+                raise RuntimeError("INVALID_PROTOBUF")
+            self.model = transformers.AutoModelForSequenceClassification.from_pretrained(Path(path).parents[1]).eval()
+
+        def get_inputs(self):
+            return [SimpleNamespace(name=n) for n in ("input_ids", "attention_mask", "token_type_ids")]
+
+        def run(self, outputs, feed):
+            InferenceSession.feeds.append({k: v.dtype for k, v in feed.items()})
+            with torch.no_grad():
+                return [self.model(**{k: torch.from_numpy(v) for k, v in feed.items()}).logits.numpy()]
+
+    return SimpleNamespace(
+        SessionOptions=lambda: SimpleNamespace(),
+        GraphOptimizationLevel=SimpleNamespace(ORT_ENABLE_ALL=99),
+        InferenceSession=InferenceSession,
+    )
+
+
+@pytest.fixture
+def onnx_model(tiny_model, tmp_path):
+    """Kopia mini-modelu z plikiem onnx/model_quantized.onnx"""
+    model_dir = tmp_path / "tiny_onnx"
+    shutil.copytree(tiny_model, model_dir)
+    (model_dir / "onnx").mkdir()
+    (model_dir / "onnx" / "model_quantized.onnx").write_bytes(b"onnx")
+    return model_dir
+
+
+def test_onnx_runner_with_session(onnx_model, monkeypatch):
+    ort = fake_onnxruntime()
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)
+    segments = make_segments()
+
+    backend = NLIBackend(str(onnx_model), LABELS, batch_size=4)
+    scores = backend.score(segments)
+    assert backend.runner.description == "ONNX (model_quantized.onnx)"
+    assert scores == pytest.approx(reference_scores(onnx_model, segments), abs=1e-5)
+    assert all(dtype == np.int64 for feed in ort.InferenceSession.feeds for dtype in feed.values())
+
+
+@pytest.mark.parametrize("ort", [None, fake_onnxruntime(fail=True)], ids=["no-onnxruntime", "session-error"])
+def test_onnx_problems_fall_back_to_torch(onnx_model, monkeypatch, ort):
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)  # None → ImportError
+    segments = make_segments()
+
+    backend = NLIBackend(str(onnx_model), LABELS, quantize=False)
+    scores = backend.score(segments)
+    assert backend.runner.description == "PyTorch cpu"
+    assert scores == pytest.approx(reference_scores(onnx_model, segments), abs=1e-5)
+
+
+def test_runner_is_part_of_cache_key(onnx_model, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake_onnxruntime())
+    segments = make_segments()
+    cache_path = tmp_path / "nli.jsonl"
+
+    onnx = NLIBackend(str(onnx_model), LABELS, cache=GPTScoreCache(cache_path))
+    onnx.score(segments)
+    torch_int8 = NLIBackend(str(onnx_model), LABELS, use_onnx=False, cache=GPTScoreCache(cache_path))
+    assert torch_int8.version != onnx.version
+    torch_int8.score(segments)
+    assert torch_int8.runner is not None  # score'y ONNX nie są używane przez runner PyTorch
+
+    assert NLIBackend(str(onnx_model), LABELS, device="cuda").version != torch_int8.version
+
+    # sesja ONNX się nie tworzy → po przejściu na PyTorch klucze i score'y runnera PyTorch
+    torch_only = tmp_path / "nli_torch.jsonl"
+    expected = NLIBackend(str(onnx_model), LABELS, use_onnx=False, cache=GPTScoreCache(torch_only)).score(segments)
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake_onnxruntime(fail=True))
+    fallback = NLIBackend(str(onnx_model), LABELS, cache=GPTScoreCache(torch_only))
+    assert fallback.score(segments) == expected
+    assert fallback.version == torch_int8.version
+    assert fallback.stats['pairs'] == 0  # nic nie liczone ponownie
+
+
+def make_stage(tmp_path, nli_model, backend="auto"):
+    config = Config()
+    config.use_gpu = False
+    config.cache.cache_dir = tmp_path / "cache"
+    config.scoring.semantic_backend = backend
+    config.scoring.nli_model = nli_model
+    config.scoring.interest_labels = dict(LABELS)
+    stage = ScoringStage.__new__(ScoringStage)
+    stage.config = config
+    stage.openai_client = None
+    stage._semantic_backend = None
+    return stage
+
+
+def test_stage_uses_local_nli_without_api_key(tiny_model, tmp_path):
+    stage = make_stage(tmp_path, str(tiny_model))
+    backend = stage._create_semantic_backend()
+    assert isinstance(backend, NLIBackend)
+
+    segments = make_segments()
+    stage._semantic_analysis(segments, backend)
+    assert [s['semantic_score'] for s in segments] == pytest.approx(reference_scores(tiny_model, segments), abs=0.05)
+    assert (tmp_path / "cache" / "semantic_scores").exists()
+
+
+def test_stage_falls_back_to_keywords(tmp_path, monkeypatch):
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+    stage = make_stage(tmp_path, str(tmp_path / "missing_model"))
+    assert isinstance(stage._create_semantic_backend(), KeywordBackend)
+
+    stage = make_stage(tmp_path, str(tmp_path / "missing_model"), backend="keywords")
+    segments = make_segments()
+    stage._semantic_analysis(segments, stage._create_semantic_backend())
+    assert [s['semantic_score'] for s in segments] == [min(3.0 * i / 15.0, 1.0) for i in range(len(segments))]
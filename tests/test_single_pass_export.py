@@ -0,0 +1,129 @@
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_07_export import ExportStage
+
+CLIPS = [
+    {"id": "a", "t0": 10.0, "t1": 40.0, "duration": 30.0, "title": "Pierwszy", "transcript": "ala ma kota"},
+    {"id": "b", "t0": 100.0, "t1": 120.0, "duration": 20.0, "title": "Drugi", "transcript": "kot ma ale"},
+]
+
+
+def make_stage(monkeypatch, **export):
+    monkeypatch.setattr(ExportStage, "_check_ffmpeg", lambda self: None)
+    config = Config()
+    config.export.single_pass = True
+    config.export.add_transitions = False
+    for name, value in export.items():
+        setattr(config.export, name, value)
+    return ExportStage(config)
+
+
+def fake_popen(calls, fail_first=0, stderr=b"error"):
+    """Popen dla EncoderPool: zapisuje pliki wyjściowe, pierwsze `fail_first` wywołań kończy błędem"""
+    class FakeProcess:
+        def __init__(self, cmd, **kwargs):
+            calls.append(cmd)
+            self.returncode = 1 if len(calls) <= fail_first else 0
+            if self.returncode == 0:
+                for idx, arg in enumerate(cmd):
+                    if arg.endswith(".mp4") and cmd[idx - 1] != "-i":  # pliki wyjściowe
+                        Path(arg).write_bytes(b"mp4")
+
+        def communicate(self):
+            return b"", stderr if self.returncode else b""
+
+        def kill(self):
+            pass
+    return FakeProcess
+
+
+def test_graph_cuts_fades_and_concats(monkeypatch, tmp_path):
+    stage = make_stage(monkeypatch)
+    input_args, graph, outputs = stage._build_single_pass_graph(tmp_path / "sejm.mp4", CLIPS)
+
+    # Pre/post roll 1.5 / 1.0 → okna 8.5-41.0 i 98.5-121.0; każdy klip to osobne wejście z seekiem
+    assert input_args.count('-i') == 2
+    assert input_args[:4] == ['-ss', '8.500', '-t', '32.500']
+    assert "[0:v]trim=duration=32.500" in graph
+    assert "fade=t=out:st=32.000:d=0.5" in graph
+    assert "[1:a]atrim=duration=22.500" in graph
+    assert "[v0][a0][v1][a1]concat=n=2:v=1:a=1[vcat][acat]" in graph
+    assert outputs == [('[vcat]', '[acat]')]
+
+
+def test_graph_with_title_cards_and_fused_subtitles(monkeypatch, tmp_path):
+    stage = make_stage(monkeypatch)
+    titles = [tmp_path / "title_001.txt", tmp_path / "title_002.txt"]
+    input_args, graph, outputs = stage._build_single_pass_graph(
+        tmp_path / "sejm.mp4", CLIPS, titles, tmp_path / "full_subtitles.srt"
+    )
+
+    assert input_args.count('-i') == 4
+    assert "drawtext=textfile=" in graph and "title_002.txt" in graph
+    assert "[tv0][ta0][v0][a0][tv1][ta1][v1][a1]concat=n=4" in graph
+    assert "[vcat]split=2[vmain][vsubin]" in graph
+    assert "subtitles=" in graph and "full_subtitles.srt" in graph
+    assert outputs == [('[vmain]', '[amain]'), ('[vsub]', '[asub]')]
+
+
+def test_single_pass_runs_one_ffmpeg_with_fused_hardsub(monkeypatch, tmp_path):
+    stage = make_stage(monkeypatch, generate_hardsub=True)
+    calls, run_calls = [], []
+    monkeypatch.setattr(subprocess, "Popen", fake_popen(calls))
+    monkeypatch.setattr(subprocess, "run", lambda cmd, **kwargs: run_calls.append(cmd))
+
+    result = stage.process(
+        input_file=str(tmp_path / "sejm.mp4"), clips=[dict(c) for c in CLIPS], segments=[],
+        output_dir=tmp_path, session_dir=tmp_path
+    )
+
+    assert len(calls) == 1 and run_calls == []
+    cmd = calls[0]
+    assert '-filter_complex_script' in cmd
+    assert cmd.count('-map') == 4
+    assert result['output_file'] == str((tmp_path / Path(result['output_file']).name).absolute())
+    assert result['output_file_hardsub'].endswith("_HARDSUB.mp4")
+    assert (tmp_path / "full_subtitles.srt").exists()
+    assert "concat=n=2" in (tmp_path / "titles" / "export_graph.txt").read_text(encoding="utf-8")
+
+
+def test_single_pass_failure_falls_back_to_classic_export(monkeypatch, tmp_path):
+    stage = make_stage(monkeypatch)
+    calls, run_calls = [], []
+    monkeypatch.setattr(subprocess, "Popen", fake_popen(calls, fail_first=1))
+
+    def fake_run(cmd, **kwargs):
+        run_calls.append(cmd)
+        Path(cmd[-1]).write_bytes(b"mp4")
+        return subprocess.CompletedProcess(cmd, 0, b"", b"")
+    monkeypatch.setattr(subprocess, "run", fake_run)
+
+    result = stage.process(
+        input_file=str(tmp_path / "sejm.mp4"), clips=[dict(c) for c in CLIPS], segments=[],
+        output_dir=tmp_path, session_dir=tmp_path
+    )
+
+    assert '-filter_complex_script' in calls[0]
+    assert len(calls) == 1 + 2 + 2  # nieudany single-pass, potem cięcie + fade per klip
+    assert len(run_calls) == 1 and "concat" in run_calls[0]
+    assert result['output_file']
+
+
+def test_title_card_font_error_retries_without_cards(monkeypatch, tmp_path):
+    stage = make_stage(monkeypatch, add_transitions=True)
+    calls = []
+    monkeypatch.setattr(subprocess, "Popen", fake_popen(calls, fail_first=1, stderr=b"Fontconfig error: Cannot load default config file"))
+
+    stage.process(
+        input_file=str(tmp_path / "sejm.mp4"), clips=[dict(c) for c in CLIPS], segments=[],
+        output_dir=tmp_path, session_dir=tmp_path
+    )
+
+    assert len(calls) == 2
+    graph = (tmp_path / "titles" / "export_graph.txt").read_text(encoding="utf-8")
+    assert "drawtext" not in graph and "concat=n=2" in graph
@@ -0,0 +1,154 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.stage_graph import StageGraph, StageScheduler, StageTiming
+
+
+def test_independent_stages_run_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def branch(key):
+        def _run(ctx):
+            barrier.wait()  # deadlock (BrokenBarrierError) jeśli etapy szłyby sekwencyjnie
+            return {key: ctx["source"] + 1}
+        return _run
+
+    graph = StageGraph()
+    graph.add_stage("source", lambda ctx: {"source": 1}, outputs=("source",))
+    graph.add_stage("export", branch("export"), inputs=("source",), outputs=("export",))
+    graph.add_stage("shorts", branch("shorts"), inputs=("source",), outputs=("shorts",))
+
+    context = {}
+    timings = StageScheduler(graph, max_workers=2).run(context)
+
+    assert context["export"] == 2
+    assert context["shorts"] == 2
+    assert set(timings) == {"source", "export", "shorts"}
+
+
+def test_dependencies_respected():
+    order = []
+    lock = threading.Lock()
+
+    def stage(name, inputs, output):
+        def _run(ctx):
+            with lock:
+                order.append(name)
+            return {output: [ctx[k] for k in inputs]}
+        return _run
+
+    graph = StageGraph()
+    graph.add_stage("c", stage("c", ("a", "b"), "c"), inputs=("a", "b"), outputs=("c",))
+    graph.add_stage("a", stage("a", ("input",), "a"), inputs=("input",), outputs=("a",))
+    graph.add_stage("b", stage("b", ("a",), "b"), inputs=("a",), outputs=("b",))
+
+    context = {"input": 0}
+    StageScheduler(graph, max_workers=4).run(context)
+
+    assert order == ["a", "b", "c"]
+    assert graph.topological_order() == ["a", "b", "c"]
+    assert context["c"] == [[0], [[0]]]
+
+
+def test_validation_errors():
+    graph = StageGraph()
+    graph.add_stage("a", lambda ctx: {"a": 1}, inputs=("missing",), outputs=("a",))
+    with pytest.raises(ValueError):
+        StageScheduler(graph).run({})
+
+    graph = StageGraph()
+    graph.add_stage("a", lambda ctx: {}, inputs=("b",), outputs=("a",))
+    graph.add_stage("b", lambda ctx: {}, inputs=("a",), outputs=("b",))
+    with pytest.raises(ValueError):
+        graph.topological_order()
+
+    graph = StageGraph()
+    graph.add_stage("a", lambda ctx: {}, outputs=("x",))
+    with pytest.raises(ValueError):
+        graph.add_stage("b", lambda ctx: {}, outputs=("x",))
+
+
+def test_error_stops_downstream_stages():
+    ran = []
+
+    def boom(ctx):
+        raise RuntimeError("ffmpeg failed")
+
+    graph = StageGraph()
+    graph.add_stage("a", boom, outputs=("a",))
+    graph.add_stage("b", lambda ctx: ran.append("b") or {"b": 1}, inputs=("a",), outputs=("b",))
+
+    with pytest.raises(RuntimeError, match="ffmpeg failed"):
+        StageScheduler(graph).run({})
+    assert ran == []
+
+
+def test_cancel_check_raises_before_next_stage():
+    cancelled = {"flag": False}
+
+    def first(ctx):
+        cancelled["flag"] = True
+        return {"a": 1}
+
+    def check():
+        if cancelled["flag"]:
+            raise InterruptedError("Processing cancelled by user")
+
+    graph = StageGraph()
+    graph.add_stage("a", first, outputs=("a",))
+    graph.add_stage("b", lambda ctx: {"b": 1}, inputs=("a",), outputs=("b",))
+
+    scheduler = StageScheduler(graph, check_cancelled=check)
+    with pytest.raises(InterruptedError):
+        scheduler.run({})
+    assert "b" not in scheduler.timings
+
+
+def test_missing_output_is_an_error():
+    graph = StageGraph()
+    graph.add_stage("a", lambda ctx: {}, outputs=("a",))
+    with pytest.raises(RuntimeError, match="did not produce"):
+        StageScheduler(graph).run({})
+
+
+def test_critical_path_uses_measured_durations():
+    graph = StageGraph()
+    graph.add_stage("ingest", lambda ctx: {}, outputs=("audio",))
+    graph.add_stage("hash", lambda ctx: {}, outputs=("key",))
+    graph.add_stage("vad", lambda ctx: {}, inputs=("audio", "key"), outputs=("vad",))
+    graph.add_stage("export", lambda ctx: {}, inputs=("vad",), outputs=("export",))
+    graph.add_stage("shorts", lambda ctx: {}, inputs=("vad",), outputs=("shorts",))
+
+    timings = {
+        "ingest": StageTiming("ingest", 0.0, 5.0),
+        "hash": StageTiming("hash", 0.0, 1.0),
+        "vad": StageTiming("vad", 5.0, 7.0),
+        "export": StageTiming("export", 7.0, 17.0),
+        "shorts": StageTiming("shorts", 7.0, 10.0),
+    }
+
+    path, length = graph.critical_path(timings)
+    assert path == ["ingest", "vad", "export"]
+    assert length == pytest.approx(17.0)
+
+
+def test_scheduler_wall_time_shorter_than_sum():
+    def sleeper(key):
+        def _run(ctx):
+            time.sleep(0.2)
+            return {key: True}
+        return _run
+
+    graph = StageGraph()
+    for name in ("a", "b", "c"):
+        graph.add_stage(name, sleeper(name), outputs=(name,))
+
+    start = time.time()
+    StageScheduler(graph, max_workers=3).run({})
+    assert time.time() - start < 0.5
@@ -0,0 +1,130 @@
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.audio_store import AudioStore
+from pipeline.config import Config
+from pipeline.stage_03_transcribe import TranscribeStage, split_clips
+
+SR = 16000
+
+
+class FakeBatchedPipeline:
+    """Udaje BatchedInferencePipeline: jeden wynik na klip, słowo = indeks klipu"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def transcribe(self, audio, clip_timestamps=None, batch_size=8, **kwargs):
+        assert isinstance(audio, np.ndarray)
+        assert kwargs['vad_filter'] is False and kwargs['word_timestamps'] is True
+        self.calls.append({'clips': clip_timestamps, 'batch_size': batch_size})
+        if self.fail:
+            raise RuntimeError("CUDA OOM")
+
+        def results():
+            for i, clip in enumerate(clip_timestamps):
+                start = round(clip['start'] + 0.5, 3)
+                word = SimpleNamespace(word=f" w{clip['start']:.0f}", start=start, end=start + 0.3, probability=0.9)
+                yield SimpleNamespace(start=start, end=round(clip['end'], 3), text=f" klip {i}",
+                                      avg_logprob=-0.1 * (i + 1), words=[word])
+        return results(), None
+
+
+class FakeModel:
+    """Sekwencyjny WhisperModel (ścieżka awaryjna)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        self.calls += 1
+        word = SimpleNamespace(word="x", start=0.1, end=0.2, probability=0.5)
+        return iter([SimpleNamespace(text="sekwencyjnie", words=[word], avg_logprob=-0.3)]), None
+
+
+def make_stage(batch_size=4, fail=False):
+    config = Config()
+    config.asr.batch_size = batch_size
+    stage = TranscribeStage.__new__(TranscribeStage)
+    stage.config = config
+    stage.model = FakeModel()
+    stage.batched_model = FakeBatchedPipeline(fail)
+    return stage
+
+
+def make_segments():
+    # Ostatni segment 70s → 3 klipy ≤30s
+    bounds = [(0, 5), (6, 12), (13, 20), (21, 22), (30, 40), (41, 111)]
+    return [{'id': f"seg_{i:04d}", 't0': float(a), 't1': float(b), 'duration': float(b - a)}
+            for i, (a, b) in enumerate(bounds)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    pcm = tmp_path / "audio.f32"
+    np.zeros(120 * SR, dtype='<f4').tofile(pcm)
+    return AudioStore(pcm, SR)
+
+
+@pytest.fixture
+def no_ffmpeg(monkeypatch):
+    def boom(*args, **kwargs):
+        raise AssertionError("ffmpeg subprocess called")
+    monkeypatch.setattr(subprocess, "run", boom)
+
+
+def test_split_clips_caps_clip_length():
+    clips, owners = split_clips(make_segments() + [{'t0': 5.0, 't1': 5.0}])
+    assert owners == [0, 1, 2, 3, 4, 5, 5, 5]
+    assert all(c['end'] - c['start'] <= 30.0 for c in clips)
+    assert clips[-3]['start'] == 41.0 and clips[-1]['end'] == 111.0
+
+
+def test_batched_transcription_maps_results_back(tmp_path, store, no_ffmpeg):
+    stage = make_stage(batch_size=4)
+    result = stage.process("unused.wav", make_segments(), tmp_path, audio_store=store)
+
+    calls = stage.batched_model.calls
+    assert len(calls) == 2  # 6 segmentów / batch_size 4
+    assert all(call['batch_size'] == 4 for call in calls)
+    assert len(calls[1]['clips']) == 1 + 3
+
+    segments = result['segments']
+    assert [s['id'] for s in segments] == [f"seg_{i:04d}" for i in range(6)]
+    assert segments[0]['transcript'] == "klip 0"
+    assert segments[5]['transcript'] == "klip 1 klip 2 klip 3"
+    assert [w['word'] for w in segments[5]['words']] == ["w41", "w64", "w88"]
+    assert segments[4]['words'][0]['start'] == 30.5  # czasy bezwzględne
+    assert segments[5]['confidence'] == pytest.approx(-0.3)
+    assert stage.model.calls == 0
+    assert result['total_words'] == 8
+
+
+def test_batch_failure_falls_back_per_segment(tmp_path, store, no_ffmpeg):
+    stage = make_stage(batch_size=10, fail=True)
+    result = stage.process("unused.wav", make_segments(), tmp_path, audio_store=store)
+
+    assert stage.model.calls == 6
+    assert all(s['transcript'] == "sekwencyjnie" for s in result['segments'])
+    assert result['segments'][2]['words'][0]['start'] == pytest.approx(13.1)
+
+
+def test_batched_opens_store_from_wav(tmp_path, no_ffmpeg):
+    import soundfile as sf
+
+    wav = tmp_path / "audio_normalized.wav"
+    sf.write(str(wav), np.zeros(60 * SR, dtype=np.float32), SR)
+    stage = make_stage()
+    result = stage.process(str(wav), make_segments()[:3], tmp_path)
+
+    assert len(stage.batched_model.calls) == 1
+    assert (tmp_path / "audio_normalized.f32").exists()
+    assert result['num_segments'] == 3
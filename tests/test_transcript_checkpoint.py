@@ -0,0 +1,127 @@
+import copy
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.audio_store import AudioStore
+from pipeline.cache_manager import CacheManager
+from pipeline.config import Config
+from pipeline.stage_03_transcribe import TranscribeStage
+from pipeline.transcript_checkpoint import TranscriptCheckpoint
+
+SR = 16000
+
+
+class CountingModel:
+    """Sekwencyjny WhisperModel; po `crash_after` wywołaniach udaje przerwanie procesu"""
+
+    def __init__(self, crash_after=None):
+        self.calls = 0
+        self.crash_after = crash_after
+
+    def transcribe(self, audio, **kwargs):
+        if self.crash_after is not None and self.calls >= self.crash_after:
+            raise KeyboardInterrupt
+        self.calls += 1
+        word = SimpleNamespace(word=f"słowo{self.calls}", start=0.1, end=0.2, probability=0.9)
+        return iter([SimpleNamespace(text=f"tekst {self.calls}", words=[word], avg_logprob=-0.2)]), None
+
+
+def make_stage(model, batch_size=3):
+    config = Config()
+    config.asr.batch_size = batch_size
+    stage = TranscribeStage.__new__(TranscribeStage)
+    stage.config = config
+    stage.model = model
+    stage.batched_model = None
+    stage._pool = None
+    return stage
+
+
+def make_segments(bounds):
+    return [{'id': f"seg_{i:04d}", 't0': float(a), 't1': float(b), 'duration': float(b - a)}
+            for i, (a, b) in enumerate(bounds)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    pcm = tmp_path / "audio.f32"
+    np.zeros(60 * SR, dtype='<f4').tofile(pcm)
+    return AudioStore(pcm, SR)
+
+
+def test_resume_transcribes_only_missing_segments(tmp_path, store):
+    segments = make_segments([(i * 5, i * 5 + 4) for i in range(10)])
+    checkpoint = TranscriptCheckpoint(tmp_path / "log.jsonl")
+
+    crashing = make_stage(CountingModel(crash_after=7))
+    with pytest.raises(KeyboardInterrupt):
+        crashing.process("unused.wav", segments, tmp_path, audio_store=store, checkpoint=checkpoint)
+    assert len(checkpoint.load()) == 6  # dwa pełne batche po 3
+
+    resumed_model = CountingModel()
+    result = make_stage(resumed_model).process(
+        "unused.wav", segments, tmp_path, audio_store=store, checkpoint=checkpoint
+    )
+    assert resumed_model.calls == 4
+    assert [s['id'] for s in result['segments']] == [s['id'] for s in segments]
+    assert result['segments'][0]['transcript'] == "tekst 1"  # z pierwszego przebiegu
+    assert result['segments'][6]['transcript'] == "tekst 1"  # pierwszy nowy
+    assert result['segments'][3]['words'][0]['start'] == pytest.approx(15.1)
+    assert len(checkpoint.load()) == 10
+
+
+def test_truncated_line_and_errors_are_retried(tmp_path):
+    checkpoint = TranscriptCheckpoint(tmp_path / "log.jsonl")
+    ok, failed = make_segments([(0, 4), (5, 9)])
+    checkpoint.append([{**ok, 'transcript': "dobrze", 'words': []},
+                       {**failed, 'transcript': "", 'words': [], 'error': "timeout"}])
+    with open(checkpoint.path, 'a', encoding='utf-8') as f:
+        f.write('{"span": "10000-14000", "fie')  # przerwany zapis
+
+    restored = checkpoint.restore(make_segments([(0, 4), (5, 9), (10, 14)]))
+    assert restored[0]['transcript'] == "dobrze"
+    assert restored[1] is None and restored[2] is None
+
+
+def test_cache_reuses_transcripts_after_vad_tweak(tmp_path, store):
+    video = tmp_path / "sejm.mp4"
+    video.write_bytes(b"fake video")
+    config = Config()
+
+    cache = CacheManager(tmp_path / "cache")
+    cache.initialize_cache_key(str(video), config)
+    before = make_segments([(0, 4), (5, 9), (10, 14), (20, 30)])
+    make_stage(CountingModel()).process("unused.wav", before, tmp_path / "run1",
+                                        audio_store=store, checkpoint=cache.transcript_checkpoint())
+
+    # Inny min_silence: dwa ostatnie segmenty scalone, pierwsze dwa bez zmian
+    config.vad.min_silence_duration += 1.0
+    rerun = CacheManager(tmp_path / "cache")
+    rerun.initialize_cache_key(str(video), config)
+    after = make_segments([(0, 4), (5, 9), (10, 30)])
+    assert not rerun.is_cache_valid('transcribe', upstream=after)
+
+    model = CountingModel()
+    result = make_stage(model).process("unused.wav", after, tmp_path / "run2",
+                                       audio_store=store, checkpoint=rerun.transcript_checkpoint())
+    assert model.calls == 1
+    assert [s['id'] for s in result['segments']] == ["seg_0000", "seg_0001", "seg_0002"]
+    assert result['segments'][1]['transcript'] == "tekst 2"
+
+    other_config = copy.deepcopy(config)
+    other_config.asr.beam_size += 1  # inna konfiguracja ASR → osobny dziennik
+    other = CacheManager(tmp_path / "cache")
+    other.initialize_cache_key(str(video), other_config)
+    assert other.transcript_checkpoint().path != rerun.transcript_checkpoint().path
+
+    louder_config = copy.deepcopy(config)
+    louder_config.audio.target_loudness += 2.0  # inne audio wejściowe Whisper → osobny dziennik
+    louder = CacheManager(tmp_path / "cache")
+    louder.initialize_cache_key(str(video), louder_config)
+    assert louder.transcript_checkpoint().path != rerun.transcript_checkpoint().path
@@ -0,0 +1,124 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import Config
+from pipeline.stage_02_vad import VADStage, frame_energy, rolling_percentile_threshold
+
+
+def reference_energy(audio_np, frame_length, hop_length):
+    energy = []
+    for i in range(0, len(audio_np) - frame_length, hop_length):
+        frame = audio_np[i:i + frame_length]
+        energy.append(np.sum(frame ** 2) / len(frame))
+    return np.array(energy)
+
+
+def reference_fallback(audio_np, sample_rate, min_speech_duration):
+    """Poprzednia (pętlowa) implementacja _detect_speech_fallback - wzorzec do porównania"""
+    frame_length = int(0.02 * sample_rate)
+    hop_length = int(0.01 * sample_rate)
+    energy = reference_energy(audio_np, frame_length, hop_length)
+    threshold = np.percentile(energy, 30)
+    is_speech = energy > threshold
+
+    segments = []
+    in_speech = False
+    start_idx = 0
+    for i, speech in enumerate(is_speech):
+        if speech and not in_speech:
+            start_idx = i
+            in_speech = True
+        elif not speech and in_speech:
+            t0 = start_idx * hop_length / sample_rate
+            t1 = i * hop_length / sample_rate
+            if t1 - t0 >= min_speech_duration:
+                segments.append({'id': f"seg_{len(segments):04d}", 't0': t0, 't1': t1, 'duration': t1 - t0})
+            in_speech = False
+    if in_speech:
+        t0 = start_idx * hop_length / sample_rate
+        t1 = len(is_speech) * hop_length / sample_rate
+        if t1 - t0 >= min_speech_duration:
+            segments.append({'id': f"seg_{len(segments):04d}", 't0': t0, 't1': t1, 'duration': t1 - t0})
+    return segments
+
+
+def make_speech(seconds, sample_rate, seed=0):
+    """Naprzemienne bloki głośne (mowa) i ciche (tło) o losowej długości"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    total = 0
+    while total < seconds * sample_rate:
+        n = int(rng.uniform(0.2, 6.0) * sample_rate)
+        level = rng.choice([0.3, 0.01])
+        parts.append((rng.standard_normal(n) * level).astype(np.float32))
+        total += n
+    return np.concatenate(parts)[:seconds * sample_rate]
+
+
+def make_stage(min_speech_duration=0.5):
+    config = Config()
+    config.vad.min_speech_duration = min_speech_duration
+    stage = VADStage.__new__(VADStage)
+    stage.config = config
+    return stage
+
+
+@pytest.mark.parametrize("sample_rate,seed", [(16000, 0), (16000, 1), (22050, 2), (8000, 3)])
+def test_vectorized_fallback_matches_loop(sample_rate, seed):
+    audio = make_speech(120, sample_rate, seed)
+    stage = make_stage()
+
+    result = stage._detect_speech_fallback(torch.from_numpy(audio)[None], sample_rate)
+    expected = reference_fallback(audio, sample_rate, 0.5)
+
+    assert len(expected) > 5
+    assert result == expected
+
+
+def test_frame_energy_blocks_match_reference():
+    audio = make_speech(10, 16000, seed=4)
+    np.testing.assert_allclose(frame_energy(audio, 320, 160), reference_energy(audio, 320, 160), rtol=1e-5)
+
+    # Ramka nie jest wielokrotnością hopu (np. 22050 Hz) → ścieżka blokowa
+    expected = reference_energy(audio, 441, 220)
+    for block_frames in (1, 7, 1000, 10 ** 6):
+        np.testing.assert_allclose(frame_energy(audio, 441, 220, block_frames), expected, rtol=1e-5)
+
+    assert len(frame_energy(audio[:320], 320, 160)) == 0
+    assert make_stage()._detect_speech_fallback(torch.zeros(1, 100), 16000) == []
+
+
+def test_adaptive_threshold_follows_background_level():
+    sample_rate = 16000
+    rng = np.random.default_rng(5)
+    # Dwie połowy z różnym poziomem tła, w każdej krótkie wypowiedzi
+    halves = []
+    for background in (0.005, 0.1):
+        parts = []
+        for _ in range(10):
+            parts.append(rng.standard_normal(4 * sample_rate) * background)
+            parts.append(rng.standard_normal(2 * sample_rate) * background * 6)
+        halves.append(np.concatenate(parts).astype(np.float32))
+    audio = np.concatenate(halves)
+
+    stage = make_stage(min_speech_duration=1.0)
+    global_segments = stage._detect_speech_fallback(torch.from_numpy(audio)[None], sample_rate)
+
+    stage.config.vad.energy_adaptive = True
+    stage.config.vad.energy_window_seconds = 20.0
+    adaptive_segments = stage._detect_speech_fallback(torch.from_numpy(audio)[None], sample_rate)
+
+    # Globalny próg: głośna połowa zlewa się w jeden segment; kroczący rozdziela wypowiedzi
+    loud_half = len(halves[0]) / sample_rate
+    assert sum(s['t0'] >= loud_half - 1 for s in global_segments) <= 2
+    assert sum(s['t0'] >= loud_half - 1 for s in adaptive_segments) >= 8
+
+    energy = frame_energy(audio, 320, 160)
+    threshold = rolling_percentile_threshold(energy, 30.0, 2000)
+    assert threshold.shape == energy.shape
@@ -0,0 +1,172 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.audio_store import AudioStore
+from pipeline.config import Config
+from pipeline.stage_02_vad import StreamingSpeechTracker, VADStage
+
+SR = 16000
+WINDOW = 512
+
+
+def reference_get_speech_timestamps(audio, model, threshold=0.5, sampling_rate=16000,
+                                    min_speech_duration_ms=250, min_silence_duration_ms=100,
+                                    speech_pad_ms=30, window_size_samples=512):
+    """Logika Silero utils_vad.get_speech_timestamps (bez max_speech_duration) - wzorzec do porównania"""
+    model.reset_states()
+    min_speech_samples = sampling_rate * min_speech_duration_ms / 1000
+    speech_pad_samples = sampling_rate * speech_pad_ms / 1000
+    min_silence_samples = sampling_rate * min_silence_duration_ms / 1000
+    audio_length_samples = len(audio)
+
+    speech_probs = []
+    for start in range(0, audio_length_samples, window_size_samples):
+        chunk = audio[start:start + window_size_samples]
+        if len(chunk) < window_size_samples:
+            chunk = torch.nn.functional.pad(chunk, (0, int(window_size_samples - len(chunk))))
+        speech_probs.append(model(chunk, sampling_rate).item())
+
+    triggered = False
+    speeches = []
+    current_speech = {}
+    neg_threshold = threshold - 0.15
+    temp_end = 0
+
+    for i, speech_prob in enumerate(speech_probs):
+        if speech_prob >= threshold and temp_end:
+            temp_end = 0
+        if speech_prob >= threshold and not triggered:
+            triggered = True
+            current_speech['start'] = window_size_samples * i
+            continue
+        if speech_prob < neg_threshold and triggered:
+            if not temp_end:
+                temp_end = window_size_samples * i
+            if (window_size_samples * i) - temp_end < min_silence_samples:
+                continue
+            current_speech['end'] = temp_end
+            if (current_speech['end'] - current_speech['start']) > min_speech_samples:
+                speeches.append(current_speech)
+            current_speech = {}
+            temp_end = 0
+            triggered = False
+
+    if current_speech and (audio_length_samples - current_speech['start']) > min_speech_samples:
+        current_speech['end'] = audio_length_samples
+        speeches.append(current_speech)
+
+    for i, speech in enumerate(speeches):
+        if i == 0:
+            speech['start'] = int(max(0, speech['start'] - speech_pad_samples))
+        if i != len(speeches) - 1:
+            silence_duration = speeches[i + 1]['start'] - speech['end']
+            if silence_duration < 2 * speech_pad_samples:
+                speech['end'] += int(silence_duration // 2)
+                speeches[i + 1]['start'] = int(max(0, speeches[i + 1]['start'] - silence_duration // 2))
+            else:
+                speech['end'] = int(min(audio_length_samples, speech['end'] + speech_pad_samples))
+                speeches[i + 1]['start'] = int(max(0, speeches[i + 1]['start'] - speech_pad_samples))
+        else:
+            speech['end'] = int(min(audio_length_samples, speech['end'] + speech_pad_samples))
+
+    return speeches
+
+
+class MeanModel:
+    """Udaje Silero: prawdopodobieństwo mowy = średnia próbek okna; zlicza wywołania"""
+
+    def __init__(self):
+        self.calls = 0
+        self.resets = 0
+
+    def reset_states(self):
+        self.resets += 1
+
+    def __call__(self, chunk, sr):
+        assert len(chunk) == WINDOW
+        self.calls += 1
+        return chunk.float().mean()
+
+
+def make_audio(seconds=90, seed=0):
+    """Losowe przebiegi mowa/cisza/niepewne (prawdopodobieństwo zakodowane w próbkach)"""
+    rng = np.random.default_rng(seed)
+    probs = []
+    while len(probs) * WINDOW < seconds * SR:
+        level = rng.choice([0.9, 0.05, 0.42])  # mowa / cisza / między progami
+        probs.extend([level] * int(rng.integers(1, 80)))
+    audio = np.repeat(np.asarray(probs, dtype=np.float32), WINDOW)
+    return audio[:seconds * SR + 300]  # niepełne ostatnie okno
+
+
+def make_stage(tmp_path, chunk_seconds):
+    config = Config()
+    config.use_gpu = False
+    config.vad.min_speech_duration = 0.3
+    config.vad.min_silence_duration = 0.2
+    config.vad.max_segment_duration = 4.0
+    config.vad.chunk_seconds = chunk_seconds
+
+    stage = VADStage.__new__(VADStage)
+    stage.config = config
+    stage.model = MeanModel()
+    stage.utils = (reference_get_speech_timestamps, None, None)
+    stage._cancelled = False
+    return stage
+
+
+@pytest.mark.parametrize("chunk_seconds", [0.5, 7.3, 1000.0])
+def test_streaming_matches_full_tensor_vad(tmp_path, chunk_seconds):
+    audio = make_audio()
+    pcm = tmp_path / "audio.f32"
+    audio.astype('<f4').tofile(pcm)
+    store = AudioStore(pcm, SR)
+
+    stage = make_stage(tmp_path, chunk_seconds)
+    expected = stage._post_process_segments(stage._detect_speech(torch.from_numpy(audio)[None], SR))
+    full_calls = stage.model.calls
+
+    stage.model = MeanModel()
+    streamed = list(stage._iter_post_processed(stage._iter_speech_streaming(store)))
+
+    assert len(expected) > 10
+    assert streamed == expected
+    assert stage.model.calls == full_calls
+    assert stage.model.resets == 1  # stan nie jest resetowany między oknami
+
+
+def test_process_uses_streaming_and_saves(tmp_path):
+    audio = make_audio(seconds=30, seed=1)
+    pcm = tmp_path / "audio.f32"
+    audio.astype('<f4').tofile(pcm)
+
+    stage = make_stage(tmp_path, 2.0)
+    result = stage.process(str(tmp_path / "unused.wav"), tmp_path, audio_store=AudioStore(pcm, SR))
+    expected = stage._post_process_segments(stage._detect_speech(torch.from_numpy(audio)[None], SR))
+    assert result['segments'] == expected
+    assert (tmp_path / "vad_segments.json").exists()
+
+
+def test_tracker_emits_incrementally():
+    tracker = StreamingSpeechTracker(0.5, SR, min_speech_duration_ms=0, min_silence_duration_ms=0)
+    assert tracker.push([0.9] * 5 + [0.0] * 5) == []  # pierwsza mowa czeka na kolejną (padding)
+    first = tracker.push([0.9] * 5 + [0.0] * 2)
+    assert first == [{'start': 0, 'end': 5 * WINDOW + 480}]
+    rest = tracker.finish(17 * WINDOW)
+    assert rest == [{'start': 10 * WINDOW - 480, 'end': 15 * WINDOW + 480}]
+
+
+def test_cancel_interrupts_streaming(tmp_path):
+    audio = make_audio(seconds=20)
+    pcm = tmp_path / "audio.f32"
+    audio.astype('<f4').tofile(pcm)
+    stage = make_stage(tmp_path, 1.0)
+    stage.cancel()
+    with pytest.raises(InterruptedError):
+        stage.process(str(pcm), tmp_path, audio_store=AudioStore(pcm, SR))
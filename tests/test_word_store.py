@@ -0,0 +1,126 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pipeline.audio_store import AudioStore
+from pipeline.config import Config
+from pipeline.stage_03_transcribe import TranscribeStage
+from pipeline.transcript_checkpoint import TranscriptCheckpoint
+from pipeline.word_store import WordStore
+
+SR = 16000
+
+
+def words_every_second(t0, t1):
+    return [{'word': f"w{t:.0f}", 'start': t + 0.2, 'end': t + 0.6, 'probability': 0.9}
+            for t in np.arange(t0, t1 - 0.5)]
+
+
+def test_gaps_words_and_dedup():
+    store = WordStore()
+    store.add(0.0, 10.0, words_every_second(0, 10), confidence=-0.2)
+    store.add(20.0, 30.0, words_every_second(20, 30), confidence=-0.4)
+    store.add(8.0, 12.0, words_every_second(8, 12), confidence=-0.4)  # nachodzi na [0, 10)
+
+    assert store.gaps(5.0, 25.0) == [(12.0, 20.0)]
+    assert store.gaps(5.0, 25.0, min_gap=10.0) == []
+    assert store.gaps(2.0, 9.0) == []
+    assert store.covered(5.0, 25.0) == pytest.approx(12.0)
+
+    words = [w['word'] for w in store.words(7.0, 12.0)]
+    assert words == ["w7", "w8", "w9", "w10", "w11"]  # w8, w9 tylko raz
+    assert store.confidence(0.0, 10.0) == pytest.approx((10 * -0.2 + 2 * -0.4) / 12)
+
+
+class RecordingModel:
+    """Sekwencyjny WhisperModel: zapisuje długości klipów, słowa co sekundę klipu"""
+
+    def __init__(self):
+        self.clips = []
+
+    def transcribe(self, audio, **kwargs):
+        duration = len(audio) / SR
+        self.clips.append(round(duration, 3))
+        words = [SimpleNamespace(word=f"n{i}", start=i + 0.2, end=i + 0.6, probability=0.8)
+                 for i in range(int(duration))]
+        return iter([SimpleNamespace(text="nowe", words=words, avg_logprob=-0.5)]), None
+
+
+def make_stage():
+    stage = TranscribeStage.__new__(TranscribeStage)
+    stage.config = Config()
+    stage.model = RecordingModel()
+    stage.batched_model = None
+    stage._pool = None
+    return stage
+
+
+def make_segments(bounds):
+    return [{'id': f"seg_{i:04d}", 't0': float(a), 't1': float(b), 'duration': float(b - a)}
+            for i, (a, b) in enumerate(bounds)]
+
+
+def test_shifted_segments_reuse_words_and_transcribe_only_gaps(tmp_path):
+    pcm = tmp_path / "audio.f32"
+    np.zeros(120 * SR, dtype='<f4').tofile(pcm)
+    store = AudioStore(pcm, SR)
+    checkpoint = TranscriptCheckpoint(tmp_path / "log.jsonl")
+
+    first = make_stage()
+    first.process("unused.wav", make_segments([(0, 10), (12, 20), (30, 40)]), tmp_path,
+                  audio_store=store, checkpoint=checkpoint)
+    assert first.model.clips == [10.0, 8.0, 10.0]
+
+    # Inny VAD: granice przesunięte o ułamki sekundy, dwa segmenty scalone, nowy fragment
+    second = make_stage()
+    result = second.process(
+        "unused.wav", make_segments([(0.3, 9.8), (11.5, 20.0), (30, 40), (50, 55)]), tmp_path,
+        audio_store=store, checkpoint=checkpoint
+    )
+    # Luka 11.5-12.0 jest krótsza niż reuse_min_gap; Whisper tylko dla nowego segmentu
+    assert second.model.clips == [5.0]
+
+    segments = result['segments']
+    assert [s['id'] for s in segments] == ["seg_0000", "seg_0001", "seg_0002", "seg_0003"]
+    assert segments[0]['transcript'].split()[0] == "n0"  # słowo 0.2-0.6 ma środek w [0.3, 9.8)
+    assert segments[0]['num_words'] == 10
+    assert segments[1]['words'][0]['start'] == pytest.approx(12.2)
+    assert segments[2]['transcript'] == "nowe"  # identyczne granice - wprost z dziennika
+    assert segments[3]['words'][0]['start'] == pytest.approx(50.2)
+
+    # Szerszy segment z dużą luką → transkrybowana tylko luka
+    third = make_stage()
+    third.process("unused.wav", make_segments([(0.3, 9.8), (12, 28)]), tmp_path,
+                  audio_store=store, checkpoint=checkpoint)
+    assert third.model.clips == [8.0]
+
+
+def test_failed_gap_is_not_checkpointed_as_success(tmp_path):
+    pcm = tmp_path / "audio.f32"
+    np.zeros(60 * SR, dtype='<f4').tofile(pcm)
+    store = AudioStore(pcm, SR)
+    checkpoint = TranscriptCheckpoint(tmp_path / "log.jsonl")
+
+    make_stage().process("unused.wav", make_segments([(0, 10)]), tmp_path,
+                         audio_store=store, checkpoint=checkpoint)
+
+    # Szerszy segment: luka 10-20 - Whisper rzuca wyjątek
+    failing = make_stage()
+    failing.model.transcribe = lambda audio, **kwargs: (_ for _ in ()).throw(RuntimeError("CUDA OOM"))
+    result = failing.process("unused.wav", make_segments([(0, 20)]), tmp_path,
+                             audio_store=store, checkpoint=checkpoint)
+    assert result['segments'][0]['error'] == "CUDA OOM"
+    assert checkpoint.restore(make_segments([(0, 20)])) == [None]
+
+    # Kolejny przebieg powtarza tylko lukę
+    retry = make_stage()
+    result = retry.process("unused.wav", make_segments([(0, 20)]), tmp_path,
+                           audio_store=store, checkpoint=checkpoint)
+    assert retry.model.clips == [10.0]
+    assert 'error' not in result['segments'][0]
+    assert result['segments'][0]['num_words'] == 20